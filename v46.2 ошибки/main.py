@@ -502,6 +502,41 @@ async def run_web_interface():
         logger.error(f"❌ Ошибка запуска веб-интерфейса: {e}")
         return False
 
+async def run_asgi_stack():
+    """Запуск бота и веб-интерфейса (ASGI) в одном event loop"""
+    logger.info("🌐 Запуск бота и ASGI-сервера в одном event loop...")
+    
+    try:
+        from src.bot import get_bot_manager
+        from src.web.asgi_app import create_asgi_app, serve
+        
+        bot_manager = get_bot_manager()
+        if await initialize_signal_components(bot_manager):
+            logger.info("✅ Все компоненты сигналов инициализированы")
+        else:
+            logger.warning("⚠️ Не все компоненты сигналов инициализированы")
+        
+        app = create_asgi_app(bot_manager)
+        
+        success, message = await bot_manager.start_in_loop()
+        if not success:
+            logger.warning(f"⚠️ Бот не запущен: {message} (запуск доступен через /api/bot/start)")
+        
+        port = int(os.getenv('WEB_PORT', 5000))
+        try:
+            # Сервер работает до Ctrl+C / SIGTERM
+            await serve(app, host='0.0.0.0', port=port)
+        finally:
+            if bot_manager.is_running:
+                await bot_manager.stop_in_loop()
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка запуска ASGI-сервера: {e}")
+        logger.exception("📊 Полная трассировка ошибки:")
+        return False
+
 # ========================================
 # ГЛАВНАЯ ФУНКЦИЯ
 # ========================================
@@ -543,13 +578,16 @@ async def main():
                 task.cancel()
                 
             success = True
+        elif mode == 'asgi':
+            logger.info("🚀 Инициализация бота и ASGI веб-интерфейса...")
+            success = await run_asgi_stack()
         elif mode == 'check':
             logger.info("🔍 Проверка системы...")
             success = await check_system_components()
             logger.info("✅ Проверка завершена")
         else:
             logger.error(f"❌ Неизвестный режим: {mode}")
-            logger.info("💡 Доступные режимы: bot, web, both, check")
+            logger.info("💡 Доступные режимы: bot, web, both, asgi, check")
             success = False
         
         if success:
@@ -8,13 +8,16 @@
 - Улучшена настройка через .env файл
 - Добавлены fallback значения
 - ДОБАВЛЕНО сохранение в таблицы market_data и candles
+- Свечи, тикеры и стакан по WebSocket (bybit_market_stream.py), REST - только
+  догрузка пропусков и запасной режим без WebSocket (в том числе, если поток
+  оборвался или замолчал - до его восстановления)
 
 Собирает данные о стакане ордеров и аномальных объемах
 """
 import asyncio
 import logging
 from typing import Dict, List, Optional, Any, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime
 from decimal import Decimal
 import numpy as np
 import json
@@ -27,9 +30,14 @@ except ImportError:
     HTTP = None
 
 from ..core.database import SessionLocal
-from ..core.models import OrderBookSnapshot, VolumeAnomaly, MarketData, Candle
+from ..core.models import OrderBookSnapshot, VolumeAnomaly, MarketData
 from ..core.unified_config import unified_config as config
+from ..data.candle_store import candle_store
+from ..data.candle_writer import upsert_candles
+from ..data.ohlcv_archive import ohlcv_archive
+from ..data.order_book import L2Book, order_book_engine
 from ..exchange.unified_exchange import UnifiedExchangeClient
+from .bybit_market_stream import BybitMarketStream
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +58,10 @@ class BybitDataProducer:
     DEFAULT_SNAPSHOT_INTERVAL = 60  # секунд
     DEFAULT_VOLUME_WINDOW = 24  # часов
     VOLUME_ANOMALY_THRESHOLD = 3.0  # стандартных отклонения
+    MARKET_DATA_SAVE_INTERVAL = 30  # секунд между записями market_data
+    STREAM_MAX_AGE = 10  # секунд, после которых потоковые данные считаются устаревшими
+    STREAM_STALE_AFTER = 60  # секунд без сообщений WebSocket до перехода на REST-опрос
+    STREAM_RESTART_INTERVAL = 300  # секунд между попытками переподключить оборванный поток
     
     def __init__(self, testnet: bool = True):
         """
@@ -72,7 +84,6 @@ class BybitDataProducer:
             
         # Кэш данных
         self.volume_history = {}  # История объемов по символам
-        self.last_orderbook = {}  # Последний стакан по символам
         self.ofi_history = {}     # История OFI для анализа
         
         # Отслеживаемые символы из конфигурации
@@ -85,6 +96,13 @@ class BybitDataProducer:
         self.volume_check_interval = getattr(config, 'VOLUME_CHECK_INTERVAL', 300)  # 5 минут
         self.trades_update_interval = getattr(config, 'TRADES_UPDATE_INTERVAL', 3600)  # 1 час
         
+        # ✅ ПОТОКОВЫЕ ДАННЫЕ ПО WEBSOCKET
+        self.streaming = getattr(config, 'MARKET_DATA_STREAMING', True)
+        self.candle_intervals = list(getattr(config, 'STREAM_KLINE_INTERVALS', ['5m', '15m', '1h']))
+        self.stream_flush_interval = getattr(config, 'STREAM_FLUSH_INTERVAL', 5)
+        self.stream: Optional[BybitMarketStream] = None
+        self._rest_tasks: List[asyncio.Task] = []  # REST-опрос, пока поток недоступен
+        
         logger.info(f"📊 Настроенные интервалы:")
         logger.info(f"   📸 Снимки стакана: {self.snapshot_interval}с")
         logger.info(f"   📈 Проверка объемов: {self.volume_check_interval}с")
@@ -130,10 +148,17 @@ class BybitDataProducer:
             asyncio.create_task(self._orderbook_snapshot_loop()),
             asyncio.create_task(self._volume_monitor_loop()),
             asyncio.create_task(self._trades_stream_monitor()),
-            asyncio.create_task(self._market_data_update_loop()),  # НОВЫЙ цикл для market_data
-            asyncio.create_task(self._candles_update_loop())       # НОВЫЙ цикл для свечей
         ]
         
+        if self.streaming and await self._start_stream():
+            # Свечи и тикеры приходят по WebSocket, в цикле только запись в БД и догрузка пропусков
+            tasks.append(asyncio.create_task(self._stream_flush_loop()))
+        else:
+            tasks.extend([
+                asyncio.create_task(self._market_data_update_loop()),  # НОВЫЙ цикл для market_data
+                asyncio.create_task(self._candles_update_loop())       # НОВЫЙ цикл для свечей
+            ])
+        
         try:
             await asyncio.gather(*tasks)
         except asyncio.CancelledError:
@@ -145,6 +170,9 @@ class BybitDataProducer:
         """Остановка продюсера"""
         logger.info("🛑 Остановка BybitDataProducer...")
         self.is_running = False
+        await self._stop_rest_loops()
+        if self.stream:
+            self.stream.stop()
         await self.exchange_client.disconnect()
         
     async def _init_volume_history(self):
@@ -175,168 +203,145 @@ class BybitDataProducer:
             self.volume_history[symbol] = []
 
     
-    async def _market_data_update_loop(self):
-        """НОВЫЙ: Цикл обновления данных в таблице market_data"""
-        logger.info("💹 Запуск цикла обновления market_data...")
-        
-        while self.is_running:
-            try:
-                for symbol in self.symbols:
-                    await self._update_market_data(symbol)
-                    await asyncio.sleep(0.5)  # Задержка между символами
-                
-                await asyncio.sleep(30)  # Обновляем каждые 30 секунд
-                
-            except asyncio.CancelledError:
-                logger.info("🛑 Цикл market_data остановлен")
-                break
-            except Exception as e:
-                logger.error(f"❌ Ошибка в цикле market_data: {e}")
-                await asyncio.sleep(10)
-    
-    async def _update_market_data(self, symbol: str):
-        """Обновление данных в таблице market_data"""
+    async def _start_stream(self) -> bool:
+        """Подключение потоковых данных, при неудаче остаемся на REST-опросе"""
         try:
-            # Получаем текущие данные
-            ticker = await self.exchange_client.fetch_ticker(symbol)
-            if not ticker or 'error' in ticker:
-                return
-            
-            db = SessionLocal()
-            try:
-                # Проверяем существует ли запись
-                market_data = db.query(MarketData).filter(
-                    MarketData.symbol == symbol
-                ).first()
-                
-                if market_data:
-                    # Обновляем существующую запись
-                    market_data.last_price = float(ticker.get('last', 0))
-                    market_data.price_24h_pcnt = float(ticker.get('percentage', 0))
-                    market_data.high_price_24h = float(ticker.get('high', 0))
-                    market_data.low_price_24h = float(ticker.get('low', 0))
-                    market_data.volume_24h = float(ticker.get('baseVolume', 0))
-                    market_data.turnover_24h = float(ticker.get('quoteVolume', 0))
-                    market_data.updated_at = datetime.utcnow()
-                else:
-                    # Создаем новую запись
-                    market_data = MarketData(
-                        symbol=symbol,
-                        last_price=float(ticker.get('last', 0)),
-                        price_24h_pcnt=float(ticker.get('percentage', 0)),
-                        high_price_24h=float(ticker.get('high', 0)),
-                        low_price_24h=float(ticker.get('low', 0)),
-                        volume_24h=float(ticker.get('baseVolume', 0)),
-                        turnover_24h=float(ticker.get('quoteVolume', 0))
-                    )
-                    db.add(market_data)
-                
-                db.commit()
-                logger.debug(f"✅ Обновлены данные market_data для {symbol}")
-                
-            except Exception as e:
-                db.rollback()
-                logger.error(f"❌ Ошибка сохранения market_data для {symbol}: {e}")
-            finally:
-                db.close()
-                
+            self.stream = BybitMarketStream(
+                self.symbols,
+                intervals=self.candle_intervals,
+                orderbook_depth=self.DEFAULT_ORDERBOOK_DEPTH,
+                testnet=self.testnet
+            )
+            if await self.stream.start():
+                return True
         except Exception as e:
-            logger.error(f"❌ Ошибка обновления market_data для {symbol}: {e}")
+            logger.error(f"❌ Ошибка запуска WebSocket потока: {e}")
+        self.stream = None
+        logger.warning("⚠️ WebSocket недоступен, используем REST-опрос")
+        return False
     
-    async def _candles_update_loop(self):
-        """НОВЫЙ: Цикл обновления свечей"""
-        logger.info("🕯️ Запуск цикла обновления свечей...")
+    def _stream_healthy(self) -> bool:
+        """Поток подключен и присылал сообщения за последние STREAM_STALE_AFTER секунд"""
+        return (self.stream is not None and self.stream.is_connected
+                and self.stream.message_age() < self.STREAM_STALE_AFTER)
+    
+    def _start_rest_loops(self):
+        """Запасной REST-опрос свечей и тикеров, пока поток недоступен"""
+        if self._rest_tasks:
+            return
+        logger.warning("⚠️ WebSocket оборвался или молчит, переходим на REST-опрос свечей и тикеров")
+        self._rest_tasks = [
+            asyncio.create_task(self._market_data_update_loop()),
+            asyncio.create_task(self._candles_update_loop())
+        ]
+    
+    async def _stop_rest_loops(self):
+        tasks, self._rest_tasks = self._rest_tasks, []
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _restart_stream(self):
+        """Новое подключение к WebSocket вместо оборванного (при неудаче остаемся на REST)"""
+        old_stream = self.stream
+        if old_stream:
+            old_stream.stop()
+            self._save_closed_candles(old_stream.drain_closed_candles())
+        if not await self._start_stream():
+            self.stream = old_stream
+    
+    async def _stream_flush_loop(self):
+        """
+        Запись накопленных потоковых данных в БД и догрузка пропусков через REST.
+        Если поток оборвался или замолчал - REST-опрос до его восстановления.
+        """
+        logger.info("📡 Запуск цикла записи потоковых данных...")
+        last_market_data_save = 0.0
+        last_restart = asyncio.get_running_loop().time()
         
         while self.is_running:
             try:
-                for symbol in self.symbols:
-                    # Обновляем свечи разных таймфреймов
-                    for interval in ['5m', '15m', '1h']:
-                        await self._update_candles(symbol, interval)
-                        await asyncio.sleep(1)  # Задержка между запросами
-                
-                await asyncio.sleep(60)  # Обновляем каждую минуту
+                now = asyncio.get_running_loop().time()
+                if not self._stream_healthy():
+                    self._start_rest_loops()
+                    if not self.stream.is_connected and now - last_restart >= self.STREAM_RESTART_INTERVAL:
+                        last_restart = now
+                        await self._restart_stream()
+                    await asyncio.sleep(self.stream_flush_interval)
+                    continue
+                if self._rest_tasks:
+                    await self._stop_rest_loops()
+                    logger.info("✅ WebSocket снова присылает данные, REST-опрос остановлен")
+                
+                # Пропуски (старт, переподключение) догружаем через REST
+                for symbol, interval in self.stream.drain_gaps():
+                    await self._update_candles(symbol, interval)
+                
+                self._save_closed_candles(self.stream.drain_closed_candles())
+                
+                if now - last_market_data_save >= self.MARKET_DATA_SAVE_INTERVAL:
+                    for symbol, ticker in self.stream.drain_tickers().items():
+                        self._save_market_data(symbol, ticker)
+                    last_market_data_save = now
+                
+                await asyncio.sleep(self.stream_flush_interval)
                 
             except asyncio.CancelledError:
-                logger.info("🛑 Цикл свечей остановлен")
+                await self._stop_rest_loops()
+                logger.info("🛑 Цикл потоковых данных остановлен")
                 break
             except Exception as e:
-                logger.error(f"❌ Ошибка в цикле свечей: {e}")
-                await asyncio.sleep(30)
+                logger.error(f"❌ Ошибка в цикле потоковых данных: {e}")
+                await asyncio.sleep(10)
     
-    async def _update_candles(self, symbol: str, interval: str):
-        """Обновление свечей в БД"""
+    def _save_closed_candles(self, closed: Dict[Tuple[str, str], List]):
+        """Закрытые свечи из WebSocket - в БД одной транзакцией и в архив"""
+        if not closed:
+            return
+        
+        db = SessionLocal()
         try:
-            # Получаем последние свечи
-            klines = await self.exchange_client.get_klines(
-                symbol=symbol,
-                interval=interval,
-                limit=100
+            saved_count = sum(
+                upsert_candles(db, symbol, interval, candles)
+                for (symbol, interval), candles in closed.items()
             )
-            
-            if not klines or 'data' not in klines:
-                return
-            
-            db = SessionLocal()
+            db.commit()
+            logger.debug(f"💾 Сохранено {saved_count} закрытых свечей из WebSocket")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ Ошибка сохранения свечей из WebSocket: {e}")
+        finally:
+            db.close()
+        
+        for (symbol, interval), candles in closed.items():
             try:
-                saved_count = 0
-                
-                for candle_data in klines['data']:
-                    if len(candle_data) < 6:
-                        continue
-                    
-                    timestamp_ms = candle_data[0]
-                    open_time = datetime.fromtimestamp(timestamp_ms / 1000)
-                    
-                    # Проверяем существует ли свеча
-                    existing = db.query(Candle).filter(
-                        Candle.symbol == symbol,
-                        Candle.interval == interval,
-                        Candle.open_time == open_time
-                    ).first()
-                    
-                    if not existing:
-                        # Создаем новую свечу
-                        candle = Candle(
-                            symbol=symbol,
-                            interval=interval,
-                            open_time=open_time,
-                            open=float(candle_data[1]),
-                            high=float(candle_data[2]),
-                            low=float(candle_data[3]),
-                            close=float(candle_data[4]),
-                            volume=float(candle_data[5]),
-                            close_time=open_time + self._get_interval_delta(interval)
-                        )
-                        db.add(candle)
-                        saved_count += 1
-                
-                if saved_count > 0:
-                    db.commit()
-                    logger.debug(f"💾 Сохранено {saved_count} свечей для {symbol} ({interval})")
-                    
+                ohlcv_archive.append_candles(symbol, interval, candles, drop_open=False)
             except Exception as e:
-                db.rollback()
-                logger.error(f"❌ Ошибка сохранения свечей для {symbol}: {e}")
-            finally:
-                db.close()
-                
-        except Exception as e:
-            logger.error(f"❌ Ошибка загрузки свечей {symbol}: {e}")
+                logger.warning(f"⚠️ Не удалось дописать {symbol} ({interval}) в архив: {e}")
+    
+    async def _get_ticker(self, symbol: str) -> Optional[Dict]:
+        """Тикер из WebSocket, если он свежий, иначе через REST"""
+        if self.stream and self.stream.age('tickers', symbol) < self.STREAM_MAX_AGE:
+            ticker = self.stream.get_ticker(symbol)
+            if ticker:
+                return ticker
+        return await self.exchange_client.fetch_ticker(symbol)
+    
+    async def _get_order_book(self, symbol: str) -> Optional[L2Book]:
+        """Стакан из WebSocket, если он свежий, иначе через REST (загружается в order_book_engine)"""
+        book = order_book_engine.book(symbol)
+        if self.stream and book is not None and book.streaming and book.age() < self.STREAM_MAX_AGE:
+            return book
+        
+        orderbook = await self.exchange_client.get_order_book(
+            symbol=symbol,
+            limit=self.DEFAULT_ORDERBOOK_DEPTH
+        )
+        if not orderbook or 'error' in orderbook or not orderbook.get('bids') or not orderbook.get('asks'):
+            return None
+        return order_book_engine.load_snapshot(symbol, orderbook['bids'], orderbook['asks'])
     
-    def _get_interval_delta(self, interval: str) -> timedelta:
-        """Получение timedelta для интервала"""
-        intervals = {
-            '1m': timedelta(minutes=1),
-            '5m': timedelta(minutes=5),
-            '15m': timedelta(minutes=15),
-            '30m': timedelta(minutes=30),
-            '1h': timedelta(hours=1),
-            '4h': timedelta(hours=4),
-            '1d': timedelta(days=1),
-        }
-        return intervals.get(interval, timedelta(minutes=5))
-                
     async def _orderbook_snapshot_loop(self):
         """
         Цикл создания снимков стакана ордеров
@@ -363,102 +368,32 @@ class BybitDataProducer:
                 await asyncio.sleep(10)
                 
     async def _capture_orderbook_snapshot(self, symbol: str):
-        """Создание снимка стакана ордеров"""
+        """
+        Запись снимка стакана.
+        Стакан поддерживается потоком в order_book_engine, в БД уходит только
+        снимок раз в snapshot_interval, метрики считаются по массивам стакана.
+        """
         try:
-            # Получаем стакан
-            orderbook = await self.exchange_client.get_order_book(
-                symbol=symbol,
-                limit=self.DEFAULT_ORDERBOOK_DEPTH
-            )
-            
-            if not orderbook or 'error' in orderbook:
-                return
-                
-            bids = orderbook.get('bids', [])
-            asks = orderbook.get('asks', [])
-            
-            if not bids or not asks:
+            book = await self._get_order_book(symbol)
+            if book is None:
                 return
-                
-            # Сохраняем в кэш
-            self.last_orderbook[symbol] = orderbook
-            
-            # Расчет метрик
-            bid_volume = sum(float(bid[1]) for bid in bids)
-            ask_volume = sum(float(ask[1]) for ask in asks)
-            
-            # Спред
-            best_bid = float(bids[0][0]) if bids else 0
-            best_ask = float(asks[0][0]) if asks else 0
-            spread = best_ask - best_bid if best_bid and best_ask else 0
             
-            # Средняя цена
-            mid_price = (best_bid + best_ask) / 2 if best_bid and best_ask else 0
-            
-            # Дисбаланс объемов
-            total_volume = bid_volume + ask_volume
-            imbalance = (bid_volume - ask_volume) / total_volume if total_volume > 0 else 0
-            
-            # Расчет Order Flow Imbalance (OFI)
-            ofi = self._calculate_ofi(bids, asks)
+            snapshot = book.snapshot_row()
             
             # Сохраняем историю OFI
-            if symbol not in self.ofi_history:
-                self.ofi_history[symbol] = []
-            self.ofi_history[symbol].append(ofi)
-            if len(self.ofi_history[symbol]) > 100:
-                self.ofi_history[symbol].pop(0)
+            history = self.ofi_history.setdefault(symbol, [])
+            history.append(snapshot['ofi'])
+            if len(history) > 100:
+                history.pop(0)
             
-            # Сохраняем снимок в БД
-            await self._save_orderbook_snapshot({
-                'symbol': symbol,
-                'timestamp': datetime.utcnow(),
-                'bids': bids[:self.DEFAULT_ORDERBOOK_DEPTH],
-                'asks': asks[:self.DEFAULT_ORDERBOOK_DEPTH],
-                'bid_volume': bid_volume,
-                'ask_volume': ask_volume,
-                'spread': spread,
-                'mid_price': mid_price,
-                'imbalance': imbalance,
-                'ofi': ofi
-            })
+            await self._save_orderbook_snapshot(snapshot)
             
             logger.debug(f"📸 Снимок стакана {symbol}: "
-                        f"imbalance={imbalance:.2f}, OFI={ofi:.2f}")
+                        f"imbalance={snapshot['imbalance']:.2f}, OFI={snapshot['ofi']:.2f}")
             
         except Exception as e:
             logger.error(f"❌ Ошибка снимка стакана {symbol}: {e}")
             
-    def _calculate_ofi(self, bids: List, asks: List, depth: int = 10) -> float:
-        """Расчет Order Flow Imbalance"""
-        try:
-            # Суммируем объемы на глубину depth
-            bid_volume = sum(float(bid[1]) for bid in bids[:depth])
-            ask_volume = sum(float(ask[1]) for ask in asks[:depth])
-            
-            # Взвешенные цены
-            if bid_volume > 0:
-                weighted_bid = sum(float(bid[0]) * float(bid[1]) for bid in bids[:depth]) / bid_volume
-            else:
-                weighted_bid = 0
-                
-            if ask_volume > 0:
-                weighted_ask = sum(float(ask[0]) * float(ask[1]) for ask in asks[:depth]) / ask_volume
-            else:
-                weighted_ask = 0
-            
-            # OFI = (bid_volume - ask_volume) * (weighted_ask - weighted_bid)
-            volume_imbalance = bid_volume - ask_volume
-            price_spread = weighted_ask - weighted_bid if weighted_ask and weighted_bid else 0
-            
-            ofi = volume_imbalance * price_spread
-            
-            return ofi
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка расчета OFI: {e}")
-            return 0.0
-            
     async def _volume_monitor_loop(self):
         """
         Цикл мониторинга объемов
@@ -488,7 +423,7 @@ class BybitDataProducer:
         """Проверка на аномальные объемы"""
         try:
             # Получаем текущие данные
-            ticker = await self.exchange_client.fetch_ticker(symbol)
+            ticker = await self._get_ticker(symbol)
             if not ticker:
                 return
                 
@@ -590,8 +525,7 @@ class BybitDataProducer:
                 symbol=snapshot_data['symbol'],
                 exchange='bybit',
                 timestamp=snapshot_data['timestamp'],
-                bids=json.dumps(snapshot_data['bids']),
-                asks=json.dumps(snapshot_data['asks']),
+                book_data=snapshot_data['book_data'],
                 bid_volume=Decimal(str(snapshot_data['bid_volume'])),
                 ask_volume=Decimal(str(snapshot_data['ask_volume'])),
                 spread=Decimal(str(snapshot_data['spread'])),
@@ -672,13 +606,9 @@ class BybitDataProducer:
                     metrics['volume_status'] = 'low'
                 
         # Дисбаланс стакана
-        if symbol in self.last_orderbook:
-            orderbook = self.last_orderbook[symbol]
-            bid_volume = sum(float(b[1]) for b in orderbook['bids'][:10])
-            ask_volume = sum(float(a[1]) for a in orderbook['asks'][:10])
-            
-            if bid_volume + ask_volume > 0:
-                metrics['orderbook_imbalance'] = (bid_volume - ask_volume) / (bid_volume + ask_volume)
+        book = order_book_engine.book(symbol)
+        if book is not None:
+            metrics['orderbook_imbalance'] = book.imbalance(10)
                 
         return metrics
 
@@ -688,7 +618,7 @@ class BybitDataProducer:
             'symbols_tracked': len(self.symbols),
             'volume_history_size': sum(len(v) for v in self.volume_history.values()),
             'ofi_history_size': sum(len(v) for v in self.ofi_history.values()),
-            'orderbook_cache_size': len(self.last_orderbook),
+            'orderbook': order_book_engine.get_statistics(),
             'is_running': self.is_running,
             'intervals': {
                 'snapshot': self.snapshot_interval,
@@ -724,47 +654,51 @@ class BybitDataProducer:
             if not ticker or 'error' in ticker:
                 return
             
-            db = SessionLocal()
-            try:
-                # Проверяем существует ли запись
-                market_data = db.query(MarketData).filter(
-                    MarketData.symbol == symbol
-                ).first()
-                
-                if market_data:
-                    # Обновляем существующую запись
-                    market_data.last_price = float(ticker.get('last', 0))
-                    market_data.price_24h_pcnt = float(ticker.get('percentage', 0))
-                    market_data.high_price_24h = float(ticker.get('high', 0))
-                    market_data.low_price_24h = float(ticker.get('low', 0))
-                    market_data.volume_24h = float(ticker.get('baseVolume', 0))
-                    market_data.turnover_24h = float(ticker.get('quoteVolume', 0))
-                    market_data.updated_at = datetime.utcnow()
-                else:
-                    # Создаем новую запись
-                    market_data = MarketData(
-                        symbol=symbol,
-                        last_price=float(ticker.get('last', 0)),
-                        price_24h_pcnt=float(ticker.get('percentage', 0)),
-                        high_price_24h=float(ticker.get('high', 0)),
-                        low_price_24h=float(ticker.get('low', 0)),
-                        volume_24h=float(ticker.get('baseVolume', 0)),
-                        turnover_24h=float(ticker.get('quoteVolume', 0))
-                    )
-                    db.add(market_data)
-                
-                db.commit()
-                logger.debug(f"✅ Обновлены данные market_data для {symbol}")
-                
-            except Exception as e:
-                db.rollback()
-                logger.error(f"❌ Ошибка сохранения market_data для {symbol}: {e}")
-            finally:
-                db.close()
+            self._save_market_data(symbol, ticker)
                 
         except Exception as e:
             logger.error(f"❌ Ошибка обновления market_data для {symbol}: {e}")
     
+    def _save_market_data(self, symbol: str, ticker: Dict):
+        """Запись тикера (формат CCXT) в таблицу market_data"""
+        db = SessionLocal()
+        try:
+            # Проверяем существует ли запись
+            market_data = db.query(MarketData).filter(
+                MarketData.symbol == symbol
+            ).first()
+            
+            if market_data:
+                # Обновляем существующую запись
+                market_data.last_price = float(ticker.get('last', 0))
+                market_data.price_24h_pcnt = float(ticker.get('percentage', 0))
+                market_data.high_price_24h = float(ticker.get('high', 0))
+                market_data.low_price_24h = float(ticker.get('low', 0))
+                market_data.volume_24h = float(ticker.get('baseVolume', 0))
+                market_data.turnover_24h = float(ticker.get('quoteVolume', 0))
+                market_data.updated_at = datetime.utcnow()
+            else:
+                # Создаем новую запись
+                market_data = MarketData(
+                    symbol=symbol,
+                    last_price=float(ticker.get('last', 0)),
+                    price_24h_pcnt=float(ticker.get('percentage', 0)),
+                    high_price_24h=float(ticker.get('high', 0)),
+                    low_price_24h=float(ticker.get('low', 0)),
+                    volume_24h=float(ticker.get('baseVolume', 0)),
+                    turnover_24h=float(ticker.get('quoteVolume', 0))
+                )
+                db.add(market_data)
+            
+            db.commit()
+            logger.debug(f"✅ Обновлены данные market_data для {symbol}")
+            
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ Ошибка сохранения market_data для {symbol}: {e}")
+        finally:
+            db.close()
+    
     async def _candles_update_loop(self):
         """НОВЫЙ: Цикл обновления свечей"""
         logger.info("🕯️ Запуск цикла обновления свечей...")
@@ -773,7 +707,7 @@ class BybitDataProducer:
             try:
                 for symbol in self.symbols:
                     # Обновляем свечи разных таймфреймов
-                    for interval in ['5m', '15m', '1h']:
+                    for interval in self.candle_intervals:
                         await self._update_candles(symbol, interval)
                         await asyncio.sleep(1)  # Задержка между запросами
                 
@@ -799,39 +733,13 @@ class BybitDataProducer:
             if not klines or 'data' not in klines:
                 return
             
+            # Свежие свечи сразу в общий кольцевой буфер, БД - вторично
+            candle_store.extend(symbol, interval, klines['data'])
+            
             db = SessionLocal()
             try:
-                saved_count = 0
-                
-                for candle_data in klines['data']:
-                    if len(candle_data) < 6:
-                        continue
-                    
-                    timestamp_ms = candle_data[0]
-                    open_time = datetime.fromtimestamp(timestamp_ms / 1000)
-                    
-                    # Проверяем существует ли свеча
-                    existing = db.query(Candle).filter(
-                        Candle.symbol == symbol,
-                        Candle.interval == interval,
-                        Candle.open_time == open_time
-                    ).first()
-                    
-                    if not existing:
-                        # Создаем новую свечу
-                        candle = Candle(
-                            symbol=symbol,
-                            interval=interval,
-                            open_time=open_time,
-                            open=float(candle_data[1]),
-                            high=float(candle_data[2]),
-                            low=float(candle_data[3]),
-                            close=float(candle_data[4]),
-                            volume=float(candle_data[5]),
-                            close_time=open_time + self._get_interval_delta(interval)
-                        )
-                        db.add(candle)
-                        saved_count += 1
+                # Пакетный upsert по уникальному индексу вместо SELECT на каждую свечу
+                saved_count = upsert_candles(db, symbol, interval, klines['data'])
                 
                 if saved_count > 0:
                     db.commit()
@@ -842,22 +750,12 @@ class BybitDataProducer:
                 logger.error(f"❌ Ошибка сохранения свечей для {symbol}: {e}")
             finally:
                 db.close()
+            
+            ohlcv_archive.append_candles(symbol, interval, klines['data'])
                 
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки свечей {symbol}: {e}")
     
-    def _get_interval_delta(self, interval: str) -> timedelta:
-        """Получение timedelta для интервала"""
-        intervals = {
-            '1m': timedelta(minutes=1),
-            '5m': timedelta(minutes=5),
-            '15m': timedelta(minutes=15),
-            '30m': timedelta(minutes=30),
-            '1h': timedelta(hours=1),
-            '4h': timedelta(hours=4),
-            '1d': timedelta(days=1),
-        }
-        return intervals.get(interval, timedelta(minutes=5))
 
 
 # Функция для запуска продюсера
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Потоковый прием рыночных данных Bybit через публичный WebSocket
+Файл: src/api_clients/bybit_market_stream.py
+
+Подписки kline.*, tickers.* и orderbook.* вместо REST-опроса:
+- свечи сразу попадают в общий candle_store
+- тикеры держатся в памяти, стакан - в общем order_book_engine
+  (delta-сообщения накладываются на snapshot)
+- закрытые свечи, тикеры и пропуски в свечах накапливаются и забираются
+  продюсером пачкой (drain_*), REST используется только для догрузки пропусков
+
+Сообщения приходят в потоке WebSocket и передаются в event loop через
+call_soon_threadsafe, поэтому состояние потока меняется только из event loop.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..data.candle_store import candle_store, interval_delta
+from ..data.order_book import order_book_engine
+from ..exchange.bybit_client_v5 import BybitCredentials, BybitEndpoints, BybitWebSocketManager
+
+logger = logging.getLogger(__name__)
+
+# Таймфрейм бота -> интервал топика kline Bybit
+KLINE_INTERVALS = {
+    '1m': '1', '3m': '3', '5m': '5', '15m': '15', '30m': '30',
+    '1h': '60', '2h': '120', '4h': '240', '6h': '360', '12h': '720',
+    '1d': 'D', '1w': 'W',
+}
+
+# Глубины стакана, доступные для подписки orderbook.{depth}.{symbol} (linear)
+ORDERBOOK_DEPTHS = (1, 50, 200, 500)
+
+PUBLIC_ENDPOINTS = {
+    True: BybitEndpoints(
+        rest_base="https://api-testnet.bybit.com",
+        ws_public="wss://stream-testnet.bybit.com/v5/public",
+        ws_private="wss://stream-testnet.bybit.com/v5/private"
+    ),
+    False: BybitEndpoints(
+        rest_base="https://api.bybit.com",
+        ws_public="wss://stream.bybit.com/v5/public",
+        ws_private="wss://stream.bybit.com/v5/private"
+    ),
+}
+
+
+class BybitMarketStream:
+    """
+    Состояние рынка из публичного WebSocket Bybit.
+
+    Пропуском считается свеча, время открытия которой дальше
+    одного интервала от последней свечи в candle_store (обрыв соединения,
+    переподключение). При старте все пары помечены как пропуски, чтобы
+    продюсер один раз догрузил историю через REST.
+    """
+
+    CONNECT_TIMEOUT = 10.0  # секунд ожидания открытия соединения
+
+    def __init__(self, symbols: Iterable[str], intervals: Iterable[str] = ('5m', '15m', '1h'),
+                 orderbook_depth: int = 50, testnet: bool = True):
+        self.symbols = list(symbols)
+        self.intervals = [tf for tf in intervals if tf in KLINE_INTERVALS]
+        self.orderbook_depth = orderbook_depth if orderbook_depth in ORDERBOOK_DEPTHS else 50
+        self.testnet = testnet
+
+        self.ws_manager = BybitWebSocketManager(BybitCredentials('', '', testnet), PUBLIC_ENDPOINTS[testnet])
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._topic_intervals = {code: tf for tf, code in KLINE_INTERVALS.items()}
+        self.is_running = False
+
+        # Текущее состояние рынка
+        self.tickers: Dict[str, Dict[str, Any]] = {}
+        self.updated_at: Dict[Tuple[str, str], float] = {}
+
+        # Накопленное для продюсера
+        self._closed_candles: Dict[Tuple[str, str], List[List[float]]] = defaultdict(list)
+        self._dirty_tickers: Set[str] = set()
+        self._gaps: Set[Tuple[str, str]] = {(s, tf) for s in self.symbols for tf in self.intervals}
+
+        # Статистика
+        self.messages = defaultdict(int)
+        self.last_lag_ms: Dict[str, float] = {}
+        self.last_message_time = 0.0
+
+    # === Подключение ===
+
+    def topics(self) -> List[str]:
+        topics = []
+        for symbol in self.symbols:
+            topics.extend(f"kline.{KLINE_INTERVALS[tf]}.{symbol}" for tf in self.intervals)
+            topics.append(f"tickers.{symbol}")
+            topics.append(f"orderbook.{self.orderbook_depth}.{symbol}")
+        return topics
+
+    async def start(self) -> bool:
+        """Подключение к публичному WebSocket и подписка на все топики"""
+        self._loop = asyncio.get_running_loop()
+        if not self.ws_manager.connect_public(self._on_message):
+            return False
+
+        deadline = time.monotonic() + self.CONNECT_TIMEOUT
+        while not self.ws_manager.ws_connected.get('public'):
+            if time.monotonic() > deadline:
+                logger.error("❌ Публичный WebSocket не открылся, остаемся на REST")
+                self.ws_manager.disconnect()
+                return False
+            await asyncio.sleep(0.1)
+
+        self.ws_manager.subscribe_topics(self.topics())
+        self.is_running = True
+        self.last_message_time = time.time()
+        logger.info(f"✅ Потоковые данные: {len(self.symbols)} пар, свечи {', '.join(self.intervals)}, "
+                    f"стакан {self.orderbook_depth}")
+        return True
+
+    def stop(self):
+        self.is_running = False
+        self.ws_manager.disconnect()
+
+    @property
+    def is_connected(self) -> bool:
+        return self.is_running and bool(self.ws_manager.ws_connected.get('public'))
+
+    def _on_message(self, data: Dict[str, Any]):
+        """Вызывается в потоке WebSocket"""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._dispatch, data)
+
+    # === Обработка сообщений ===
+
+    def _dispatch(self, data: Dict[str, Any]):
+        topic = data.get('topic')
+        if not topic:
+            return
+        try:
+            kind, _, rest = topic.partition('.')
+            if kind == 'kline':
+                interval_code, _, symbol = rest.partition('.')
+                timeframe = self._topic_intervals.get(interval_code)
+                if timeframe:
+                    self._handle_kline(symbol, timeframe, data.get('data') or [])
+            elif kind == 'tickers':
+                self._handle_ticker(rest, data.get('data') or {})
+            elif kind == 'orderbook':
+                self._handle_orderbook(rest.partition('.')[2], data.get('type'), data.get('data') or {})
+            else:
+                return
+
+            self.messages[kind] += 1
+            self.last_message_time = time.time()
+            if data.get('ts'):
+                self.last_lag_ms[kind] = time.time() * 1000 - float(data['ts'])
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки топика {topic}: {e}")
+
+    def _handle_kline(self, symbol: str, timeframe: str, items: List[Dict[str, Any]]):
+        interval_ms = int(interval_delta(timeframe).total_seconds() * 1000)
+        for item in items:
+            candle = [
+                int(item['start']), float(item['open']), float(item['high']),
+                float(item['low']), float(item['close']), float(item['volume'])
+            ]
+            last = candle_store.last_timestamp(symbol, timeframe)
+            if last is not None and candle[0] - last > interval_ms:
+                self._gaps.add((symbol, timeframe))
+            if item.get('confirm'):
+                self._closed_candles[(symbol, timeframe)].append(candle)
+            candle_store.append(symbol, timeframe, candle)
+        self.updated_at[('kline', symbol)] = time.time()
+
+    def _handle_ticker(self, symbol: str, data: Dict[str, Any]):
+        # delta содержит только изменившиеся поля
+        self.tickers.setdefault(symbol, {}).update(data)
+        self._dirty_tickers.add(symbol)
+        self.updated_at[('tickers', symbol)] = time.time()
+
+    def _handle_orderbook(self, symbol: str, msg_type: Optional[str], data: Dict[str, Any]):
+        if order_book_engine.apply(symbol, msg_type, data) is not None:
+            self.updated_at[('orderbook', symbol)] = time.time()
+
+    # === Чтение состояния ===
+
+    def age(self, kind: str, symbol: str) -> float:
+        """Секунд с последнего обновления данных вида kind ('kline', 'tickers', 'orderbook')"""
+        updated = self.updated_at.get((kind, symbol))
+        return time.time() - updated if updated else float('inf')
+
+    def message_age(self) -> float:
+        """Секунд с последнего сообщения по любому топику"""
+        return time.time() - self.last_message_time if self.last_message_time else float('inf')
+
+    def get_ticker(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Тикер в формате CCXT (last, percentage, high, low, baseVolume, quoteVolume)"""
+        raw = self.tickers.get(symbol)
+        if not raw or 'lastPrice' not in raw:
+            return None
+        return {
+            'symbol': symbol,
+            'last': float(raw.get('lastPrice', 0)),
+            'bid': float(raw.get('bid1Price', 0) or 0),
+            'ask': float(raw.get('ask1Price', 0) or 0),
+            'percentage': float(raw.get('price24hPcnt', 0)) * 100,
+            'high': float(raw.get('highPrice24h', 0)),
+            'low': float(raw.get('lowPrice24h', 0)),
+            'baseVolume': float(raw.get('volume24h', 0)),
+            'quoteVolume': float(raw.get('turnover24h', 0)),
+        }
+
+    def get_orderbook(self, symbol: str, limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Стакан в формате CCXT: bids по убыванию цены, asks по возрастанию"""
+        book = order_book_engine.book(symbol)
+        if book is None or not book.streaming:
+            return None
+        return book.to_ccxt(limit or self.orderbook_depth)
+
+    # === Выдача накопленного продюсеру ===
+
+    def drain_closed_candles(self) -> Dict[Tuple[str, str], List[List[float]]]:
+        closed, self._closed_candles = self._closed_candles, defaultdict(list)
+        return closed
+
+    def drain_tickers(self) -> Dict[str, Dict[str, Any]]:
+        dirty, self._dirty_tickers = self._dirty_tickers, set()
+        tickers = {symbol: self.get_ticker(symbol) for symbol in dirty}
+        return {symbol: ticker for symbol, ticker in tickers.items() if ticker}
+
+    def drain_gaps(self) -> Set[Tuple[str, str]]:
+        gaps, self._gaps = self._gaps, set()
+        return gaps
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'connected': self.is_connected,
+            'message_age': self.message_age(),
+            'topics': len(self.ws_manager.public_topics),
+            'messages': dict(self.messages),
+            'lag_ms': dict(self.last_lag_ms),
+            'pending_candles': sum(len(v) for v in self._closed_candles.values()),
+            'pending_gaps': len(self._gaps),
+        }
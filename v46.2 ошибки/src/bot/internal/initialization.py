@@ -837,6 +837,7 @@ async def initialize_enhanced_exchange(bot_manager):
                     # Не считаем это критической ошибкой
                 
                 bot_manager.v5_integration_enabled = True
+                _attach_position_stream(bot_manager.enhanced_exchange_client)
                 return True
             else:
                 logger.error("❌ Не удалось инициализировать enhanced клиент")
@@ -852,6 +853,18 @@ async def initialize_enhanced_exchange(bot_manager):
         return False
 
 
+def _attach_position_stream(enhanced_client):
+    """Подключение PositionManager к WebSocket потокам позиций, исполнений и тикеров"""
+    try:
+        from ...exchange.position_manager import get_position_manager
+        
+        integration = enhanced_client.bybit_integration
+        ws_manager = getattr(integration.v5_client, 'ws_manager', None)
+        get_position_manager().attach_stream(integration.ws_handler, ws_manager)
+    except Exception as e:
+        logger.warning(f"⚠️ Поток позиций недоступен, PositionManager работает через REST: {e}")
+
+
 async def display_account_info(bot_manager):
     """Отображение информации об аккаунте и балансе"""
     try:
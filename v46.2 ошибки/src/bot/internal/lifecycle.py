@@ -33,7 +33,15 @@ def get_lifecycle(bot_instance):
         async def start_async(self):
             """Асинхронный запуск торгового бота"""
             return await start_async(self.bot)
-            
+
+        async def start_in_loop(self):
+            """Запуск бота в текущем event loop"""
+            return await start_in_loop(self.bot)
+
+        async def stop_in_loop(self):
+            """Остановка бота, запущенного в текущем event loop"""
+            return await stop_in_loop(self.bot)
+
         async def pause(self):
             """Приостановка торгового бота"""
             return await pause(self.bot)
@@ -144,6 +152,71 @@ def stop(bot_manager) -> Tuple[bool, str]:
     return True, msg
 
 
+async def start_in_loop(bot_manager, timeout: float = 10.0) -> Tuple[bool, str]:
+    """
+    Запуск бота задачей в ТЕКУЩЕМ event loop (ASGI-сервер и бот в одном цикле).
+    В отличие от start() не создает поток и не блокирует цикл ожиданием.
+    """
+    task = getattr(bot_manager, '_loop_task', None)
+    if bot_manager.is_running or (task is not None and not task.done()):
+        logger.warning("Попытка запустить уже работающего бота.")
+        return False, "Бот уже запущен."
+
+    logger.info("🚀 Получена команда на запуск бота в текущем event loop...")
+    bot_manager.status = BotStatus.STARTING
+    bot_manager._thread_stop_event = threading.Event()
+    bot_manager._stop_event = asyncio.Event()
+    bot_manager._loop_task = asyncio.create_task(start_async(bot_manager), name="BotLifecycle")
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if bot_manager.status == BotStatus.RUNNING:
+            msg = "Бот успешно запущен."
+            logger.info(msg)
+            return True, msg
+        if bot_manager.status == BotStatus.ERROR or bot_manager._loop_task.done():
+            msg = "Ошибка запуска бота. Проверьте логи."
+            logger.error(msg)
+            return False, msg
+        await asyncio.sleep(0.1)
+
+    msg = f"Таймаут запуска бота. Текущий статус: {bot_manager.status.value}"
+    logger.error(msg)
+    return False, msg
+
+
+async def stop_in_loop(bot_manager, timeout: float = 15.0) -> Tuple[bool, str]:
+    """Остановка бота, запущенного start_in_loop(), с ожиданием завершения его задач"""
+    task = getattr(bot_manager, '_loop_task', None)
+    if not bot_manager.is_running and (task is None or task.done()):
+        logger.warning("Попытка остановить уже остановленного бота.")
+        return False, "Бот не запущен."
+
+    logger.info("🛑 Получена команда на остановку бота...")
+    bot_manager.status = BotStatus.STOPPING
+    bot_manager._thread_stop_event.set()
+    bot_manager._stop_event.set()
+
+    if task is not None:
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+        except asyncio.TimeoutError:
+            bot_manager.status = BotStatus.ERROR
+            msg = "КРИТИЧЕСКАЯ ОШИБКА: Задачи бота не завершились вовремя."
+            logger.critical(msg)
+            return False, msg
+        except Exception as e:
+            logger.error(f"❌ Ошибка при остановке бота: {e}")
+
+    bot_manager.is_running = False
+    bot_manager.status = BotStatus.STOPPED
+    bot_manager.stop_time = datetime.utcnow()
+
+    msg = "Бот успешно остановлен."
+    logger.info(msg)
+    return True, msg
+
+
 async def _stop_signal_components(bot_manager):
     """Остановка компонентов системы сигналов"""
     logger.info("🛑 Остановка компонентов системы сигналов...")
@@ -180,6 +253,13 @@ async def _stop_signal_components(bot_manager):
         except Exception as e:
             logger.error(f"❌ Ошибка остановки SignalAggregator: {e}")
     
+    # Дозапись сигналов, еще не сохраненных шиной
+    try:
+        from src.strategies.signal_bus import signal_bus
+        await signal_bus.close()
+    except Exception as e:
+        logger.error(f"❌ Ошибка остановки шины сигналов: {e}")
+    
     logger.info("✅ Все компоненты системы сигналов остановлены")
 
 
@@ -417,6 +497,11 @@ async def _stop_all_tasks(bot_manager):
     # Сначала останавливаем компоненты системы сигналов
     await _stop_signal_components(bot_manager)
     
+    # Пул потоков анализа стратегий
+    scanner = getattr(bot_manager, 'opportunity_scanner', None)
+    if scanner:
+        await asyncio.to_thread(scanner.close)
+    
     # Отменяем все задачи
     for task_name, task in bot_manager.tasks.items():
         if task and not task.done():
@@ -427,6 +512,13 @@ async def _stop_all_tasks(bot_manager):
     if bot_manager.tasks:
         await asyncio.gather(*bot_manager.tasks.values(), return_exceptions=True)
     
+    # Пул соединений асинхронного доступа к БД
+    try:
+        from src.core.async_database import async_db
+        await async_db.dispose()
+    except Exception as e:
+        logger.error(f"❌ Ошибка закрытия асинхронного пула БД: {e}")
+    
     logger.info("✅ Все задачи остановлены")
 
 
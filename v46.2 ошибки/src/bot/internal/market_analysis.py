@@ -14,8 +14,69 @@ from datetime import datetime, timedelta
 from collections import defaultdict, deque
 from typing import Dict, List, Optional, Any
 
+from ...data.candle_store import candle_store as shared_candle_store
+from ...indicators.indicator_cache import indicator_cache
+from ...indicators.unified_indicators import (
+    IncrementalADX, IncrementalATR, IncrementalBollingerBands, IncrementalEMA,
+    IncrementalMACD, IncrementalRSI, IncrementalStochastic, IndicatorStream
+)
+
 logger = logging.getLogger(__name__)
 
+# Таймфрейм свечей, на котором работает анализ (совпадает с DataCollector)
+ANALYSIS_TIMEFRAME = '5m'
+ANALYSIS_INTERVAL_SECONDS = 300
+
+
+def _get_candle_store(bot_instance):
+    """Общее хранилище свечей бота (кольцевые буферы NumPy)"""
+    return getattr(bot_instance, 'candle_store', None) or shared_candle_store
+
+
+def _new_indicator_stream() -> IndicatorStream:
+    """
+    Потоковые индикаторы, которые читает MultiIndicatorStrategy.
+    Режим TA-Lib (Уайлдер, затравка SMA, std с ddof=0) совпадает с библиотекой ta,
+    которой стратегии считают те же индикаторы по DataFrame.
+    """
+    return IndicatorStream({
+        'rsi': IncrementalRSI(14, talib=True),
+        'macd': IncrementalMACD(12, 26, 9, talib=True),
+        'bb': IncrementalBollingerBands(20, 2, 2, talib=True),
+        'atr': IncrementalATR(14, talib=True),
+        'adx': IncrementalADX(14, talib=True),
+        'stoch': IncrementalStochastic(14, 3, talib=True),
+        **{f'ema_{period}': IncrementalEMA(period, talib=True) for period in (9, 21, 50, 200)},
+    })
+
+
+def _stream_indicators(bot_instance, symbol: str, market_data: dict) -> Optional[Dict[str, float]]:
+    """
+    Индикаторы пары на последней свече из потоковых индикаторов.
+    
+    Поток докармливается только новыми закрытыми свечами хранилища,
+    последняя (незакрытая) учитывается в копии состояния - O(новых свечей)
+    на пару вместо пересчета всей истории каждой стратегией.
+    """
+    timestamps = market_data.get('timestamp')
+    if not isinstance(timestamps, np.ndarray) or len(timestamps) < 2:
+        return None
+    
+    streams = getattr(bot_instance, 'indicator_streams', None)
+    if streams is None:
+        streams = bot_instance.indicator_streams = {}
+    stream = streams.get(symbol)
+    # Пропущенные свечи (буфер ушел дальше потока) или буфер пересоздан - прогреваем заново
+    if stream is None or (
+        stream.last_timestamp is not None
+        and not int(timestamps[0]) - ANALYSIS_INTERVAL_SECONDS * 1000 <= stream.last_timestamp < int(timestamps[-1])
+    ):
+        stream = streams[symbol] = _new_indicator_stream()
+    
+    stream.sync(market_data)
+    last_candle = {field: market_data[field][-1] for field in ('open', 'high', 'low', 'close', 'volume')}
+    return stream.preview(last_candle)
+
 def get_market_analysis(bot_instance):
     """Возвращает объект с методами анализа рынка"""
     
@@ -47,16 +108,8 @@ async def _update_market_data(bot_instance):
                     market_data = await bot_instance.data_collector.collect_market_data(symbol)
                     
                     # ✅ ИСПРАВЛЕНО: правильная проверка словаря
+                    # Свечи DataCollector сам дописывает в общее хранилище
                     if market_data and isinstance(market_data, dict):
-                        # Сохраняем candles в кэш если они есть
-                        if 'candles' in market_data and market_data['candles']:
-                            if symbol not in bot_instance.candle_cache:
-                                bot_instance.candle_cache[symbol] = deque(maxlen=100)
-                            
-                            # Добавляем свечи в кэш
-                            for candle in market_data['candles']:
-                                bot_instance.candle_cache[symbol].append(candle)
-                        
                         # Обновляем последнюю цену
                         if 'ticker' in market_data and market_data['ticker']:
                             last_price = float(market_data['ticker'].get('last', 0))
@@ -89,21 +142,8 @@ async def _update_market_data(bot_instance):
                         continue
                     
                     if candles and len(candles) > 0:
-                        # Сохраняем данные в кэш
-                        if symbol not in bot_instance.candle_cache:
-                            bot_instance.candle_cache[symbol] = deque(maxlen=100)
-                        
-                        # Добавляем новые свечи
-                        for candle in candles:  # Последние 10 свечей
-                            candle_data = {
-                                'timestamp': candle[0] if isinstance(candle, list) else candle.get('timestamp'),
-                                'open': float(candle[1] if isinstance(candle, list) else candle.get('open', 0)),
-                                'high': float(candle[2] if isinstance(candle, list) else candle.get('high', 0)),
-                                'low': float(candle[3] if isinstance(candle, list) else candle.get('low', 0)),
-                                'close': float(candle[4] if isinstance(candle, list) else candle.get('close', 0)),
-                                'volume': float(candle[5] if isinstance(candle, list) else candle.get('volume', 0))
-                            }
-                            bot_instance.candle_cache[symbol].append(candle_data)
+                        # Дописываем свечи в общее хранилище
+                        _get_candle_store(bot_instance).extend(symbol, ANALYSIS_TIMEFRAME, candles)
                         
                         # Обновляем последнюю цену
                         last_candle = candles[-1]
@@ -181,119 +221,33 @@ async def _find_all_trading_opportunities(bot_instance):
                 logger.error("❌ Не удалось импортировать фабрику стратегий")
                 return opportunities
         
-        for symbol in bot_instance.active_pairs:
-            try:
-                # Подготавливаем данные для анализа
-                market_data = await _prepare_market_data(bot_instance, symbol)
-                
-                if not market_data or len(market_data.get('close', [])) < 20:
-                    logger.debug(f"⚠️ Недостаточно данных для анализа {symbol}")
-                    continue
-                
-                # Преобразуем в DataFrame
-                df = _market_data_to_dataframe(bot_instance, market_data)
-                
-                # Анализируем всеми активными стратегиями
-                active_strategies = getattr(bot_instance.config, 'ACTIVE_STRATEGIES', None)
-
-                # Если нет ACTIVE_STRATEGIES, используем веса стратегий
-                if active_strategies is None:
-                    active_strategies = {}
-                    
-                    # Проверяем наличие весов в конфигурации
-                    if hasattr(bot_instance.config, 'STRATEGY_WEIGHTS'):
-                        strategy_weights_raw = bot_instance.config.STRATEGY_WEIGHTS
-                        
-                        # Если это строка, парсим её
-                        if isinstance(strategy_weights_raw, str):
-                            for pair in strategy_weights_raw.split(','):
-                                if ':' in pair:
-                                    name, weight = pair.strip().split(':')
-                                    active_strategies[name.strip()] = float(weight)
-                        elif isinstance(strategy_weights_raw, dict):
-                            active_strategies = strategy_weights_raw
-                    
-                    # Если всё ещё пусто, используем значения по умолчанию
-                    if not active_strategies:
-                        active_strategies = {
-                            'multi_indicator': 25.0,
-                            'momentum': 20.0,
-                            'mean_reversion': 15.0,
-                            'breakout': 15.0,
-                            'scalping': 10.0,
-                            'swing': 10.0,
-                            'whale_hunting': 15.0,
-                            'sleeping_giants': 12.0,
-                            'order_book_analysis': 10.0
-                        }
-                
-                # Убеждаемся что это словарь
-                if isinstance(active_strategies, str):
-                    logger.warning(f"⚠️ ACTIVE_STRATEGIES является строкой: {active_strategies}")
-                    # Пытаемся распарсить
-                    parsed_strategies = {}
-                    try:
-                        import json
-                        parsed_strategies = json.loads(active_strategies)
-                    except:
-                        # Если не JSON, пробуем как список
-                        for strategy in active_strategies.split(','):
-                            strategy = strategy.strip()
-                            if strategy:
-                                parsed_strategies[strategy] = 1.0
-                    active_strategies = parsed_strategies
-                
-                logger.debug(f"📊 Активные стратегии: {list(active_strategies.keys())}")
-                
-                for strategy_name, weight in active_strategies.items():
-                    if weight <= 0:
-                        continue
-                        
-                    try:
-                        # Создаем экземпляр стратегии
-                        strategy = strategy_factory.create(strategy_name)
-                        
-                        # Анализируем
-                        signal = await strategy.analyze(df, symbol)
-                        
-                        # Преобразуем TradingSignal в словарь
-                        if signal and signal.action != 'WAIT' and signal.action != 'HOLD':
-                            opportunity = {
-                                'symbol': symbol,
-                                'strategy': strategy_name,
-                                'signal': signal.action,
-                                'confidence': signal.confidence * (weight / 100.0),  # Учитываем вес стратегии
-                                'price': signal.price if signal.price > 0 else float(market_data['close'][-1]),
-                                'stop_loss': signal.stop_loss,
-                                'take_profit': signal.take_profit,
-                                'timestamp': datetime.utcnow(),
-                                'reasons': [signal.reason] if signal.reason else [f'{strategy_name}_signal'],
-                                'raw_confidence': signal.confidence,
-                                'strategy_weight': weight
-                            }
-                            
-                            # Проверяем минимальную уверенность
-                            min_confidence = getattr(bot_instance.config, 'MIN_STRATEGY_CONFIDENCE', 0.65)
-                            if signal.confidence >= min_confidence:
-                                opportunities.append(opportunity)
-                                logger.info(f"🎯 Найдена возможность: {symbol} {signal.action} от {strategy_name} (уверенность: {signal.confidence:.2f})")
-                            
-                    except Exception as e:
-                        logger.debug(f"Ошибка анализа {symbol} стратегией {strategy_name}: {e}")
-                        continue
-                
-                # ML анализ (если включен)
-                if getattr(bot_instance.config, 'ENABLE_MACHINE_LEARNING', False) and hasattr(bot_instance, 'ml_system') and bot_instance.ml_system:
-                    ml_signal = await _analyze_with_ml(bot_instance, symbol, df)
-                    if ml_signal and ml_signal['confidence'] >= getattr(bot_instance.config, 'ML_PREDICTION_THRESHOLD', 0.7):
-                        opportunities.append(ml_signal)
-                        logger.info(f"🤖 ML сигнал: {symbol} {ml_signal['signal']} (уверенность: {ml_signal['confidence']:.2f})")
-                        
-            except Exception as e:
-                logger.error(f"❌ Ошибка анализа {symbol}: {e}")
-                continue
+        active_strategies = _get_active_strategies(bot_instance)
+        logger.debug(f"📊 Активные стратегии: {list(active_strategies.keys())}")
+        
+        # Пары анализируются параллельно, стратегии переиспользуются между циклами
+        scanner = _get_opportunity_scanner(bot_instance, strategy_factory)
+        
+        # Свечи пар для ML собираются во время сканирования и оцениваются одним пакетом
+        ml_frames = {} if _ml_enabled(bot_instance) else None
+        
+        async def scan_symbol(symbol):
+            return await _scan_symbol(bot_instance, scanner, symbol, active_strategies, ml_frames)
+        
+        opportunities = await scanner.scan(list(bot_instance.active_pairs), scan_symbol)
+        
+        if ml_frames:
+            ml_signals = await _analyze_with_ml_batch(bot_instance, ml_frames)
+            for ml_signal in ml_signals.values():
+                opportunities.append(ml_signal)
+                logger.info(f"🤖 ML сигнал: {ml_signal['symbol']} {ml_signal['signal']} (уверенность: {ml_signal['confidence']:.2f})")
                 
         logger.info(f"📊 Всего найдено {len(opportunities)} торговых возможностей")
+        cache_stats = indicator_cache.get_statistics()
+        logger.debug(
+            f"🗃️ Кэш индикаторов: {cache_stats['hits']} попаданий, {cache_stats['misses']} промахов "
+            f"(hit rate {cache_stats['hit_rate']:.0%}, записей {cache_stats['size']})"
+        )
+        _log_scan_latency(scanner)
         
     except Exception as e:
         logger.error(f"❌ Критическая ошибка поиска возможностей: {e}")
@@ -301,7 +255,174 @@ async def _find_all_trading_opportunities(bot_instance):
         traceback.print_exc()
         
     return opportunities
+
+
+def _get_opportunity_scanner(bot_instance, strategy_factory):
+    """Планировщик параллельного анализа пар (один на бота)"""
+    from .scan_scheduler import OpportunityScanner
+    
+    scanner = getattr(bot_instance, 'opportunity_scanner', None)
+    if scanner is None or scanner.strategy_factory is not strategy_factory:
+        scanner = OpportunityScanner(
+            strategy_factory,
+            max_concurrent_symbols=getattr(bot_instance.config, 'MAX_CONCURRENT_SYMBOLS', 5),
+            max_workers=getattr(bot_instance.config, 'MAX_CONCURRENT_ANALYSIS', 4)
+        )
+        bot_instance.opportunity_scanner = scanner
+    return scanner
+
+
+def _get_active_strategies(bot_instance) -> Dict[str, float]:
+    """Активные стратегии и их веса из конфигурации"""
+    active_strategies = getattr(bot_instance.config, 'ACTIVE_STRATEGIES', None)
+
+    # Если нет ACTIVE_STRATEGIES, используем веса стратегий
+    if active_strategies is None:
+        active_strategies = {}
+        
+        # Проверяем наличие весов в конфигурации
+        if hasattr(bot_instance.config, 'STRATEGY_WEIGHTS'):
+            strategy_weights_raw = bot_instance.config.STRATEGY_WEIGHTS
+            
+            # Если это строка, парсим её
+            if isinstance(strategy_weights_raw, str):
+                for pair in strategy_weights_raw.split(','):
+                    if ':' in pair:
+                        name, weight = pair.strip().split(':')
+                        active_strategies[name.strip()] = float(weight)
+            elif isinstance(strategy_weights_raw, dict):
+                active_strategies = strategy_weights_raw
+        
+        # Если всё ещё пусто, используем значения по умолчанию
+        if not active_strategies:
+            active_strategies = {
+                'multi_indicator': 25.0,
+                'momentum': 20.0,
+                'mean_reversion': 15.0,
+                'breakout': 15.0,
+                'scalping': 10.0,
+                'swing': 10.0,
+                'whale_hunting': 15.0,
+                'sleeping_giants': 12.0,
+                'order_book_analysis': 10.0
+            }
+    
+    # Убеждаемся что это словарь
+    if isinstance(active_strategies, str):
+        logger.warning(f"⚠️ ACTIVE_STRATEGIES является строкой: {active_strategies}")
+        # Пытаемся распарсить
+        parsed_strategies = {}
+        try:
+            import json
+            parsed_strategies = json.loads(active_strategies)
+        except:
+            # Если не JSON, пробуем как список
+            for strategy in active_strategies.split(','):
+                strategy = strategy.strip()
+                if strategy:
+                    parsed_strategies[strategy] = 1.0
+        active_strategies = parsed_strategies
+    
+    return active_strategies
+
+
+async def _scan_symbol(bot_instance, scanner, symbol: str, active_strategies: Dict[str, float],
+                       ml_frames: Optional[Dict[str, pd.DataFrame]] = None) -> List[Dict]:
+    """
+    Анализ одной пары всеми активными стратегиями.
+    
+    ml_frames: сюда кладется DataFrame пары для пакетного ML анализа после
+    сканирования; без него пара оценивается ML сразу
+    """
+    opportunities = []
+    
+    # Подготавливаем данные для анализа
+    market_data = await _prepare_market_data(bot_instance, symbol)
+    
+    if not market_data or len(market_data.get('close', [])) < 20:
+        logger.debug(f"⚠️ Недостаточно данных для анализа {symbol}")
+        return opportunities
+    
+    # Преобразуем в DataFrame. Копия нужна, так как стратегии работают в пуле
+    # потоков, пока основной цикл дописывает свечи в кольцевые буферы
+    df = _market_data_to_dataframe(bot_instance, market_data)
+    if df is None:
+        return opportunities
+    df = df.copy()
+    # Ключ общего кэша индикаторов: стратегии считают RSI/MACD/ATR один раз на пару
+    df.attrs['symbol'] = symbol
+    df.attrs['timeframe'] = ANALYSIS_TIMEFRAME
+    try:
+        stream_values = _stream_indicators(bot_instance, symbol, market_data)
+    except Exception as e:
+        logger.debug(f"Потоковые индикаторы {symbol} недоступны: {e}")
+        stream_values = None
+    if stream_values:
+        df.attrs['indicators'] = stream_values
+    
+    strategies = [(name, weight) for name, weight in active_strategies.items() if weight > 0]
+    signals = await asyncio.gather(
+        *(scanner.analyze(name, df, symbol) for name, _ in strategies),
+        return_exceptions=True
+    )
+    min_confidence = getattr(bot_instance.config, 'MIN_STRATEGY_CONFIDENCE', 0.65)
+    
+    for (strategy_name, weight), signal in zip(strategies, signals):
+        if isinstance(signal, Exception):
+            logger.debug(f"Ошибка анализа {symbol} стратегией {strategy_name}: {signal}")
+            continue
+        
+        # Преобразуем TradingSignal в словарь
+        if signal and signal.action != 'WAIT' and signal.action != 'HOLD':
+            opportunity = {
+                'symbol': symbol,
+                'strategy': strategy_name,
+                'signal': signal.action,
+                'confidence': signal.confidence * (weight / 100.0),  # Учитываем вес стратегии
+                'price': signal.price if signal.price > 0 else float(market_data['close'][-1]),
+                'stop_loss': signal.stop_loss,
+                'take_profit': signal.take_profit,
+                'timestamp': datetime.utcnow(),
+                'reasons': [signal.reason] if signal.reason else [f'{strategy_name}_signal'],
+                'raw_confidence': signal.confidence,
+                'strategy_weight': weight
+            }
+            
+            # Проверяем минимальную уверенность
+            if signal.confidence >= min_confidence:
+                opportunities.append(opportunity)
+                logger.info(f"🎯 Найдена возможность: {symbol} {signal.action} от {strategy_name} (уверенность: {signal.confidence:.2f})")
     
+    # ML анализ (если включен)
+    if ml_frames is not None:
+        ml_frames[symbol] = df
+    elif _ml_enabled(bot_instance):
+        ml_signal = await _analyze_with_ml(bot_instance, symbol, df)
+        if ml_signal and ml_signal['confidence'] >= getattr(bot_instance.config, 'ML_PREDICTION_THRESHOLD', 0.7):
+            opportunities.append(ml_signal)
+            logger.info(f"🤖 ML сигнал: {symbol} {ml_signal['signal']} (уверенность: {ml_signal['confidence']:.2f})")
+    
+    return opportunities
+
+
+def _log_scan_latency(scanner):
+    """Время цикла поиска и самые медленные пары/стратегии"""
+    stats = scanner.get_statistics()
+    cycle_ms = stats['last_cycle_ms']
+    slowest_strategy = max(stats['strategies'].items(), key=lambda kv: kv[1]['avg_ms'], default=None)
+    slowest_symbol = max(stats['symbols'].items(), key=lambda kv: kv[1]['last_ms'], default=None)
+    
+    details = ""
+    if slowest_symbol:
+        details += f", медленная пара {slowest_symbol[0]} {slowest_symbol[1]['last_ms']:.0f} мс"
+    if slowest_strategy:
+        details += f", медленная стратегия {slowest_strategy[0]} {slowest_strategy[1]['avg_ms']:.0f} мс"
+    
+    if cycle_ms / 1000 > ANALYSIS_INTERVAL_SECONDS:
+        logger.warning(f"⚠️ Цикл поиска {cycle_ms:.0f} мс дольше интервала свечи {ANALYSIS_TIMEFRAME}{details}")
+    else:
+        logger.debug(f"⏱️ Цикл поиска {cycle_ms:.0f} мс{details}")
+
 def _market_data_to_dataframe(bot_instance, market_data):
     """Преобразование market_data в DataFrame для стратегий"""
     try:
@@ -321,14 +442,19 @@ def _market_data_to_dataframe(bot_instance, market_data):
         }
         
         # Проверяем, что все массивы одинаковой длины
-        lengths = [len(v) for v in df_data.values() if isinstance(v, list)]
+        lengths = [len(v) for v in df_data.values() if isinstance(v, (list, np.ndarray))]
         if lengths and all(l == lengths[0] for l in lengths):
-            df = pd.DataFrame(df_data)
+            # Массивы из хранилища свечей оборачиваем без копирования
+            df = pd.DataFrame(df_data, copy=False)
             
             # Добавляем временные метки если есть
             if 'timestamp' in market_data:
-                df['timestamp'] = pd.to_datetime(market_data['timestamp'])
-                df.set_index('timestamp', inplace=True)
+                timestamps = market_data['timestamp']
+                if isinstance(timestamps, np.ndarray) and np.issubdtype(timestamps.dtype, np.integer):
+                    df.index = pd.DatetimeIndex(pd.to_datetime(timestamps, unit='ms'), name='timestamp')
+                else:
+                    df['timestamp'] = pd.to_datetime(timestamps)
+                    df.set_index('timestamp', inplace=True)
                 
             return df
         else:
@@ -339,115 +465,101 @@ def _market_data_to_dataframe(bot_instance, market_data):
         logger.error(f"Ошибка преобразования данных в DataFrame: {e}")
         return None
 
+def _ml_enabled(bot_instance) -> bool:
+    """ML включен в конфигурации и ML система инициализирована"""
+    return bool(
+        getattr(bot_instance.config, 'ENABLE_MACHINE_LEARNING', False)
+        and getattr(bot_instance, 'ml_system', None)
+    )
+
 async def _analyze_with_ml(bot_instance, symbol: str, df: pd.DataFrame) -> Optional[Dict[str, Any]]:
-    """✅ ИСПРАВЛЕНО: Анализ с использованием ML моделей"""
+    """✅ ИСПРАВЛЕНО: Анализ с использованием ML моделей (одна пара)"""
+    signals = await _analyze_with_ml_batch(bot_instance, {symbol: df})
+    return signals.get(symbol)
+
+async def _analyze_with_ml_batch(bot_instance, frames: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, Any]]:
+    """
+    ML анализ набора пар одним пакетом.
+    
+    Модели берутся из кэша сервиса инференса, признаки переиспользуются
+    до прихода новой свечи, пары с общей моделью оцениваются одним
+    вызовом predict_proba. Расчет идет в пуле потоков, не блокируя цикл.
+    
+    Returns:
+        {symbol: ml_signal} для пар с уверенностью не ниже ML_PREDICTION_THRESHOLD
+    """
+    if not frames or not _ml_enabled(bot_instance):
+        return {}
+    
     try:
-        if not hasattr(bot_instance, 'ml_system') or not bot_instance.ml_system:
-            return None
-        
-        # Проверяем что ML включен в конфигурации
-        if not getattr(bot_instance.config, 'ENABLE_MACHINE_LEARNING', False):
-            return None
-        
-        # ✅ ИСПРАВЛЕНО: Правильное обращение к ML компонентам
-        direction_prediction = None
-        
-        # Пробуем разные способы получения предсказания
+        from ...ml.inference import inference_service
+        
+        ml_system = bot_instance.ml_system
+        predictions = await asyncio.to_thread(
+            inference_service.predict_batch,
+            frames,
+            ANALYSIS_TIMEFRAME,
+            getattr(ml_system, 'feature_engineer', None),
+            getattr(ml_system, 'direction_classifier', None),
+            getattr(ml_system, 'price_regressor', None)
+        )
+    except Exception as e:
+        logger.error(f"❌ Ошибка получения ML предсказаний: {e}")
+        return {}
+    
+    if len(predictions) < len(frames):
+        logger.debug(f"⚠️ ML модели недоступны для {len(frames) - len(predictions)} из {len(frames)} пар")
+    
+    min_confidence = getattr(bot_instance.config, 'ML_PREDICTION_THRESHOLD', 0.7)
+    signals = {}
+    for symbol, direction_prediction in predictions.items():
         try:
-            # Способ 1: Через trainer (если есть)
-            if hasattr(bot_instance.ml_system, 'trainer') and bot_instance.ml_system.trainer:
-                if hasattr(bot_instance.ml_system.trainer, 'predict_direction'):
-                    direction_prediction = await bot_instance.ml_system.trainer.predict_direction(symbol, df)
-                elif hasattr(bot_instance.ml_system.trainer, 'predict'):
-                    direction_prediction = await bot_instance.ml_system.trainer.predict(symbol, df)
+            if direction_prediction.get('direction', 'HOLD') == 'HOLD':
+                continue
             
-            # Способ 2: Через direction_classifier (если trainer не сработал)
-            if not direction_prediction and hasattr(bot_instance.ml_system, 'direction_classifier'):
-                if hasattr(bot_instance.ml_system.direction_classifier, 'predict'):
-                    # Подготавливаем признаки
-                    features = bot_instance.ml_system.feature_engineer.create_features(df, symbol) if hasattr(bot_instance.ml_system, 'feature_engineer') else df
-                    
-                    # Получаем предсказание
-                    prediction_result = bot_instance.ml_system.direction_classifier.predict(features)
-                    
-                    if 'error' not in prediction_result:
-                        # Преобразуем в нужный формат
-                        direction_prediction = {
-                            'direction': prediction_result.get('direction_labels', ['HOLD'])[-1] if prediction_result.get('direction_labels') else 'HOLD',
-                            'confidence': prediction_result.get('confidence', [0.5])[-1] if prediction_result.get('confidence') else 0.5,
-                            'features': {},
-                            'model_type': 'direction_classifier'
-                        }
+            # Проверяем минимальную уверенность
+            if direction_prediction.get('confidence', 0) < min_confidence:
+                logger.debug(f"🤖 ML предсказание {symbol} отклонено: уверенность {direction_prediction.get('confidence', 0):.2f} < {min_confidence}")
+                continue
+            
+            df = frames[symbol]
+            price = df['close'].iloc[-1]
+            levels = direction_prediction.get('levels', {})
+            price_prediction = {
+                'support': levels.get('support_level', price * 0.98),
+                'resistance': levels.get('resistance_level', price * 1.02),
+                'targets': levels,
+                'confidence': 0.5
+            }
             
-            # Способ 3: Создаем заглушку, если ничего не получилось
-            if not direction_prediction:
-                logger.warning("⚠️ ML модели недоступны, используем заглушку")
-                direction_prediction = {
-                    'direction': 'HOLD',
-                    'confidence': 0.3,  # Низкая уверенность для заглушки
-                    'features': {},
-                    'model_type': 'fallback'
+            # Формируем торговый сигнал
+            ml_signal = {
+                'symbol': symbol,
+                'signal': direction_prediction.get('direction', 'HOLD'),
+                'price': price,
+                'confidence': direction_prediction['confidence'],
+                'stop_loss': price_prediction['support'],
+                'take_profit': price_prediction['resistance'],
+                'strategy': 'ml_prediction',
+                'ml_features': direction_prediction.get('features', {}),
+                'price_targets': price_prediction['targets'],
+                'rl_action': None,
+                'indicators': {
+                    'ml_direction_confidence': direction_prediction['confidence'],
+                    'ml_price_confidence': price_prediction['confidence'],
+                    'ml_probabilities': direction_prediction.get('probabilities', {}),
+                    'model_type': direction_prediction.get('model_type', 'ensemble'),
+                    'model_version': direction_prediction.get('model_version')
                 }
-                
-        except Exception as e:
-            logger.error(f"❌ Ошибка получения ML предсказания: {e}")
-            return None
-        
-        # Проверяем минимальную уверенность
-        min_confidence = getattr(bot_instance.config, 'ML_PREDICTION_THRESHOLD', 0.7)
-        if direction_prediction.get('confidence', 0) < min_confidence:
-            logger.debug(f"🤖 ML предсказание отклонено: уверенность {direction_prediction.get('confidence', 0):.2f} < {min_confidence}")
-            return None
+            }
+            
+            logger.debug(f"🤖 ML сигнал для {symbol}: {ml_signal['signal']} (уверенность: {ml_signal['confidence']:.2f})")
+            signals[symbol] = ml_signal
             
-        # ✅ ИСПРАВЛЕНО: Получение price_prediction
-        price_prediction = {
-            'support': df['close'].iloc[-1] * 0.98, 
-            'resistance': df['close'].iloc[-1] * 1.02,
-            'confidence': 0.5
-        }
-        
-        try:
-            if hasattr(bot_instance.ml_system, 'price_regressor'):
-                # Здесь можно добавить реальное предсказание цены
-                pass
-        except Exception as e:
-            logger.warning(f"⚠️ Ошибка price_prediction: {e}")
-        
-        # ✅ ИСПРАВЛЕНО: Получение RL recommendation  
-        rl_recommendation = None
-        try:
-            if hasattr(bot_instance.ml_system, 'rl_agent') and bot_instance.ml_system.rl_agent:
-                # Здесь можно добавить RL предсказание
-                pass
         except Exception as e:
-            logger.warning(f"⚠️ Ошибка RL recommendation: {e}")
-        
-        # Формируем торговый сигнал
-        ml_signal = {
-            'symbol': symbol,
-            'signal': direction_prediction.get('direction', 'HOLD'),
-            'price': df['close'].iloc[-1],
-            'confidence': direction_prediction['confidence'],
-            'stop_loss': price_prediction.get('support', df['close'].iloc[-1] * 0.98),
-            'take_profit': price_prediction.get('resistance', df['close'].iloc[-1] * 1.02),
-            'strategy': 'ml_prediction',
-            'ml_features': direction_prediction.get('features', {}),
-            'price_targets': price_prediction.get('targets', {}),
-            'rl_action': rl_recommendation.get('action') if rl_recommendation else None,
-            'indicators': {
-                'ml_direction_confidence': direction_prediction['confidence'],
-                'ml_price_confidence': price_prediction.get('confidence', 0),
-                'feature_importance': direction_prediction.get('feature_importance', {}),
-                'model_type': direction_prediction.get('model_type', 'ensemble')
-            }
-        }
-        
-        logger.debug(f"🤖 ML сигнал для {symbol}: {ml_signal['signal']} (уверенность: {ml_signal['confidence']:.2f})")
-        return ml_signal
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка ML анализа для {symbol}: {e}")
-        return None
+            logger.error(f"❌ Ошибка ML анализа для {symbol}: {e}")
+    
+    return signals
 
 def _calculate_rsi(bot_instance, prices: pd.Series, period: int = 14) -> pd.Series:
     """Расчет RSI"""
@@ -782,67 +894,21 @@ async def _save_candles_to_db(bot_instance, symbol: str, timeframe: str, candles
         if not hasattr(bot_instance, 'db') or not bot_instance.db or not candles:
             return
         
-        from ..core.models import Candle
-        from datetime import datetime
+        from ...data.candle_writer import upsert_candles
         
         session = bot_instance.db() if callable(bot_instance.db) else bot_instance.db
         
-        for candle_data in candles[-30:]:  # Сохраняем только последние 30 свечей
-            try:
-                # Определяем формат данных
-                if isinstance(candle_data, dict):
-                    timestamp = candle_data.get('timestamp', 0)
-                    open_price = candle_data.get('open', 0)
-                    high_price = candle_data.get('high', 0)
-                    low_price = candle_data.get('low', 0)
-                    close_price = candle_data.get('close', 0)
-                    volume = candle_data.get('volume', 0)
-                elif isinstance(candle_data, (list, tuple)) and len(candle_data) >= 6:
-                    timestamp = candle_data[0]
-                    open_price = candle_data[1]
-                    high_price = candle_data[2]
-                    low_price = candle_data[3]
-                    close_price = candle_data[4]
-                    volume = candle_data[5]
-                else:
-                    continue
-                
-                # Преобразуем timestamp
-                if isinstance(timestamp, (int, float)):
-                    if timestamp > 1e12:  # timestamp в миллисекундах
-                        open_time = datetime.fromtimestamp(timestamp / 1000)
-                    else:  # timestamp в секундах
-                        open_time = datetime.fromtimestamp(timestamp)
-                else:
-                    continue
-                
-                # Проверяем, есть ли уже такая свеча
-                existing = session.query(Candle).filter(
-                    Candle.symbol == symbol,
-                    Candle.interval == timeframe,
-                    Candle.open_time == open_time
-                ).first()
-                
-                if not existing:
-                    # Создаем новую свечу
-                    candle = Candle(
-                        symbol=symbol,
-                        interval=timeframe,
-                        open_time=open_time,
-                        open=float(open_price),
-                        high=float(high_price),
-                        low=float(low_price),
-                        close=float(close_price),
-                        volume=float(volume)
-                    )
-                    session.add(candle)
-            
-            except Exception as e:
-                logger.debug(f"Ошибка сохранения свечи: {e}")
-                continue
-        
-        session.commit()
-        logger.debug(f"💾 Данные для {symbol} ({timeframe}) обработаны и сохранены")
+        try:
+            # Только последние 30 свечей, одним upsert-запросом
+            saved_count = upsert_candles(session, symbol, timeframe, candles[-30:])
+            session.commit()
+            logger.debug(f"💾 Данные для {symbol} ({timeframe}) обработаны и сохранены: {saved_count} свечей")
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            if callable(bot_instance.db):
+                session.close()
         
     except Exception as e:
         logger.error(f"❌ Ошибка сохранения свечей в БД: {e}")
@@ -853,20 +919,8 @@ async def _save_ohlcv_to_db(bot_instance, symbol: str, timeframe: str, ohlcv):
         if not hasattr(bot_instance, 'db') or not bot_instance.db or not ohlcv:
             return
         
-        # Преобразуем OHLCV в формат свечей
-        candles = []
-        for item in ohlcv:
-            if len(item) >= 6:
-                candles.append({
-                    'timestamp': item[0],
-                    'open': item[1],
-                    'high': item[2],
-                    'low': item[3],
-                    'close': item[4],
-                    'volume': item[5]
-                })
-        
-        await _save_candles_to_db(bot_instance, symbol, timeframe, candles)
+        # Списки [ts, o, h, l, c, v] пишутся напрямую, без промежуточных словарей
+        await _save_candles_to_db(bot_instance, symbol, timeframe, [item for item in ohlcv if len(item) >= 6])
         
     except Exception as e:
         logger.error(f"❌ Ошибка сохранения OHLCV в БД: {e}")
@@ -878,63 +932,27 @@ async def _prepare_market_data(bot_instance, symbol: str):
         
         logger.debug(f"📊 Подготовка данных для {symbol}")
         
-        # Проверяем кэш свечей
-        if hasattr(bot_instance, 'candle_cache') and symbol in bot_instance.candle_cache:
-            candles = list(bot_instance.candle_cache[symbol])
-            
-            if candles and len(candles) > 0:
-                # Подготавливаем массивы OHLCV
-                timestamps, opens, highs, lows, closes, volumes = [], [], [], [], [], []
-                
-                for candle in candles:
-                    try:
-                        if isinstance(candle, dict):
-                            timestamps.append(candle.get('timestamp', candle.get('open_time', 0)))
-                            opens.append(float(candle.get('open', 0)))
-                            highs.append(float(candle.get('high', 0)))
-                            lows.append(float(candle.get('low', 0)))
-                            closes.append(float(candle.get('close', 0)))
-                            volumes.append(float(candle.get('volume', 0)))
-                        elif isinstance(candle, (list, tuple)) and len(candle) >= 6:
-                            timestamps.append(candle[0])
-                            opens.append(float(candle[1]))
-                            highs.append(float(candle[2]))
-                            lows.append(float(candle[3]))
-                            closes.append(float(candle[4]))
-                            volumes.append(float(candle[5]))
-                    except (ValueError, TypeError, IndexError) as e:
-                        logger.warning(f"⚠️ Ошибка обработки свечи для {symbol}: {e}")
-                        continue
-                
-                if len(closes) > 0:
-                    return {
-                        'timestamp': timestamps,
-                        'open': opens,
-                        'high': highs,
-                        'low': lows,
-                        'close': closes,
-                        'volume': volumes,
-                        'symbol': symbol
-                    }
+        store = _get_candle_store(bot_instance)
         
-        # Если кэш пуст, получаем через data_collector
+        # Срезы кольцевого буфера без копирования
+        arrays = store.view(symbol, ANALYSIS_TIMEFRAME)
+        if arrays is not None:
+            arrays['symbol'] = symbol
+            return arrays
+        
+        # Если буфер пуст, получаем через data_collector (он заполнит хранилище)
         if hasattr(bot_instance, 'data_collector') and bot_instance.data_collector:
             logger.debug(f"📈 Получение данных через data_collector для {symbol}")
             
             market_data = await bot_instance.data_collector.collect_market_data(symbol)
             
-            if market_data and isinstance(market_data, dict) and 'candles' in market_data:
-                candles = market_data['candles']
-                if candles:
-                    return {
-                        'timestamp': [c.get('timestamp', c.get('open_time', 0)) for c in candles],
-                        'open': [float(c.get('open', 0)) for c in candles],
-                        'high': [float(c.get('high', 0)) for c in candles],
-                        'low': [float(c.get('low', 0)) for c in candles],
-                        'close': [float(c.get('close', 0)) for c in candles],
-                        'volume': [float(c.get('volume', 0)) for c in candles],
-                        'symbol': symbol
-                    }
+            if market_data and isinstance(market_data, dict) and market_data.get('candles'):
+                if not store.has(symbol, ANALYSIS_TIMEFRAME):
+                    store.extend(symbol, ANALYSIS_TIMEFRAME, market_data['candles'])
+                arrays = store.view(symbol, ANALYSIS_TIMEFRAME)
+                if arrays is not None:
+                    arrays['symbol'] = symbol
+                    return arrays
         
         logger.warning(f"⚠️ Нет данных для {symbol}")
         return None
@@ -18,6 +18,8 @@ from datetime import datetime, timedelta
 
 # Импорты типов
 from src.bot.internal.types import ComponentStatus
+from src.exchange.rate_limiter import rate_limiter
+from src.logging.smart_logger import logger as smart_logger
 
 logger = logging.getLogger(__name__)
 
@@ -105,6 +107,11 @@ class Monitoring:
             except Exception as e:
                 health_info['system']['error'] = str(e)
             
+            # Запись логов в БД
+            health_info['log_sink'] = smart_logger.get_statistics()
+            if not health_info['log_sink'].get('db_healthy', True) and health_info['log_sink'].get('running'):
+                health_info['alerts'].append("Log sink cannot reach database")
+            
             # Проверка торговых лимитов
             if self.bot.trades_today >= self.bot.config.MAX_DAILY_TRADES * 0.9:
                 health_info['alerts'].append("Approaching daily trade limit")
@@ -127,6 +134,15 @@ class Monitoring:
                 'error': str(e)
             }
     
+    async def _check_rate_limits(self) -> Dict[str, Any]:
+        """Состояние общего лимитера запросов к бирже: токены, очередь, ожидание"""
+        stats = rate_limiter.get_statistics()
+        for name, bucket in stats.items():
+            if bucket['blocked_for'] > 0 or bucket['queue_depth'] > bucket['capacity']:
+                logger.warning(f"⚠️ Лимит запросов '{name}': очередь {bucket['queue_depth']}, "
+                               f"пауза {bucket['blocked_for']:.1f}с")
+        return stats
+    
     async def get_market_data_enhanced(self, symbol: str) -> Optional[Dict]:
         """Получение рыночных данных через enhanced API"""
         try:
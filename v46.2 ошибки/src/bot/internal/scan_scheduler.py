@@ -0,0 +1,207 @@
+"""
+Планировщик параллельного поиска торговых возможностей
+Файл: src/bot/internal/scan_scheduler.py
+
+Пары анализируются одновременно под семафором, экземпляры стратегий
+переиспользуются между циклами, а CPU-тяжелые стратегии выполняются
+в пуле потоков, не блокируя основной event loop бота.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Стратегии с чистыми расчетами по DataFrame — их можно выносить в пул потоков.
+# Остальные (sleeping_giants, order_book_analysis, whale_hunting) ходят в БД
+# внутри analyze() и выполняются в основном event loop.
+CPU_BOUND_STRATEGIES = frozenset({
+    'multi_indicator', 'momentum', 'mean_reversion', 'breakout',
+    'scalping', 'swing', 'safe_multi_indicator', 'conservative',
+})
+
+# Сколько последних замеров хранить для статистики задержек
+LATENCY_WINDOW = 200
+
+
+class _LatencyTracker:
+    """Скользящие замеры задержек по ключу (пара или стратегия)"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+
+    def add(self, key: str, seconds: float):
+        self._samples[key].append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for key, samples in self._samples.items():
+            if not samples:
+                continue
+            values = np.fromiter(samples, dtype=np.float64)
+            result[key] = {
+                'count': len(values),
+                'avg_ms': float(values.mean() * 1000),
+                'p95_ms': float(np.percentile(values, 95) * 1000),
+                'max_ms': float(values.max() * 1000),
+                'last_ms': float(values[-1] * 1000),
+            }
+        return result
+
+
+class OpportunityScanner:
+    """
+    Параллельный анализ пар всеми активными стратегиями.
+
+    - Пары обрабатываются одновременно, не более max_concurrent_symbols сразу
+    - Экземпляры стратегий создаются один раз (на поток пула) и переиспользуются
+    - CPU-тяжелые стратегии выполняются в ThreadPoolExecutor; у каждого
+      потока свой event loop и свои экземпляры, поэтому состояние стратегий
+      не разделяется между потоками
+    - Для каждой пары и стратегии копится статистика задержек
+    """
+
+    def __init__(self, strategy_factory, max_concurrent_symbols: int = 5,
+                 max_workers: int = 4, offload_strategies=CPU_BOUND_STRATEGIES):
+        self.strategy_factory = strategy_factory
+        self.max_concurrent_symbols = max(1, int(max_concurrent_symbols))
+        self.max_workers = max(0, int(max_workers))
+        self.offload_strategies = frozenset(offload_strategies or ())
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+        self._loops: List[asyncio.AbstractEventLoop] = []
+        self._closing = False
+        self._main_strategies: Dict[str, Any] = {}
+
+        self.symbol_latency = _LatencyTracker()
+        self.strategy_latency = _LatencyTracker()
+        self.last_cycle_seconds = 0.0
+        self.cycles = 0
+
+    # === Экземпляры стратегий ===
+
+    def _get_strategy(self, strategy_name: str, pool: Dict[str, Any]):
+        strategy = pool.get(strategy_name)
+        if strategy is None:
+            strategy = self.strategy_factory.create(strategy_name)
+            pool[strategy_name] = strategy
+        return strategy
+
+    def _worker_analyze(self, strategy_name: str, df, symbol: str) -> Tuple[Any, float]:
+        """Выполнение analyze() в потоке пула с собственным event loop"""
+        local = self._local
+        if getattr(local, 'loop', None) is None or local.loop.is_closed():
+            local.loop = asyncio.new_event_loop()
+            local.strategies = {}
+            self._loops.append(local.loop)
+        try:
+            strategy = self._get_strategy(strategy_name, local.strategies)
+            started = time.perf_counter()
+            signal = local.loop.run_until_complete(strategy.analyze(df, symbol))
+            return signal, time.perf_counter() - started
+        finally:
+            # Пул останавливается: последняя задача потока закрывает его loop
+            if self._closing:
+                local.loop.close()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Семафор привязан к event loop, в котором создан
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_symbols)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _get_executor(self) -> Optional[ThreadPoolExecutor]:
+        if self.max_workers and self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='strategy-scan'
+            )
+        return self._executor
+
+    # === Анализ ===
+
+    async def analyze(self, strategy_name: str, df, symbol: str):
+        """Анализ пары одной стратегией с замером времени"""
+        executor = self._get_executor() if strategy_name in self.offload_strategies else None
+        if executor is not None:
+            loop = asyncio.get_running_loop()
+            signal, elapsed = await loop.run_in_executor(
+                executor, self._worker_analyze, strategy_name, df, symbol
+            )
+        else:
+            strategy = self._get_strategy(strategy_name, self._main_strategies)
+            started = time.perf_counter()
+            signal = await strategy.analyze(df, symbol)
+            elapsed = time.perf_counter() - started
+        self.strategy_latency.add(strategy_name, elapsed)
+        return signal
+
+    async def scan(self, symbols: List[str], scan_symbol: Callable[[str], Any]) -> List[Any]:
+        """
+        Запуск scan_symbol(symbol) по всем парам с ограничением параллельности.
+
+        Args:
+            symbols: Список пар
+            scan_symbol: Корутина-функция анализа одной пары, возвращает список возможностей
+
+        Returns:
+            List: Объединенный список возможностей в порядке пар
+        """
+        semaphore = self._get_semaphore()
+        cycle_started = time.perf_counter()
+
+        async def run(symbol: str):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    return await scan_symbol(symbol) or []
+                except Exception as e:
+                    logger.error(f"❌ Ошибка анализа {symbol}: {e}")
+                    return []
+                finally:
+                    self.symbol_latency.add(symbol, time.perf_counter() - started)
+
+        results = await asyncio.gather(*(run(symbol) for symbol in symbols))
+
+        self.last_cycle_seconds = time.perf_counter() - cycle_started
+        self.cycles += 1
+        return [item for items in results for item in items]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'cycles': self.cycles,
+            'last_cycle_ms': self.last_cycle_seconds * 1000,
+            'max_concurrent_symbols': self.max_concurrent_symbols,
+            'max_workers': self.max_workers,
+            'symbols': self.symbol_latency.summary(),
+            'strategies': self.strategy_latency.summary(),
+        }
+
+    def close(self):
+        """
+        Остановка пула потоков и закрытие их event loop.
+
+        Ждет завершения текущих анализов (очередь отменяется), поэтому
+        из event loop бота вызывается через asyncio.to_thread.
+        """
+        if self._executor is not None:
+            self._closing = True
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        # Loop простаивавших потоков закрываем здесь: потоки пула уже завершились
+        for loop in self._loops:
+            if not loop.is_closed():
+                loop.close()
+        self._loops.clear()
+        self._closing = False
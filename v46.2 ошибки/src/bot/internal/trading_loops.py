@@ -363,7 +363,7 @@ async def start_signal_system_loops(bot_instance):
             _run_signal_aggregator(bot_instance),
             name="SignalAggregator"
         ))
-        logger.info("▶️ Запущен SignalAggregator (интервал: 60с)")
+        logger.info("▶️ Запущен SignalAggregator (шина сигналов)")
     
     # Система уведомлений
     if hasattr(bot_instance, 'notification_manager') and bot_instance.notification_manager:
@@ -407,8 +407,27 @@ async def _update_signals_matrix_loop(bot_instance):
         except Exception as e:
             logger.error(f"❌ Ошибка в цикле обновления матрицы сигналов: {e}")
             await asyncio.sleep(10)
-            
-            
+
+
+async def _run_signal_aggregator(bot_instance):
+    """Агрегатор сигналов: обрабатывает сигналы из шины сразу после публикации"""
+    aggregator = bot_instance.signal_aggregator
+    
+    while not bot_instance._stop_event.is_set():
+        try:
+            await aggregator.start()
+        except asyncio.CancelledError:
+            await aggregator.stop()
+            break
+        except Exception as e:
+            logger.error(f"❌ SignalAggregator: ошибка: {e}")
+            await asyncio.sleep(10)
+
+
+async def _run_signal_strategy(bot_instance, attr_name: str, interval: int):
+    """Цикл стратегии сигналов bot_instance.<attr_name> по активным парам"""
+    strategy = getattr(bot_instance, attr_name)
+    await run_strategy_loop(strategy, interval, type(strategy).__name__, bot_instance)
 
 
 async def run_strategy_loop(strategy, interval: int, name: str, bot_instance):
@@ -422,7 +441,14 @@ async def run_strategy_loop(strategy, interval: int, name: str, bot_instance):
             async with API_SEMAPHORE:  # ✅ Потом захватываем семафор
                 logger.debug(f"  {name}: начало цикла анализа")
                 
-                if hasattr(strategy, 'analyze'):
+                if hasattr(strategy, 'analyze_batch'):
+                    # Все пары одним проходом: стоимость цикла почти не растет с числом пар
+                    if hasattr(bot_instance, 'active_pairs'):
+                        signals = await strategy.analyze_batch(list(bot_instance.active_pairs))
+                        if signals:
+                            logger.info(f" {name}: сгенерировано {len(signals)} сигналов")
+                
+                elif hasattr(strategy, 'analyze'):
                     if hasattr(bot_instance, 'active_pairs'):
                         for symbol in bot_instance.active_pairs:
                             try:
@@ -112,7 +112,9 @@ class BotManager:
         self.price_history = {}
         self.volume_history = {}
         self.indicator_cache = {}
-        self.candle_cache = {}
+        # Общее колоночное хранилище свечей (кольцевые буферы NumPy)
+        from ..data.candle_store import candle_store
+        self.candle_store = candle_store
         
         self._stop_event = None
         self._pause_event = None
@@ -357,9 +359,13 @@ class BotManager:
             ).order_by(OrderBookSnapshot.timestamp.desc()).first()
             
             if orderbook:
+                from ..data.order_book import L2Book
+                from ..data.orderbook_codec import snapshot_arrays
+                
+                bids, asks = L2Book.from_arrays(symbol, *snapshot_arrays(orderbook)).levels(10)
                 details['orderbook'] = {
-                    'bids': orderbook.bids[:10],
-                    'asks': orderbook.asks[:10],
+                    'bids': bids,
+                    'asks': asks,
                     'spread': float(orderbook.spread) if orderbook.spread else None,
                     'imbalance': float(orderbook.imbalance) if orderbook.imbalance else None,
                     'ofi': float(orderbook.ofi) if orderbook.ofi else None
@@ -483,6 +489,10 @@ class BotManager:
         return await self._initialization._process_balance_info(balance_info)
     async def start_async(self):
         return await self._lifecycle.start_async()
+    async def start_in_loop(self):
+        return await self._lifecycle.start_in_loop()
+    async def stop_in_loop(self):
+        return await self._lifecycle.stop_in_loop()
     async def pause(self):
         return await self._lifecycle.pause()
     async def resume(self):
@@ -85,6 +85,14 @@ except ImportError as e:
     Database = db = engine = SessionLocal = None
     get_db = get_session = create_session = transaction = None
 
+try:
+    from .async_database import AsyncDatabase, async_db, run_db
+    ASYNC_DATABASE_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"⚠️ Асинхронный доступ к БД недоступен: {e}")
+    ASYNC_DATABASE_AVAILABLE = False
+    AsyncDatabase = async_db = run_db = None
+
 # =================================================================
 # ИМПОРТ КОНФИГУРАЦИИ - ИСПРАВЛЕНО
 # =================================================================
@@ -234,6 +242,7 @@ __all__ = [
     # Статус компонентов
     'MODELS_AVAILABLE',
     'DATABASE_AVAILABLE', 
+    'ASYNC_DATABASE_AVAILABLE',
     'CONFIG_AVAILABLE',
     'BYBIT_CONFIG_AVAILABLE',
     
@@ -274,6 +283,9 @@ __all__ = [
     'get_session',
     'create_session',
     'transaction',
+    'AsyncDatabase',
+    'async_db',
+    'run_db',
     
     # Config (ИСПРАВЛЕНО)
     'unified_config',
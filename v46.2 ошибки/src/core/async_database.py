@@ -0,0 +1,210 @@
+"""
+Асинхронный доступ к БД для горячих путей бота
+Файл: src/core/async_database.py
+
+Синхронные сессии SessionLocal в async-коде блокируют event loop на время
+запроса: медленный запрос задерживает мониторинг цен и выставление ордеров.
+Здесь запросы выполняются без блокировки цикла:
+- AsyncEngine на том же URL, что и core/database.py, с асинхронным драйвером
+  (mysql+pymysql -> mysql+aiomysql, sqlite -> sqlite+aiosqlite,
+  postgresql -> postgresql+asyncpg) и своим пулом соединений
+- run_db(fn, *args): fn(session, *args) - обычный ORM-код с session.query();
+  выполняется через AsyncSession.run_sync поверх асинхронного драйвера
+- без асинхронного драйвера или при вызове из другого event loop (потоки
+  пула стратегий) fn выполняется в синхронной сессии в отдельном пуле
+  потоков БД, не занимая общий пул asyncio.to_thread
+
+fn должна возвращать готовые данные: ленивые атрибуты ORM-объектов
+после закрытия сессии недоступны.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.engine import URL, make_url
+
+from .database import SessionLocal, db
+from .unified_config import unified_config as config
+
+try:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    ASYNC_SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    ASYNC_SQLALCHEMY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Синхронный драйвер -> асинхронный
+_ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'mysql+mysqldb': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+}
+
+
+def _setting(name: str, default, cast=int):
+    try:
+        return cast(getattr(config, name, default) or default)
+    except (TypeError, ValueError):
+        return default
+
+
+def async_database_url(database_url: str) -> Optional[URL]:
+    """URL с асинхронным драйвером или None, если для диалекта его нет"""
+    url = make_url(database_url)
+    driver = _ASYNC_DRIVERS.get(url.drivername)
+    return url.set(drivername=driver) if driver else None
+
+
+class AsyncDatabase:
+    """
+    Неблокирующие запросы к БД из event loop бота.
+
+    AsyncEngine создается лениво в первом вызове и привязан к его event loop.
+    """
+
+    def __init__(self, database=None):
+        self.database = database or db
+        self.pool_size = _setting('ASYNC_DB_POOL_SIZE', 10)
+        self.max_overflow = _setting('ASYNC_DB_MAX_OVERFLOW', 10)
+        # Короче, чем у синхронного пула: лучше ошибка, чем задача, висящая в очереди за соединением
+        self.pool_timeout = _setting('ASYNC_DB_POOL_TIMEOUT', 10)
+        self.executor_workers = _setting('DB_EXECUTOR_WORKERS', 4)
+        self.slow_query_seconds = _setting('DB_SLOW_QUERY_SECONDS', 1.0, float)
+
+        self._engine = None
+        self._sessionmaker = None
+        self._loop = None
+        self._disabled = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.stats = {'async_calls': 0, 'thread_calls': 0, 'slow_calls': 0, 'errors': 0}
+
+    # === Движки ===
+
+    def _get_engine(self):
+        """AsyncEngine текущего event loop или None (тогда - пул потоков)"""
+        if self._disabled:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._engine is not None:
+            return self._engine if self._loop is loop else None
+
+        url = async_database_url(self.database.database_url) if ASYNC_SQLALCHEMY_AVAILABLE else None
+        if url is None:
+            self._disable("асинхронный драйвер для этой БД не поддерживается")
+            return None
+
+        engine_kwargs = {'pool_pre_ping': True, 'pool_recycle': 3600}
+        if url.get_backend_name() != 'sqlite':
+            engine_kwargs.update({
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'pool_timeout': self.pool_timeout,
+            })
+        try:
+            self._engine = create_async_engine(url, **engine_kwargs)
+        except ImportError as e:
+            self._disable(f"драйвер не установлен ({e})")
+            return None
+
+        self._sessionmaker = async_sessionmaker(self._engine, expire_on_commit=False, autoflush=False)
+        self._loop = loop
+        logger.info(f"✅ Асинхронный engine БД создан ({url.drivername}, pool_size={self.pool_size})")
+        return self._engine
+
+    def _disable(self, reason: str):
+        self._disabled = True
+        logger.warning(f"⚠️ Асинхронный доступ к БД недоступен: {reason}. "
+                       f"Запросы выполняются в пуле потоков БД ({self.executor_workers})")
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.executor_workers, thread_name_prefix='db')
+        return self._executor
+
+    # === Выполнение ===
+
+    async def run(self, fn: Callable[..., Any], *args, commit: bool = False,
+                  timeout: Optional[float] = None) -> Any:
+        """
+        Выполнение fn(session, *args) без блокировки event loop.
+
+        Args:
+            fn: Синхронная функция с ORM-запросами
+            commit: Зафиксировать транзакцию после fn
+            timeout: Максимальное ожидание результата, секунд
+        """
+        started = time.perf_counter()
+        if self._get_engine() is not None:
+            self.stats['async_calls'] += 1
+            call = self._run_async(fn, args, commit)
+        else:
+            self.stats['thread_calls'] += 1
+            call = asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), self._run_sync, fn, args, commit
+            )
+        try:
+            return await asyncio.wait_for(call, timeout) if timeout else await call
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if elapsed > self.slow_query_seconds:
+                self.stats['slow_calls'] += 1
+                logger.warning(f"🐢 Медленный запрос к БД: {getattr(fn, '__qualname__', fn)} ({elapsed:.2f}с)")
+
+    async def _run_async(self, fn, args, commit: bool):
+        async with self._sessionmaker() as session:
+            result = await session.run_sync(fn, *args)
+            if commit:
+                await session.commit()
+            return result
+
+    @staticmethod
+    def _run_sync(fn, args, commit: bool):
+        session = SessionLocal()
+        try:
+            result = fn(session, *args)
+            if commit:
+                session.commit()
+            return result
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    async def dispose(self):
+        """Закрытие пула соединений (при остановке бота)"""
+        if self._engine is not None and self._loop is asyncio.get_running_loop():
+            await self._engine.dispose()
+            self._engine = None
+            self._sessionmaker = None
+            self._loop = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        pool = self._engine.pool.status() if self._engine is not None else None
+        return {
+            **self.stats,
+            'mode': 'async' if self._engine is not None else 'threads',
+            'pool': pool,
+        }
+
+
+# Глобальный экземпляр
+async_db = AsyncDatabase()
+
+
+async def run_db(fn: Callable[..., Any], *args, commit: bool = False, timeout: Optional[float] = None) -> Any:
+    """Сокращение для async_db.run()"""
+    return await async_db.run(fn, *args, commit=commit, timeout=timeout)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Создание индексов моделей на существующей БД
+Файл: src/core/index_migration.py
+
+    python -m src.core.index_migration [--dry-run] [--table trades ...]
+
+create_all() не добавляет индексы в уже созданные таблицы, поэтому индексы,
+объявленные в models.py позже (idx_signal_created, idx_trade_status_close,
+idx_trade_close_time и т.д.), есть только в метаданных. Скрипт сравнивает
+__table_args__ с индексами в БД и создает недостающие (аналог
+CREATE INDEX IF NOT EXISTS, работает и в MySQL, где такого синтаксиса нет).
+
+Запуск можно повторять: существующие индексы не трогаются.
+Построение индекса на большой таблице может блокировать запись в нее -
+запускать в период низкой нагрузки.
+"""
+import argparse
+import logging
+from typing import List, Optional, Sequence
+
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
+
+from .database import engine
+from .models import Base
+
+logger = logging.getLogger(__name__)
+
+
+def missing_indexes(engine, tables: Optional[Sequence[str]] = None) -> list:
+    """Индексы из метаданных, которых нет в существующих таблицах БД"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables or (tables and table.name not in tables):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return missing
+
+
+def ensure_indexes(engine, tables: Optional[Sequence[str]] = None, dry_run: bool = False) -> List[str]:
+    """Создание недостающих индексов. Возвращает выполненные (или, при dry_run, планируемые) команды"""
+    statements = []
+    for index in missing_indexes(engine, tables):
+        statement = str(CreateIndex(index).compile(dialect=engine.dialect))
+        statements.append(statement)
+        logger.info(f"🔧 {statement}")
+        if not dry_run:
+            # checkfirst - на случай параллельного запуска
+            index.create(bind=engine, checkfirst=True)
+    return statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Создание недостающих индексов моделей")
+    parser.add_argument('--dry-run', action='store_true', help="Только показать команды")
+    parser.add_argument('--table', action='append', help="Ограничить таблицами (можно несколько раз)")
+    args = parser.parse_args()
+
+    statements = ensure_indexes(engine, tables=args.table, dry_run=args.dry_run)
+    if not statements:
+        logger.info("✅ Все индексы уже созданы")
+    elif args.dry_run:
+        logger.info(f"📋 Будет создано индексов: {len(statements)}")
+    else:
+        logger.info(f"✅ Создано индексов: {len(statements)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
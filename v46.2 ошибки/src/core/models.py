@@ -5,7 +5,7 @@ from datetime import datetime
 from enum import Enum
 from sqlalchemy import (
     Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, 
-    JSON, Index, Enum as SQLEnum, DECIMAL, BigInteger
+    JSON, Index, Enum as SQLEnum, DECIMAL, BigInteger, LargeBinary
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -257,6 +257,7 @@ class Signal(Base):
     __table_args__ = (
         Index('idx_signal_symbol_created', 'symbol', 'created_at'),
         Index('idx_signal_strategy', 'strategy'),
+        Index('idx_signal_created', 'created_at'),
     )
     
     def to_dict(self):
@@ -322,6 +323,8 @@ class Trade(Base):
     __table_args__ = (
         Index('idx_trade_user_created', 'user_id', 'created_at'),
         Index('idx_trade_symbol', 'symbol'),
+        Index('idx_trade_status_close', 'status', 'close_time'),
+        Index('idx_trade_close_time', 'close_time'),
     )
 
 
@@ -455,8 +458,10 @@ class OrderBookSnapshot(Base):
     symbol = Column(String(20), nullable=False)
     exchange = Column(String(20), nullable=False, default='bybit')
     timestamp = Column(DateTime, nullable=False)
-    bids = Column(JSON, nullable=False)
-    asks = Column(JSON, nullable=False)
+    # Старый формат уровней (JSON), новые строки пишут только book_data
+    bids = Column(JSON, nullable=True)
+    asks = Column(JSON, nullable=True)
+    book_data = Column(LargeBinary, comment='Уровни стакана, см. src/data/orderbook_codec.py')
     bid_volume = Column(DECIMAL(20, 8))
     ask_volume = Column(DECIMAL(20, 8))
     spread = Column(DECIMAL(10, 8))
@@ -100,6 +100,7 @@ class UnifiedConfig:
     SLEEPING_GIANTS_HURST_THRESHOLD = float(os.getenv('SLEEPING_GIANTS_HURST_THRESHOLD', '0.45'))
     SLEEPING_GIANTS_OFI_THRESHOLD = float(os.getenv('SLEEPING_GIANTS_OFI_THRESHOLD', '0.3'))
     SLEEPING_GIANTS_INTERVAL = int(os.getenv('SLEEPING_GIANTS_INTERVAL', '300'))
+    SLEEPING_GIANTS_TIMEFRAME = os.getenv('SLEEPING_GIANTS_TIMEFRAME', '5m')
     
     # Whale Hunting Strategy параметры (дополняем существующие)
     WHALE_HUNTING_INTERVAL = int(os.getenv('WHALE_HUNTING_INTERVAL', '60'))
@@ -154,6 +155,18 @@ class UnifiedConfig:
     MIN_RISK_REWARD_RATIO = float(os.getenv('MIN_RISK_REWARD_RATIO', '2.0'))
     MAX_DRAWDOWN_PERCENT = float(os.getenv('MAX_DRAWDOWN_PERCENT', '10.0'))
     
+    # PositionManager: проверки на тиках WebSocket, REST - только сверка
+    POSITION_RECONCILE_INTERVAL = int(os.getenv('POSITION_RECONCILE_INTERVAL', '300'))
+    POSITION_DB_FLUSH_INTERVAL = float(os.getenv('POSITION_DB_FLUSH_INTERVAL', '2.0'))
+    POSITION_PRICE_MAX_AGE = float(os.getenv('POSITION_PRICE_MAX_AGE', '15.0'))
+    
+    # Аналитика портфеля для EnhancedRiskManager (risk/portfolio_analytics.py)
+    RISK_ANALYTICS_TIMEFRAME = os.getenv('RISK_ANALYTICS_TIMEFRAME', '5m')
+    RISK_EWMA_HALFLIFE = float(os.getenv('RISK_EWMA_HALFLIFE', '288'))  # свечей
+    RISK_RETURNS_WINDOW = int(os.getenv('RISK_RETURNS_WINDOW', '1000'))
+    RISK_STATE_TTL = float(os.getenv('RISK_STATE_TTL', '10.0'))  # сек, позиции и капитал из БД
+    RISK_EQUITY_DAYS = int(os.getenv('RISK_EQUITY_DAYS', '30'))
+    
     # Торговые пары
     TRADING_PAIRS = os.getenv('TRADING_PAIRS', 'BTCUSDT,ETHUSDT').split(',')
     PRIMARY_TRADING_PAIRS = os.getenv('PRIMARY_TRADING_PAIRS', 'BTCUSDT,ETHUSDT,ADAUSDT').split(',')
@@ -195,6 +208,9 @@ class UnifiedConfig:
     ORDERBOOK_SNAPSHOT_INTERVAL = int(os.getenv('ORDERBOOK_SNAPSHOT_INTERVAL', '60'))
     VOLUME_CHECK_INTERVAL = int(os.getenv('VOLUME_CHECK_INTERVAL', '60'))
     TRADES_UPDATE_INTERVAL = int(os.getenv('TRADES_UPDATE_INTERVAL', '60'))
+    MARKET_DATA_STREAMING = os.getenv('MARKET_DATA_STREAMING', 'true').lower() == 'true'
+    STREAM_KLINE_INTERVALS = os.getenv('STREAM_KLINE_INTERVALS', '5m,15m,1h').split(',')
+    STREAM_FLUSH_INTERVAL = int(os.getenv('STREAM_FLUSH_INTERVAL', '5'))
     
     # =================================================================
     # ✅ API КЛЮЧИ СКАНЕРОВ БЛОКЧЕЙНА
@@ -235,6 +251,7 @@ class UnifiedConfig:
     ML_MODEL_RETRAIN_INTERVAL = int(os.getenv('ML_MODEL_RETRAIN_INTERVAL', '86400'))  # 24 часа
     ENABLE_AUTO_STRATEGY_SELECTION = os.getenv('ENABLE_AUTO_STRATEGY_SELECTION', 'true').lower() == 'true'
     ML_MIN_TRAINING_DATA = int(os.getenv('ML_MIN_TRAINING_DATA', '1000'))
+    ML_MODEL_CACHE_SIZE = int(os.getenv('ML_MODEL_CACHE_SIZE', '256'))  # загруженных моделей в LRU сервиса инференса
     
     # ✅ ДОБАВЛЕНЫ ПАРАМЕТРЫ ДЛЯ BOTMANAGER
     MAX_CONCURRENT_ANALYSIS = int(os.getenv('MAX_CONCURRENT_ANALYSIS', '4'))
@@ -275,6 +292,13 @@ class UnifiedConfig:
     DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
     DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '3600'))
     
+    # Асинхронный пул (core/async_database.py) и пул потоков для синхронных сессий
+    ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', '10'))
+    ASYNC_DB_MAX_OVERFLOW = int(os.getenv('ASYNC_DB_MAX_OVERFLOW', '10'))
+    ASYNC_DB_POOL_TIMEOUT = int(os.getenv('ASYNC_DB_POOL_TIMEOUT', '10'))
+    DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', '4'))
+    DB_SLOW_QUERY_SECONDS = float(os.getenv('DB_SLOW_QUERY_SECONDS', '1.0'))
+    
     # =================================================================
     # ДОПОЛНИТЕЛЬНЫЕ НАСТРОЙКИ
     # =================================================================
@@ -646,6 +670,7 @@ class UnifiedConfig:
             'SLEEPING_GIANTS_HURST_THRESHOLD': 0.45,
             'SLEEPING_GIANTS_OFI_THRESHOLD': 0.3,
             'SLEEPING_GIANTS_INTERVAL': 300,
+            'SLEEPING_GIANTS_TIMEFRAME': '5m',
             
             # Whale Hunting Strategy
             'WHALE_MIN_USD_VALUE': 100000.0,
@@ -694,12 +719,21 @@ class UnifiedConfig:
             # Дополнительные торговые параметры
             'MAX_CONCURRENT_TRADES': 5,
             'POSITION_CHECK_INTERVAL_SECONDS': 30,
+            'POSITION_RECONCILE_INTERVAL': 300,
+            'POSITION_DB_FLUSH_INTERVAL': 2.0,
+            'POSITION_PRICE_MAX_AGE': 15.0,
+            'RISK_ANALYTICS_TIMEFRAME': '5m',
+            'RISK_EWMA_HALFLIFE': 288.0,
+            'RISK_RETURNS_WINDOW': 1000,
+            'RISK_STATE_TTL': 10.0,
+            'RISK_EQUITY_DAYS': 30,
             'REBALANCE_INTERVAL': 300,
             'ORDER_TIMEOUT_SECONDS': 60,
             
             # Параметры анализа и ML
             'ANALYSIS_TIMEOUT_SECONDS': 30,
             'ML_TIMEOUT_SECONDS': 10,
+            'ML_MODEL_CACHE_SIZE': 256,
             'FEATURE_UPDATE_INTERVAL': 60,
             'MODEL_VALIDATION_ENABLED': True,
             
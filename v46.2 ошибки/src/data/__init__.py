@@ -11,6 +11,56 @@ except ImportError:
     DATA_COLLECTOR_AVAILABLE = False
     DataCollector = None
 
+try:
+    from .candle_store import CandleStore, CandleRingBuffer, candle_store
+    CANDLE_STORE_AVAILABLE = True
+except ImportError:
+    CANDLE_STORE_AVAILABLE = False
+    CandleStore = None
+    CandleRingBuffer = None
+    candle_store = None
+
+try:
+    from .candle_writer import upsert_candles
+    CANDLE_WRITER_AVAILABLE = True
+except ImportError:
+    CANDLE_WRITER_AVAILABLE = False
+    upsert_candles = None
+
+try:
+    from .ohlcv_archive import OHLCVArchive, ohlcv_archive
+    OHLCV_ARCHIVE_AVAILABLE = True
+except ImportError:
+    OHLCV_ARCHIVE_AVAILABLE = False
+    OHLCVArchive = None
+    ohlcv_archive = None
+
+try:
+    from .order_book import L2Book, OrderBookEngine, order_book_engine
+    ORDER_BOOK_AVAILABLE = True
+except ImportError:
+    ORDER_BOOK_AVAILABLE = False
+    L2Book = None
+    OrderBookEngine = None
+    order_book_engine = None
+
+try:
+    from .orderbook_codec import encode_book, decode_book, snapshot_arrays
+    ORDERBOOK_CODEC_AVAILABLE = True
+except ImportError:
+    ORDERBOOK_CODEC_AVAILABLE = False
+    encode_book = None
+    decode_book = None
+    snapshot_arrays = None
+
+try:
+    from .regime_features import RegimeFeatureEngine, hurst_exponents
+    REGIME_FEATURES_AVAILABLE = True
+except ImportError:
+    REGIME_FEATURES_AVAILABLE = False
+    RegimeFeatureEngine = None
+    hurst_exponents = None
+
 try:
     from .indicators import UnifiedIndicators, indicators
     INDICATORS_AVAILABLE = True
@@ -23,6 +73,26 @@ __all__ = [
     'DataCollector',
     'UnifiedIndicators', 
     'indicators',
+    'CandleStore',
+    'CandleRingBuffer',
+    'candle_store',
+    'upsert_candles',
+    'OHLCVArchive',
+    'ohlcv_archive',
+    'L2Book',
+    'OrderBookEngine',
+    'order_book_engine',
+    'encode_book',
+    'decode_book',
+    'snapshot_arrays',
+    'RegimeFeatureEngine',
+    'hurst_exponents',
     'DATA_COLLECTOR_AVAILABLE',
+    'CANDLE_STORE_AVAILABLE',
+    'CANDLE_WRITER_AVAILABLE',
+    'OHLCV_ARCHIVE_AVAILABLE',
+    'ORDER_BOOK_AVAILABLE',
+    'ORDERBOOK_CODEC_AVAILABLE',
+    'REGIME_FEATURES_AVAILABLE',
     'INDICATORS_AVAILABLE'
 ]
\ No newline at end of file
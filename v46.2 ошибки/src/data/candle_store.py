@@ -0,0 +1,363 @@
+"""
+Колоночное хранилище свечей на кольцевых буферах NumPy
+Файл: src/data/candle_store.py
+
+Один предвыделенный буфер на пару (symbol, timeframe). Свечи дописываются
+на месте, а стратегии получают срезы массивов без копирования.
+Хранилище общее для DataCollector, BybitDataProducer и анализа рынка.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OHLCV_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+DEFAULT_CAPACITY = 1000
+
+# Длительность свечи по таймфрейму
+_INTERVAL_DELTAS = {
+    '1m': timedelta(minutes=1),
+    '3m': timedelta(minutes=3),
+    '5m': timedelta(minutes=5),
+    '15m': timedelta(minutes=15),
+    '30m': timedelta(minutes=30),
+    '1h': timedelta(hours=1),
+    '2h': timedelta(hours=2),
+    '4h': timedelta(hours=4),
+    '6h': timedelta(hours=6),
+    '12h': timedelta(hours=12),
+    '1d': timedelta(days=1),
+    '1w': timedelta(weeks=1),
+    # Интервалы Bybit в минутах
+    '1': timedelta(minutes=1),
+    '3': timedelta(minutes=3),
+    '5': timedelta(minutes=5),
+    '15': timedelta(minutes=15),
+    '30': timedelta(minutes=30),
+    '60': timedelta(hours=1),
+    '120': timedelta(hours=2),
+    '240': timedelta(hours=4),
+    '360': timedelta(hours=6),
+    '720': timedelta(hours=12),
+    'D': timedelta(days=1),
+    'W': timedelta(weeks=1),
+}
+
+
+def interval_delta(interval: str) -> timedelta:
+    """Длительность свечи для интервала ('5m', '1h' или формат Bybit '5', '60', 'D')"""
+    return _INTERVAL_DELTAS.get(str(interval), timedelta(hours=1))
+
+
+def _to_ms(value: Any) -> Optional[int]:
+    """Приведение метки времени свечи к миллисекундам epoch"""
+    if value is None:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return int(pd.Timestamp(value).value // 1_000_000)
+    if isinstance(value, np.datetime64):
+        return int(value.astype('datetime64[ms]').astype(np.int64))
+    if isinstance(value, str):
+        if value.isdigit():
+            value = int(value)
+        else:
+            return int(pd.Timestamp(value).value // 1_000_000)
+    value = int(value)
+    # Секунды -> миллисекунды
+    return value * 1000 if 0 < value < 1e11 else value
+
+
+def _parse_candle(candle: Any) -> Optional[Tuple[int, float, float, float, float, float]]:
+    """Разбор свечи из списка [ts, o, h, l, c, v, ...] или словаря"""
+    try:
+        if isinstance(candle, dict):
+            ts = _to_ms(candle.get('timestamp', candle.get('open_time')))
+            return (
+                ts,
+                float(candle.get('open', 0)),
+                float(candle.get('high', 0)),
+                float(candle.get('low', 0)),
+                float(candle.get('close', 0)),
+                float(candle.get('volume', 0)),
+            )
+        if isinstance(candle, (list, tuple)) and len(candle) >= 6:
+            return (
+                _to_ms(candle[0]),
+                float(candle[1]),
+                float(candle[2]),
+                float(candle[3]),
+                float(candle[4]),
+                float(candle[5]),
+            )
+    except (ValueError, TypeError):
+        pass
+    return None
+
+
+def frame_timestamps(df: pd.DataFrame) -> np.ndarray:
+    """Время свечей DataFrame (DatetimeIndex или колонка 'timestamp') в мс epoch"""
+    if 'timestamp' in df.columns:
+        ts = df['timestamp']
+    else:
+        ts = df.index.to_series()
+    if pd.api.types.is_datetime64_any_dtype(ts):
+        return ts.values.astype('datetime64[ms]').astype(np.int64)
+    return pd.to_numeric(ts, errors='coerce').to_numpy(dtype=np.int64)
+
+
+class CandleRingBuffer:
+    """
+    Кольцевой буфер OHLCV для одной пары (symbol, timeframe).
+
+    Массивы выделены с двойным запасом: запись идет линейно, а при
+    заполнении последние `capacity` свечей переносятся в начало. Поэтому
+    окно всегда непрерывно и `view()` возвращает срезы без копирования.
+    Срезы остаются корректными до следующей записи в буфер.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = int(capacity)
+        self._timestamps = np.zeros(self.capacity * 2, dtype=np.int64)
+        self._data = np.zeros((len(OHLCV_FIELDS), self.capacity * 2), dtype=np.float64)
+        self._start = 0
+        self._end = 0
+        self.updated_at: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        """Время открытия последней свечи (мс) или None"""
+        if self._end == self._start:
+            return None
+        return int(self._timestamps[self._end - 1])
+
+    def append(self, timestamp: int, open_: float, high: float, low: float,
+               close: float, volume: float) -> bool:
+        """
+        Добавление одной свечи.
+
+        Свеча с тем же временем, что и последняя, обновляет ее на месте
+        (незакрытая свеча). Более старые свечи игнорируются.
+        """
+        last = self.last_timestamp
+        if last is not None and timestamp < last:
+            return False
+
+        if last is None or timestamp > last:
+            if self._end == self._timestamps.shape[0]:
+                self._compact(self.capacity - 1)
+            self._end += 1
+            if self._end - self._start > self.capacity:
+                self._start += 1
+
+        idx = self._end - 1
+        self._timestamps[idx] = timestamp
+        self._data[:, idx] = (open_, high, low, close, volume)
+        self.updated_at = datetime.utcnow()
+        return True
+
+    def extend_arrays(self, timestamps: np.ndarray, opens: np.ndarray, highs: np.ndarray,
+                      lows: np.ndarray, closes: np.ndarray, volumes: np.ndarray) -> int:
+        """
+        Пакетное добавление свечей из массивов.
+
+        Массивы сортируются по времени, дубликаты схлопываются (остается
+        последнее значение), свечи старше последней в буфере отбрасываются.
+
+        Returns:
+            int: Количество записанных (добавленных или обновленных) свечей
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if timestamps.size == 0:
+            return 0
+        values = np.vstack([
+            np.asarray(opens, dtype=np.float64),
+            np.asarray(highs, dtype=np.float64),
+            np.asarray(lows, dtype=np.float64),
+            np.asarray(closes, dtype=np.float64),
+            np.asarray(volumes, dtype=np.float64),
+        ])
+
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+        values = values[:, order]
+
+        # Схлопываем дубликаты, оставляя последнее вхождение
+        keep = np.ones(timestamps.size, dtype=bool)
+        keep[:-1] = timestamps[1:] != timestamps[:-1]
+        timestamps = timestamps[keep]
+        values = values[:, keep]
+
+        written = 0
+        last = self.last_timestamp
+        if last is not None:
+            fresh = timestamps >= last
+            timestamps = timestamps[fresh]
+            values = values[:, fresh]
+            if timestamps.size and timestamps[0] == last:
+                self._data[:, self._end - 1] = values[:, 0]
+                timestamps = timestamps[1:]
+                values = values[:, 1:]
+                written += 1
+
+        n = int(timestamps.size)
+        if n == 0:
+            if written:
+                self.updated_at = datetime.utcnow()
+            return written
+
+        if n > self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            values = values[:, -self.capacity:]
+            n = self.capacity
+
+        new_size = min(len(self) + n, self.capacity)
+        if self._end + n > self._timestamps.shape[0]:
+            self._compact(new_size - n)
+
+        self._timestamps[self._end:self._end + n] = timestamps
+        self._data[:, self._end:self._end + n] = values
+        self._end += n
+        self._start = self._end - new_size
+        self.updated_at = datetime.utcnow()
+        return written + n
+
+    def _compact(self, keep: int):
+        """Перенос последних `keep` свечей в начало буфера"""
+        keep = max(0, min(keep, len(self)))
+        if keep:
+            self._timestamps[:keep] = self._timestamps[self._end - keep:self._end]
+            self._data[:, :keep] = self._data[:, self._end - keep:self._end]
+        self._start = 0
+        self._end = keep
+
+    def view(self, limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Срезы массивов без копирования.
+
+        Returns:
+            Dict: {'timestamp': int64 мс, 'open', 'high', 'low', 'close', 'volume'}
+        """
+        start = self._start
+        if limit is not None and limit < len(self):
+            start = self._end - int(limit)
+        result = {'timestamp': self._timestamps[start:self._end]}
+        for i, field in enumerate(OHLCV_FIELDS):
+            result[field] = self._data[i, start:self._end]
+        return result
+
+    def to_dataframe(self, limit: Optional[int] = None, copy: bool = False) -> pd.DataFrame:
+        """DataFrame с DatetimeIndex поверх срезов буфера"""
+        arrays = self.view(limit)
+        index = pd.DatetimeIndex(pd.to_datetime(arrays.pop('timestamp'), unit='ms'), name='timestamp')
+        return pd.DataFrame(arrays, index=index, copy=copy)
+
+
+class CandleStore:
+    """Реестр кольцевых буферов по ключу (symbol, timeframe)"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._buffers: Dict[Tuple[str, str], CandleRingBuffer] = {}
+        self._lock = threading.Lock()
+
+    def get_buffer(self, symbol: str, timeframe: str, create: bool = True) -> Optional[CandleRingBuffer]:
+        """Получение (или создание) буфера для пары"""
+        key = (symbol, timeframe)
+        buffer = self._buffers.get(key)
+        if buffer is None and create:
+            with self._lock:
+                buffer = self._buffers.get(key)
+                if buffer is None:
+                    buffer = CandleRingBuffer(self.capacity)
+                    self._buffers[key] = buffer
+        return buffer
+
+    def has(self, symbol: str, timeframe: str) -> bool:
+        buffer = self._buffers.get((symbol, timeframe))
+        return buffer is not None and len(buffer) > 0
+
+    def append(self, symbol: str, timeframe: str, candle: Any) -> bool:
+        """Добавление одной свечи (список или словарь)"""
+        parsed = _parse_candle(candle)
+        if parsed is None or parsed[0] is None:
+            return False
+        return self.get_buffer(symbol, timeframe).append(*parsed)
+
+    def extend(self, symbol: str, timeframe: str, candles: Iterable[Any]) -> int:
+        """Пакетное добавление свечей в формате списков/словарей (Bybit, CCXT, БД)"""
+        rows: List[Tuple] = []
+        for candle in candles or []:
+            parsed = _parse_candle(candle)
+            if parsed is not None and parsed[0] is not None:
+                rows.append(parsed)
+        if not rows:
+            return 0
+        arr = np.array(rows, dtype=np.float64)
+        return self.get_buffer(symbol, timeframe).extend_arrays(
+            arr[:, 0].astype(np.int64), arr[:, 1], arr[:, 2], arr[:, 3], arr[:, 4], arr[:, 5]
+        )
+
+    def extend_frame(self, symbol: str, timeframe: str, df: pd.DataFrame) -> int:
+        """
+        Пакетное добавление свечей из DataFrame.
+        Время берется из DatetimeIndex или из колонки 'timestamp'.
+        """
+        if df is None or df.empty:
+            return 0
+        return self.get_buffer(symbol, timeframe).extend_arrays(
+            frame_timestamps(df),
+            df['open'].to_numpy(dtype=np.float64),
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64),
+            df['close'].to_numpy(dtype=np.float64),
+            df['volume'].to_numpy(dtype=np.float64),
+        )
+
+    def view(self, symbol: str, timeframe: str, limit: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        buffer = self._buffers.get((symbol, timeframe))
+        if buffer is None or len(buffer) == 0:
+            return None
+        return buffer.view(limit)
+
+    def to_dataframe(self, symbol: str, timeframe: str, limit: Optional[int] = None,
+                     copy: bool = False) -> Optional[pd.DataFrame]:
+        buffer = self._buffers.get((symbol, timeframe))
+        if buffer is None or len(buffer) == 0:
+            return None
+        return buffer.to_dataframe(limit, copy=copy)
+
+    def last_timestamp(self, symbol: str, timeframe: str) -> Optional[int]:
+        buffer = self._buffers.get((symbol, timeframe))
+        return buffer.last_timestamp if buffer is not None else None
+
+    def symbols(self, timeframe: Optional[str] = None) -> List[str]:
+        return sorted({s for (s, tf) in self._buffers if timeframe is None or tf == timeframe})
+
+    def clear(self, symbol: Optional[str] = None):
+        with self._lock:
+            if symbol is None:
+                self._buffers.clear()
+            else:
+                for key in [k for k in self._buffers if k[0] == symbol]:
+                    del self._buffers[key]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'buffers': len(self._buffers),
+            'capacity': self.capacity,
+            'candles': sum(len(b) for b in self._buffers.values()),
+            'memory_bytes': sum(b._timestamps.nbytes + b._data.nbytes for b in self._buffers.values()),
+        }
+
+
+# Глобальный экземпляр, общий для всех компонентов
+candle_store = CandleStore()
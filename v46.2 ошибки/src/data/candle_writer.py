@@ -0,0 +1,120 @@
+"""
+Пакетная запись свечей в БД через upsert
+Файл: src/data/candle_writer.py
+
+Вместо SELECT на каждую свечу перед INSERT свечи пишутся пачками одним
+запросом на уникальный индекс idx_candle_symbol_time (symbol, interval, open_time):
+- MySQL: INSERT ... ON DUPLICATE KEY UPDATE
+- SQLite/PostgreSQL: INSERT ... ON CONFLICT (...) DO UPDATE
+Существующая свеча обновляет OHLCV (незакрытая свеча меняется до закрытия).
+open_time хранится как naive локальное время хоста (datetime.fromtimestamp), как и
+до перехода на upsert: иначе новые строки не совпадут с уникальным ключом старых.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import tuple_
+
+from ..core.models import Candle
+from .candle_store import _parse_candle, interval_delta
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+# Ключ уникального индекса idx_candle_symbol_time
+CONFLICT_COLUMNS = ('symbol', 'interval', 'open_time')
+UPDATE_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'close_time')
+
+
+def candle_rows(symbol: str, interval: str, candles: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    Преобразование свечей (списки [ts, o, h, l, c, v] или словари) в строки таблицы candles.
+    Дубликаты по времени схлопываются, остается последняя версия свечи.
+    """
+    delta = interval_delta(interval)
+    rows: Dict[datetime, Dict[str, Any]] = {}
+    for candle in candles or []:
+        parsed = _parse_candle(candle)
+        if parsed is None or parsed[0] is None:
+            continue
+        timestamp_ms, open_, high, low, close, volume = parsed
+        open_time = datetime.fromtimestamp(timestamp_ms / 1000)
+        rows[open_time] = {
+            'symbol': symbol,
+            'interval': interval,
+            'open_time': open_time,
+            'close_time': open_time + delta,
+            'open': open_,
+            'high': high,
+            'low': low,
+            'close': close,
+            'volume': volume,
+        }
+    return list(rows.values())
+
+
+def _upsert_statement(dialect: str, rows: List[Dict[str, Any]]):
+    """INSERT с обработкой конфликта по уникальному индексу для диалекта БД"""
+    table = Candle.__table__
+    if dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        return stmt.on_duplicate_key_update({col: stmt.inserted[col] for col in UPDATE_COLUMNS})
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    stmt = insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=list(CONFLICT_COLUMNS),
+        set_={col: stmt.excluded[col] for col in UPDATE_COLUMNS}
+    )
+
+
+def _insert_missing(session, rows: List[Dict[str, Any]]):
+    """Запасной путь для прочих СУБД: один SELECT существующих ключей на пачку"""
+    keys = [(row['symbol'], row['interval'], row['open_time']) for row in rows]
+    existing = set(
+        session.query(Candle.symbol, Candle.interval, Candle.open_time)
+        .filter(tuple_(Candle.symbol, Candle.interval, Candle.open_time).in_(keys))
+        .all()
+    )
+    missing = [row for row, key in zip(rows, keys) if tuple(key) not in existing]
+    if missing:
+        session.execute(Candle.__table__.insert(), missing)
+
+
+def upsert_candles(session, symbol: str, interval: str, candles: Iterable[Any],
+                   batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Пакетная запись свечей одной пары.
+
+    Транзакцией управляет вызывающий код (commit/rollback остаются на его стороне).
+
+    Args:
+        session: Сессия SQLAlchemy
+        symbol: Торговая пара
+        interval: Таймфрейм
+        candles: Свечи в формате [ts, o, h, l, c, v] или словари
+        batch_size: Размер пачки в одном INSERT
+
+    Returns:
+        int: Количество записанных (вставленных или обновленных) свечей
+    """
+    rows = candle_rows(symbol, interval, candles)
+    if not rows:
+        return 0
+
+    dialect = session.get_bind().dialect.name
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        stmt = _upsert_statement(dialect, batch)
+        if stmt is None:
+            _insert_missing(session, batch)
+        else:
+            session.execute(stmt)
+    return len(rows)
@@ -5,11 +5,14 @@
 import asyncio
 import logging
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from datetime import datetime
 import pandas as pd
 import numpy as np
 from collections import defaultdict
 from ..core.models import Candle, Signal, VolumeAnomaly
+from .candle_store import candle_store
+from .candle_writer import upsert_candles
+from .ohlcv_archive import ohlcv_archive
 import traceback
 
 logger = logging.getLogger(__name__)
@@ -26,6 +29,10 @@ class DataCollector:
         self.collection_tasks = {}
         self.update_interval = 60  # секунд
         self.active_pairs = []
+        # Общее колоночное хранилище свечей (см. candle_store.py)
+        self.candle_store = candle_store
+        # Локальный архив истории для бэктестов и обучения (см. ohlcv_archive.py)
+        self.archive = ohlcv_archive
         
         logger.info("✅ DataCollector инициализирован")
     
@@ -121,6 +128,8 @@ class DataCollector:
                         if df is not None and not df.empty:
                             # Сохраняем в кэш
                             self._cache_data(symbol, timeframe, df)
+                            self.candle_store.extend_frame(symbol, timeframe, df)
+                            self._archive_frame(symbol, timeframe, df)
                             
                             logger.info(f"💾 Данные для {symbol} ({timeframe}) обработаны и сохранены")
                             return df
@@ -207,6 +216,13 @@ class DataCollector:
         self.collected_data[symbol][timeframe] = df
         logger.debug(f"💾 Данные для {symbol} ({timeframe}) кэшированы в памяти.")
             
+    def _archive_frame(self, symbol: str, timeframe: str, df: pd.DataFrame):
+        """Дописывание закрытых свечей в локальный архив истории"""
+        try:
+            self.archive.append_frame(symbol, timeframe, df)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось дописать {symbol} ({timeframe}) в архив: {e}")
+
     def _convert_timeframe(self, timeframe: str) -> str:
         """Конвертация timeframe в формат Bybit"""
         # Bybit использует числовой формат для интервалов
@@ -233,60 +249,12 @@ class DataCollector:
                 db_session = self.db()
             else:
                 db_session = self.db
-                
             
-            saved_count = 0
-            candles_to_save = []
-            
-            for candle_data in candles:
-                try:
-                    timestamp_ms = int(candle_data[0])
-                    open_time = datetime.fromtimestamp(timestamp_ms / 1000)
-                    
-                    # Рассчитываем close_time
-                    timeframe_deltas = {
-                        '1m': timedelta(minutes=1),
-                        '5m': timedelta(minutes=5),
-                        '15m': timedelta(minutes=15),
-                        '30m': timedelta(minutes=30),
-                        '1h': timedelta(hours=1),
-                        '4h': timedelta(hours=4),
-                        '1d': timedelta(days=1)
-                    }
-                    
-                    close_time = open_time + timeframe_deltas.get(timeframe, timedelta(hours=1))
-                    
-                    # ✅ СОГЛАСНО ВАШЕЙ БД: interval и open_time
-                    existing = db_session.query(Candle.id).filter(
-                        Candle.symbol == symbol,
-                        Candle.interval == timeframe,  # ✅ ПРАВИЛЬНОЕ ПОЛЕ
-                        Candle.open_time == open_time  # ✅ ПРАВИЛЬНОЕ ПОЛЕ
-                    ).first()
-                    
-                    if not existing:
-                        candle = Candle(
-                            symbol=symbol,
-                            interval=timeframe,        # ✅ ПРАВИЛЬНОЕ ПОЛЕ
-                            open_time=open_time,       # ✅ ПРАВИЛЬНОЕ ПОЛЕ
-                            close_time=close_time,     # ✅ ЕСТЬ В ВАШЕЙ БД
-                            open=float(candle_data[1]),
-                            high=float(candle_data[2]),
-                            low=float(candle_data[3]),
-                            close=float(candle_data[4]),
-                            volume=float(candle_data[5])
-                        )
-                        candles_to_save.append(candle)
-                        
-                except Exception as e:
-                    logger.debug(f"Ошибка обработки свечи: {e}")
-                    continue
-            
-            # Сохраняем пакетом
-            if candles_to_save:
-                db_session.add_all(candles_to_save)
+            # Одним upsert-запросом на пачку вместо SELECT на каждую свечу
+            saved_count = upsert_candles(db_session, symbol, timeframe, candles)
+            if saved_count:
                 db_session.commit()
-                saved_count = len(candles_to_save)
-                logger.info(f"💾 Сохранено {saved_count} новых свечей для {symbol}")
+                logger.info(f"💾 Сохранено {saved_count} свечей для {symbol}")
             
             if callable(self.db):
                 db_session.close()
@@ -405,6 +373,10 @@ class DataCollector:
                 # Удаляем строки с NaN после преобразования
                 df = df.dropna()
                 
+                # Дописываем свечи в общий кольцевой буфер
+                self.candle_store.extend_frame(symbol, '5m', df)
+                self._archive_frame(symbol, '5m', df)
+                
                 if len(df) >= 20:  # Проверяем, что есть достаточно данных
                     collected['candles'] = df.to_dict('records')  # Последние 20 свечей
                     collected['technical'] = {
@@ -0,0 +1,282 @@
+"""
+Локальный колоночный архив истории свечей
+Файл: src/data/ohlcv_archive.py
+
+Раскладка на диске: <root>/<symbol>/<timeframe>/<YYYY-MM>/<column>.bin,
+где каждая колонка — сырой массив (timestamp int64 мс, OHLCV float64).
+Запись только дописыванием в конец, чтение через np.memmap: бэктесты и
+обучение ML получают историю без запросов к БД и бирже.
+
+Отбор по времени идет в два шага: сначала по месячным партициям,
+затем бинарным поиском по отсортированному timestamp внутри партиции.
+"""
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .candle_store import OHLCV_FIELDS, _parse_candle, _to_ms, frame_timestamps, interval_delta
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = os.getenv('OHLCV_ARCHIVE_DIR', 'data/ohlcv')
+
+COLUMN_DTYPES = {'timestamp': np.int64, **{field: np.float64 for field in OHLCV_FIELDS}}
+
+
+def _month_key(timestamp_ms: np.ndarray) -> np.ndarray:
+    """Номер месяца (datetime64[M]) для каждой метки времени"""
+    return np.asarray(timestamp_ms, dtype='datetime64[ms]').astype('datetime64[M]')
+
+
+class OHLCVArchive:
+    """
+    Архив свечей, разбитый по symbol/timeframe/месяцу.
+
+    Свеча дописывается в партицию, только если она новее последней
+    свечи этой партиции, поэтому повторная загрузка тех же данных безопасна.
+    Перед записью все колонки обрезаются до числа полных строк, timestamp
+    пишется последним: прерванная запись не дает читателю строк с неполными
+    данными и не сдвигает колонки при следующем дописывании.
+
+    Время везде - UTC, миллисекунды epoch (open_time свечей в БД - локальное время хоста).
+    """
+
+    def __init__(self, root: str = DEFAULT_ARCHIVE_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._last_ts: Dict[Path, int] = {}
+
+    # === Пути и служебные методы ===
+
+    def _series_dir(self, symbol: str, timeframe: str) -> Path:
+        return self.root / symbol.replace('/', '') / str(timeframe)
+
+    def _partitions(self, symbol: str, timeframe: str) -> List[Path]:
+        series_dir = self._series_dir(symbol, timeframe)
+        if not series_dir.is_dir():
+            return []
+        return sorted(p for p in series_dir.iterdir() if p.is_dir())
+
+    @staticmethod
+    def _rows(partition: Path) -> int:
+        """Число полностью записанных строк партиции"""
+        sizes = []
+        for column, dtype in COLUMN_DTYPES.items():
+            path = partition / f'{column}.bin'
+            if not path.exists():
+                return 0
+            sizes.append(path.stat().st_size // np.dtype(dtype).itemsize)
+        return min(sizes)
+
+    @classmethod
+    def _memmap(cls, partition: Path, column: str, rows: int) -> np.ndarray:
+        return np.memmap(partition / f'{column}.bin', dtype=COLUMN_DTYPES[column], mode='r', shape=(rows,))
+
+    def _partition_last_ts(self, partition: Path) -> Optional[int]:
+        if partition in self._last_ts:
+            return self._last_ts[partition]
+        rows = self._rows(partition)
+        if rows == 0:
+            return None
+        last = int(self._memmap(partition, 'timestamp', rows)[rows - 1])
+        self._last_ts[partition] = last
+        return last
+
+    # === Запись ===
+
+    def append_arrays(self, symbol: str, timeframe: str, timestamps: np.ndarray,
+                      opens: np.ndarray, highs: np.ndarray, lows: np.ndarray,
+                      closes: np.ndarray, volumes: np.ndarray, drop_open: bool = True) -> int:
+        """
+        Дописывание свечей в архив.
+
+        Args:
+            drop_open: Не записывать незакрытую свечу (open_time + интервал > сейчас)
+
+        Returns:
+            int: Количество дописанных свечей
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if timestamps.size == 0:
+            return 0
+        columns = {
+            'open': np.asarray(opens, dtype=np.float64),
+            'high': np.asarray(highs, dtype=np.float64),
+            'low': np.asarray(lows, dtype=np.float64),
+            'close': np.asarray(closes, dtype=np.float64),
+            'volume': np.asarray(volumes, dtype=np.float64),
+        }
+
+        # Сортировка и схлопывание дубликатов (остается последнее значение)
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+        keep = np.ones(timestamps.size, dtype=bool)
+        keep[:-1] = timestamps[1:] != timestamps[:-1]
+        if drop_open:
+            interval_ms = int(interval_delta(timeframe).total_seconds() * 1000)
+            now_ms = int(pd.Timestamp.utcnow().value // 1_000_000)
+            keep &= timestamps + interval_ms <= now_ms
+        timestamps = timestamps[keep]
+        columns = {name: values[order][keep] for name, values in columns.items()}
+        if timestamps.size == 0:
+            return 0
+
+        written = 0
+        months = _month_key(timestamps)
+        bounds = np.flatnonzero(months[1:] != months[:-1]) + 1
+        series_dir = self._series_dir(symbol, timeframe)
+
+        with self._lock:
+            for start, end in zip(np.r_[0, bounds], np.r_[bounds, timestamps.size]):
+                partition = series_dir / str(months[start])
+                chunk_ts = timestamps[start:end]
+                last = self._partition_last_ts(partition)
+                if last is not None:
+                    fresh = chunk_ts > last
+                    if not fresh.any():
+                        continue
+                    first = int(np.argmax(fresh))
+                    start, chunk_ts = start + first, chunk_ts[first:]
+
+                partition.mkdir(parents=True, exist_ok=True)
+                rows = self._rows(partition)
+                chunk = [(name, columns[name][start:end]) for name in OHLCV_FIELDS]
+                chunk.append(('timestamp', chunk_ts))
+                for name, values in chunk:
+                    with open(partition / f'{name}.bin', 'ab') as f:
+                        # Байты прерванной записи за пределами полных строк отбрасываются
+                        f.truncate(rows * np.dtype(COLUMN_DTYPES[name]).itemsize)
+                        f.write(values.tobytes())
+
+                self._last_ts[partition] = int(chunk_ts[-1])
+                written += int(chunk_ts.size)
+
+        if written:
+            logger.debug(f"🗄️ Архив {symbol} {timeframe}: дописано {written} свечей")
+        return written
+
+    def append_frame(self, symbol: str, timeframe: str, df: pd.DataFrame, drop_open: bool = True) -> int:
+        """Дописывание свечей из DataFrame (DatetimeIndex или колонка 'timestamp')"""
+        if df is None or df.empty:
+            return 0
+        return self.append_arrays(
+            symbol, timeframe, frame_timestamps(df),
+            df['open'].to_numpy(dtype=np.float64),
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64),
+            df['close'].to_numpy(dtype=np.float64),
+            df['volume'].to_numpy(dtype=np.float64),
+            drop_open=drop_open,
+        )
+
+    def append_candles(self, symbol: str, timeframe: str, candles: Iterable[Any], drop_open: bool = True) -> int:
+        """Дописывание свечей в формате списков [ts, o, h, l, c, v] или словарей"""
+        rows = [parsed for parsed in map(_parse_candle, candles or []) if parsed and parsed[0] is not None]
+        if not rows:
+            return 0
+        arr = np.array(rows, dtype=np.float64)
+        return self.append_arrays(
+            symbol, timeframe, arr[:, 0].astype(np.int64),
+            arr[:, 1], arr[:, 2], arr[:, 3], arr[:, 4], arr[:, 5], drop_open=drop_open
+        )
+
+    # === Чтение ===
+
+    def read(self, symbol: str, timeframe: str, start: Any = None, end: Any = None,
+             columns: Sequence[str] = OHLCV_FIELDS) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Чтение свечей за период [start, end] в массивы.
+
+        Если период целиком внутри одной партиции, возвращаются срезы
+        np.memmap без копирования (только для чтения).
+
+        Returns:
+            Dict: {'timestamp': int64 мс, <columns>: float64} или None
+        """
+        start_ms = _to_ms(start)
+        end_ms = _to_ms(end)
+        first_month = _month_key(start_ms) if start_ms is not None else None
+        last_month = _month_key(end_ms) if end_ms is not None else None
+
+        parts: List[Dict[str, np.ndarray]] = []
+        for partition in self._partitions(symbol, timeframe):
+            month = np.datetime64(partition.name, 'M')
+            if (first_month is not None and month < first_month) or \
+               (last_month is not None and month > last_month):
+                continue
+            rows = self._rows(partition)
+            if rows == 0:
+                continue
+            ts = self._memmap(partition, 'timestamp', rows)
+            lo = int(np.searchsorted(ts, start_ms, side='left')) if start_ms is not None else 0
+            hi = int(np.searchsorted(ts, end_ms, side='right')) if end_ms is not None else rows
+            if hi <= lo:
+                continue
+            part = {'timestamp': ts[lo:hi]}
+            for column in columns:
+                part[column] = self._memmap(partition, column, rows)[lo:hi]
+            parts.append(part)
+
+        if not parts:
+            return None
+        if len(parts) == 1:
+            return parts[0]
+        return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+    def read_frame(self, symbol: str, timeframe: str, start: Any = None, end: Any = None,
+                   columns: Sequence[str] = OHLCV_FIELDS) -> pd.DataFrame:
+        """Чтение свечей за период в DataFrame с DatetimeIndex 'timestamp'"""
+        arrays = self.read(symbol, timeframe, start, end, columns)
+        if arrays is None:
+            return pd.DataFrame(columns=list(columns))
+        index = pd.DatetimeIndex(pd.to_datetime(np.asarray(arrays.pop('timestamp')), unit='ms'), name='timestamp')
+        return pd.DataFrame({key: np.asarray(values) for key, values in arrays.items()}, index=index)
+
+    def last_timestamp(self, symbol: str, timeframe: str) -> Optional[int]:
+        """Время последней архивной свечи (мс) или None"""
+        for partition in reversed(self._partitions(symbol, timeframe)):
+            last = self._partition_last_ts(partition)
+            if last is not None:
+                return last
+        return None
+
+    def first_timestamp(self, symbol: str, timeframe: str) -> Optional[int]:
+        """Время первой архивной свечи (мс) или None"""
+        for partition in self._partitions(symbol, timeframe):
+            rows = self._rows(partition)
+            if rows:
+                return int(self._memmap(partition, 'timestamp', rows)[0])
+        return None
+
+    def has(self, symbol: str, timeframe: str) -> bool:
+        return self.last_timestamp(symbol, timeframe) is not None
+
+    def series(self) -> List[Tuple[str, str]]:
+        """Список пар (symbol, timeframe), имеющихся в архиве"""
+        if not self.root.is_dir():
+            return []
+        return sorted(
+            (symbol_dir.name, tf_dir.name)
+            for symbol_dir in self.root.iterdir() if symbol_dir.is_dir()
+            for tf_dir in symbol_dir.iterdir() if tf_dir.is_dir()
+        )
+
+    def get_statistics(self) -> Dict[str, Any]:
+        series = self.series()
+        partitions = [p for symbol, tf in series for p in self._partitions(symbol, tf)]
+        return {
+            'root': str(self.root),
+            'series': len(series),
+            'partitions': len(partitions),
+            'candles': sum(self._rows(p) for p in partitions),
+            'size_bytes': sum(f.stat().st_size for p in partitions for f in p.glob('*.bin')),
+        }
+
+
+# Глобальный экземпляр архива
+ohlcv_archive = OHLCVArchive()
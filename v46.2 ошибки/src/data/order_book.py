@@ -0,0 +1,404 @@
+"""
+L2-стакан в памяти на массивах NumPy
+Файл: src/data/order_book.py
+
+Один стакан на символ, поддерживается сообщениями orderbook.50 Bybit
+(snapshot + delta):
+- уровни хранятся отсортированными массивами цен и объемов
+  (bids по убыванию цены, asks по возрастанию)
+- при каждом обновлении считаются OFI лучших уровней (Cont, Kukanov, Stoikov)
+  и исчезнувшие крупные уровни, история объемов копится в кольцевом буфере
+- дисбаланс, стены и OFI по глубине считаются по массивам без циклов Python
+- слушатели (стратегии) вызываются после каждого обновления стакана
+
+В БД пишутся только снимки, отобранные продюсером с его интервалом.
+"""
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .orderbook_codec import encode_book
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEPTH = 50
+FEATURE_LEVELS = 10  # уровней для OFI по глубине, стен и исчезнувших уровней
+LARGE_LEVEL_SHARE = 0.01  # доля общего объема, начиная с которой уровень считается крупным
+
+# История объемов: одна строка (время, объем bids, объем asks, OFI) на шаг
+HISTORY_STEP = 1.0  # секунд
+HISTORY_SIZE = 600
+DISAPPEARED_MAXLEN = 1000
+
+_EMPTY = np.empty(0, dtype=np.float64)
+
+
+def _as_levels(levels) -> np.ndarray:
+    """[[price, size, ...], ...] (строки или числа) -> массив (n, 2)"""
+    if levels is None or len(levels) == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    return np.asarray(levels, dtype=np.float64).reshape(len(levels), -1)[:, :2]
+
+
+def _sorted(levels: np.ndarray, descending: bool) -> Tuple[np.ndarray, np.ndarray]:
+    levels = levels[levels[:, 1] > 0]
+    order = np.argsort(-levels[:, 0] if descending else levels[:, 0], kind='stable')
+    return levels[order, 0], levels[order, 1]
+
+
+def _merge(prices: np.ndarray, sizes: np.ndarray, updates: np.ndarray,
+           descending: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Наложение delta-уровней: объем 0 удаляет уровень, иначе заменяет или добавляет"""
+    if len(updates) == 0:
+        return prices, sizes
+    keep = ~np.isin(prices, updates[:, 0])
+    added = updates[updates[:, 1] > 0]
+    prices = np.concatenate((prices[keep], added[:, 0]))
+    sizes = np.concatenate((sizes[keep], added[:, 1]))
+    order = np.argsort(-prices if descending else prices, kind='stable')
+    return prices[order], sizes[order]
+
+
+def _gone(old_prices: np.ndarray, old_sizes: np.ndarray, new_prices: np.ndarray,
+          threshold: float) -> np.ndarray:
+    """Маска крупных уровней из первых FEATURE_LEVELS, которых нет среди new_prices"""
+    old_prices, old_sizes = old_prices[:FEATURE_LEVELS], old_sizes[:FEATURE_LEVELS]
+    return (old_sizes > threshold) & ~np.isin(old_prices, new_prices)
+
+
+def disappeared_levels(prev: 'L2Book', curr: 'L2Book') -> List[Dict[str, Any]]:
+    """Крупные уровни prev, исчезнувшие к curr (сравнение двух снимков)"""
+    threshold = sum(prev.volumes()) * LARGE_LEVEL_SHARE
+    if threshold <= 0:
+        return []
+    result = []
+    for side, prices, sizes, new_prices in (
+            ('bid', prev.bid_prices, prev.bid_sizes, curr.bid_prices),
+            ('ask', prev.ask_prices, prev.ask_sizes, curr.ask_prices)):
+        mask = _gone(prices, sizes, new_prices, threshold)
+        result.extend({'side': side, 'price': float(p), 'volume': float(s)}
+                      for p, s in zip(prices[:FEATURE_LEVELS][mask], sizes[:FEATURE_LEVELS][mask]))
+    return result
+
+
+class L2Book:
+    """Стакан одного символа"""
+
+    def __init__(self, symbol: str, depth: int = DEFAULT_DEPTH, history_size: int = HISTORY_SIZE):
+        self.symbol = symbol
+        self.depth = depth
+        self.bid_prices = _EMPTY
+        self.bid_sizes = _EMPTY
+        self.ask_prices = _EMPTY
+        self.ask_sizes = _EMPTY
+        self.seq = 0
+        self.streaming = False  # True - поддерживается delta-сообщениями WebSocket
+        self.updated_at = 0.0
+        self.updates = 0
+
+        # (время, сторона, цена, объем) исчезнувших крупных уровней
+        self.disappeared: deque = deque(maxlen=DISAPPEARED_MAXLEN)
+
+        self._history = np.zeros((history_size, 4), dtype=np.float64)
+        self._history_len = 0
+        self._history_pos = 0
+
+    @classmethod
+    def from_levels(cls, symbol: str, bids, asks, timestamp: Optional[float] = None) -> 'L2Book':
+        """Стакан из списков уровней (REST-ответ)"""
+        bids, asks = _as_levels(bids), _as_levels(asks)
+        return cls.from_arrays(symbol, bids[:, 0], bids[:, 1], asks[:, 0], asks[:, 1], timestamp)
+
+    @classmethod
+    def from_arrays(cls, symbol: str, bid_prices: np.ndarray, bid_sizes: np.ndarray,
+                    ask_prices: np.ndarray, ask_sizes: np.ndarray,
+                    timestamp: Optional[float] = None) -> 'L2Book':
+        """Стакан из массивов уровней (сохраненный снимок, см. orderbook_codec.snapshot_arrays)"""
+        book = cls(symbol, depth=max(len(bid_prices), len(ask_prices), 1), history_size=1)
+        book._update(
+            _sorted(np.column_stack((bid_prices, bid_sizes)), True),
+            _sorted(np.column_stack((ask_prices, ask_sizes)), False),
+            timestamp
+        )
+        return book
+
+    # === Обновление ===
+
+    def load(self, bids, asks, seq: int = 0, streaming: bool = False, timestamp: Optional[float] = None):
+        """Полный снимок стакана"""
+        self._update(_sorted(_as_levels(bids), True), _sorted(_as_levels(asks), False), timestamp)
+        self.seq = seq
+        self.streaming = streaming
+
+    def apply_delta(self, bids, asks, seq: int, timestamp: Optional[float] = None):
+        self._update(
+            _merge(self.bid_prices, self.bid_sizes, _as_levels(bids), True),
+            _merge(self.ask_prices, self.ask_sizes, _as_levels(asks), False),
+            timestamp
+        )
+        self.seq = seq
+
+    def _update(self, bids: Tuple[np.ndarray, np.ndarray], asks: Tuple[np.ndarray, np.ndarray],
+                timestamp: Optional[float]):
+        now = timestamp or time.time()
+        bid_prices, bid_sizes = bids[0][:self.depth], bids[1][:self.depth]
+        ask_prices, ask_sizes = asks[0][:self.depth], asks[1][:self.depth]
+
+        ofi = 0.0
+        if self.updates:
+            ofi = self._best_level_ofi(bid_prices, bid_sizes, ask_prices, ask_sizes)
+            self._track_disappeared(now, bid_prices, ask_prices)
+
+        self.bid_prices, self.bid_sizes = bid_prices, bid_sizes
+        self.ask_prices, self.ask_sizes = ask_prices, ask_sizes
+        self.updated_at = now
+        self.updates += 1
+        self._record_history(now, ofi)
+
+    def _best_level_ofi(self, bid_prices, bid_sizes, ask_prices, ask_sizes) -> float:
+        """Вклад обновления в OFI лучших уровней: рост спроса минус рост предложения"""
+        if not (len(self.bid_prices) and len(self.ask_prices) and len(bid_prices) and len(ask_prices)):
+            return 0.0
+        old_bid, old_bid_size = self.bid_prices[0], self.bid_sizes[0]
+        old_ask, old_ask_size = self.ask_prices[0], self.ask_sizes[0]
+        new_bid, new_bid_size = bid_prices[0], bid_sizes[0]
+        new_ask, new_ask_size = ask_prices[0], ask_sizes[0]
+        return float(
+            (new_bid_size if new_bid >= old_bid else 0.0)
+            - (old_bid_size if new_bid <= old_bid else 0.0)
+            - (new_ask_size if new_ask <= old_ask else 0.0)
+            + (old_ask_size if new_ask >= old_ask else 0.0)
+        )
+
+    def _track_disappeared(self, now: float, bid_prices: np.ndarray, ask_prices: np.ndarray):
+        threshold = sum(self.volumes()) * LARGE_LEVEL_SHARE
+        if threshold <= 0:
+            return
+        for side, prices, sizes, new_prices in (
+                ('bid', self.bid_prices, self.bid_sizes, bid_prices),
+                ('ask', self.ask_prices, self.ask_sizes, ask_prices)):
+            mask = _gone(prices, sizes, new_prices, threshold)
+            if mask.any():
+                for price, size in zip(prices[:FEATURE_LEVELS][mask], sizes[:FEATURE_LEVELS][mask]):
+                    self.disappeared.append((now, side, float(price), float(size)))
+
+    def _record_history(self, now: float, ofi: float):
+        bid_volume, ask_volume = self.volumes()
+        size = len(self._history)
+        last = (self._history_pos - 1) % size
+        if self._history_len and now - self._history[last, 0] < HISTORY_STEP:
+            row = self._history[last]
+            row[1], row[2] = bid_volume, ask_volume
+            row[3] += ofi
+            return
+        self._history[self._history_pos] = (now, bid_volume, ask_volume, ofi)
+        self._history_pos = (self._history_pos + 1) % size
+        self._history_len = min(self._history_len + 1, size)
+
+    # === Признаки микроструктуры ===
+
+    @property
+    def best_bid(self) -> float:
+        return float(self.bid_prices[0]) if len(self.bid_prices) else 0.0
+
+    @property
+    def best_ask(self) -> float:
+        return float(self.ask_prices[0]) if len(self.ask_prices) else 0.0
+
+    @property
+    def spread(self) -> float:
+        return self.best_ask - self.best_bid if self.best_bid and self.best_ask else 0.0
+
+    @property
+    def mid_price(self) -> float:
+        return (self.best_bid + self.best_ask) / 2 if self.best_bid and self.best_ask else 0.0
+
+    def is_ready(self) -> bool:
+        return bool(len(self.bid_prices) and len(self.ask_prices))
+
+    def age(self) -> float:
+        """Секунд с последнего обновления"""
+        return time.time() - self.updated_at if self.updated_at else float('inf')
+
+    def volumes(self, levels: Optional[int] = None) -> Tuple[float, float]:
+        """Суммарный объем (bids, asks) на первых levels уровнях (None - весь стакан)"""
+        return float(self.bid_sizes[:levels].sum()), float(self.ask_sizes[:levels].sum())
+
+    def imbalance(self, levels: Optional[int] = None) -> float:
+        bid_volume, ask_volume = self.volumes(levels)
+        total = bid_volume + ask_volume
+        return (bid_volume - ask_volume) / total if total > 0 else 0.0
+
+    def depth_ofi(self, levels: int = FEATURE_LEVELS) -> float:
+        """OFI по глубине: (объем bids - объем asks) * (VWAP asks - VWAP bids) на levels уровнях"""
+        bid_volume, ask_volume = self.volumes(levels)
+        if bid_volume <= 0 or ask_volume <= 0:
+            return 0.0
+        weighted_bid = float(np.dot(self.bid_prices[:levels], self.bid_sizes[:levels])) / bid_volume
+        weighted_ask = float(np.dot(self.ask_prices[:levels], self.ask_sizes[:levels])) / ask_volume
+        return (bid_volume - ask_volume) * (weighted_ask - weighted_bid)
+
+    def history(self, seconds: Optional[float] = None) -> np.ndarray:
+        """Строки (время, объем bids, объем asks, OFI лучших уровней) по возрастанию времени"""
+        if self._history_len < len(self._history):
+            rows = self._history[:self._history_len]
+        else:
+            rows = np.roll(self._history, -self._history_pos, axis=0)
+        if seconds is not None:
+            rows = rows[rows[:, 0] >= self.updated_at - seconds]
+        return rows
+
+    def flow_ofi(self, seconds: float) -> float:
+        """Накопленный OFI лучших уровней за последние seconds секунд"""
+        return float(self.history(seconds)[:, 3].sum())
+
+    def walls(self, threshold_pct: float, levels: int = FEATURE_LEVELS) -> List[Dict[str, Any]]:
+        """Уровни, объем которых превышает threshold_pct процентов всего стакана (bids, затем asks)"""
+        total = sum(self.volumes())
+        if total <= 0:
+            return []
+        walls = []
+        for side, prices, sizes in (('bid', self.bid_prices, self.bid_sizes),
+                                    ('ask', self.ask_prices, self.ask_sizes)):
+            percentage = sizes[:levels] / total * 100
+            for level in np.flatnonzero(percentage > threshold_pct):
+                walls.append({
+                    'side': side,
+                    'price': float(prices[level]),
+                    'size': float(sizes[level]),
+                    'percentage': float(percentage[level]),
+                    'level': int(level) + 1,
+                })
+        return walls
+
+    def recent_disappeared(self, seconds: float) -> List[Dict[str, Any]]:
+        """Крупные уровни, исчезнувшие за последние seconds секунд"""
+        since = self.updated_at - seconds
+        return [{'side': side, 'price': price, 'volume': size, 'time': ts}
+                for ts, side, price, size in self.disappeared if ts >= since]
+
+    # === Экспорт ===
+
+    def levels(self, limit: Optional[int] = None) -> Tuple[List[List[float]], List[List[float]]]:
+        """Уровни в формате CCXT: ([[price, size], ...] bids, [[price, size], ...] asks)"""
+        return (np.column_stack((self.bid_prices[:limit], self.bid_sizes[:limit])).tolist(),
+                np.column_stack((self.ask_prices[:limit], self.ask_sizes[:limit])).tolist())
+
+    def to_ccxt(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        bids, asks = self.levels(limit)
+        return {'symbol': self.symbol, 'bids': bids, 'asks': asks, 'timestamp': int(self.updated_at * 1000)}
+
+    def snapshot_row(self) -> Dict[str, Any]:
+        """Данные для записи OrderBookSnapshot"""
+        bid_volume, ask_volume = self.volumes()
+        return {
+            'symbol': self.symbol,
+            'timestamp': datetime.utcfromtimestamp(self.updated_at),
+            'book_data': encode_book(self.bid_prices, self.bid_sizes, self.ask_prices, self.ask_sizes),
+            'bid_volume': bid_volume,
+            'ask_volume': ask_volume,
+            'spread': self.spread,
+            'mid_price': self.mid_price,
+            'imbalance': self.imbalance(),
+            'ofi': self.depth_ofi(),
+        }
+
+
+class OrderBookEngine:
+    """
+    Стаканы всех символов и рассылка обновлений слушателям.
+
+    Работает в event loop бота: BybitMarketStream передает сюда сообщения
+    из потока WebSocket через call_soon_threadsafe.
+    """
+
+    def __init__(self, depth: int = DEFAULT_DEPTH):
+        self.depth = depth
+        self.books: Dict[str, L2Book] = {}
+        self._listeners: Dict[str, Callable[[L2Book], None]] = {}
+
+        self.updates = 0
+        self.dropped = 0
+        self.listener_errors = 0
+
+    def book(self, symbol: str) -> Optional[L2Book]:
+        book = self.books.get(symbol)
+        return book if book is not None and book.is_ready() else None
+
+    def _get_or_create(self, symbol: str) -> L2Book:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = L2Book(symbol, self.depth)
+        return book
+
+    def apply(self, symbol: str, msg_type: Optional[str], data: Dict[str, Any],
+              timestamp: Optional[float] = None) -> Optional[L2Book]:
+        """
+        Сообщение orderbook.{depth}.{symbol} Bybit.
+
+        Returns:
+            Обновленный стакан или None, если delta пропущена
+            (нет снимка, устаревший seq)
+        """
+        seq = int(data.get('u', 0))
+        book = self.books.get(symbol)
+        # u == 1 - биржа присылает полный снимок после рестарта сервиса
+        if msg_type == 'snapshot' or seq == 1:
+            book = self._get_or_create(symbol)
+            book.load(data.get('b'), data.get('a'), seq=seq, streaming=True, timestamp=timestamp)
+        elif book is None or not book.streaming or seq <= book.seq:
+            self.dropped += 1
+            return None
+        else:
+            book.apply_delta(data.get('b'), data.get('a'), seq, timestamp)
+
+        self.updates += 1
+        self._notify(book)
+        return book
+
+    def load_snapshot(self, symbol: str, bids, asks) -> L2Book:
+        """
+        Полный стакан из REST (запасной режим без WebSocket).
+        Delta-сообщения к такому стакану не применяются до следующего snapshot из потока.
+        """
+        book = self._get_or_create(symbol)
+        book.load(bids, asks)
+        self._notify(book)
+        return book
+
+    # === Слушатели ===
+
+    def add_listener(self, name: str, callback: Callable[[L2Book], None]):
+        """Регистрация слушателя (повторная регистрация с тем же именем заменяет прежнего)"""
+        self._listeners[name] = callback
+
+    def remove_listener(self, name: str):
+        self._listeners.pop(name, None)
+
+    def _notify(self, book: L2Book):
+        if not book.is_ready():
+            return
+        for name, callback in list(self._listeners.items()):
+            try:
+                callback(book)
+            except Exception as e:
+                self.listener_errors += 1
+                logger.error(f"❌ Ошибка слушателя стакана {name} ({book.symbol}): {e}")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'books': len(self.books),
+            'streaming': sum(1 for book in self.books.values() if book.streaming),
+            'updates': self.updates,
+            'dropped': self.dropped,
+            'listeners': list(self._listeners),
+            'listener_errors': self.listener_errors,
+        }
+
+
+# Глобальные стаканы, общие для потока данных, продюсера и стратегий
+order_book_engine = OrderBookEngine()
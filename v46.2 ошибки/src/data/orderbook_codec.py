@@ -0,0 +1,94 @@
+"""
+Компактное хранение уровней стакана (OrderBookSnapshot.book_data)
+Файл: src/data/orderbook_codec.py
+
+Формат BLOB (little-endian):
+- заголовок: b'OB', версия, десятичные знаки цены и объема, число bids и asks
+- тело (zlib): int64 с фиксированной точкой
+  цены bids и asks подряд в дельтах (первая - абсолютная, далее разница
+  с предыдущей: соседние уровни отличаются на несколько тиков),
+  затем объемы bids и asks
+
+Декодер возвращает массивы NumPy без промежуточных списков Python.
+Строки старого формата (JSON-массивы пар строк) читаются тем же
+snapshot_arrays() и конвертируются orderbook_migration.py.
+"""
+import json
+import struct
+import zlib
+from typing import Any, Tuple
+
+import numpy as np
+
+MAGIC = b'OB'
+VERSION = 1
+MAX_DECIMALS = 12
+
+_HEADER = struct.Struct('<2sBbbHH')
+_INT64_LIMIT = 2.0 ** 62
+
+# (цены bids, объемы bids, цены asks, объемы asks)
+BookArrays = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+_EMPTY = np.empty(0, dtype=np.float64)
+
+
+def _decimals(values: np.ndarray) -> int:
+    """Минимальное число десятичных знаков, при котором значения - целые"""
+    if not len(values):
+        return 0
+    magnitude = float(np.abs(values).max())
+    for decimals in range(MAX_DECIMALS + 1):
+        scaled = values * 10.0 ** decimals
+        if np.all(np.abs(scaled - np.rint(scaled)) <= 1e-6):
+            return decimals
+        if magnitude * 10.0 ** (decimals + 1) >= _INT64_LIMIT:
+            return decimals
+    return MAX_DECIMALS
+
+
+def encode_book(bid_prices, bid_sizes, ask_prices, ask_sizes) -> bytes:
+    """Уровни стакана -> BLOB"""
+    bid_prices, bid_sizes, ask_prices, ask_sizes = (
+        np.asarray(a, dtype=np.float64) for a in (bid_prices, bid_sizes, ask_prices, ask_sizes)
+    )
+    prices = np.concatenate((bid_prices, ask_prices))
+    sizes = np.concatenate((bid_sizes, ask_sizes))
+    price_decimals, size_decimals = _decimals(prices), _decimals(sizes)
+
+    fixed_prices = np.rint(prices * 10.0 ** price_decimals).astype(np.int64)
+    fixed_sizes = np.rint(sizes * 10.0 ** size_decimals).astype(np.int64)
+    body = np.concatenate((np.diff(fixed_prices, prepend=np.int64(0)), fixed_sizes)).astype('<i8')
+
+    header = _HEADER.pack(MAGIC, VERSION, price_decimals, size_decimals, len(bid_prices), len(ask_prices))
+    return header + zlib.compress(body.tobytes())
+
+
+def decode_book(blob: bytes) -> BookArrays:
+    """BLOB -> (цены bids, объемы bids, цены asks, объемы asks)"""
+    magic, version, price_decimals, size_decimals, n_bids, n_asks = _HEADER.unpack_from(blob)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Неизвестный формат стакана: {magic!r} v{version}")
+
+    body = np.frombuffer(zlib.decompress(blob[_HEADER.size:]), dtype='<i8')
+    total = n_bids + n_asks
+    prices = np.cumsum(body[:total]) / 10.0 ** price_decimals
+    sizes = body[total:2 * total] / 10.0 ** size_decimals
+    return prices[:n_bids], sizes[:n_bids], prices[n_bids:], sizes[n_bids:]
+
+
+def _json_side(value) -> Tuple[np.ndarray, np.ndarray]:
+    if isinstance(value, (str, bytes)):
+        value = json.loads(value)
+    if not value:
+        return _EMPTY, _EMPTY
+    levels = np.asarray(value, dtype=np.float64).reshape(len(value), -1)
+    return levels[:, 0], levels[:, 1]
+
+
+def snapshot_arrays(snapshot: Any) -> BookArrays:
+    """Уровни строки OrderBookSnapshot: из book_data, для старых строк - из JSON bids/asks"""
+    blob = getattr(snapshot, 'book_data', None)
+    if blob:
+        return decode_book(blob)
+    return (*_json_side(snapshot.bids), *_json_side(snapshot.asks))
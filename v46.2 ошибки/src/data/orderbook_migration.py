@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Перевод OrderBookSnapshot на компактный формат уровней
+Файл: src/data/orderbook_migration.py
+
+    python -m src.data.orderbook_migration [--batch-size 1000] [--keep-json] [--optimize]
+
+1. Добавляет столбец book_data и снимает NOT NULL с bids/asks (MySQL, PostgreSQL;
+   в SQLite, где ALTER COLUMN нет, таблица пересоздается с копированием строк)
+2. Пачками по id переводит JSON-уровни старых строк в book_data
+   и очищает bids/asks (--keep-json оставляет их)
+3. --optimize возвращает освободившееся место (OPTIMIZE TABLE / VACUUM)
+
+Запуск можно прервать и повторить: конвертируются только строки без book_data.
+"""
+import argparse
+import logging
+from typing import Dict, List
+
+from sqlalchemy import LargeBinary, MetaData, bindparam, inspect, null, select, text, update
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from ..core.database import engine
+from ..core.models import OrderBookSnapshot
+from .orderbook_codec import encode_book, snapshot_arrays
+
+logger = logging.getLogger(__name__)
+
+TABLE = OrderBookSnapshot.__table__
+DEFAULT_BATCH_SIZE = 1000
+
+
+def ensure_schema(engine) -> List[str]:
+    """DDL под новый формат. Возвращает выполненные команды"""
+    columns = {column['name']: column for column in inspect(engine).get_columns(TABLE.name)}
+    dialect = engine.dialect.name
+    statements = []
+
+    if 'book_data' not in columns:
+        blob_type = LargeBinary().compile(dialect=engine.dialect)
+        statements.append(f"ALTER TABLE {TABLE.name} ADD COLUMN book_data {blob_type}")
+
+    rebuild = False
+    for name in ('bids', 'asks'):
+        if columns[name]['nullable']:
+            continue
+        if dialect == 'mysql':
+            statements.append(f"ALTER TABLE {TABLE.name} MODIFY {name} JSON NULL")
+        elif dialect == 'postgresql':
+            statements.append(f"ALTER TABLE {TABLE.name} ALTER COLUMN {name} DROP NOT NULL")
+        elif dialect == 'sqlite':
+            rebuild = True
+        else:
+            logger.warning(f"⚠️ {dialect}: NOT NULL со столбца {name} не снимается, JSON-уровни будут сохранены")
+
+    if rebuild:
+        # book_data новая таблица получает из модели, поэтому ADD COLUMN не нужен
+        statements = _sqlite_rebuild_statements(engine, columns)
+
+    with engine.begin() as conn:
+        for statement in statements:
+            logger.info(f"🔧 {statement}")
+            conn.execute(text(statement))
+    return statements
+
+
+def _sqlite_rebuild_statements(engine, columns: Dict[str, dict]) -> List[str]:
+    """
+    Пересоздание таблицы в SQLite по текущей модели (ALTER COLUMN там нет):
+    новая таблица, копирование общих столбцов, замена старой, индексы.
+    Выполняется в одной транзакции вместе с остальным DDL.
+    """
+    new_name = f"{TABLE.name}_new"
+    new_table = TABLE.to_metadata(MetaData(), name=new_name)
+    new_table.indexes.clear()
+
+    common = [column.name for column in TABLE.columns if column.name in columns]
+    dropped = sorted(set(columns) - set(common))
+    if dropped:
+        logger.warning(f"⚠️ Столбцов {dropped} нет в модели, при пересоздании таблицы они будут удалены")
+    column_list = ', '.join(common)
+
+    statements = [
+        f"DROP TABLE IF EXISTS {new_name}",
+        str(CreateTable(new_table).compile(dialect=engine.dialect)).strip(),
+        f"INSERT INTO {new_name} ({column_list}) SELECT {column_list} FROM {TABLE.name}",
+        f"DROP TABLE {TABLE.name}",
+        f"ALTER TABLE {new_name} RENAME TO {TABLE.name}",
+    ]
+    statements.extend(str(CreateIndex(index).compile(dialect=engine.dialect)) for index in TABLE.indexes)
+    return statements
+
+
+def _json_nullable(engine) -> bool:
+    columns = {column['name']: column for column in inspect(engine).get_columns(TABLE.name)}
+    return columns['bids']['nullable'] and columns['asks']['nullable']
+
+
+def backfill(engine, batch_size: int = DEFAULT_BATCH_SIZE, keep_json: bool = False) -> Dict[str, int]:
+    """Конвертация строк без book_data пачками по возрастанию id"""
+    keep_json = keep_json or not _json_nullable(engine)
+    values = {'book_data': bindparam('blob')}
+    if not keep_json:
+        values.update(bids=null(), asks=null())
+    statement = update(TABLE).where(TABLE.c.id == bindparam('row_id')).values(**values)
+
+    stats = {'converted': 0, 'failed': 0, 'json_bytes': 0, 'blob_bytes': 0}
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(TABLE.c.id, TABLE.c.bids, TABLE.c.asks)
+                .where(TABLE.c.id > last_id, TABLE.c.book_data.is_(None), TABLE.c.bids.isnot(None))
+                .order_by(TABLE.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            params = []
+            for row in rows:
+                try:
+                    blob = encode_book(*snapshot_arrays(row))
+                except Exception as e:
+                    stats['failed'] += 1
+                    logger.warning(f"⚠️ Строка {row.id} не сконвертирована: {e}")
+                    continue
+                params.append({'row_id': row.id, 'blob': blob})
+                stats['json_bytes'] += len(str(row.bids)) + len(str(row.asks))
+                stats['blob_bytes'] += len(blob)
+
+            if params:
+                conn.execute(statement, params)
+            last_id = rows[-1].id
+
+        stats['converted'] += len(params)
+        logger.info(f"💾 Сконвертировано {stats['converted']} строк (id <= {last_id})")
+
+    return stats
+
+
+def optimize(engine):
+    """Возврат места, освободившегося после очистки JSON"""
+    commands = {
+        'mysql': f"OPTIMIZE TABLE {TABLE.name}",
+        'postgresql': f"VACUUM FULL {TABLE.name}",
+        'sqlite': "VACUUM",
+    }
+    command = commands.get(engine.dialect.name)
+    if command is None:
+        logger.warning(f"⚠️ Сжатие таблицы для {engine.dialect.name} не поддерживается")
+        return
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        logger.info(f"🔧 {command}")
+        conn.execute(text(command))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перевод OrderBookSnapshot на компактный формат уровней")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--keep-json', action='store_true', help="Не очищать bids/asks после конвертации")
+    parser.add_argument('--optimize', action='store_true', help="Сжать таблицу после конвертации")
+    args = parser.parse_args()
+
+    ensure_schema(engine)
+    stats = backfill(engine, batch_size=args.batch_size, keep_json=args.keep_json)
+    if stats['blob_bytes']:
+        logger.info(f"✅ Строк: {stats['converted']}, ошибок: {stats['failed']}, "
+                    f"JSON {stats['json_bytes']} байт -> {stats['blob_bytes']} байт "
+                    f"(x{stats['json_bytes'] / stats['blob_bytes']:.1f})")
+    else:
+        logger.info("✅ Строк для конвертации нет")
+    if args.optimize:
+        optimize(engine)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
@@ -0,0 +1,278 @@
+"""
+Признаки режима рынка для набора символов одним векторным проходом
+Файл: src/data/regime_features.py
+
+Используется SleepingGiantsStrategy. Показатель Хёрста, волатильность,
+отклонение от VWAP и OFI считаются сразу для всех символов по матрице
+цен (символы x свечи), собранной из candle_store:
+- Хёрст: матрица разностей x[t+lag] - x[t] по всем лагам и одна регрессия
+  log(tau) от log(lag) для всех символов
+- свечи символов, которых нет в candle_store, догружаются одним запросом
+  к candles (и остаются в candle_store для следующих проходов)
+- OFI - одним запросом к order_book_snapshots: только столбцы объемов
+  последних OFI_SNAPSHOTS снимков каждого символа (ROW_NUMBER по символу)
+- между проходами пересчитываются только символы, у которых появились
+  новые свечи, для остальных берутся готовые признаки
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+
+from ..core.models import Candle, OrderBookSnapshot
+from .candle_store import candle_store, interval_delta
+
+logger = logging.getLogger(__name__)
+
+FEATURE_COLUMNS = ('price', 'candles', 'last_candle', 'volatility', 'hurst', 'vwap_deviation')
+
+MIN_LAG = 2
+MAX_LAG = 100
+OFI_SNAPSHOTS = 10  # последних снимков стакана на символ
+HURST_CHUNK = 32  # символов на блок: матрица разностей занимает chunk x lags x window
+
+
+def _row_mean_std(values: np.ndarray, axis: int = -1):
+    """Среднее и std (ddof=0) по оси без учета NaN, без предупреждений на пустых строках"""
+    valid = np.isfinite(values)
+    count = valid.sum(axis=axis)
+    filled = np.where(valid, values, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum(axis=axis) / count
+        centered = np.where(valid, values - np.expand_dims(mean, axis), 0.0)
+        std = np.sqrt((centered ** 2).sum(axis=axis) / count)
+    return mean, std, count
+
+
+def _lag_std(prices: np.ndarray, lags: np.ndarray) -> np.ndarray:
+    """std(x[t+lag] - x[t]) для всех символов и лагов -> (символы, лаги)"""
+    n = prices.shape[1]
+    ahead = np.arange(n)[None, :] + lags[:, None]
+    diffs = prices[:, np.minimum(ahead, n - 1)] - prices[:, None, :]
+    diffs[:, ahead >= n] = np.nan
+    return _row_mean_std(diffs)[1]
+
+
+def hurst_exponents(prices: np.ndarray, min_lag: int = MIN_LAG, max_lag: int = MAX_LAG) -> np.ndarray:
+    """
+    Показатель Хёрста для каждой строки матрицы цен.
+
+    Строки выровнены по последней свече, недостающая история слева - NaN.
+    Как и для одиночного ряда, лаги ограничены половиной длины ряда,
+    при недостатке данных возвращается 0.5.
+
+    Args:
+        prices: Матрица (символы, свечи) или один ряд
+
+    Returns:
+        np.ndarray: H по символам
+    """
+    prices = np.atleast_2d(np.asarray(prices, dtype=np.float64))
+    result = np.full(prices.shape[0], 0.5)
+    max_lag = min(max_lag, prices.shape[1] // 2)
+    if max_lag <= min_lag:
+        return result
+
+    lags = np.arange(min_lag, max_lag)
+    tau = np.vstack([
+        np.sqrt(_lag_std(prices[i:i + HURST_CHUNK], lags))
+        for i in range(0, prices.shape[0], HURST_CHUNK)
+    ])
+
+    # Взвешенная регрессия сразу для всех строк: вес 0 у лагов вне ряда символа
+    lengths = np.isfinite(prices).sum(axis=1)
+    usable = (lags[None, :] < (lengths // 2)[:, None]) & np.isfinite(tau) & (tau > 0)
+    weights = usable.astype(np.float64)
+    x = np.broadcast_to(np.log(lags), tau.shape)
+    y = np.log(np.where(usable, tau, 1.0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        count = weights.sum(axis=1)
+        x_mean = (weights * x).sum(axis=1) / count
+        y_mean = (weights * y).sum(axis=1) / count
+        dx = x - x_mean[:, None]
+        slope = (weights * dx * (y - y_mean[:, None])).sum(axis=1) / (weights * dx ** 2).sum(axis=1)
+
+    ok = (count >= 2) & np.isfinite(slope)
+    result[ok] = slope[ok] * 2.0
+    return result
+
+
+def annualized_volatility(closes: np.ndarray, periods_per_year: float) -> np.ndarray:
+    """Годовая волатильность лог-доходностей по строкам (inf, если доходностей меньше двух)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.diff(np.log(closes), axis=1)
+    _, std, count = _row_mean_std(returns)
+    return np.where(count >= 2, std * np.sqrt(periods_per_year), np.inf)
+
+
+def vwap_deviations(closes: np.ndarray, volumes: np.ndarray) -> np.ndarray:
+    """(последняя цена - VWAP) / VWAP по строкам, 0 при нулевом объеме"""
+    valid = np.isfinite(closes) & np.isfinite(volumes)
+    turnover = np.where(valid, closes * volumes, 0.0).sum(axis=1)
+    volume = np.where(valid, volumes, 0.0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = turnover / volume
+        deviation = (closes[:, -1] - vwap) / vwap
+    return np.where(np.isfinite(deviation), deviation, 0.0)
+
+
+class RegimeFeatureEngine:
+    """
+    Признаки режима для набора символов с инкрементальным обновлением.
+
+    compute() возвращает DataFrame по символам: price, candles, last_candle,
+    volatility, hurst, vwap_deviation, ofi. Пересчет идет только для
+    символов, у которых в candle_store изменилась последняя свеча.
+    """
+
+    def __init__(self, timeframe: str = '5m', lookback_hours: int = 24, vwap_hours: int = 6,
+                 min_lag: int = MIN_LAG, max_lag: int = MAX_LAG,
+                 ofi_snapshots: int = OFI_SNAPSHOTS, store=None):
+        self.timeframe = timeframe
+        self.lookback = timedelta(hours=lookback_hours)
+        self.min_lag = min_lag
+        self.max_lag = max_lag
+        self.ofi_snapshots = ofi_snapshots
+        self.store = store or candle_store
+
+        interval = interval_delta(timeframe)
+        self.window = max(int(self.lookback / interval), 2)
+        self.vwap_periods = max(int(timedelta(hours=vwap_hours) / interval), 1)
+        self.periods_per_year = timedelta(days=365) / interval
+
+        self._features = pd.DataFrame(columns=FEATURE_COLUMNS, dtype=np.float64)
+        self._versions: Dict[str, Optional[int]] = {}
+        self.stats = {'passes': 0, 'recomputed': 0, 'reused': 0, 'db_loaded': 0}
+
+    def compute(self, symbols: Iterable[str], db=None) -> pd.DataFrame:
+        """
+        Признаки для символов за один проход.
+
+        Args:
+            symbols: Символы
+            db: Сессия БД для догрузки свечей и OFI (без нее OFI = 0)
+        """
+        symbols = list(dict.fromkeys(symbols))
+        self.stats['passes'] += 1
+        if not symbols:
+            return pd.DataFrame(columns=FEATURE_COLUMNS + ('ofi',), dtype=np.float64)
+
+        if db is not None:
+            missing = [s for s in symbols if not self.store.has(s, self.timeframe)]
+            if missing:
+                self._load_candles(db, missing)
+
+        dirty = [
+            s for s in symbols
+            if s not in self._versions or self.store.last_timestamp(s, self.timeframe) != self._versions[s]
+        ]
+        if dirty:
+            self._recompute(dirty)
+        self.stats['recomputed'] += len(dirty)
+        self.stats['reused'] += len(symbols) - len(dirty)
+
+        features = self._features.reindex(symbols)
+        cutoff_ms = (datetime.utcnow() - self.lookback - datetime(1970, 1, 1)) / timedelta(milliseconds=1)
+        features.loc[~(features['last_candle'] >= cutoff_ms), 'volatility'] = np.inf
+
+        ofi = self._load_ofi(db, symbols) if db is not None else pd.Series(dtype=np.float64)
+        features['ofi'] = ofi.reindex(symbols).fillna(0.0).to_numpy()
+        return features
+
+    def _recompute(self, symbols: List[str]):
+        closes = np.full((len(symbols), self.window), np.nan)
+        volumes = np.full((len(symbols), self.window), np.nan)
+        last_candle = np.full(len(symbols), np.nan)
+        for i, symbol in enumerate(symbols):
+            view = self.store.view(symbol, self.timeframe, limit=self.window)
+            self._versions[symbol] = self.store.last_timestamp(symbol, self.timeframe)
+            if view is None:
+                continue
+            n = len(view['close'])
+            closes[i, self.window - n:] = view['close']
+            volumes[i, self.window - n:] = view['volume']
+            last_candle[i] = view['timestamp'][-1]
+
+        features = pd.DataFrame({
+            'price': closes[:, -1],
+            'candles': np.isfinite(closes).sum(axis=1),
+            'last_candle': last_candle,
+            'volatility': annualized_volatility(closes, self.periods_per_year),
+            'hurst': hurst_exponents(closes, self.min_lag, self.max_lag),
+            'vwap_deviation': vwap_deviations(closes[:, -self.vwap_periods:], volumes[:, -self.vwap_periods:]),
+        }, index=pd.Index(symbols, name='symbol'))
+
+        kept = self._features.drop(index=symbols, errors='ignore')
+        self._features = features if kept.empty else pd.concat([kept, features])
+
+    def _load_candles(self, db, symbols: List[str]):
+        """
+        Свечи символов без буфера - одним запросом в candle_store.
+        open_time в БД - наивное локальное время хоста, буфер хранит UTC мс.
+        """
+        try:
+            rows = db.query(
+                Candle.symbol, Candle.open_time, Candle.open, Candle.high,
+                Candle.low, Candle.close, Candle.volume
+            ).filter(
+                Candle.interval == self.timeframe,
+                Candle.symbol.in_(symbols),
+                Candle.open_time > datetime.now() - self.lookback
+            ).order_by(Candle.symbol, Candle.open_time).all()
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки свечей для признаков режима: {e}")
+            return
+
+        if not rows:
+            return
+        # datetime.timestamp() читает наивное время как локальное (pd.Timestamp - как UTC)
+        df = pd.DataFrame(
+            [(row[0], int(row[1].timestamp() * 1000)) + tuple(row[2:]) for row in rows],
+            columns=['symbol', 'timestamp', 'open', 'high', 'low', 'close', 'volume']
+        )
+        for symbol, group in df.groupby('symbol', sort=False):
+            self.store.extend_frame(symbol, self.timeframe, group)
+        self.stats['db_loaded'] += len(rows)
+
+    def _load_ofi(self, db, symbols: List[str]) -> pd.Series:
+        """Средний дисбаланс объемов последних ofi_snapshots снимков стакана по символам"""
+        try:
+            # Нумерация снимков внутри символа от нового к старому: из БД
+            # приходят только нужные строки, а не все снимки за lookback
+            ranked = db.query(
+                OrderBookSnapshot.symbol.label('symbol'),
+                OrderBookSnapshot.bid_volume.label('bid_volume'),
+                OrderBookSnapshot.ask_volume.label('ask_volume'),
+                func.row_number().over(
+                    partition_by=OrderBookSnapshot.symbol,
+                    order_by=OrderBookSnapshot.timestamp.desc()
+                ).label('rn')
+            ).filter(
+                OrderBookSnapshot.symbol.in_(symbols),
+                OrderBookSnapshot.timestamp > datetime.utcnow() - self.lookback
+            ).subquery()
+            rows = db.query(
+                ranked.c.symbol, ranked.c.bid_volume, ranked.c.ask_volume
+            ).filter(ranked.c.rn <= self.ofi_snapshots).all()
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки OFI: {e}")
+            return pd.Series(dtype=np.float64)
+
+        if not rows:
+            return pd.Series(dtype=np.float64)
+        df = pd.DataFrame(rows, columns=['symbol', 'bid_volume', 'ask_volume'])
+        bids = df['bid_volume'].astype(np.float64)
+        asks = df['ask_volume'].astype(np.float64)
+        df['ofi'] = ((bids - asks) / (bids + asks)).replace([np.inf, -np.inf], np.nan)
+        return df.groupby('symbol')['ofi'].mean()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'symbols': len(self._features),
+            'window': self.window,
+            'timeframe': self.timeframe,
+        }
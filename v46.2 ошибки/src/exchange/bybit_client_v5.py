@@ -27,7 +27,8 @@ import random
 from typing import Optional, Dict, Any, List, Callable, Union
 from datetime import datetime
 from dataclasses import dataclass
-from collections import defaultdict, deque
+
+from .rate_limiter import RATE_LIMIT_RET_CODE, rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -39,61 +40,29 @@ except ImportError:
     logger.warning("⚠️ unified_config недоступен, используем переменные окружения")
     unified_config = None
     UNIFIED_CONFIG_AVAILABLE = False
-    
-    
-class BybitRateLimiter:
-    """Менеджер rate limit для Bybit API"""
-    
-    def __init__(self):
-        self.limits = {
-            'default': 10,
-            'klines': 10,
-            'orderbook': 10,
-            'trades': 10,
-            'balance': 20,
-            'positions': 20
-        }
-        self.request_windows = defaultdict(lambda: deque())
-        self.min_delay = 0.1
-        
-    async def wait_if_needed(self, endpoint_type: str = 'default'):
-        """Ожидание для соблюдения rate limit"""
-        try:
-            current_time = time.time()
-            window = self.request_windows[endpoint_type]
-            limit = self.limits.get(endpoint_type, 10)
-            
-            # Удаляем старые запросы
-            while window and current_time - window[0] > 1.0:
-                window.popleft()
-            
-            # Если достигли лимита, ждем
-            if len(window) >= limit:
-                sleep_time = 1.0 - (current_time - window[0]) + 0.1
-                if sleep_time > 0:
-                    await asyncio.sleep(sleep_time)
-            
-            # Базовая задержка
-            await asyncio.sleep(self.min_delay)
-            
-            # Записываем запрос
-            window.append(time.time())
-            
-        except Exception as e:
-            logger.error(f"Rate limit error: {e}")
-            await asyncio.sleep(0.2)
 
-# Глобальный rate limiter
-_rate_limiter = BybitRateLimiter()
+# Префикс пути REST API -> тип эндпоинта для общего лимитера
+ENDPOINT_TYPES = (
+    ('/v5/order/create', 'trade'),
+    ('/v5/order/amend', 'trade'),
+    ('/v5/order/cancel', 'trade'),
+    ('/v5/position/set-leverage', 'leverage'),
+    ('/v5/order/', 'order_status'),
+    ('/v5/position/', 'positions'),
+    ('/v5/account/', 'balance'),
+    ('/v5/market/kline', 'klines'),
+    ('/v5/market/orderbook', 'orderbook'),
+    ('/v5/market/tickers', 'ticker'),
+    ('/v5/market/recent-trade', 'trades'),
+)
+
 
-def rate_limited(endpoint_type: str = 'default'):
-    """Декоратор для rate limiting"""
-    def decorator(func):
-        async def wrapper(*args, **kwargs):
-            await _rate_limiter.wait_if_needed(endpoint_type)
-            return await func(*args, **kwargs)
-        return wrapper
-    return decorator
+def endpoint_type(endpoint: str) -> str:
+    """Тип эндпоинта по пути запроса"""
+    for prefix, kind in ENDPOINT_TYPES:
+        if endpoint.startswith(prefix):
+            return kind
+    return 'default'
 
 @dataclass
 class BybitCredentials:
@@ -118,6 +87,9 @@ class BybitAPIError(Exception):
         self.response = response
         super().__init__(self.message)
 
+# Топиков в одном сообщении подписки (ограничение Bybit для публичных каналов)
+SUBSCRIBE_BATCH_SIZE = 10
+
 class BybitWebSocketManager:
     """Менеджер WebSocket соединений - ПОЛНОСТЬЮ ИСПРАВЛЕННАЯ ВЕРСИЯ"""
     
@@ -144,6 +116,9 @@ class BybitWebSocketManager:
         self._connection_locks = {'public': threading.Lock(), 'private': threading.Lock()}
         self._connecting = {'public': False, 'private': False}
         
+        # Активные публичные подписки - восстанавливаются после переподключения
+        self.public_topics: List[str] = []
+        
         logger.info("✅ BybitWebSocketManager инициализирован")
 
     def connect_private(self, callback: Callable):
@@ -199,10 +174,10 @@ class BybitWebSocketManager:
                         # Подписываемся на каналы после успешной аутентификации
                         subscribe_msg = {
                             "op": "subscribe",
-                            "args": ["position", "order", "wallet"]
+                            "args": ["position", "order", "wallet", "execution"]
                         }
                         ws.send(json.dumps(subscribe_msg))
-                        logger.info("📡 Подписка на position, order, wallet")
+                        logger.info("📡 Подписка на position, order, wallet, execution")
                     
                     # Передаем сообщение в callback
                     if callback:
@@ -317,6 +292,10 @@ class BybitWebSocketManager:
                 logger.info("📡 Публичное WebSocket соединение открыто")
                 manager.ws_connected['public'] = True
                 manager.last_message_time['public'] = time.time()
+                manager.reconnect_attempts['public'] = 0
+                # После переподключения повторяем подписки
+                if manager.public_topics:
+                    manager._send_subscribe(ws, manager.public_topics)
             
             ws = websocket.WebSocketApp(
                 self.endpoints.ws_public + "/linear",
@@ -408,6 +387,35 @@ class BybitWebSocketManager:
             logger.error(f"❌ Ошибка подписки: {e}")
             return False
     
+    def subscribe_topics(self, topics: List[str], batch_size: int = SUBSCRIBE_BATCH_SIZE) -> bool:
+        """
+        Пакетная подписка на публичные топики ('kline.5.BTCUSDT', 'tickers.BTCUSDT', ...).
+
+        Топики запоминаются и повторно подписываются при переподключении.
+        """
+        new_topics = [topic for topic in topics if topic not in self.public_topics]
+        self.public_topics.extend(new_topics)
+        
+        ws = self.connections.get('public')
+        if not ws or not self.ws_connected.get('public'):
+            logger.warning(f"⚠️ Публичный WebSocket не подключен, {len(new_topics)} топиков будут подписаны при подключении")
+            return False
+        
+        return self._send_subscribe(ws, new_topics, batch_size)
+    
+    def _send_subscribe(self, ws, topics: List[str], batch_size: int = SUBSCRIBE_BATCH_SIZE) -> bool:
+        """Отправка подписки пачками по batch_size топиков в одном сообщении"""
+        try:
+            for start in range(0, len(topics), batch_size):
+                batch = topics[start:start + batch_size]
+                ws.send(json.dumps({"op": "subscribe", "args": batch}))
+            if topics:
+                logger.info(f"📡 Подписка на {len(topics)} публичных топиков")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетной подписки: {e}")
+            return False
+    
     def _schedule_reconnect(self, ws_type: str):
         """Планирование переподключения с учетом rate limiting"""
         attempts = self.reconnect_attempts.get(ws_type, 0)
@@ -591,7 +599,7 @@ class BybitClientV5:
                 'apiKey': self.credentials.api_key,
                 'secret': self.credentials.api_secret,
                 'sandbox': self.testnet,
-                'enableRateLimit': True,
+                'enableRateLimit': False,  # лимит - общий rate_limiter
                 'options': {
                     'defaultType': 'linear',
                     'recvWindow': self.credentials.recv_window,
@@ -623,7 +631,9 @@ class BybitClientV5:
 
     async def _make_request(self, method: str, endpoint: str, params: dict = None) -> dict:
         """Универсальный метод для HTTP запросов к API"""
+        kind = endpoint_type(endpoint)
         try:
+            await rate_limiter.acquire(kind)
             timestamp = str(int(time.time() * 1000))
             url = f"{self.endpoints.rest_base}{endpoint}"
             
@@ -642,6 +652,7 @@ class BybitClientV5:
                     
                     async with session.get(url, headers=headers) as response:
                         result = await response.json()
+                        self._update_rate_limit(kind, response.headers, result)
                         self._update_stats(result)
                         return result
                         
@@ -654,6 +665,7 @@ class BybitClientV5:
                     
                     async with session.request(method, url, headers=headers, data=json_body) as response:
                         result = await response.json()
+                        self._update_rate_limit(kind, response.headers, result)
                         self._update_stats(result)
                         return result
             
@@ -666,6 +678,13 @@ class BybitClientV5:
                 'result': None
             }
 
+    @staticmethod
+    def _update_rate_limit(kind: str, headers, result: dict):
+        """Передача остатка лимита из ответа в общий лимитер"""
+        rate_limiter.update_from_headers(kind, headers)
+        if isinstance(result, dict) and result.get('retCode') == RATE_LIMIT_RET_CODE:
+            rate_limiter.penalize(kind)
+
     def _generate_signature(self, timestamp: str, method: str, endpoint: str, params: str) -> str:
         """Генерация подписи для HTTP запросов"""
         param_str = f"{timestamp}{self.credentials.api_key}{self.credentials.recv_window}{params}"
@@ -708,7 +727,6 @@ class BybitClientV5:
 
     # ================== WALLET & ACCOUNT METHODS ==================
 
-    @rate_limited('balance')
     async def get_wallet_balance(self, account_type: str = "UNIFIED", coin: str = None) -> dict:
         """Получение баланса кошелька"""
         params = {"accountType": account_type}
@@ -724,7 +742,6 @@ class BybitClientV5:
         return response
         
     
-    @rate_limited('positions')
     async def get_positions(self, category: str = "linear", symbol: str = None, settleCoin: str = None) -> dict:
         """Получение позиций - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
         try:
@@ -923,7 +940,6 @@ class BybitClientV5:
             logger.error(f"❌ Ошибка получения market data для {symbol}: {e}")
             return None
 
-    @rate_limited('klines')
     async def get_klines(self, category: str, symbol: str, 
                         interval: str, limit: int = 200) -> dict:
         """Получение исторических данных (свечей) - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
@@ -1019,7 +1035,6 @@ class BybitClientV5:
                 'result': {'list': []}
             }
 
-    @rate_limited('orderbook')
     async def get_orderbook(self, category: str, symbol: str, 
                            limit: int = 25) -> dict:
         """Получение стакана ордеров"""
@@ -1040,7 +1055,6 @@ class BybitClientV5:
             }
         return {}
         
-    @rate_limited('trades')
     async def get_public_trading_records(self, category: str, symbol: str, 
                                         limit: int = 100) -> dict:
         """Получение информации о публичных сделках"""
@@ -1112,6 +1126,7 @@ class BybitClientV5:
             if not self.exchange:
                 raise BybitAPIError("Exchange не инициализирован")
             
+            await rate_limiter.acquire('balance')
             balance = await asyncio.to_thread(self.exchange.fetch_balance)
             return float(balance.get(coin, {}).get('free', 0))
             
@@ -141,30 +141,34 @@ class BybitWebSocketHandler:
             for position_data in data:
                 try:
                     symbol = position_data.get('symbol', '')
-                    size = float(position_data.get('size', 0))
+                    size = float(position_data.get('size') or 0)
+                    unrealized_pnl = float(position_data.get('unrealisedPnl') or 0)
+                    position_value = float(position_data.get('positionValue') or 0)
                     
-                    if size > 0:  # Только активные позиции
-                        position = PositionInfo(
-                            symbol=symbol,
-                            side=position_data.get('side', ''),
-                            size=size,
-                            entry_price=float(position_data.get('avgPrice', 0)),
-                            unrealized_pnl=float(position_data.get('unrealisedPnl', 0)),
-                            percentage=float(position_data.get('unrealisedPnl', 0)) / float(position_data.get('positionValue', 1)) * 100,
-                            leverage=float(position_data.get('leverage', 1))
-                        )
-                        
-                        # Обновляем кэш
+                    position = PositionInfo(
+                        symbol=symbol,
+                        side=position_data.get('side', ''),
+                        size=size,
+                        entry_price=float(position_data.get('avgPrice') or 0),
+                        unrealized_pnl=unrealized_pnl,
+                        percentage=unrealized_pnl / position_value * 100 if position_value else 0.0,
+                        leverage=float(position_data.get('leverage') or 1)
+                    )
+                    
+                    # Обновляем кэш: закрытая позиция (size 0) из него удаляется
+                    if size > 0:
                         self.integration_manager.cache['positions'][symbol] = position
-                        
                         logger.info(f"📊 Позиция обновлена: {symbol} {position.side} {position.size}")
-                        
-                        # Безопасный вызов callbacks
-                        for callback in self.callbacks.get('position', []):
-                            try:
-                                callback(position)
-                            except Exception as callback_error:
-                                logger.error(f"❌ Ошибка в position callback: {callback_error}")
+                    else:
+                        self.integration_manager.cache['positions'].pop(symbol, None)
+                        logger.info(f"📊 Позиция закрыта: {symbol}")
+                    
+                    # Безопасный вызов callbacks (в том числе для закрытой позиции)
+                    for callback in self.callbacks.get('position', []):
+                        try:
+                            callback(position)
+                        except Exception as callback_error:
+                            logger.error(f"❌ Ошибка в position callback: {callback_error}")
                                 
                 except (ValueError, TypeError) as e:
                     logger.error(f"❌ Ошибка парсинга данных позиции: {e}")
@@ -8,15 +8,24 @@ POSITION MANAGER - Управление торговыми позициями
 ✅ Трейлинг стопы для максимизации прибыли
 ✅ Экстренное закрытие при критических условиях
 ✅ Обновление PnL в реальном времени
+
+Позиции и открытые сделки держатся в памяти. При подключенном потоке
+Bybit (attach_stream) SL/TP, трейлинг и частичное закрытие проверяются
+на каждом тике цены, позиции и исполнения приходят из приватного
+WebSocket. REST-цикл остается сверкой раз в POSITION_RECONCILE_INTERVAL
+секунд (без потока - каждые check_interval). Изменения сделок копятся
+и записываются в БД одной транзакцией раз в POSITION_DB_FLUSH_INTERVAL.
 """
 import asyncio
-from typing import Dict, List, Optional, Tuple, Any
+import time
+from typing import Dict, List, Optional, Set, Tuple, Any
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 import logging
 
-from ..core.database import SessionLocal
+from ..core.async_database import run_db
 from ..core.models import Trade, TradeStatus, OrderSide
+from ..core.unified_config import unified_config as config
 from ..logging.smart_logger import get_logger
 try:
     from .unified_exchange import get_real_exchange_client
@@ -25,6 +34,14 @@ except ImportError:
 
 logger = get_logger(__name__)
 
+
+def _setting(name: str, default, cast=float):
+    try:
+        return cast(getattr(config, name, default) or default)
+    except (TypeError, ValueError):
+        return default
+
+
 @dataclass
 class PositionInfo:
     """Информация о позиции"""
@@ -41,6 +58,7 @@ class PositionInfo:
     trailing_distance: Optional[float] = None
     max_price: Optional[float] = None  # Для трейлинг стопа
     min_price: Optional[float] = None  # Для трейлинг стопа
+    leverage: float = 1.0
 
 @dataclass
 class TradeUpdate:
@@ -50,13 +68,14 @@ class TradeUpdate:
     exit_price: Optional[float] = None
     profit: Optional[float] = None
     exit_reason: Optional[str] = None
+    profit_percent: Optional[float] = None
 
 class PositionManager:
     """
     Менеджер торговых позиций
     
     🔥 АВТОМАТИЧЕСКОЕ УПРАВЛЕНИЕ ПОЗИЦИЯМИ:
-    1. Мониторинг открытых позиций каждые 30 секунд
+    1. Проверка позиций на каждом тике цены (или каждые 30 секунд без потока)
     2. Автоматический stop-loss/take-profit без участия человека
     3. Трейлинг стопы для увеличения прибыли
     4. Partial close логика для фиксации прибыли
@@ -68,19 +87,52 @@ class PositionManager:
         Инициализация менеджера позиций
         
         Args:
-            check_interval: Интервал проверки позиций в секундах
+            check_interval: Интервал проверки позиций в секундах (без WebSocket потока)
         """
         self.exchange = get_real_exchange_client()
         self.check_interval = check_interval
+        self.reconcile_interval = _setting('POSITION_RECONCILE_INTERVAL', 300)
+        self.db_flush_interval = _setting('POSITION_DB_FLUSH_INTERVAL', 2.0)
+        self.price_max_age = _setting('POSITION_PRICE_MAX_AGE', 15.0)
         self.is_running = False
         self.positions: Dict[str, PositionInfo] = {}
         self.active_trades: Dict[int, Trade] = {}
+        self.trades_by_symbol: Dict[str, Trade] = {}
         
         # Настройки риск-менеджмента
         self.max_slippage_percent = 0.5  # Максимальное проскальзывание
         self.emergency_stop_drawdown = 0.15  # 15% просадка для экстренной остановки
         self.partial_close_profit_threshold = 0.05  # 5% прибыли для частичного закрытия
         
+        # Состояние потока
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ws_manager = None
+        self._stream_attached = False
+        self._ticker_topics: Set[str] = set()
+        self._prices: Dict[str, Tuple[float, float]] = {}  # symbol -> (цена, time.monotonic())
+        # symbol -> (цена, время исполнения в секундах epoch, сторона Buy/Sell)
+        self._last_fill: Dict[str, Tuple[float, float, str]] = {}
+        
+        # Защита от повторных действий, пока ордер в пути
+        self._closing: Set[str] = set()
+        self._close_requested: Dict[str, float] = {}  # symbol -> time.time() запроса закрытия
+        # После неудачного закрытия повтор не раньше дедлайна (экспоненциальная пауза)
+        self._close_retry_at: Dict[str, float] = {}  # symbol -> time.monotonic()
+        self._close_failures: Dict[str, int] = {}
+        self.close_retry_max_delay = _setting('POSITION_CLOSE_RETRY_MAX_DELAY', 300.0)
+        self._partial_closed: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._trades_loading = False
+        
+        # Отложенная запись в БД: trade_id -> значения столбцов
+        self._pending_updates: Dict[int, Dict[str, Any]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        self.stats = {
+            'ticks': 0, 'evaluations': 0, 'position_events': 0, 'executions': 0,
+            'reconciles': 0, 'db_flushes': 0, 'db_rows': 0
+        }
+        
         logger.info(
             "Position Manager инициализирован",
             category='position',
@@ -94,16 +146,20 @@ class PositionManager:
             return
         
         self.is_running = True
+        self._loop = asyncio.get_running_loop()
+        self._flush_task = asyncio.create_task(self._flush_loop())
         
         logger.info(
             "🔄 Запуск мониторинга позиций",
-            category='position'
+            category='position',
+            stream=self._stream_attached
         )
         
         while self.is_running:
             try:
                 await self._monitoring_cycle()
-                await asyncio.sleep(self.check_interval)
+                # С потоком REST нужен только для сверки
+                await asyncio.sleep(self.reconcile_interval if self._stream_attached else self.check_interval)
                 
             except Exception as e:
                 logger.error(
@@ -115,32 +171,374 @@ class PositionManager:
     def stop_monitoring(self):
         """Остановка мониторинга"""
         self.is_running = False
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        # Несохраненные изменения записываем сразу
+        if self._pending_updates and self._loop and self._loop.is_running():
+            self._spawn(self._flush_updates())
         logger.info("⏹️ Мониторинг позиций остановлен", category='position')
     
+    # =================================================================
+    # WEBSOCKET ПОТОК
+    # =================================================================
+    
+    def attach_stream(self, ws_handler, ws_manager=None) -> bool:
+        """
+        Подключение к потокам BybitWebSocketHandler.
+        
+        Args:
+            ws_handler: BybitWebSocketHandler (callbacks position/execution/ticker)
+            ws_manager: WebSocket менеджер V5 клиента для подписки на тикеры позиций
+        """
+        if self._stream_attached:
+            return True
+        try:
+            self._loop = self._loop or asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        
+        ws_handler.add_callback('position', self._threadsafe(self._on_position_event))
+        ws_handler.add_callback('execution', self._threadsafe(self._on_execution))
+        ws_handler.add_callback('ticker', self._threadsafe(self._on_ticker))
+        self._ws_manager = ws_manager
+        self._stream_attached = True
+        self._subscribe_tickers(list(self.positions))
+        
+        logger.info("📡 Position Manager подключен к потокам позиций, исполнений и тикеров", category='position')
+        return True
+    
+    def _threadsafe(self, handler):
+        """Callback WebSocket (поток клиента) -> вызов handler в event loop бота"""
+        def callback(payload):
+            loop = self._loop
+            if loop is None or loop.is_closed():
+                return
+            loop.call_soon_threadsafe(self._dispatch, handler, payload)
+        return callback
+    
+    def _dispatch(self, handler, payload):
+        try:
+            handler(payload)
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки события позиции: {e}", category='position')
+    
+    def _subscribe_tickers(self, symbols: List[str]):
+        if not self._ws_manager or not hasattr(self._ws_manager, 'subscribe_topics'):
+            return
+        topics = [f"tickers.{symbol}" for symbol in symbols if f"tickers.{symbol}" not in self._ticker_topics]
+        if topics:
+            self._ticker_topics.update(topics)
+            self._ws_manager.subscribe_topics(topics)
+    
+    def _on_ticker(self, data):
+        """Тикер из публичного потока: dict или список dict"""
+        for ticker in (data if isinstance(data, list) else [data]):
+            price = ticker.get('lastPrice') if isinstance(ticker, dict) else None
+            if price:
+                self._on_price(ticker.get('symbol'), float(price))
+    
+    def _on_execution(self, execution: dict):
+        """Исполнение из приватного потока: цена последней сделки по символу"""
+        self.stats['executions'] += 1
+        symbol = execution.get('symbol')
+        price = float(execution.get('execPrice') or 0)
+        if symbol and price > 0:
+            try:
+                exec_time = float(execution.get('execTime') or 0) / 1000
+            except (TypeError, ValueError):
+                exec_time = 0.0
+            self._last_fill[symbol] = (price, exec_time or time.time(), str(execution.get('side') or ''))
+            self._on_price(symbol, price)
+    
+    def _exit_price(self, symbol: str, position: PositionInfo) -> float:
+        """
+        Цена выхода: исполнение закрывающей стороны после запроса закрытия,
+        иначе текущая цена (исполнение закрытия могло еще не прийти)
+        """
+        fill = self._last_fill.get(symbol)
+        if fill is None:
+            return position.current_price
+        price, exec_time, side = fill
+        closing_side = 'sell' if position.side == 'long' else 'buy'
+        if side and side.lower() != closing_side:
+            return position.current_price
+        requested = self._close_requested.get(symbol)
+        if requested is not None and exec_time < requested:
+            return position.current_price
+        return price
+    
+    def _on_position_event(self, position):
+        """Позиция из приватного потока (bybit_integration.PositionInfo)"""
+        self.stats['position_events'] += 1
+        symbol = position.symbol
+        
+        if position.size <= 0:
+            # Позиция закрыта на бирже: стоп биржи, ликвидация, ручное закрытие
+            if symbol in self.positions and symbol not in self._closing:
+                existing = self.positions[symbol]
+                self._finalize_close(symbol, "Exchange Close", self._exit_price(symbol, existing))
+            return
+        
+        side = 'long' if str(position.side).lower() in ('buy', 'long') else 'short'
+        existing = self.positions.get(symbol)
+        if existing is None:
+            existing = PositionInfo(
+                symbol=symbol,
+                side=side,
+                size=position.size,
+                entry_price=position.entry_price,
+                current_price=self._fresh_price(symbol) or position.entry_price,
+                unrealized_pnl=position.unrealized_pnl,
+                unrealized_pnl_percent=position.percentage
+            )
+            self.positions[symbol] = existing
+            self._last_fill.pop(symbol, None)
+            self._subscribe_tickers([symbol])
+        else:
+            existing.side = side
+            existing.size = position.size
+            existing.entry_price = position.entry_price
+        existing.leverage = float(getattr(position, 'leverage', 1) or 1)
+        
+        trade = self.trades_by_symbol.get(symbol)
+        if trade is None:
+            # Сделка открыта после последней загрузки из БД
+            self._spawn(self._load_active_trades())
+            return
+        self._apply_trade_levels(existing, trade)
+        self._apply_price(existing, existing.current_price)
+        self._evaluate(symbol)
+    
+    def _on_price(self, symbol: Optional[str], price: float):
+        """Тик цены: пересчет PnL и проверка правил позиции"""
+        if not symbol:
+            return
+        self._prices[symbol] = (price, time.monotonic())
+        position = self.positions.get(symbol)
+        if position is None:
+            return
+        self.stats['ticks'] += 1
+        self._apply_price(position, price)
+        self._evaluate(symbol)
+    
+    def _fresh_price(self, symbol: str) -> Optional[float]:
+        cached = self._prices.get(symbol)
+        if cached and time.monotonic() - cached[1] <= self.price_max_age:
+            return cached[0]
+        return None
+    
+    # =================================================================
+    # ПРАВИЛА ПОЗИЦИИ
+    # =================================================================
+    
+    def _apply_price(self, position: PositionInfo, price: float):
+        position.current_price = price
+        direction = 1 if position.side == 'long' else -1
+        position.unrealized_pnl = (price - position.entry_price) * position.size * direction
+        if position.entry_price > 0:
+            # Как percentage биржи: доходность на маржу
+            position.unrealized_pnl_percent = (
+                (price / position.entry_price - 1) * direction * 100 * (position.leverage or 1)
+            )
+        
+        trade = self.trades_by_symbol.get(position.symbol)
+        if trade is not None:
+            trade.current_price = price
+            trade.unrealized_pnl = position.unrealized_pnl
+    
+    @staticmethod
+    def _apply_trade_levels(position: PositionInfo, trade: Trade):
+        position.stop_loss = trade.stop_loss
+        position.take_profit = trade.take_profit
+        position.trailing_stop = getattr(trade, 'trailing_stop', False) or False
+        position.trailing_distance = getattr(trade, 'trailing_distance', None)
+    
+    def _evaluate(self, symbol: str):
+        """SL/TP, трейлинг и частичное закрытие для одной позиции"""
+        position = self.positions.get(symbol)
+        if position is None or symbol in self._closing:
+            return
+        self.stats['evaluations'] += 1
+        
+        reason = self._exit_reason(position)
+        if reason:
+            if time.monotonic() < self._close_retry_at.get(symbol, 0):
+                return
+            self._closing.add(symbol)
+            self._spawn(self._close_with_reason(symbol, reason))
+            return
+        
+        trade = self.trades_by_symbol.get(symbol)
+        if trade is None:
+            return
+        self._update_trailing_stop(position, trade)
+        
+        if (position.unrealized_pnl_percent >= self.partial_close_profit_threshold * 100
+                and trade.id not in self._partial_closed):
+            self._partial_closed.add(trade.id)
+            self._spawn(self._partial_close(position, trade))
+    
+    @staticmethod
+    def _exit_reason(position: PositionInfo) -> Optional[str]:
+        price = position.current_price
+        long = position.side == 'long'
+        if position.stop_loss and (price <= position.stop_loss if long else price >= position.stop_loss):
+            return "Stop-Loss"
+        if position.take_profit and (price >= position.take_profit if long else price <= position.take_profit):
+            return "Take-Profit"
+        return None
+    
+    def _update_trailing_stop(self, position: PositionInfo, trade: Trade):
+        """Подтягивание стопа за максимумом (long) или минимумом (short) цены"""
+        if not position.trailing_stop or not position.trailing_distance:
+            return
+        
+        if position.side == 'long':
+            if position.max_price and position.current_price <= position.max_price:
+                return
+            position.max_price = position.current_price
+            new_stop = position.max_price * (1 - position.trailing_distance / 100)
+            if position.stop_loss and new_stop <= position.stop_loss:
+                return
+        else:  # short position
+            if position.min_price and position.current_price >= position.min_price:
+                return
+            position.min_price = position.current_price
+            new_stop = position.min_price * (1 + position.trailing_distance / 100)
+            if position.stop_loss and new_stop >= position.stop_loss:
+                return
+        
+        position.stop_loss = new_stop
+        trade.stop_loss = new_stop
+        self._queue_update(trade.id, stop_loss=new_stop)
+        
+        logger.debug(
+            f"{'📈' if position.side == 'long' else '📉'} Трейлинг стоп обновлен для {position.symbol}",
+            category='position',
+            symbol=position.symbol,
+            new_stop=new_stop
+        )
+    
+    async def _close_with_reason(self, symbol: str, reason: str):
+        """Закрытие позиции по правилу и фиксация сделки"""
+        try:
+            position = self.positions.get(symbol)
+            if position is None:
+                return
+            log = logger.warning if reason == "Stop-Loss" else logger.info
+            log(
+                f"{'🛑' if reason == 'Stop-Loss' else '🎯'} {reason} triggered для {symbol}",
+                category='position',
+                symbol=symbol,
+                current_price=position.current_price,
+                stop_loss=position.stop_loss,
+                take_profit=position.take_profit,
+                pnl_percent=position.unrealized_pnl_percent
+            )
+            self._close_requested[symbol] = time.time()
+            if await self._close_position_with_reason(symbol, reason):
+                self._finalize_close(symbol, reason, self._exit_price(symbol, position))
+            else:
+                self._schedule_close_retry(symbol)
+        finally:
+            self._closing.discard(symbol)
+    
+    def _schedule_close_retry(self, symbol: str):
+        """Пауза перед повтором неудачного закрытия: check_interval, 2x, 4x... до максимума"""
+        failures = self._close_failures.get(symbol, 0) + 1
+        self._close_failures[symbol] = failures
+        delay = min(self.check_interval * 2 ** (failures - 1), self.close_retry_max_delay)
+        self._close_retry_at[symbol] = time.monotonic() + delay
+        logger.warning(
+            f"⏳ Повтор закрытия {symbol} через {delay:.0f} сек",
+            category='position',
+            symbol=symbol,
+            failures=failures
+        )
+    
+    def _finalize_close(self, symbol: str, reason: str, exit_price: float):
+        """Удаление позиции из памяти и запись закрытия сделки в очередь БД"""
+        position = self.positions.pop(symbol, None)
+        trade = self.trades_by_symbol.pop(symbol, None)
+        self._last_fill.pop(symbol, None)
+        self._close_requested.pop(symbol, None)
+        self._close_retry_at.pop(symbol, None)
+        self._close_failures.pop(symbol, None)
+        if trade is None:
+            return
+        self.active_trades.pop(trade.id, None)
+        self._partial_closed.discard(trade.id)
+        if position is not None:
+            self._apply_price(position, exit_price)
+        
+        self._queue_trade_update(TradeUpdate(
+            trade_id=trade.id,
+            status=TradeStatus.CLOSED,
+            exit_price=exit_price,
+            profit=position.unrealized_pnl if position else None,
+            profit_percent=position.unrealized_pnl_percent if position else None,
+            exit_reason=reason
+        ))
+    
+    async def _partial_close(self, position: PositionInfo, trade: Trade):
+        """Частичное закрытие 50% позиции при достижении порога прибыли"""
+        try:
+            partial_size = position.size * 0.5
+            
+            # Частично закрываем позицию
+            close_side = 'sell' if position.side == 'long' else 'buy'
+            
+            result = await self.exchange.create_order(
+                symbol=position.symbol,
+                order_type='market',
+                side=close_side,
+                amount=partial_size
+            )
+            
+            if result.success:
+                position.size -= partial_size
+                logger.info(
+                    f"💰 Частичное закрытие позиции {position.symbol}: 50%",
+                    category='position',
+                    symbol=position.symbol,
+                    profit_percent=position.unrealized_pnl_percent
+                )
+            else:
+                self._partial_closed.discard(trade.id)
+                
+        except Exception as e:
+            self._partial_closed.discard(trade.id)
+            logger.error(f"❌ Ошибка частичного закрытия {position.symbol}: {e}")
+    
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    # =================================================================
+    # REST СВЕРКА
+    # =================================================================
+    
     async def _monitoring_cycle(self):
-        """Один цикл мониторинга"""
+        """Один цикл мониторинга (сверка с биржей и БД)"""
         try:
+            self.stats['reconciles'] += 1
+            
             # 1. Обновляем информацию о позициях
             await self._update_positions()
             
             # 2. Загружаем активные сделки из БД
             await self._load_active_trades()
             
-            # 3. Проверяем stop-loss/take-profit
-            await self._check_stop_loss_take_profit()
-            
-            # 4. Обновляем трейлинг стопы
-            await self._update_trailing_stops()
-            
-            # 5. Проверяем условия для частичного закрытия
-            await self._check_partial_close()
+            # 3. SL/TP, трейлинг стопы и частичное закрытие
+            for symbol in list(self.positions):
+                self._evaluate(symbol)
             
-            # 6. Проверяем экстренные условия
+            # 4. Проверяем экстренные условия
             await self._check_emergency_conditions()
             
-            # 7. Обновляем PnL в базе данных
-            await self._update_trades_pnl()
-            
         except Exception as e:
             logger.error(f"❌ Ошибка в цикле мониторинга: {e}")
     
@@ -150,16 +548,16 @@ class PositionManager:
             # Получаем позиции с биржи
             exchange_positions = await self.exchange.fetch_positions()
             
-            # Обновляем наш кэш
-            self.positions.clear()
-            
+            positions = {}
             for pos in exchange_positions:
                 if pos.size > 0:  # Только открытые позиции
                     symbol = pos.symbol
                     
-                    # Получаем текущую цену
-                    ticker = await self.exchange.fetch_ticker(symbol)
-                    current_price = ticker['last']
+                    # Цена из потока, если свежая, иначе REST
+                    current_price = self._fresh_price(symbol)
+                    if current_price is None:
+                        ticker = await self.exchange.fetch_ticker(symbol)
+                        current_price = ticker['last']
                     
                     position_info = PositionInfo(
                         symbol=symbol,
@@ -168,10 +566,25 @@ class PositionManager:
                         entry_price=pos.entry_price,
                         current_price=current_price,
                         unrealized_pnl=pos.unrealized_pnl,
-                        unrealized_pnl_percent=pos.percentage
+                        unrealized_pnl_percent=pos.percentage,
+                        leverage=float(getattr(pos, 'leverage', 1) or 1)
                     )
                     
-                    self.positions[symbol] = position_info
+                    # Экстремумы трейлинг стопа сохраняются между сверками
+                    previous = self.positions.get(symbol)
+                    if previous is not None:
+                        position_info.max_price = previous.max_price
+                        position_info.min_price = previous.min_price
+                    else:
+                        self._last_fill.pop(symbol, None)
+                    
+                    positions[symbol] = position_info
+            
+            for symbol in set(self._close_retry_at) - set(positions):
+                self._close_retry_at.pop(symbol, None)
+                self._close_failures.pop(symbol, None)
+            self.positions = positions
+            self._subscribe_tickers(list(positions))
             
             if self.positions:
                 logger.debug(
@@ -185,189 +598,42 @@ class PositionManager:
     
     async def _load_active_trades(self):
         """Загрузка активных сделок из БД"""
-        db = SessionLocal()
+        if self._trades_loading:
+            return
+        self._trades_loading = True
         try:
-            active_trades = db.query(Trade).filter(
-                Trade.status == TradeStatus.OPEN
-            ).all()
-            
-            self.active_trades.clear()
-            for trade in active_trades:
-                self.active_trades[trade.id] = trade
-                
-                # Добавляем информацию о stop-loss/take-profit к позициям
-                if trade.symbol in self.positions:
-                    position = self.positions[trade.symbol]
-                    position.stop_loss = trade.stop_loss
-                    position.take_profit = trade.take_profit
-                    position.trailing_stop = trade.trailing_stop or False
-                    position.trailing_distance = trade.trailing_distance
-            
+            active_trades = await run_db(self._query_active_trades)
         finally:
-            db.close()
-    
-    async def _check_stop_loss_take_profit(self):
-        """Проверка условий stop-loss и take-profit"""
-        updates = []
-        
-        for symbol, position in self.positions.items():
-            try:
-                # Проверяем stop-loss
-                if position.stop_loss:
-                    sl_triggered = False
-                    
-                    if position.side == 'long' and position.current_price <= position.stop_loss:
-                        sl_triggered = True
-                    elif position.side == 'short' and position.current_price >= position.stop_loss:
-                        sl_triggered = True
-                    
-                    if sl_triggered:
-                        logger.warning(
-                            f"🛑 Stop-Loss triggered для {symbol}",
-                            category='position',
-                            symbol=symbol,
-                            current_price=position.current_price,
-                            stop_loss=position.stop_loss,
-                            loss_percent=position.unrealized_pnl_percent
-                        )
-                        
-                        # Закрываем позицию
-                        if await self._close_position_with_reason(symbol, "Stop-Loss"):
-                            updates.append(TradeUpdate(
-                                trade_id=self._get_trade_id_by_symbol(symbol),
-                                status=TradeStatus.CLOSED,
-                                exit_price=position.current_price,
-                                profit=position.unrealized_pnl,
-                                exit_reason="Stop-Loss"
-                            ))
-                
-                # Проверяем take-profit
-                if position.take_profit:
-                    tp_triggered = False
-                    
-                    if position.side == 'long' and position.current_price >= position.take_profit:
-                        tp_triggered = True
-                    elif position.side == 'short' and position.current_price <= position.take_profit:
-                        tp_triggered = True
-                    
-                    if tp_triggered:
-                        logger.info(
-                            f"🎯 Take-Profit triggered для {symbol}",
-                            category='position',
-                            symbol=symbol,
-                            current_price=position.current_price,
-                            take_profit=position.take_profit,
-                            profit_percent=position.unrealized_pnl_percent
-                        )
-                        
-                        # Закрываем позицию
-                        if await self._close_position_with_reason(symbol, "Take-Profit"):
-                            updates.append(TradeUpdate(
-                                trade_id=self._get_trade_id_by_symbol(symbol),
-                                status=TradeStatus.CLOSED,
-                                exit_price=position.current_price,
-                                profit=position.unrealized_pnl,
-                                exit_reason="Take-Profit"
-                            ))
-                
-            except Exception as e:
-                logger.error(f"❌ Ошибка проверки SL/TP для {symbol}: {e}")
+            self._trades_loading = False
         
-        # Обновляем сделки в БД
-        if updates:
-            await self._update_trades_in_db(updates)
-    
-    async def _update_trailing_stops(self):
-        """Обновление трейлинг стопов"""
-        for symbol, position in self.positions.items():
-            if not position.trailing_stop or not position.trailing_distance:
-                continue
+        previous = self.trades_by_symbol
+        self.active_trades = {}
+        self.trades_by_symbol = {}
+        for trade in active_trades:
+            # Стоп, подтянутый трейлингом, мог еще не дойти до БД
+            old = previous.get(trade.symbol)
+            if old is not None and old.id == trade.id:
+                trade.stop_loss = old.stop_loss
+                for attr in ('trailing_stop', 'trailing_distance'):
+                    if hasattr(old, attr):
+                        setattr(trade, attr, getattr(old, attr))
             
-            try:
-                trade = self._get_trade_by_symbol(symbol)
-                if not trade:
-                    continue
-                
-                # Обновляем максимальную/минимальную цену
-                if position.side == 'long':
-                    if not position.max_price or position.current_price > position.max_price:
-                        position.max_price = position.current_price
-                        
-                        # Обновляем трейлинг стоп
-                        new_stop = position.max_price * (1 - position.trailing_distance / 100)
-                        
-                        if not position.stop_loss or new_stop > position.stop_loss:
-                            position.stop_loss = new_stop
-                            
-                            # Обновляем в БД
-                            await self._update_trade_stop_loss(trade.id, new_stop)
-                            
-                            logger.info(
-                                f"📈 Трейлинг стоп обновлен для {symbol}",
-                                category='position',
-                                symbol=symbol,
-                                new_stop=new_stop,
-                                max_price=position.max_price
-                            )
-                
-                else:  # short position
-                    if not position.min_price or position.current_price < position.min_price:
-                        position.min_price = position.current_price
-                        
-                        # Обновляем трейлинг стоп
-                        new_stop = position.min_price * (1 + position.trailing_distance / 100)
-                        
-                        if not position.stop_loss or new_stop < position.stop_loss:
-                            position.stop_loss = new_stop
-                            
-                            # Обновляем в БД
-                            await self._update_trade_stop_loss(trade.id, new_stop)
-                            
-                            logger.info(
-                                f"📉 Трейлинг стоп обновлен для {symbol}",
-                                category='position',
-                                symbol=symbol,
-                                new_stop=new_stop,
-                                min_price=position.min_price
-                            )
-                            
-            except Exception as e:
-                logger.error(f"❌ Ошибка обновления трейлинг стопа для {symbol}: {e}")
+            self.active_trades[trade.id] = trade
+            self.trades_by_symbol.setdefault(trade.symbol, trade)
+            
+            # Добавляем информацию о stop-loss/take-profit к позициям
+            if trade.symbol in self.positions:
+                position = self.positions[trade.symbol]
+                self._apply_trade_levels(position, trade)
+                # После перезапуска: позиция уже вдвое меньше сделки
+                if trade.quantity and position.size <= trade.quantity * 0.5 + 1e-12:
+                    self._partial_closed.add(trade.id)
     
-    async def _check_partial_close(self):
-        """Проверка условий для частичного закрытия позиций"""
-        for symbol, position in self.positions.items():
-            try:
-                # Если прибыль достигла порога, закрываем 50% позиции
-                if position.unrealized_pnl_percent >= self.partial_close_profit_threshold * 100:
-                    trade = self._get_trade_by_symbol(symbol)
-                    if trade and not hasattr(trade, 'partial_closed'):
-                        
-                        partial_size = position.size * 0.5
-                        
-                        # Частично закрываем позицию
-                        close_side = 'sell' if position.side == 'long' else 'buy'
-                        
-                        result = await self.exchange.create_order(
-                            symbol=symbol,
-                            order_type='market',
-                            side=close_side,
-                            amount=partial_size
-                        )
-                        
-                        if result.success:
-                            logger.info(
-                                f"💰 Частичное закрытие позиции {symbol}: 50%",
-                                category='position',
-                                symbol=symbol,
-                                profit_percent=position.unrealized_pnl_percent
-                            )
-                            
-                            # Помечаем в БД что частично закрыто
-                            await self._mark_partial_closed(trade.id)
-                
-            except Exception as e:
-                logger.error(f"❌ Ошибка частичного закрытия {symbol}: {e}")
+    @staticmethod
+    def _query_active_trades(db) -> List[Trade]:
+        return db.query(Trade).filter(
+            Trade.status == TradeStatus.OPEN
+        ).all()
     
     async def _check_emergency_conditions(self):
         """Проверка экстренных условий"""
@@ -397,29 +663,6 @@ class PositionManager:
         except Exception as e:
             logger.error(f"❌ Ошибка проверки экстренных условий: {e}")
     
-    async def _update_trades_pnl(self):
-        """Обновление PnL сделок в БД"""
-        if not self.positions:
-            return
-        
-        db = SessionLocal()
-        try:
-            for symbol, position in self.positions.items():
-                trade = self._get_trade_by_symbol(symbol)
-                if trade:
-                    trade.current_price = position.current_price
-                    trade.unrealized_pnl = position.unrealized_pnl
-                    trade.updated_at = datetime.utcnow()
-                    
-                    db.merge(trade)
-            
-            db.commit()
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка обновления PnL в БД: {e}")
-        finally:
-            db.close()
-    
     # =================================================================
     # ВСПОМОГАТЕЛЬНЫЕ МЕТОДЫ
     # =================================================================
@@ -427,7 +670,8 @@ class PositionManager:
     async def _close_position_with_reason(self, symbol: str, reason: str) -> bool:
         """Закрытие позиции с указанием причины"""
         try:
-            success = await self.exchange.close_position(symbol)
+            result = await self.exchange.close_position(symbol)
+            success = result.get('success', False) if isinstance(result, dict) else bool(result)
             
             if success:
                 logger.info(
@@ -452,78 +696,88 @@ class PositionManager:
     
     def _get_trade_by_symbol(self, symbol: str) -> Optional[Trade]:
         """Получение сделки по символу"""
-        for trade in self.active_trades.values():
-            if trade.symbol == symbol:
-                return trade
-        return None
+        return self.trades_by_symbol.get(symbol)
     
     def _get_trade_id_by_symbol(self, symbol: str) -> Optional[int]:
         """Получение ID сделки по символу"""
         trade = self._get_trade_by_symbol(symbol)
         return trade.id if trade else None
     
-    async def _update_trade_stop_loss(self, trade_id: int, new_stop_loss: float):
-        """Обновление stop-loss сделки в БД"""
-        db = SessionLocal()
-        try:
-            trade = db.query(Trade).filter(Trade.id == trade_id).first()
-            if trade:
-                trade.stop_loss = new_stop_loss
-                trade.updated_at = datetime.utcnow()
-                db.commit()
-                
-        except Exception as e:
-            logger.error(f"❌ Ошибка обновления stop-loss: {e}")
-        finally:
-            db.close()
+    # =================================================================
+    # ЗАПИСЬ В БД
+    # =================================================================
+    
+    @staticmethod
+    def _trade_update_values(update: TradeUpdate) -> Dict[str, Any]:
+        """TradeUpdate -> значения столбцов Trade"""
+        values = {'status': update.status, 'close_time': datetime.utcnow()}
+        if update.exit_price:
+            values['close_price'] = update.exit_price
+        if update.profit is not None:
+            values['profit_loss'] = update.profit
+        if update.profit_percent is not None:
+            values['profit_loss_percent'] = update.profit_percent
+        return values
+    
+    def _queue_update(self, trade_id: int, **values):
+        """Изменение сделки в очередь записи (последнее значение столбца побеждает)"""
+        self._pending_updates.setdefault(trade_id, {}).update(values)
     
-    async def _mark_partial_closed(self, trade_id: int):
-        """Пометить сделку как частично закрытую"""
-        db = SessionLocal()
+    def _queue_trade_update(self, update: TradeUpdate):
+        self._queue_update(update.trade_id, **self._trade_update_values(update))
+        logger.info(
+            f"📝 Сделка {update.trade_id} закрыта: {update.exit_reason}",
+            category='position',
+            exit_price=update.exit_price,
+            profit=update.profit
+        )
+    
+    async def _flush_loop(self):
+        """Периодическая запись накопленных изменений"""
+        while self.is_running:
+            try:
+                await asyncio.sleep(self.db_flush_interval)
+                await self._flush_updates()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Ошибка в цикле записи сделок: {e}")
+    
+    async def _flush_updates(self):
+        """Все накопленные изменения сделок одной транзакцией"""
+        if not self._pending_updates:
+            return
+        pending, self._pending_updates = self._pending_updates, {}
+        
+        def apply(db):
+            trades = db.query(Trade).filter(Trade.id.in_(list(pending))).all()
+            now = datetime.utcnow()
+            for trade in trades:
+                for column, value in pending[trade.id].items():
+                    setattr(trade, column, value)
+                trade.updated_at = now
+            return len(trades)
+        
         try:
-            trade = db.query(Trade).filter(Trade.id == trade_id).first()
-            if trade:
-                # Добавляем флаг частичного закрытия
-                if not trade.notes:
-                    trade.notes = "partial_closed"
-                else:
-                    trade.notes += ",partial_closed"
-                trade.updated_at = datetime.utcnow()
-                db.commit()
-                
+            rows = await run_db(apply, commit=True)
+            self.stats['db_flushes'] += 1
+            self.stats['db_rows'] += rows
         except Exception as e:
-            logger.error(f"❌ Ошибка пометки частичного закрытия: {e}")
-        finally:
-            db.close()
+            # Возвращаем в очередь, не затирая более свежие значения
+            for trade_id, values in pending.items():
+                self._pending_updates[trade_id] = {**values, **self._pending_updates.get(trade_id, {})}
+            logger.error(f"❌ Ошибка записи изменений сделок в БД: {e}")
     
     async def _update_trades_in_db(self, updates: List[TradeUpdate]):
-        """Обновление сделок в БД"""
-        db = SessionLocal()
-        try:
-            for update in updates:
-                trade = db.query(Trade).filter(Trade.id == update.trade_id).first()
-                if trade:
-                    trade.status = update.status
-                    if update.exit_price:
-                        trade.exit_price = update.exit_price
-                    if update.profit is not None:
-                        trade.profit = update.profit
-                    if update.exit_reason:
-                        trade.exit_reason = update.exit_reason
-                    trade.closed_at = datetime.utcnow()
-                    trade.updated_at = datetime.utcnow()
-            
-            db.commit()
-            
-            logger.info(
-                f"✅ Обновлено сделок в БД: {len(updates)}",
-                category='position'
-            )
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка обновления сделок в БД: {e}")
-        finally:
-            db.close()
+        """Немедленное обновление сделок в БД"""
+        for update in updates:
+            self._queue_update(update.trade_id, **self._trade_update_values(update))
+        await self._flush_updates()
+        
+        logger.info(
+            f"✅ Обновлено сделок в БД: {len(updates)}",
+            category='position'
+        )
     
     # =================================================================
     # ПУБЛИЧНЫЕ МЕТОДЫ
@@ -583,6 +837,9 @@ class PositionManager:
                     ))
                 
                 await self._update_trades_in_db(updates)
+                self.positions.clear()
+                self.active_trades.clear()
+                self.trades_by_symbol.clear()
                 
                 logger.critical(
                     f"🚨 Экстренно закрыто позиций: {closed_count}",
@@ -605,31 +862,24 @@ class PositionManager:
                 logger.error(f"❌ Сделка для {symbol} не найдена")
                 return False
             
-            # Обновляем в БД
-            db = SessionLocal()
-            try:
-                trade.trailing_stop = True
-                trade.trailing_distance = trailing_distance_percent
-                trade.updated_at = datetime.utcnow()
-                db.merge(trade)
-                db.commit()
-                
-                # Обновляем в позиции
-                if symbol in self.positions:
-                    self.positions[symbol].trailing_stop = True
-                    self.positions[symbol].trailing_distance = trailing_distance_percent
-                
-                logger.info(
-                    f"✅ Трейлинг стоп установлен для {symbol}: {trailing_distance_percent}%",
-                    category='position',
-                    symbol=symbol,
-                    trailing_distance=trailing_distance_percent
-                )
-                
-                return True
-                
-            finally:
-                db.close()
+            # Параметры трейлинга живут в памяти вместе с открытой сделкой
+            trade.trailing_stop = True
+            trade.trailing_distance = trailing_distance_percent
+            
+            # Обновляем в позиции
+            if symbol in self.positions:
+                self.positions[symbol].trailing_stop = True
+                self.positions[symbol].trailing_distance = trailing_distance_percent
+                self._evaluate(symbol)
+            
+            logger.info(
+                f"✅ Трейлинг стоп установлен для {symbol}: {trailing_distance_percent}%",
+                category='position',
+                symbol=symbol,
+                trailing_distance=trailing_distance_percent
+            )
+            
+            return True
                 
         except Exception as e:
             logger.error(f"❌ Ошибка установки трейлинг стопа для {symbol}: {e}")
@@ -0,0 +1,294 @@
+"""
+Общий асинхронный лимитер запросов к бирже (token bucket)
+Файл: src/exchange/rate_limiter.py
+
+Один экземпляр на процесс используют и BybitClientV5, и UnifiedExchangeClient:
+- у каждого класса эндпоинтов свое ведро токенов с допустимым всплеском
+- все запросы дополнительно проходят через общее ведро лимита по IP
+- пока токены есть, запрос проходит без задержки; ждущие запросы
+  обслуживаются по приоритету (ордера раньше рыночных данных)
+- заголовки X-Bapi-Limit-Status / X-Bapi-Limit-Reset-Timestamp и ошибка
+  10006 (превышен лимит) притормаживают соответствующее ведро
+
+Лимитер можно использовать из нескольких event loop (основной цикл бота,
+потоки сканера, синхронные обертки клиента): остаток токенов общий,
+очередь ожидающих - у каждого цикла своя.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты (меньше - раньше)
+PRIORITY_ORDER = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_MARKET_DATA = 2
+
+# Тип эндпоинта -> (класс эндпоинтов, приоритет)
+ENDPOINT_CLASSES: Dict[str, Tuple[str, int]] = {
+    'trade': ('order', PRIORITY_ORDER),
+    'order': ('order', PRIORITY_ORDER),
+    'leverage': ('order', PRIORITY_ORDER),
+    'order_status': ('account', PRIORITY_ACCOUNT),
+    'balance': ('account', PRIORITY_ACCOUNT),
+    'positions': ('account', PRIORITY_ACCOUNT),
+    'ticker': ('market', PRIORITY_MARKET_DATA),
+    'klines': ('market', PRIORITY_MARKET_DATA),
+    'orderbook': ('market', PRIORITY_MARKET_DATA),
+    'trades': ('market', PRIORITY_MARKET_DATA),
+    'default': ('market', PRIORITY_MARKET_DATA),
+}
+
+# Класс эндпоинтов -> (токенов в секунду, емкость ведра)
+DEFAULT_LIMITS: Dict[str, Tuple[float, float]] = {
+    'order': (10, 10),
+    'account': (20, 20),
+    'market': (20, 40),
+    # Bybit: 600 запросов за 5 секунд с одного IP
+    'ip': (120, 120),
+}
+
+# Адаптивное торможение после ошибки лимита
+BACKOFF_BASE = 1.0  # секунд
+BACKOFF_MAX = 60.0
+
+# Код ошибки Bybit "Too many visits"
+RATE_LIMIT_RET_CODE = 10006
+
+
+class TokenBucket:
+    """
+    Ведро токенов с очередью ожидающих запросов по приоритету.
+
+    Токены общие для всех потоков (под threading.Lock), а очередь и
+    диспетчер - свои у каждого event loop: future ожидающего запроса
+    разрешает только задача его же цикла.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float):
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self.backoff_level = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        # event loop -> очередь (priority, seq, future) и задача-диспетчер
+        self._queues: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, list]' = weakref.WeakKeyDictionary()
+        self._dispatchers: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]' = weakref.WeakKeyDictionary()
+        self._seq = itertools.count()
+
+        # Метрики
+        self.acquired = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_queue = 0
+        self.backoffs = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self, now: float) -> bool:
+        with self._lock:
+            if now < self.blocked_until:
+                return False
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def _give_back(self):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def _delay(self, now: float) -> float:
+        with self._lock:
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            return max((1 - self.tokens) / self.rate, 0.001)
+
+    def queue_depth(self) -> int:
+        """Число ожидающих запросов во всех event loop"""
+        return sum(1 for queue in list(self._queues.values()) for *_, future in queue if not future.done())
+
+    async def acquire(self, priority: int = PRIORITY_MARKET_DATA) -> float:
+        """
+        Получение токена.
+
+        Returns:
+            float: Время ожидания в секундах (0 - без очереди)
+        """
+        started = time.monotonic()
+        self.acquired += 1
+        if not self.queue_depth() and self._try_take(started):
+            return 0.0
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._queues.setdefault(loop, [])
+        heapq.heappush(queue, (priority, next(self._seq), future))
+        self.max_queue = max(self.max_queue, self.queue_depth())
+        dispatcher = self._dispatchers.get(loop)
+        if dispatcher is None or dispatcher.done():
+            self._dispatchers[loop] = loop.create_task(self._dispatch(queue))
+
+        # Отмена ожидающей задачи отменяет future, диспетчер его пропустит
+        await future
+
+        waited = time.monotonic() - started
+        self.delayed += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    async def _dispatch(self, queue: list):
+        """Выдача токенов ожидающим запросам своего event loop в порядке приоритета"""
+        while queue:
+            future = queue[0][2]
+            if future.done():
+                heapq.heappop(queue)
+                continue
+            now = time.monotonic()
+            if self._try_take(now):
+                heapq.heappop(queue)
+                future.set_result(None)
+                continue
+            await asyncio.sleep(self._delay(now))
+
+    def block(self, seconds: float):
+        """Приостановка выдачи токенов на seconds секунд"""
+        now = time.monotonic()
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self._refill(now)
+            self.tokens = 0.0
+        self.backoffs += 1
+
+    def clamp(self, remaining: float):
+        """Не больше remaining токенов (фактический остаток лимита на бирже)"""
+        with self._lock:
+            self.backoff_level = 0
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, remaining)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            tokens = self.tokens
+        return {
+            'rate': self.rate,
+            'capacity': self.capacity,
+            'tokens': round(tokens, 2),
+            'queue_depth': self.queue_depth(),
+            'max_queue': self.max_queue,
+            'acquired': self.acquired,
+            'delayed': self.delayed,
+            'avg_wait_ms': self.total_wait / self.delayed * 1000 if self.delayed else 0.0,
+            'max_wait_ms': self.max_wait * 1000,
+            'backoffs': self.backoffs,
+            'blocked_for': max(0.0, self.blocked_until - now),
+        }
+
+
+class RateLimiter:
+    """Набор ведер по классам эндпоинтов плюс общее ведро лимита по IP"""
+
+    def __init__(self, limits: Optional[Mapping[str, Tuple[float, float]]] = None):
+        limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.buckets: Dict[str, TokenBucket] = {
+            name: TokenBucket(name, rate, capacity) for name, (rate, capacity) in limits.items()
+        }
+
+    @staticmethod
+    def classify(endpoint: str) -> Tuple[str, int]:
+        """Класс эндпоинтов и приоритет по типу эндпоинта"""
+        return ENDPOINT_CLASSES.get(endpoint, ENDPOINT_CLASSES['default'])
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        return self.buckets[self.classify(endpoint)[0]]
+
+    async def acquire(self, endpoint: str = 'default', priority: Optional[int] = None) -> float:
+        """
+        Ожидание разрешения на запрос (один запрос - один токен, как считает Bybit).
+
+        Args:
+            endpoint: Тип эндпоинта ('trade', 'balance', 'klines', ...)
+            priority: Приоритет (по умолчанию - по классу эндпоинта)
+
+        Returns:
+            float: Суммарное время ожидания в секундах
+        """
+        endpoint_class, default_priority = self.classify(endpoint)
+        priority = default_priority if priority is None else priority
+        waited = await self.buckets[endpoint_class].acquire(priority)
+        waited += await self.buckets['ip'].acquire(priority)
+        return waited
+
+    def try_acquire(self, endpoint: str = 'default') -> bool:
+        """Получение токена без ожидания (False - лимит исчерпан или есть очередь)"""
+        bucket = self.bucket(endpoint)
+        ip_bucket = self.buckets['ip']
+        if bucket.queue_depth() or ip_bucket.queue_depth():
+            return False
+        now = time.monotonic()
+        if not bucket._try_take(now):
+            return False
+        if not ip_bucket._try_take(now):
+            bucket._give_back()
+            return False
+        bucket.acquired += 1
+        ip_bucket.acquired += 1
+        return True
+
+    def update_from_headers(self, endpoint: str, headers: Optional[Mapping[str, str]]):
+        """
+        Подстройка под фактический остаток лимита из заголовков Bybit.
+
+        X-Bapi-Limit-Status - сколько запросов осталось в текущем окне,
+        X-Bapi-Limit-Reset-Timestamp - когда окно сбросится (мс).
+        """
+        if not headers:
+            return
+        remaining = headers.get('X-Bapi-Limit-Status')
+        if remaining is None:
+            return
+        try:
+            remaining = float(remaining)
+            reset_ms = float(headers.get('X-Bapi-Limit-Reset-Timestamp') or 0)
+        except (TypeError, ValueError):
+            return
+
+        bucket = self.bucket(endpoint)
+        if remaining > 0:
+            bucket.clamp(remaining)
+        else:
+            wait = reset_ms / 1000 - time.time() if reset_ms else BACKOFF_BASE
+            bucket.block(min(max(wait, 0.0), BACKOFF_MAX))
+            logger.warning(f"⚠️ Лимит запросов '{bucket.name}' исчерпан, пауза {wait:.2f}с")
+
+    def penalize(self, endpoint: str, retry_after: Optional[float] = None):
+        """Экспоненциальное торможение после ответа 'превышен лимит'"""
+        bucket = self.bucket(endpoint)
+        if retry_after is None:
+            retry_after = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** bucket.backoff_level))
+            bucket.backoff_level += 1
+        bucket.block(retry_after)
+        logger.warning(f"⚠️ Превышен лимит запросов '{bucket.name}', пауза {retry_after:.1f}с")
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        return {name: bucket.get_statistics() for name, bucket in self.buckets.items()}
+
+
+# Глобальный лимитер, общий для всех клиентов биржи
+rate_limiter = RateLimiter()
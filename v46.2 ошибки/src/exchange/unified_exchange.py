@@ -14,7 +14,6 @@ import ccxt
 import json
 import logging
 import random
-import time
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Union, Tuple
@@ -22,6 +21,8 @@ import urllib3
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
 
+from .rate_limiter import rate_limiter
+
 try:
     from ..core.unified_config import unified_config
     UNIFIED_CONFIG_AVAILABLE = True
@@ -76,7 +77,8 @@ class BaseExchangeClient(ABC):
         self.exchange = None
         self.is_connected = False
         self.last_request_time = None
-        self.rate_limiter = {}
+        # Общий лимитер запросов (см. rate_limiter.py)
+        self.rate_limiter = rate_limiter
         self.testnet = True
         
     @abstractmethod
@@ -178,13 +180,8 @@ class BaseExchangeClient(ABC):
         return 0.001  # Минимальный размер для тестов
     
     def _check_rate_limit(self, endpoint: str) -> bool:
-        """Проверка лимита запросов"""
-        current_time = time.time()
-        if endpoint in self.rate_limiter:
-            if current_time - self.rate_limiter[endpoint] < 0.1:  # 100ms между запросами
-                return False
-        self.rate_limiter[endpoint] = current_time
-        return True
+        """Проверка лимита запросов без ожидания (True - токен получен)"""
+        return self.rate_limiter.try_acquire(endpoint)
 
 # =================================================================
 # ОСНОВНОЙ ОБЪЕДИНЕННЫЙ КЛИЕНТ
@@ -263,18 +260,12 @@ class UnifiedExchangeClient(BaseExchangeClient):
             
     async def _wait_for_rate_limit(self, endpoint: str):
         """
-        ✅ ИСПРАВЛЕНИЕ: Добавлен недостающий метод для управления лимитами запросов.
-        Этот метод обеспечивает небольшую задержку для предотвращения превышения
-        лимитов API биржи.
+        Ожидание токена в общем лимитере запросов.
+        Пока лимит не исчерпан, запрос проходит без задержки;
+        ордера обслуживаются раньше запросов рыночных данных.
         """
         try:
-            if endpoint in self.rate_limiter:
-                last_call_time = self.rate_limiter[endpoint]
-                elapsed = time.time() - last_call_time
-                if elapsed < 0.2: # 200ms
-                    await asyncio.sleep(0.2 - elapsed)
-            
-            self.rate_limiter[endpoint] = time.time()
+            await self.rate_limiter.acquire(endpoint)
         except Exception as e:
             logger.error(f"Ошибка в _wait_for_rate_limit: {e}")
 
@@ -284,11 +275,10 @@ class UnifiedExchangeClient(BaseExchangeClient):
             self.exchange.session = self._session
             logger.info("✅ Применена кастомная сессия к exchange")
         
-        # Также применяем настройки rate limit
-        if hasattr(self.exchange, 'rateLimit'):
-            self.exchange.rateLimit = 100  # миллисекунды между запросами
-            self.exchange.enableRateLimit = True
-            logger.info("✅ Rate limit установлен: 100ms")
+        # Темп запросов задает общий rate_limiter (_wait_for_rate_limit),
+        # собственная фиксированная задержка ccxt выключена
+        if hasattr(self.exchange, 'enableRateLimit'):
+            self.exchange.enableRateLimit = False
         """
         Подключение к реальной бирже
         Из: real_client.py
@@ -358,8 +348,6 @@ class UnifiedExchangeClient(BaseExchangeClient):
                         config = {
                             'apiKey': getattr(unified_config, 'BYBIT_API_KEY', ''),
                             'secret': getattr(unified_config, 'BYBIT_API_SECRET', ''),
-                            'enableRateLimit': True,
-                            'rateLimit': 100
                         }
                 else:
                     # Конфигурация из переменных окружения
@@ -369,14 +357,13 @@ class UnifiedExchangeClient(BaseExchangeClient):
                                            os.getenv('BYBIT_API_KEY', '')),
                         'secret': os.getenv('BYBIT_TESTNET_API_SECRET' if testnet else 'BYBIT_MAINNET_API_SECRET',
                                            os.getenv('BYBIT_API_SECRET', '')),
-                        'enableRateLimit': True,
-                        'rateLimit': 100
                     }
                 
                 # ✅ ОБЯЗАТЕЛЬНЫЕ НАСТРОЙКИ
                 config['sandbox'] = testnet
                 config['timeout'] = 30000  # 30 секунд
-                config['rateLimit'] = 100  # Снижаем частоту запросов
+                # Лимит запросов - общий rate_limiter, без фиксированной задержки ccxt
+                config['enableRateLimit'] = False
                 
                 # ✅ УЛУЧШЕННЫЕ НАСТРОЙКИ ПОДКЛЮЧЕНИЯ
                 config['options'] = {
@@ -502,8 +489,7 @@ class UnifiedExchangeClient(BaseExchangeClient):
                 'apiKey': unified_config.BINANCE_API_KEY,
                 'secret': unified_config.BINANCE_API_SECRET,
                 'sandbox': testnet,
-                'enableRateLimit': True,
-                'rateLimit': 50,
+                'enableRateLimit': False,  # лимит - общий rate_limiter
                 'options': {
                     'defaultType': 'spot',
                     'adjustForTimeDifference': True
@@ -535,8 +521,7 @@ class UnifiedExchangeClient(BaseExchangeClient):
                 'secret': unified_config.OKX_API_SECRET,
                 'password': unified_config.OKX_PASSPHRASE,
                 'sandbox': testnet,
-                'enableRateLimit': True,
-                'rateLimit': 100,
+                'enableRateLimit': False,  # лимит - общий rate_limiter
                 'options': {
                     'defaultType': 'spot'
                 }
@@ -787,6 +772,8 @@ class UnifiedExchangeClient(BaseExchangeClient):
             return []
         
         try:
+            await self._wait_for_rate_limit('positions')
+            
             # Используем run_in_executor для синхронного метода
             loop = asyncio.get_event_loop()
             positions = await loop.run_in_executor(
@@ -920,6 +907,7 @@ class UnifiedExchangeClient(BaseExchangeClient):
         
         try:
             if not self.markets:
+                await self._wait_for_rate_limit('default')
                 self.markets = await self.exchange.load_markets()
             
             # Фильтруем только USDT пары и активные
@@ -1202,6 +1190,8 @@ class UnifiedExchangeClient(BaseExchangeClient):
             return False
         
         try:
+            await self._wait_for_rate_limit('default')
+            
             # ✅ ИСПРАВЛЕНО: используем run_in_executor для синхронного метода
             loop = asyncio.get_event_loop()
             await loop.run_in_executor(None, self.exchange.fetch_time)
@@ -15,8 +15,12 @@ from .unified_indicators import (
     CDL3WHITESOLDIERS, CDL3BLACKCROWS, CDL3INSIDE,
     AVGPRICE, MEDPRICE, TYPPRICE, WCLPRICE,
     LINEARREG, LINEARREG_ANGLE, LINEARREG_SLOPE,
-    STDDEV, TSF, VAR, USE_TALIB, HAS_PANDAS_TA
+    STDDEV, TSF, VAR, USE_TALIB, HAS_PANDAS_TA,
+    IncrementalIndicator, IncrementalEMA, IncrementalRSI, IncrementalMACD,
+    IncrementalBollingerBands, IncrementalATR, IncrementalADX, IncrementalOBV,
+    IncrementalStochastic, IncrementalMFI, INCREMENTAL_INDICATORS, IndicatorStream
 )
+from .indicator_cache import IndicatorCache, indicator_cache
 
 # Алиасы для совместимости
 TechnicalIndicators = UnifiedIndicators
@@ -34,5 +38,9 @@ __all__ = [
     'CDL3WHITESOLDIERS', 'CDL3BLACKCROWS', 'CDL3INSIDE',
     'AVGPRICE', 'MEDPRICE', 'TYPPRICE', 'WCLPRICE',
     'LINEARREG', 'LINEARREG_ANGLE', 'LINEARREG_SLOPE',
-    'STDDEV', 'TSF', 'VAR', 'USE_TALIB', 'HAS_PANDAS_TA'
+    'STDDEV', 'TSF', 'VAR', 'USE_TALIB', 'HAS_PANDAS_TA',
+    'IncrementalIndicator', 'IncrementalEMA', 'IncrementalRSI', 'IncrementalMACD',
+    'IncrementalBollingerBands', 'IncrementalATR', 'IncrementalADX', 'IncrementalOBV',
+    'IncrementalStochastic', 'IncrementalMFI', 'INCREMENTAL_INDICATORS', 'IndicatorStream',
+    'IndicatorCache', 'indicator_cache'
 ]
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Общий кэш индикаторов для стратегий
+Файл: src/indicators/indicator_cache.py
+
+За один проход поиска возможностей все стратегии получают один и тот же
+DataFrame по паре. Кэш позволяет посчитать RSI/MACD/ATR/Bollinger один раз
+и отдать результат всем стратегиям. Ключ:
+(symbol, timeframe, время последней свечи, индикатор, параметры).
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAXSIZE = 4096
+
+
+def _normalize_params(params: Optional[Dict[str, Any]]) -> Tuple:
+    """Параметры индикатора в виде хэшируемого кортежа"""
+    if not params:
+        return ()
+    return tuple(sorted(params.items()))
+
+
+class IndicatorCache:
+    """
+    LRU-кэш результатов индикаторов.
+
+    DataFrame должен нести в df.attrs ключи 'symbol' и 'timeframe'
+    (их проставляет анализ рынка). Для кадров без этих атрибутов
+    индикатор просто считается без кэширования.
+
+    Закэшированные Series/DataFrame общие для всех стратегий —
+    их нельзя изменять на месте.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._data: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncached = 0
+
+    @staticmethod
+    def frame_key(df: pd.DataFrame) -> Optional[Tuple]:
+        """
+        Ключ данных DataFrame: (symbol, timeframe, время последней свечи, ревизия).
+
+        Ревизия (длина, close и volume последней свечи) отличает
+        обновленную незакрытую свечу и укороченные срезы того же кадра.
+        """
+        if df is None or df.empty:
+            return None
+        symbol = df.attrs.get('symbol')
+        timeframe = df.attrs.get('timeframe')
+        if not symbol or not timeframe:
+            return None
+        try:
+            if 'timestamp' in df.columns:
+                last_time = df['timestamp'].iloc[-1]
+            else:
+                last_time = df.index[-1]
+            last_time = pd.Timestamp(last_time).value if not isinstance(last_time, (int, float)) else last_time
+            revision = (len(df), float(df['close'].iloc[-1]),
+                        float(df['volume'].iloc[-1]) if 'volume' in df.columns else 0.0)
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None
+        return symbol, timeframe, last_time, revision
+
+    def get_or_compute(self, df: pd.DataFrame, indicator: str, compute: Callable[[], Any],
+                       params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Значение индикатора из кэша или результат compute().
+
+        Args:
+            df: Свечи пары с df.attrs['symbol'] и df.attrs['timeframe']
+            indicator: Имя индикатора (одно имя = одна формула для всех стратегий)
+            compute: Функция расчета без аргументов
+            params: Параметры индикатора, входящие в ключ
+        """
+        frame_key = self.frame_key(df)
+        if frame_key is None:
+            self.uncached += 1
+            return compute()
+
+        key = frame_key + (indicator, _normalize_params(params))
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+
+        # Считаем вне блокировки: параллельный промах лишь посчитает то же самое
+        value = compute()
+
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Сброс кэша целиком или по одной паре"""
+        with self._lock:
+            if symbol is None:
+                self._data.clear()
+            else:
+                for key in [k for k in self._data if k[0] == symbol]:
+                    del self._data[key]
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = self.uncached = 0
+
+    def get_statistics(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'uncached': self.uncached,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
+
+
+# Глобальный экземпляр, общий для всех стратегий
+indicator_cache = IndicatorCache()
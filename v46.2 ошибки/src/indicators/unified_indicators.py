@@ -6,6 +6,10 @@
 
 Файл: src/indicators/unified_indicators.py
 """
+import copy
+import math
+from collections import deque
+
 import pandas as pd
 import numpy as np
 from typing import Dict, Any, Optional, Tuple, List, Union
@@ -549,6 +553,730 @@ def CDL3INSIDE(open: Union[pd.Series, np.ndarray],
     else:
         return np.zeros_like(close, dtype=int)
 
+# ===== ИНКРЕМЕНТАЛЬНЫЕ (ПОТОКОВЫЕ) ИНДИКАТОРЫ =====
+#
+# Объекты хранят состояние и пересчитывают значение за O(1) на каждую
+# закрытую свечу вместо полного пересчета по истории. Формулы повторяют
+# пакетные функции выше в том же режиме, что и они сами:
+# - talib=True: семантика TA-Lib (EMA с затравкой SMA, RSI/ATR/ADX по
+#   Уайлдеру, std Bollinger с ddof=0, первые значения на тех же индексах)
+# - talib=False: ручные реализации (скользящие средние, ewm)
+# По умолчанию (talib=None) режим берется из USE_TALIB, поэтому после seed()
+# по истории значения совпадают с RSI()/ATR()/... в пределах погрешности float.
+
+_CANDLE_LIST_INDEX = {'timestamp': 0, 'open': 1, 'high': 2, 'low': 3, 'close': 4, 'volume': 5}
+
+
+def _candle_value(candle: Any, field: str) -> float:
+    """Значение поля свечи (словарь, pd.Series, список [ts, o, h, l, c, v] или число-close)"""
+    if isinstance(candle, (int, float, np.number)):
+        return float(candle)
+    if isinstance(candle, (list, tuple)):
+        return float(candle[_CANDLE_LIST_INDEX[field]])
+    return float(candle[field])
+
+
+def _safe_div(numerator: float, denominator: float) -> float:
+    """Деление с семантикой NumPy: x/0 -> ±inf, 0/0 -> nan"""
+    if denominator == 0:
+        if numerator == 0 or math.isnan(numerator):
+            return math.nan
+        return math.copysign(math.inf, numerator)
+    return numerator / denominator
+
+
+def _talib_is_zero(value: float) -> bool:
+    """TA_IS_ZERO из TA-Lib"""
+    return -0.00000001 < value < 0.00000001
+
+
+def _wilder(previous: float, value: float, period: int) -> float:
+    """Сглаживание Уайлдера в порядке операций TA-Lib"""
+    return (previous * (period - 1) + value) / period
+
+
+class _RollingWindow:
+    """Скользящее окно фиксированного размера с O(1) суммой и учетом NaN"""
+
+    __slots__ = ('size', 'values', 'total', 'nan_count', '_updates', '_last', '_same')
+
+    def __init__(self, size: int):
+        self.size = int(size)
+        self.values: deque = deque()
+        self.total = 0.0
+        self.nan_count = 0
+        self._updates = 0
+        self._last = math.nan
+        self._same = 0
+
+    def push(self, value: float):
+        if len(self.values) == self.size:
+            old = self.values.popleft()
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self.total -= old
+        self.values.append(value)
+        if math.isnan(value):
+            self.nan_count += 1
+        else:
+            self.total += value
+
+        # Окно из одинаковых значений (например, нулей на плоском участке)
+        # суммируем точно, как rolling().sum(): остаток вычитаний дал бы 1e-12 вместо 0
+        self._same = self._same + 1 if value == self._last else 1
+        self._last = value
+        if self._same >= self.size:
+            self.total = value * self.size
+
+        # Периодически пересчитываем сумму точно, чтобы не копилась ошибка
+        self._updates += 1
+        if self._updates >= self.size * 8:
+            self._updates = 0
+            self.total = math.fsum(v for v in self.values if not math.isnan(v))
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.size
+
+    def sum(self) -> float:
+        """Сумма окна (NaN, пока окно не заполнено или содержит NaN — как rolling().sum())"""
+        if len(self.values) < self.size or self.nan_count:
+            return math.nan
+        return self.total
+
+    def mean(self) -> float:
+        return self.sum() / self.size
+
+
+class _RollingExtreme:
+    """Скользящий минимум/максимум на монотонной очереди (амортизированно O(1))"""
+
+    __slots__ = ('size', 'is_max', '_queue', '_index')
+
+    def __init__(self, size: int, is_max: bool):
+        self.size = int(size)
+        self.is_max = is_max
+        self._queue: deque = deque()
+        self._index = 0
+
+    def push(self, value: float) -> float:
+        queue = self._queue
+        if self.is_max:
+            while queue and queue[-1][1] <= value:
+                queue.pop()
+        else:
+            while queue and queue[-1][1] >= value:
+                queue.pop()
+        queue.append((self._index, value))
+        if queue[0][0] <= self._index - self.size:
+            queue.popleft()
+        self._index += 1
+        if self._index < self.size:
+            return math.nan
+        return queue[0][1]
+
+
+class IncrementalIndicator:
+    """
+    Базовый класс потокового индикатора.
+
+    Наследники задают `fields` (нужные поля свечи) и `_step(*values)`,
+    который обновляет состояние за O(1). `value` — основное значение,
+    `values` — все выходы индикатора; до накопления периода они NaN.
+    `talib` — режим формул (None: как у пакетных функций, по USE_TALIB).
+    """
+
+    name = 'indicator'
+    fields: Tuple[str, ...] = ('close',)
+
+    def __init__(self, talib: Optional[bool] = None):
+        self.talib = USE_TALIB if talib is None else bool(talib)
+        self.count = 0
+        self.value = math.nan
+
+    def update(self, candle: Any) -> float:
+        """Учет одной закрытой свечи"""
+        self.count += 1
+        self._step(*(_candle_value(candle, field) for field in self.fields))
+        return self.value
+
+    def seed(self, history: Any) -> 'IncrementalIndicator':
+        """
+        Прогрев по истории: DataFrame, dict массивов (CandleStore.view)
+        или серия цен закрытия для индикаторов только по close.
+        """
+        if history is None:
+            return self
+        if self.fields == ('close',) and not isinstance(history, (pd.DataFrame, dict)):
+            columns = [np.asarray(history, dtype=np.float64).tolist()]
+        else:
+            columns = [np.asarray(history[field], dtype=np.float64).tolist() for field in self.fields]
+        step = self._step
+        for row in zip(*columns):
+            self.count += 1
+            step(*row)
+        return self
+
+    @property
+    def is_ready(self) -> bool:
+        return not math.isnan(self.value)
+
+    @property
+    def values(self) -> Dict[str, float]:
+        return {self.name: self.value}
+
+    def _step(self, *values: float):
+        raise NotImplementedError
+
+
+class IncrementalEMA(IncrementalIndicator):
+    """
+    EMA. TA-Lib: затравка — SMA первых period значений.
+    Без TA-Lib: adjust=False совпадает с EMA(), adjust=True — с Series.ewm(span).mean()
+    """
+
+    name = 'ema'
+
+    def __init__(self, period: int = 30, adjust: bool = False, talib: Optional[bool] = None):
+        super().__init__(talib)
+        self.period = period
+        self.adjust = adjust
+        self.alpha = 2.0 / (period + 1)
+        self._beta = 1.0 - self.alpha
+        self._numerator = 0.0
+        self._denominator = 0.0
+        self._seen = 0
+
+    def _step(self, close: float):
+        if self.talib:
+            self._seen += 1
+            if self._seen < self.period:
+                self._numerator += close
+            elif self._seen == self.period:
+                self.value = (self._numerator + close) / self.period
+            else:
+                self.value = (close - self.value) * self.alpha + self.value
+        elif self.adjust:
+            self._numerator = close + self._beta * self._numerator
+            self._denominator = 1.0 + self._beta * self._denominator
+            self.value = self._numerator / self._denominator
+        elif math.isnan(self.value):
+            self.value = close
+        else:
+            self.value = self.alpha * close + self._beta * self.value
+
+
+class IncrementalRSI(IncrementalIndicator):
+    """
+    RSI. TA-Lib: средние приростов/потерь по Уайлдеру с затравкой SMA,
+    первое значение на свече period. Без TA-Lib: скользящие средние (как RSI())
+    """
+
+    name = 'rsi'
+
+    def __init__(self, period: int = 14, talib: Optional[bool] = None):
+        super().__init__(talib)
+        self.period = period
+        self._gains = _RollingWindow(period)
+        self._losses = _RollingWindow(period)
+        self._prev_close: Optional[float] = None
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._seen = 0
+
+    def _step(self, close: float):
+        if self.talib:
+            self._talib_step(close)
+            return
+        delta = close - self._prev_close if self._prev_close is not None else 0.0
+        self._prev_close = close
+        self._gains.push(delta if delta > 0 else 0.0)
+        self._losses.push(-delta if delta < 0 else 0.0)
+        rs = _safe_div(self._gains.mean(), self._losses.mean())
+        self.value = 100.0 if math.isinf(rs) else 100 - (100 / (1 + rs))
+
+    def _talib_step(self, close: float):
+        prev = self._prev_close
+        self._prev_close = close
+        if prev is None:
+            return
+        delta = close - prev
+        gain = delta if delta >= 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        self._seen += 1
+        if self._seen <= self.period:
+            self._avg_gain += gain
+            self._avg_loss += loss
+            if self._seen < self.period:
+                return
+            self._avg_gain /= self.period
+            self._avg_loss /= self.period
+        else:
+            self._avg_gain = _wilder(self._avg_gain, gain, self.period)
+            self._avg_loss = _wilder(self._avg_loss, loss, self.period)
+        total = self._avg_gain + self._avg_loss
+        self.value = 0.0 if _talib_is_zero(total) else 100.0 * (self._avg_gain / total)
+
+
+class IncrementalMACD(IncrementalIndicator):
+    """
+    MACD. TA-Lib: EMA с затравкой SMA, быстрая EMA начинается так, чтобы
+    совпасть с медленной, все три выхода появляются вместе с сигнальной линией.
+    Без TA-Lib: скорректированные EMA (как MACD())
+    """
+
+    name = 'macd'
+
+    def __init__(self, fastperiod: int = 12, slowperiod: int = 26, signalperiod: int = 9,
+                 talib: Optional[bool] = None):
+        super().__init__(talib)
+        adjust = not self.talib
+        self._fast = IncrementalEMA(fastperiod, adjust=adjust, talib=self.talib)
+        self._slow = IncrementalEMA(slowperiod, adjust=adjust, talib=self.talib)
+        self._signal = IncrementalEMA(signalperiod, adjust=adjust, talib=self.talib)
+        self._fast_skip = max(slowperiod - fastperiod, 0) if self.talib else 0
+        self.signal = math.nan
+        self.histogram = math.nan
+
+    def _step(self, close: float):
+        if self._fast_skip:
+            self._fast_skip -= 1
+        else:
+            self._fast._step(close)
+        self._slow._step(close)
+        macd = self._fast.value - self._slow.value
+        if self.talib and math.isnan(macd):
+            return
+        self._signal._step(macd)
+        if self.talib and math.isnan(self._signal.value):
+            return
+        self.value = macd
+        self.signal = self._signal.value
+        self.histogram = self.value - self.signal
+
+    @property
+    def values(self) -> Dict[str, float]:
+        return {'macd': self.value, 'signal': self.signal, 'histogram': self.histogram}
+
+
+class IncrementalBollingerBands(IncrementalIndicator):
+    """
+    Bollinger Bands: скользящие среднее и std по схеме Уэлфорда.
+    TA-Lib считает std с ddof=0, ручная реализация — с ddof=1
+    """
+
+    name = 'bollinger'
+
+    def __init__(self, period: int = 20, nbdevup: float = 2, nbdevdn: float = 2,
+                 talib: Optional[bool] = None):
+        super().__init__(talib)
+        self.period = period
+        self.nbdevup = nbdevup
+        self.nbdevdn = nbdevdn
+        self.ddof = 0 if self.talib else 1
+        self._window: deque = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._updates = 0
+        self.upper = math.nan
+        self.lower = math.nan
+
+    def _step(self, close: float):
+        window = self._window
+        if len(window) < self.period:
+            window.append(close)
+            delta = close - self._mean
+            self._mean += delta / len(window)
+            self._m2 += delta * (close - self._mean)
+        else:
+            old = window.popleft()
+            window.append(close)
+            new_mean = self._mean + (close - old) / self.period
+            self._m2 += (close - old) * (close - new_mean + old - self._mean)
+            self._mean = new_mean
+            self._updates += 1
+            if self._updates >= self.period * 8:
+                self._updates = 0
+                self._mean = math.fsum(window) / self.period
+                self._m2 = math.fsum((v - self._mean) ** 2 for v in window)
+
+        if len(window) < self.period:
+            return
+        std = math.sqrt(max(self._m2, 0.0) / (self.period - self.ddof))
+        self.value = self._mean
+        self.upper = self._mean + std * self.nbdevup
+        self.lower = self._mean - std * self.nbdevdn
+
+    @property
+    def values(self) -> Dict[str, float]:
+        return {'upper': self.upper, 'middle': self.value, 'lower': self.lower}
+
+
+class IncrementalATR(IncrementalIndicator):
+    """
+    ATR. TA-Lib: затравка — среднее TR свечей 1..period, дальше сглаживание
+    Уайлдера. Без TA-Lib: скользящее среднее True Range (как ATR())
+    """
+
+    name = 'atr'
+    fields = ('high', 'low', 'close')
+
+    def __init__(self, period: int = 14, talib: Optional[bool] = None):
+        super().__init__(talib)
+        self.period = period
+        self._tr = _RollingWindow(period)
+        self._prev_close: Optional[float] = None
+        self._tr_sum = 0.0
+        self._seen = 0
+
+    def _step(self, high: float, low: float, close: float):
+        prev_close = self._prev_close
+        self._prev_close = close
+        true_range = high - low
+        if prev_close is not None:
+            true_range = max(true_range, abs(high - prev_close), abs(low - prev_close))
+        if not self.talib:
+            self._tr.push(true_range)
+            self.value = self._tr.mean()
+            return
+
+        # В TA-Lib TR первой свечи не учитывается
+        if prev_close is None:
+            return
+        self._seen += 1
+        if self._seen < self.period:
+            self._tr_sum += true_range
+        elif self._seen == self.period:
+            self.value = (self._tr_sum + true_range) / self.period
+        else:
+            self.value = _wilder(self.value, true_range, self.period)
+
+
+class IncrementalADX(IncrementalIndicator):
+    """
+    ADX с +DI/-DI. TA-Lib: суммы Уайлдера (DI с свечи period, ADX с 2*period-1).
+    Без TA-Lib: скользящие средние (как ADX())
+    """
+
+    name = 'adx'
+    fields = ('high', 'low', 'close')
+
+    def __init__(self, period: int = 14, talib: Optional[bool] = None):
+        super().__init__(talib)
+        self.period = period
+        self._tr = _RollingWindow(period)
+        self._dm_plus = _RollingWindow(period)
+        self._dm_minus = _RollingWindow(period)
+        self._dx = _RollingWindow(period)
+        self._prev: Optional[Tuple[float, float, float]] = None
+        self._sum_tr = 0.0
+        self._sum_plus = 0.0
+        self._sum_minus = 0.0
+        self._sum_dx = 0.0
+        self._seen = 0
+        self.plus_di = math.nan
+        self.minus_di = math.nan
+
+    def _step(self, high: float, low: float, close: float):
+        prev = self._prev
+        self._prev = (high, low, close)
+        if prev is None:
+            # В пакетной версии TR первого бара NaN: окна начинаются со второго бара
+            return
+        if self.talib:
+            self._talib_step(high, low, prev)
+            return
+        prev_high, prev_low, prev_close = prev
+
+        up_move = high - prev_high
+        down_move = prev_low - low
+        self._tr.push(max(high - low, abs(high - prev_close), abs(low - prev_close)))
+        self._dm_plus.push(max(up_move, 0.0) if up_move > down_move else 0.0)
+        self._dm_minus.push(max(down_move, 0.0) if down_move > up_move else 0.0)
+        if not self._tr.full:
+            return
+
+        atr = self._tr.mean()
+        self.plus_di = 100 * _safe_div(self._dm_plus.mean(), atr)
+        self.minus_di = 100 * _safe_div(self._dm_minus.mean(), atr)
+        dx = 100 * _safe_div(abs(self.plus_di - self.minus_di), self.plus_di + self.minus_di)
+        self._dx.push(dx)
+        self.value = self._dx.mean()
+
+    def _talib_step(self, high: float, low: float, prev: Tuple[float, float, float]):
+        prev_high, prev_low, prev_close = prev
+        period = self.period
+        diff_plus = high - prev_high
+        diff_minus = prev_low - low
+        dm_plus = diff_plus if diff_plus > 0 and diff_plus > diff_minus else 0.0
+        dm_minus = diff_minus if diff_minus > 0 and diff_plus < diff_minus else 0.0
+        true_range = max(high - low, abs(prev_close - high), abs(low - prev_close))
+
+        self._seen += 1
+        if self._seen < period:
+            self._sum_plus += dm_plus
+            self._sum_minus += dm_minus
+            self._sum_tr += true_range
+            return
+        self._sum_plus = self._sum_plus - self._sum_plus / period + dm_plus
+        self._sum_minus = self._sum_minus - self._sum_minus / period + dm_minus
+        self._sum_tr = self._sum_tr - self._sum_tr / period + true_range
+
+        dx = math.nan
+        if _talib_is_zero(self._sum_tr):
+            self.plus_di = self.minus_di = 0.0
+        else:
+            self.plus_di = 100.0 * (self._sum_plus / self._sum_tr)
+            self.minus_di = 100.0 * (self._sum_minus / self._sum_tr)
+            di_sum = self.plus_di + self.minus_di
+            if not _talib_is_zero(di_sum):
+                dx = 100.0 * (abs(self.minus_di - self.plus_di) / di_sum)
+
+        # Первые period значений DX усредняются, дальше - сглаживание Уайлдера
+        if self._seen < 2 * period - 1:
+            if not math.isnan(dx):
+                self._sum_dx += dx
+        elif self._seen == 2 * period - 1:
+            if not math.isnan(dx):
+                self._sum_dx += dx
+            self.value = self._sum_dx / period
+        elif not math.isnan(dx):
+            self.value = _wilder(self.value, dx, period)
+
+    @property
+    def values(self) -> Dict[str, float]:
+        return {'adx': self.value, 'plus_di': self.plus_di, 'minus_di': self.minus_di}
+
+
+class IncrementalOBV(IncrementalIndicator):
+    """On Balance Volume (одинаков в TA-Lib и ручной реализации)"""
+
+    name = 'obv'
+    fields = ('close', 'volume')
+
+    def __init__(self, talib: Optional[bool] = None):
+        super().__init__(talib)
+        self._prev_close: Optional[float] = None
+
+    def _step(self, close: float, volume: float):
+        if self._prev_close is None:
+            self.value = volume
+        elif close > self._prev_close:
+            self.value += volume
+        elif close < self._prev_close:
+            self.value -= volume
+        self._prev_close = close
+
+
+class IncrementalStochastic(IncrementalIndicator):
+    """
+    Stochastic Oscillator.
+
+    STOCH(fastk_period, slowk_period, slowd_period) соответствует
+    IncrementalStochastic(fastk_period, slowd_period, smooth_k=slowk_period);
+    smooth_k=1 без TA-Lib совпадает с UnifiedIndicators.stochastic.
+    В режиме TA-Lib %K при нулевом диапазоне равен 0, а %K и %D появляются вместе.
+    """
+
+    name = 'stochastic'
+    fields = ('high', 'low', 'close')
+
+    def __init__(self, k_period: int = 14, d_period: int = 3, smooth_k: int = 1,
+                 talib: Optional[bool] = None):
+        super().__init__(talib)
+        self.k_period = k_period
+        self.d_period = d_period
+        self.smooth_k = smooth_k
+        self._highest = _RollingExtreme(k_period, is_max=True)
+        self._lowest = _RollingExtreme(k_period, is_max=False)
+        self._k_window = _RollingWindow(smooth_k) if smooth_k > 1 else None
+        self._d_window = _RollingWindow(d_period)
+        self.d = math.nan
+
+    def _step(self, high: float, low: float, close: float):
+        highest_high = self._highest.push(high)
+        lowest_low = self._lowest.push(low)
+        if self.talib:
+            if math.isnan(highest_high):
+                return
+            price_range = (highest_high - lowest_low) / 100.0
+            k = (close - lowest_low) / price_range if price_range != 0.0 else 0.0
+        else:
+            k = 100 * _safe_div(close - lowest_low, highest_high - lowest_low)
+        if self._k_window is not None:
+            self._k_window.push(k)
+            k = self._k_window.mean()
+            if self.talib and math.isnan(k):
+                return
+        self._d_window.push(k)
+        self.d = self._d_window.mean()
+        if self.talib and math.isnan(self.d):
+            return
+        self.value = k
+
+    @property
+    def values(self) -> Dict[str, float]:
+        return {'k': self.value, 'd': self.d}
+
+
+class IncrementalMFI(IncrementalIndicator):
+    """
+    Money Flow Index. TA-Lib: окно из period потоков начиная со второй свечи,
+    при сумме потоков < 1 значение 0. Без TA-Lib: как MFI()
+    """
+
+    name = 'mfi'
+    fields = ('high', 'low', 'close', 'volume')
+
+    def __init__(self, period: int = 14, talib: Optional[bool] = None):
+        super().__init__(talib)
+        self.period = period
+        self._positive = _RollingWindow(period)
+        self._negative = _RollingWindow(period)
+        self._prev_typical: Optional[float] = None
+
+    def _step(self, high: float, low: float, close: float, volume: float):
+        typical_price = (high + low + close) / 3
+        money_flow = typical_price * volume
+        prev = self._prev_typical
+        self._prev_typical = typical_price
+        if self.talib and prev is None:
+            return
+        self._positive.push(money_flow if prev is not None and typical_price > prev else 0.0)
+        self._negative.push(money_flow if prev is not None and typical_price < prev else 0.0)
+        if self.talib:
+            if not self._positive.full:
+                return
+            positive, negative = self._positive.sum(), self._negative.sum()
+            total = positive + negative
+            self.value = 0.0 if total < 1.0 else 100.0 * (positive / total)
+            return
+        money_ratio = _safe_div(self._positive.sum(), self._negative.sum())
+        self.value = 100.0 if math.isinf(money_ratio) else 100 - (100 / (1 + money_ratio))
+
+
+INCREMENTAL_INDICATORS = {
+    'ema': IncrementalEMA,
+    'rsi': IncrementalRSI,
+    'macd': IncrementalMACD,
+    'bollinger': IncrementalBollingerBands,
+    'atr': IncrementalATR,
+    'adx': IncrementalADX,
+    'obv': IncrementalOBV,
+    'stochastic': IncrementalStochastic,
+    'mfi': IncrementalMFI,
+}
+
+
+class IndicatorStream:
+    """
+    Набор потоковых индикаторов для одной пары (symbol, timeframe).
+
+    Запоминает время последней учтенной свечи, поэтому sync() по срезу
+    CandleStore докармливает индикаторам только новые свечи.
+    """
+
+    def __init__(self, indicators: Optional[Dict[str, IncrementalIndicator]] = None):
+        self.indicators: Dict[str, IncrementalIndicator] = dict(indicators or {})
+        self.last_timestamp: Optional[int] = None
+
+    @classmethod
+    def default(cls, talib: Optional[bool] = None) -> 'IndicatorStream':
+        """Стандартный набор индикаторов для анализа рынка"""
+        return cls({
+            'ema_20': IncrementalEMA(20, talib=talib),
+            'ema_50': IncrementalEMA(50, talib=talib),
+            'rsi': IncrementalRSI(14, talib=talib),
+            'macd': IncrementalMACD(talib=talib),
+            'bb': IncrementalBollingerBands(20, talib=talib),
+            'atr': IncrementalATR(14, talib=talib),
+            'adx': IncrementalADX(14, talib=talib),
+            'obv': IncrementalOBV(talib=talib),
+            'stoch': IncrementalStochastic(14, 3, talib=talib),
+            'mfi': IncrementalMFI(14, talib=talib),
+        })
+
+    def add(self, name: str, indicator: IncrementalIndicator) -> IncrementalIndicator:
+        self.indicators[name] = indicator
+        return indicator
+
+    def update(self, candle: Any, timestamp: Optional[int] = None) -> bool:
+        """Учет закрытой свечи; свечи не новее последней пропускаются"""
+        if timestamp is not None:
+            if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+                return False
+            self.last_timestamp = int(timestamp)
+        for indicator in self.indicators.values():
+            indicator.update(candle)
+        return True
+
+    def sync(self, view: Dict[str, np.ndarray], closed_only: bool = True) -> int:
+        """
+        Докормить новые свечи из CandleStore.view().
+
+        Args:
+            view: Колонки 'timestamp', 'open', 'high', 'low', 'close', 'volume'
+            closed_only: Не учитывать последнюю (незакрытую) свечу
+
+        Returns:
+            int: Количество учтенных свечей
+        """
+        if not view:
+            return 0
+        timestamps = view['timestamp']
+        end = len(timestamps) - 1 if closed_only else len(timestamps)
+        start = 0
+        if self.last_timestamp is not None:
+            start = int(np.searchsorted(timestamps[:end], self.last_timestamp, side='right'))
+        if start >= end:
+            return 0
+
+        chunk = {field: view[field][start:end] for field in ('open', 'high', 'low', 'close', 'volume')}
+        for indicator in self.indicators.values():
+            indicator.seed(chunk)
+        self.last_timestamp = int(timestamps[end - 1])
+        return end - start
+
+    def seed(self, history: pd.DataFrame) -> 'IndicatorStream':
+        """Прогрев по истории из DataFrame с DatetimeIndex или колонкой 'timestamp'"""
+        if history is None or len(history) == 0:
+            return self
+        for indicator in self.indicators.values():
+            indicator.seed(history)
+        ts = history['timestamp'] if 'timestamp' in history.columns else history.index.to_series()
+        if pd.api.types.is_datetime64_any_dtype(ts):
+            self.last_timestamp = int(pd.Timestamp(ts.iloc[-1]).value // 1_000_000)
+        else:
+            self.last_timestamp = int(ts.iloc[-1])
+        return self
+
+    @property
+    def is_ready(self) -> bool:
+        return all(indicator.is_ready for indicator in self.indicators.values())
+
+    def snapshot(self) -> Dict[str, float]:
+        """Текущие значения в плоском виде: 'rsi', 'macd_signal', 'bb_upper', ..."""
+        result = {}
+        for name, indicator in self.indicators.items():
+            values = indicator.values
+            if len(values) == 1:
+                result[name] = indicator.value
+            else:
+                for key, value in values.items():
+                    result[f"{name}_{key}"] = value
+        return result
+
+    def preview(self, candle: Any) -> Dict[str, float]:
+        """
+        Значения с учетом незакрытой свечи без изменения состояния потока.
+        Копируется только состояние индикаторов (O(период)), а не история.
+        """
+        stream = IndicatorStream(copy.deepcopy(self.indicators))
+        for indicator in stream.indicators.values():
+            indicator.update(candle)
+        return stream.snapshot()
+
 # ===== ОСНОВНОЙ КЛАСС ТЕХНИЧЕСКИХ ИНДИКАТОРОВ =====
 
 class UnifiedIndicators:
@@ -819,7 +1547,12 @@ __all__ = [
     'CDL3WHITESOLDIERS', 'CDL3BLACKCROWS', 'CDL3INSIDE',
     'AVGPRICE', 'MEDPRICE', 'TYPPRICE', 'WCLPRICE',
     'LINEARREG', 'LINEARREG_ANGLE', 'LINEARREG_SLOPE',
-    'STDDEV', 'TSF', 'VAR', 'USE_TALIB', 'HAS_PANDAS_TA'
+    'STDDEV', 'TSF', 'VAR', 'USE_TALIB', 'HAS_PANDAS_TA',
+
+    # Инкрементальные индикаторы
+    'IncrementalIndicator', 'IncrementalEMA', 'IncrementalRSI', 'IncrementalMACD',
+    'IncrementalBollingerBands', 'IncrementalATR', 'IncrementalADX', 'IncrementalOBV',
+    'IncrementalStochastic', 'IncrementalMFI', 'INCREMENTAL_INDICATORS', 'IndicatorStream'
 ]
 
 # Алиасы для обратной совместимости
@@ -7,6 +7,7 @@ Smart Logger - ИСПРАВЛЕННАЯ ВЕРСИЯ
 - Исправлена инициализация базы данных
 - Добавлены проверки состояния
 - Исправлены утечки памяти
+- Логи пишутся в БД пачками из отдельного потока, очередь ограничена
 /src/logging/smart_logger.py
 
 
@@ -15,11 +16,12 @@ Smart Logger - ИСПРАВЛЕННАЯ ВЕРСИЯ
 import logging
 import asyncio
 import json
+import os
 import time
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
 from dataclasses import dataclass, asdict
-from collections import deque
+from collections import defaultdict, deque
 import threading
 from contextlib import asynccontextmanager
 
@@ -56,9 +58,50 @@ class LogEntry:
     strategy: Optional[str] = None
     context: Optional[Dict[str, Any]] = None
 
+# Параметры записи логов в БД
+LOG_QUEUE_SIZE = int(os.getenv('LOG_DB_QUEUE_SIZE', '10000'))
+LOG_BATCH_SIZE = int(os.getenv('LOG_DB_BATCH_SIZE', '500'))
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_DB_FLUSH_INTERVAL', '2.0'))  # секунд
+HEALTH_CHECK_INTERVAL = 120.0  # секунд между проверками БД
+HEALTH_RETRY_INTERVAL = 10.0  # секунд между попытками после ошибки БД
+
+# Заполнение очереди, после которого уровень перестает приниматься целиком:
+# DEBUG отбрасывается, INFO прореживается (каждая SAMPLE_EVERY-я запись категории).
+# WARNING принимается до заполнения очереди, ERROR/CRITICAL вытесняют самую старую запись.
+SHED_THRESHOLDS = {'DEBUG': 0.5, 'INFO': 0.8}
+SAMPLE_EVERY = 10
+PRIORITY_LEVELS = ('ERROR', 'CRITICAL')
+
+
+def _log_row(entry: LogEntry) -> Dict[str, Any]:
+    """Строка таблицы trading_logs для пакетного INSERT"""
+    trade_id = entry.trade_id
+    context = entry.context
+    if trade_id is not None and not str(trade_id).isdigit():
+        context = dict(context or {}, trade_id=trade_id)
+        trade_id = None
+    if context is not None:
+        # Значения, которые не сериализуются в JSON, не должны ронять всю пачку
+        context = json.loads(json.dumps(context, default=str))
+    return {
+        'created_at': entry.created_at,
+        'log_level': entry.level,
+        'category': entry.category,
+        'message': entry.message,
+        'symbol': entry.symbol,
+        'trade_id': int(trade_id) if trade_id is not None else None,
+        'strategy': entry.strategy,
+        'context': context,
+    }
+
+
 class DatabaseLogWriter:
     """
-    ✅ ИСПРАВЛЕНО: Записывает логи в базу данных без множественных запусков
+    Запись логов в БД из отдельного потока.
+
+    add_log только кладет запись в ограниченную очередь и не ждет БД;
+    поток пишет накопленное пачками (один INSERT executemany на пачку).
+    При переполнении очереди сначала теряются DEBUG и INFO, ошибки - последними.
     """
     
     # ✅ ИСПРАВЛЕНИЕ: Singleton pattern для предотвращения множественных экземпляров
@@ -74,58 +117,52 @@ class DatabaseLogWriter:
         if self._initialized:
             return
             
-        self.db = None
         self.is_running = False
-        self.queue = deque(maxlen=1000)  # Ограничиваем размер очереди
-        self.batch_size = 10
-        self.flush_interval = 5.0  # секунд
-        self.task = None
-        self.shutdown_event = asyncio.Event() if self._event_loop_available() else None
-        self._last_health_check = 0
-        self._db_initialized = False
+        self.max_queue = LOG_QUEUE_SIZE
+        self.queue = deque()
+        self.batch_size = LOG_BATCH_SIZE
+        self.flush_interval = LOG_FLUSH_INTERVAL
         self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_requested = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._healthy = False
+        self._last_health_check = 0.0
+        self._sample_counters: Dict[Tuple[str, str], int] = defaultdict(int)
+        
+        # Счетчики
+        self.enqueued = 0
+        self.written = 0
+        self.dropped: Dict[str, int] = defaultdict(int)
+        self.dropped_by_category: Dict[str, int] = defaultdict(int)
+        self.write_errors = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
         
         DatabaseLogWriter._initialized = True
         print("✅ DatabaseLogWriter инициализирован (singleton)")
     
-    @staticmethod
-    def _event_loop_available() -> bool:
-        """Проверка доступности event loop"""
-        try:
-            asyncio.get_event_loop()
-            return True
-        except RuntimeError:
-            return False
-    
     async def start(self):
-        """✅ ИСПРАВЛЕНО: Запуск writer с проверкой состояния"""
+        """Запуск потока записи"""
         with self._lock:
             if self.is_running:
                 print("⚠️ DatabaseLogWriter уже запущен, пропускаем")
                 return
             
-            self.is_running = True
-            print("🚀 Запуск DatabaseLogWriter...")
-        
-        try:
-            await self._init_database()
+            if not (DATABASE_AVAILABLE and SessionLocal and MODELS_AVAILABLE and SQLALCHEMY_AVAILABLE):
+                print("⚠️ DatabaseLogWriter: База данных недоступна, работаем без БД")
+                return
             
-            # Запускаем только если БД доступна
-            if self._db_initialized:
-                if self.shutdown_event:
-                    self.shutdown_event.clear()
-                
-                self.task = asyncio.create_task(self._write_loop())
-                print("✅ DatabaseLogWriter запущен успешно")
-            else:
-                print("⚠️ DatabaseLogWriter запущен без БД (только в память)")
-        
-        except Exception as e:
-            print(f"❌ Ошибка запуска DatabaseLogWriter: {e}")
-            self.is_running = False
+            self.is_running = True
+            self._stop_requested.clear()
+            self._thread = threading.Thread(target=self._run, name="DatabaseLogWriter", daemon=True)
+            self._thread.start()
+            print("✅ DatabaseLogWriter запущен успешно")
     
     async def stop(self):
-        """✅ ИСПРАВЛЕНО: Остановка writer с корректной очисткой"""
+        """Остановка потока с дозаписью оставшихся логов"""
         with self._lock:
             if not self.is_running:
                 print("ℹ️ DatabaseLogWriter уже остановлен")
@@ -134,180 +171,138 @@ class DatabaseLogWriter:
             print("🛑 Остановка DatabaseLogWriter...")
             self.is_running = False
         
-        try:
-            # Сигнализируем о завершении
-            if self.shutdown_event:
-                self.shutdown_event.set()
-            
-            # Ждем завершения задачи
-            if self.task and not self.task.done():
-                try:
-                    await asyncio.wait_for(self.task, timeout=5.0)
-                except asyncio.TimeoutError:
-                    print("⚠️ Таймаут при остановке DatabaseLogWriter")
-                    self.task.cancel()
-            
-            # Финальная запись оставшихся логов
-            await self._flush_remaining_logs()
-            
-            # Закрытие БД соединения
-            if self.db:
-                try:
-                    self.db.close()
-                    self.db = None
-                except Exception as e:
-                    print(f"⚠️ Ошибка закрытия БД: {e}")
-            
-            self._db_initialized = False
-            print("✅ DatabaseLogWriter остановлен")
-            
-        except Exception as e:
-            print(f"❌ Ошибка остановки DatabaseLogWriter: {e}")
+        self._stop_requested.set()
+        self._wakeup.set()
+        if self._thread:
+            await asyncio.to_thread(self._thread.join, 10.0)
+            if self._thread.is_alive():
+                print("⚠️ Таймаут при остановке DatabaseLogWriter")
+            self._thread = None
+        print("✅ DatabaseLogWriter остановлен")
     
-    async def _init_database(self):
-        """✅ ИСПРАВЛЕНО: Инициализация подключения к БД"""
-        try:
-            if self._db_initialized:
-                return
-                
-            # Проверяем доступность компонентов
-            if not DATABASE_AVAILABLE or not SessionLocal:
-                print("⚠️ DatabaseLogWriter: База данных недоступна, работаем без БД")
-                self.db = None
-                self._db_initialized = False
-                return
-                
-            # Правильная инициализация SessionLocal
-            self.db = SessionLocal()
-            self._db_initialized = True
-            print("✅ DatabaseLogWriter: БД инициализирована успешно")
-            
-        except Exception as e:
-            # Безопасный fallback
-            self.db = None
-            self._db_initialized = False
-            print(f"❌ DatabaseLogWriter: Ошибка инициализации БД: {e}")
+    # === Поток записи ===
     
-    async def _write_loop(self):
-        """✅ ИСПРАВЛЕНО: Основной цикл записи логов"""
+    def _run(self):
         print("🔄 DatabaseLogWriter: Цикл записи запущен")
-        
         try:
-            while self.is_running:
-                try:
-                    # Проверяем сигнал завершения
-                    if self.shutdown_event and self.shutdown_event.is_set():
-                        print("📋 DatabaseLogWriter получил сигнал отмены")
+            while True:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                stopping = self._stop_requested.is_set()
+                
+                self._check_database_health()
+                while self._healthy:
+                    batch = self._take_batch()
+                    if not batch:
                         break
-                    
-                    # Собираем батч логов
-                    batch = []
-                    while len(batch) < self.batch_size and self.queue:
-                        batch.append(self.queue.popleft())
-                    
-                    # Записываем батч
-                    if batch:
-                        await self._write_logs_to_db(batch)
-                    
-                    # Проверка здоровья БД (периодически)
-                    await self._check_database_health()
-                    
-                    # Ждем следующую итерацию
-                    await asyncio.sleep(self.flush_interval)
-                    
-                except asyncio.CancelledError:
-                    print("🚫 DatabaseLogWriter отменен")
+                    self._write_batch(batch)
+                
+                if stopping:
                     break
-                except Exception as e:
-                    print(f"❌ Ошибка в цикле записи: {e}")
-                    await asyncio.sleep(1)  # Короткая пауза при ошибке
-        
+        except Exception as e:
+            print(f"❌ Ошибка в цикле записи: {e}")
         finally:
             print("🏁 DatabaseLogWriter: Цикл записи завершен")
     
-    async def _flush_remaining_logs(self):
-        """✅ ИСПРАВЛЕНО: Запись оставшихся логов при завершении"""
+    def _take_batch(self) -> List[LogEntry]:
+        with self._lock:
+            count = min(self.batch_size, len(self.queue))
+            return [self.queue.popleft() for _ in range(count)]
+    
+    def _write_batch(self, batch: List[LogEntry]):
+        started = time.perf_counter()
+        db = SessionLocal()
         try:
-            remaining_logs = list(self.queue)
-            if remaining_logs:
-                print(f"📝 Записываем {len(remaining_logs)} оставшихся логов")
-                await self._write_logs_to_db(remaining_logs)
-                self.queue.clear()
+            db.execute(TradingLog.__table__.insert(), [_log_row(entry) for entry in batch])
+            db.commit()
+            self.written += len(batch)
         except Exception as e:
-            print(f"❌ Ошибка записи оставшихся логов: {e}")
+            db.rollback()
+            self.write_errors += 1
+            for entry in batch:
+                self.dropped[entry.level] += 1
+            # Следующая попытка записи - после проверки БД
+            self._healthy = False
+            self._last_health_check = time.monotonic()
+            print(f"❌ Ошибка сохранения логов в БД ({len(batch)} записей потеряно): {e}")
+        finally:
+            db.close()
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
     
-    async def _write_logs_to_db(self, logs: List[LogEntry]):
-        """✅ ИСПРАВЛЕНО: Запись логов в базу данных"""
-        # Критичная проверка: Проверяем что БД инициализирована
-        if not self.db or not self._db_initialized:
+    def _check_database_health(self):
+        """Проверка БД раз в HEALTH_CHECK_INTERVAL (после ошибки - раз в HEALTH_RETRY_INTERVAL)"""
+        interval = HEALTH_CHECK_INTERVAL if self._healthy else HEALTH_RETRY_INTERVAL
+        now = time.monotonic()
+        if self._last_health_check and now - self._last_health_check < interval:
             return
+        self._last_health_check = now
         
-        if not SQLALCHEMY_AVAILABLE or not MODELS_AVAILABLE or not TradingLog or not logs:
-            return
-            
+        db = SessionLocal()
         try:
-            # Используем существующую сессию
-            for log_entry in logs:
-                # ✅ ИСПРАВЛЕНИЕ: Используем created_at вместо timestamp
-                db_log = TradingLog(
-                    created_at=log_entry.timestamp,
-                    level=log_entry.level,
-                    category=log_entry.category,
-                    message=log_entry.message,
-                    symbol=log_entry.symbol,
-                    trade_id=log_entry.trade_id,
-                    strategy=log_entry.strategy,
-                    context=json.dumps(log_entry.context) if log_entry.context else None
-                )
-                
-                self.db.add(db_log)
-            
-            # Коммитим изменения
-            self.db.commit()
-                
+            db.execute(text("SELECT 1"))
+            if not self._healthy:
+                print("✅ DatabaseLogWriter: БД доступна")
+            self._healthy = True
         except Exception as e:
-            print(f"❌ Ошибка сохранения лога в БД: {e}")
-            try:
-                self.db.rollback()
-            except:
-                pass
+            if self._healthy or self.flushes == 0:
+                print(f"⚠️ Проблема с БД: {e}")
+            self._healthy = False
+        finally:
+            db.close()
     
-    async def _check_database_health(self):
-        """✅ ИСПРАВЛЕНО: Проверка состояния БД"""
-        try:
-            # Проверяем каждые 2 минуты
-            current_time = time.time()
-            if current_time - self._last_health_check < 120:
-                return
-            
-            self._last_health_check = current_time
-            
-            # Простой запрос для проверки соединения
-            if self.db and self._db_initialized:
-                try:
-                    # Используем синхронный запрос
-                    self.db.execute(text("SELECT 1"))
-                except Exception as e:
-                    print(f"⚠️ Проблема с БД: {e}")
-                    # Пытаемся переподключиться
-                    try:
-                        await self._init_database()
-                    except Exception as init_error:
-                        print(f"❌ Не удалось переподключиться к БД: {init_error}")
-                    
-        except Exception as e:
-            print(f"❌ Ошибка проверки состояния БД: {e}")
+    # === Очередь ===
     
     def add_log(self, log_entry: LogEntry):
-        """Добавление записи лога в очередь"""
-        try:
-            if len(self.queue) >= self.queue.maxlen:
-                # Удаляем старые записи если очередь переполнена
-                self.queue.popleft()
+        """Добавление записи лога в очередь без ожидания БД"""
+        level = log_entry.level
+        with self._lock:
+            fill = len(self.queue) / self.max_queue
+            threshold = SHED_THRESHOLDS.get(level)
+            if threshold is not None and fill >= threshold:
+                key = (level, log_entry.category)
+                self._sample_counters[key] += 1
+                if level == 'DEBUG' or self._sample_counters[key] % SAMPLE_EVERY:
+                    self._drop(log_entry)
+                    return
+            
+            if len(self.queue) >= self.max_queue:
+                if level not in PRIORITY_LEVELS:
+                    self._drop(log_entry)
+                    return
+                self._drop(self.queue.popleft())
             
             self.queue.append(log_entry)
-        except Exception as e:
-            print(f"❌ Ошибка добавления лога в очередь: {e}")
+            self.enqueued += 1
+            queued = len(self.queue)
+        
+        if queued >= self.batch_size:
+            self._wakeup.set()
+    
+    def _drop(self, log_entry: LogEntry):
+        self.dropped[log_entry.level] += 1
+        self.dropped_by_category[log_entry.category] += 1
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'running': self.is_running,
+            'db_healthy': self._healthy,
+            'queue_size': len(self.queue),
+            'queue_capacity': self.max_queue,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': dict(self.dropped),
+            'dropped_by_category': dict(self.dropped_by_category),
+            'write_errors': self.write_errors,
+            'flushes': self.flushes,
+            'last_flush_ms': self.last_flush_ms,
+            'avg_flush_ms': self._total_flush_ms / self.flushes if self.flushes else 0.0,
+            'max_flush_ms': self.max_flush_ms,
+        }
 
 class SmartLogger:
     """
@@ -373,6 +368,10 @@ class SmartLogger:
         except Exception as e:
             print(f"❌ Ошибка завершения SmartLogger: {e}")
     
+    def get_statistics(self) -> Dict[str, Any]:
+        """Счетчики записи логов в БД"""
+        return self.db_writer.get_statistics() if self.db_writer else {}
+    
     def _create_log_entry(self, level: str, message: str, **kwargs) -> LogEntry:
         """Создание записи лога"""
         return LogEntry(
@@ -400,6 +400,17 @@ except ImportError as e:
     ML_TRAINER_AVAILABLE = False
     MLTrainer = None
 
+# Пакетный инференс
+try:
+    from .inference import InferenceService, inference_service
+    INFERENCE_AVAILABLE = True
+    logger.info("✅ InferenceService доступен")
+except ImportError as e:
+    logger.warning(f"⚠️ InferenceService недоступен: {e}")
+    INFERENCE_AVAILABLE = False
+    InferenceService = None
+    inference_service = None
+
 # =================================================================
 # СТАТУС И УТИЛИТЫ
 # =================================================================
@@ -579,6 +590,8 @@ __all__ = [
     'TradingAction',
     'AutoStrategySelector',
     'MLTrainer',
+    'InferenceService',
+    'inference_service',
     
     # Утилиты
     'get_ml_status',
@@ -602,5 +615,6 @@ __all__ = [
     'PRICE_REGRESSOR_AVAILABLE',
     'RL_AGENT_AVAILABLE',
     'STRATEGY_SELECTION_AVAILABLE',
-    'ML_TRAINER_AVAILABLE'
+    'ML_TRAINER_AVAILABLE',
+    'INFERENCE_AVAILABLE'
 ]
\ No newline at end of file
@@ -15,8 +15,11 @@ from sqlalchemy.orm import Session
 
 from ..core.database import SessionLocal
 from ..core.models import Trade, Signal, MarketData
+from ..data.candle_store import candle_store, interval_delta
+from ..data.ohlcv_archive import ohlcv_archive
 from ..logging.smart_logger import SmartLogger
 from .features.feature_engineering import FeatureEngineering
+from .features.store import feature_store
 
 
 class DataPipeline:
@@ -53,7 +56,8 @@ class DataPipeline:
                                start_date: Optional[datetime] = None,
                                end_date: Optional[datetime] = None) -> pd.DataFrame:
         """
-        Загружает рыночные данные из БД
+        Загружает рыночные данные из локального архива свечей; при его отсутствии
+        или неполном покрытии периода недостающие свечи берутся из БД
         
         Args:
             symbol: Торговая пара
@@ -72,6 +76,75 @@ class DataPipeline:
             if (datetime.now() - last_update).seconds < 300:  # 5 минут
                 return self.cache['market_data'][cache_key]
         
+        # Архив читается через memory-map с отбором по времени, без запроса к БД
+        df = ohlcv_archive.read_frame(symbol, timeframe, start_date, end_date)
+        if df.empty:
+            df = self._fetch_db_market_data(symbol, timeframe, start_date, end_date)
+            if df.empty:
+                self.logger.warning(
+                    f"Нет данных для {symbol} {timeframe}",
+                    category='data',
+                    symbol=symbol,
+                    timeframe=timeframe
+                )
+                return df
+            
+            self.logger.info(
+                f"Загружено {len(df)} свечей для {symbol} {timeframe}",
+                category='data',
+                symbol=symbol,
+                timeframe=timeframe,
+                candles=len(df)
+            )
+        else:
+            df = self._fill_archive_gaps(df, symbol, timeframe, start_date, end_date)
+        
+        # Кешируем
+        self.cache['market_data'][cache_key] = df
+        self.cache['last_update'][cache_key] = datetime.now()
+        return df
+    
+    def _fill_archive_gaps(self, df: pd.DataFrame, symbol: str, timeframe: str,
+                           start_date: Optional[datetime],
+                           end_date: Optional[datetime]) -> pd.DataFrame:
+        """
+        Дополнение архивных свечей из БД, если архив покрывает только часть периода
+        
+        Начало проверяется, если задан start_date; конец - по end_date или текущему
+        времени. Допуск - одна свеча в начале и две в конце (последняя свеча
+        периода может быть еще не закрыта и не попасть в архив).
+        """
+        step = interval_delta(timeframe)
+        first, last = df.index[0].to_pydatetime(), df.index[-1].to_pydatetime()
+        end = end_date or datetime.utcnow()
+        
+        parts = []
+        if start_date is not None and first - start_date > step:
+            parts.append(self._fetch_db_market_data(symbol, timeframe, start_date, first - timedelta(microseconds=1)))
+        parts.append(df)
+        if end - last > 2 * step:
+            tail = self._fetch_db_market_data(symbol, timeframe, last + timedelta(microseconds=1), end_date)
+            parts.append(tail)
+        
+        parts = [part for part in parts if not part.empty]
+        if len(parts) == 1:
+            return df
+        
+        merged = pd.concat(parts)
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        self.logger.info(
+            f"Архив {symbol} {timeframe} дополнен из БД: {len(merged) - len(df)} свечей",
+            category='data',
+            symbol=symbol,
+            timeframe=timeframe,
+            candles=len(merged) - len(df)
+        )
+        return merged
+    
+    def _fetch_db_market_data(self, symbol: str, timeframe: str,
+                              start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None) -> pd.DataFrame:
+        """Рыночные данные из БД (таблица MarketData) за период"""
         db = SessionLocal()
         try:
             query = db.query(MarketData).filter(
@@ -89,14 +162,7 @@ class DataPipeline:
             query = query.order_by(MarketData.timestamp.asc())
             
             data = query.all()
-            
             if not data:
-                self.logger.warning(
-                    f"Нет данных для {symbol} {timeframe}",
-                    category='data',
-                    symbol=symbol,
-                    timeframe=timeframe
-                )
                 return pd.DataFrame()
             
             # Преобразуем в DataFrame
@@ -110,19 +176,6 @@ class DataPipeline:
             } for d in data])
             
             df.set_index('timestamp', inplace=True)
-            
-            # Кешируем
-            self.cache['market_data'][cache_key] = df
-            self.cache['last_update'][cache_key] = datetime.now()
-            
-            self.logger.info(
-                f"Загружено {len(df)} свечей для {symbol} {timeframe}",
-                category='data',
-                symbol=symbol,
-                timeframe=timeframe,
-                candles=len(df)
-            )
-            
             return df
             
         except Exception as e:
@@ -273,8 +326,14 @@ class DataPipeline:
             )
             return pd.DataFrame()
         
-        # Извлекаем признаки
-        features = self.feature_engineering.extract_features(market_data)
+        # Признаки из хранилища: считаются только свечи новее уже сохраненных
+        features = await asyncio.to_thread(
+            feature_store.load, symbol, timeframe, self.feature_engineering,
+            start=market_data.index[0], end=market_data.index[-1],
+            candles=market_data, source='clean'
+        )
+        if not features.empty:
+            features = features.reindex(market_data.index).dropna()
         
         # Кешируем
         cache_key = f"{symbol}_{timeframe}"
@@ -443,6 +502,10 @@ class DataPipeline:
         """
         Подготавливает признаки для real-time предсказаний
         
+        Свечи берутся из candle_store (буфер потока данных), при его отсутствии -
+        из архива/БД. Признаки обновляются инкрементально: считаются только
+        свечи, появившиеся с прошлого вызова для этой пары.
+        
         Args:
             symbol: Торговая пара
             timeframe: Таймфрейм
@@ -450,6 +513,12 @@ class DataPipeline:
         Returns:
             DataFrame с последними признаками
         """
+        key = (symbol, timeframe)
+        view = candle_store.view(symbol, timeframe, limit=self.params['feature_window'])
+        if (view is not None and len(view['close']) >= self.params['feature_window']
+                and self.feature_engineering.indicators is None):
+            return self.feature_engineering.pipeline.update_arrays(key, view)
+        
         # Загружаем последние данные
         end_date = datetime.now()
         start_date = end_date - timedelta(days=30)  # Достаточно для расчета индикаторов
@@ -468,11 +537,8 @@ class DataPipeline:
         # Очищаем данные
         market_data = self.clean_data(market_data)
         
-        # Извлекаем признаки
-        features = self.feature_engineering.extract_features(market_data)
-        
-        # Возвращаем последнюю строку
-        return features.iloc[[-1]]
+        # Последняя строка признаков
+        return self.feature_engineering.latest_features(market_data, key)
     
     def augment_data(self, features: pd.DataFrame, labels: pd.Series,
                     augmentation_factor: int = 2) -> Tuple[pd.DataFrame, pd.Series]:
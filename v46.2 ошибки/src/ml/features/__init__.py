@@ -9,6 +9,7 @@ try:
         FeatureConfig,
         FeatureExtractor  # Если используется
     )
+    from .pipeline import FeaturePipeline, FeatureSpec
     _features_available = True
 except ImportError as e:
     print(f"Ошибка импорта feature_engineering: {e}")
@@ -45,4 +46,15 @@ except ImportError as e:
         def extract(self, *args, **kwargs):
             return []
 
-__all__ = ['FeatureEngineer', 'FeatureEngineering', 'FeatureConfig', 'FeatureExtractor']
\ No newline at end of file
+try:
+    from .store import FeatureStore, feature_store
+    _store_available = _features_available
+except ImportError as e:
+    print(f"Ошибка импорта хранилища признаков: {e}")
+    _store_available = False
+
+__all__ = ['FeatureEngineer', 'FeatureEngineering', 'FeatureConfig', 'FeatureExtractor']
+if _features_available:
+    __all__ += ['FeaturePipeline', 'FeatureSpec']
+if _store_available:
+    __all__ += ['FeatureStore', 'feature_store']
\ No newline at end of file
@@ -28,6 +28,8 @@ except ImportError:
     INDICATORS_AVAILABLE = False
     UnifiedIndicators = None
 
+from .pipeline import FeaturePipeline
+
 try:
     from ..core.unified_config import unified_config
     CONFIG_AVAILABLE = True
@@ -77,6 +79,7 @@ class FeatureEngineer:
         """
         self.config = config or FeatureConfig()
         self.indicators = UnifiedIndicators() if INDICATORS_AVAILABLE else None
+        self.pipeline = FeaturePipeline(self.config)
         self.feature_names: List[str] = []
         self.is_fitted = False
         
@@ -104,30 +107,11 @@ class FeatureEngineer:
                 logger.warning("⚠️ Пустой DataFrame передан в create_features")
                 return df
             
-            # Копируем для безопасности
-            result_df = df.copy()
-            
-            # Убеждаемся в правильных названиях колонок
-            result_df = self._standardize_columns(result_df)
-            
-            # Создаем различные типы признаков
-            if self.config.enable_price_features:
-                result_df = self._create_price_features(result_df)
-            
-            if self.config.enable_volume_features:
-                result_df = self._create_volume_features(result_df)
-            
-            if self.config.enable_technical_indicators:
-                result_df = self._create_technical_features(result_df)
-            
-            if self.config.enable_time_features:
-                result_df = self._create_time_features(result_df)
-            
-            if self.config.enable_lag_features:
-                result_df = self._create_lag_features(result_df)
-            
-            # Создаем статистические признаки
-            result_df = self._create_statistical_features(result_df)
+            if self.indicators is None:
+                # Все признаки одним векторным проходом (ручные индикаторы)
+                result_df = self.pipeline.compute(df)
+            else:
+                result_df = self._create_features_stepwise(df)
             
             # Удаляем строки с NaN значениями
             initial_rows = len(result_df)
@@ -153,6 +137,50 @@ class FeatureEngineer:
                 return df
             return pd.DataFrame()
     
+    def _create_features_stepwise(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Пошаговое создание признаков (индикаторы через UnifiedIndicators)"""
+        # Копируем для безопасности
+        result_df = df.copy()
+        
+        # Убеждаемся в правильных названиях колонок
+        result_df = self._standardize_columns(result_df)
+        
+        # Создаем различные типы признаков
+        if self.config.enable_price_features:
+            result_df = self._create_price_features(result_df)
+        
+        if self.config.enable_volume_features:
+            result_df = self._create_volume_features(result_df)
+        
+        if self.config.enable_technical_indicators:
+            result_df = self._create_technical_features(result_df)
+        
+        if self.config.enable_time_features:
+            result_df = self._create_time_features(result_df)
+        
+        if self.config.enable_lag_features:
+            result_df = self._create_lag_features(result_df)
+        
+        # Создаем статистические признаки
+        return self._create_statistical_features(result_df)
+    
+    def latest_features(self, df: pd.DataFrame, key: Any, rows: int = 1) -> pd.DataFrame:
+        """
+        Последние строки признаков для live-предсказаний.
+        
+        Пересчитываются только новые свечи с прошлого вызова для того же key
+        (см. FeaturePipeline.update). Строки warm-up не отбрасываются:
+        признаки с недостающей историей остаются NaN.
+        
+        Args:
+            df: Свечи OHLCV по возрастанию времени
+            key: Ключ состояния, обычно (символ, таймфрейм)
+            rows: Сколько последних строк вернуть
+        """
+        if self.indicators is not None:
+            return self.create_features(df, str(key)).tail(rows)
+        return self.pipeline.update(key, df, rows)
+    
     def _standardize_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Стандартизация названий колонок"""
         column_mapping = {
@@ -447,6 +475,43 @@ class FeatureEngineer:
                 'error': str(e)
             }
     
+    def prepare_training_data(self, df: pd.DataFrame, target_type: str = 'direction',
+                              target_periods: int = 5,
+                              threshold: float = 0.002) -> Tuple[pd.DataFrame, pd.Series]:
+        """
+        Обучающая выборка из готовой матрицы признаков (например, feature_store.load)
+        
+        Args:
+            df: Матрица признаков с колонкой close
+            target_type: 'direction' - классы 0 (DOWN), 1 (SIDEWAYS), 2 (UP);
+                         'return' - изменение цены в процентах
+            target_periods: Горизонт прогноза в свечах
+            threshold: Порог изменения цены для классов UP/DOWN
+            
+        Returns:
+            Tuple[X, y]: все колонки df и цель; строки без будущей цены отброшены
+        """
+        if df is None or df.empty or 'close' not in df.columns or len(df) <= target_periods:
+            return pd.DataFrame(columns=getattr(df, 'columns', None)), pd.Series(dtype=np.int64)
+        
+        close = df['close'].to_numpy(dtype=np.float64)
+        change = np.full(len(close), np.nan)
+        change[:-target_periods] = close[target_periods:] / close[:-target_periods] - 1
+        valid = np.isfinite(change)
+        
+        if target_type == 'direction':
+            target = np.ones(len(close), dtype=np.int64)
+            target[change > threshold] = 2
+            target[change < -threshold] = 0
+        elif target_type == 'return':
+            target = change * 100
+        else:
+            raise ValueError(f"Неизвестный target_type: {target_type}")
+        
+        X = df[valid]
+        y = pd.Series(target[valid], index=X.index, name='target')
+        return X, y
+    
     def get_feature_importance(self, model=None, method: str = 'correlation') -> pd.DataFrame:
         """
         Получение важности признаков
@@ -521,6 +586,7 @@ class FeatureEngineer:
                 data = pickle.load(f)
             
             self.config = data['config']
+            self.pipeline = FeaturePipeline(self.config)
             self.feature_names = data['feature_names']
             self.is_fitted = data['is_fitted']
             
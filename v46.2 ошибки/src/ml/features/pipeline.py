@@ -0,0 +1,604 @@
+"""
+Векторный конвейер признаков с инкрементальным обновлением
+Файл: src/ml/features/pipeline.py
+
+Те же признаки, что и FeatureEngineer (ручные индикаторы), но без копий
+DataFrame и пошаговых вставок столбцов:
+- у каждого признака объявлено окно (lookback) - сколько строк истории,
+  включая текущую, нужно для его значения; warm-up = max(lookback) - 1
+- обучение: вся матрица признаков одним векторным проходом по массивам
+  NumPy (скользящие окна - sliding_window_view, EMA - lfilter)
+- live: по ключу (символ, таймфрейм) хранится состояние рекурсивных
+  признаков (EMA, VPT, OBV) на предпоследней свече. Новый вызов находит
+  эту свечу в данных и считает только новые строки по хвосту из
+  max(lookback) свечей; формирующаяся последняя свеча пересчитывается
+  при каждом вызове, пока не закроется
+- если свеча состояния не найдена или ее close изменился (пропуск,
+  перезагрузка истории) - полный пересчет
+"""
+import hashlib
+import json
+import logging
+from dataclasses import asdict, dataclass, field, is_dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+COLUMN_ALIASES = {
+    'Open': 'open', 'High': 'high', 'Low': 'low',
+    'Close': 'close', 'Volume': 'volume',
+    'time': 'timestamp', 'datetime': 'timestamp'
+}
+
+# Окна, заданные в FeatureEngineer константами
+BB_WINDOW = 20
+VWAP_WINDOW = 20
+RSI_WINDOW = 14
+STOCH_WINDOW = 14
+STOCH_SMOOTH = 3
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+RSI_LAGS = (1, 2, 3)
+RANGE_WINDOWS = (10, 20, 50)
+MOMENTUM_PERIODS = (5, 10, 20)
+ZSCORE_WINDOWS = (20, 50)
+MAX_PRICE_LAGS = 6
+
+# Версия набора формул: меняется при изменении расчета признаков,
+# сохраненные матрицы (features/store.py) с другой версией пересчитываются
+FEATURE_SET_VERSION = 1
+
+MAX_CATCHUP = 256  # новых свечей, после которых дешевле полный пересчет
+SMALL_ROWS = 8  # до стольких строк окна и EMA считаются без sliding_window_view/lfilter
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """Объявление признака"""
+    name: str
+    lookback: int  # строк истории, включая текущую
+    group: str
+    recursive: bool = False  # зависит от всей истории (EMA, накопленные суммы)
+
+
+@dataclass
+class PipelineState:
+    """Состояние рекурсивных признаков после последней закрытой свечи"""
+    label: Any  # время (или индекс) свечи
+    close: float
+    ewm: Dict[str, Tuple[float, float]] = field(default_factory=dict)  # (числитель, знаменатель)
+    sums: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        label = self.label.item() if isinstance(self.label, np.generic) else self.label
+        return {'label': label, 'close': self.close,
+                'ewm': {key: list(value) for key, value in self.ewm.items()}, 'sums': dict(self.sums)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PipelineState':
+        return cls(label=data['label'], close=data['close'],
+                   ewm={key: tuple(value) for key, value in data['ewm'].items()}, sums=data['sums'])
+
+
+def _last(x: np.ndarray, rows: int, lag: int = 0) -> np.ndarray:
+    """Значения x[t - lag] для последних rows строк (NaN, где истории не хватает)"""
+    stop = len(x) - lag
+    start = stop - rows
+    if start >= 0:
+        return x[start:stop]
+    out = np.full(rows, np.nan)
+    if stop > 0:
+        out[-start:] = x[:stop]
+    return out
+
+
+_REDUCERS = {'sum': np.add, 'max': np.maximum, 'min': np.minimum}
+_WINDOW_INDEX: Dict[Tuple[int, int], np.ndarray] = {}
+
+
+def _windows(x: np.ndarray, window: int, count: int) -> np.ndarray:
+    """Последние count окон x матрицей (count, window)"""
+    if count > SMALL_ROWS:
+        return sliding_window_view(x[len(x) - window - count + 1:], window)
+    # Для хвоста из пары строк индексная выборка дешевле sliding_window_view
+    index = _WINDOW_INDEX.get((window, count))
+    if index is None:
+        index = _WINDOW_INDEX[(window, count)] = np.arange(count)[:, None] + np.arange(window)[None, :]
+    return x[len(x) - window - count + 1:][index]
+
+
+def _rolling(x: np.ndarray, window: int, how: str, rows: int) -> np.ndarray:
+    """
+    Скользящая статистика (как pandas rolling(window), std с ddof=1)
+    только для последних rows строк x.
+    """
+    out = np.full(rows, np.nan)
+    count = min(rows, len(x) - window + 1)
+    if count <= 0:
+        return out
+    windows = _windows(x, window, count)
+    if how in _REDUCERS:
+        values = _REDUCERS[how].reduce(windows, axis=1)
+    else:
+        values = np.add.reduce(windows, axis=1) / window
+        if how == 'std':
+            centered = windows - values[:, None]
+            values = np.sqrt(np.add.reduce(centered * centered, axis=1) / (window - 1))
+    out[rows - count:] = values
+    return out
+
+
+def _ewm(x: np.ndarray, span: int, state: Tuple[float, float]):
+    """
+    EMA как pandas ewm(span).mean() (adjust=True) от состояния предыдущих строк.
+
+    Returns:
+        (значения, числители, знаменатели) по строкам x
+    """
+    alpha = 2.0 / (span + 1.0)
+    beta = 1.0 - alpha
+    num0, den0 = state
+    if len(x) <= SMALL_ROWS:
+        num = np.empty(len(x))
+        den = np.empty(len(x))
+        for i, value in enumerate(x.tolist()):
+            num0 = value + beta * num0
+            den0 = 1.0 + beta * den0
+            num[i], den[i] = num0, den0
+    else:
+        num, _ = lfilter([1.0], [1.0, -beta], x, zi=[beta * num0])
+        powers = beta ** np.arange(1, len(x) + 1)
+        den = den0 * powers + (1.0 - powers) / alpha
+    return num / den, num, den
+
+
+class _Rolling:
+    """Скользящие статистики столбцов буфера с переиспользованием одинаковых окон"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        self._memo: Dict[Tuple[str, int, str, int], np.ndarray] = {}
+
+    def __call__(self, column: str, window: int, how: str, rows: int) -> np.ndarray:
+        key = (column, window, how, rows)
+        result = self._memo.get(key)
+        if result is None:
+            result = self._memo[key] = _rolling(self.arrays[column], window, how, rows)
+        return result
+
+
+class FeaturePipeline:
+    """
+    Признаки FeatureEngineer одним векторным проходом и инкрементально.
+
+    compute() - вся матрица (для обучения), update() / update_arrays() -
+    последние строки по сохраненному состоянию ключа (для live).
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.specs: List[FeatureSpec] = self._build_specs()
+        self.feature_names = [spec.name for spec in self.specs]
+        self.history = max(spec.lookback for spec in self.specs)
+        self.warmup = self.history - 1
+
+        self._states: Dict[Any, Optional[PipelineState]] = {}
+        self.stats = {'full_passes': 0, 'incremental': 0, 'rows': 0}
+
+    # === Объявление признаков ===
+
+    def _build_specs(self) -> List[FeatureSpec]:
+        cfg = self.config
+        specs: List[FeatureSpec] = []
+
+        def add(group: str, name: str, lookback: int, recursive: bool = False):
+            specs.append(FeatureSpec(name, lookback, group, recursive))
+
+        if cfg.enable_price_features:
+            for name, lookback in (('typical_price', 1), ('price_change', 2), ('price_change_abs', 2),
+                                   ('price_range', 1), ('price_range_pct', 1), ('close_position', 1)):
+                add('price', name, lookback)
+            for window in cfg.price_windows:
+                add('price', f'sma_{window}', window)
+                add('price', f'price_vs_sma_{window}', window)
+                add('price', f'ema_{window}', 1, recursive=True)
+                add('price', f'price_vs_ema_{window}', 1, recursive=True)
+            for name in ('bb_middle', 'bb_upper', 'bb_lower', 'bb_position', 'bb_width'):
+                add('price', name, BB_WINDOW)
+
+        if cfg.enable_volume_features:
+            add('volume', 'volume_change', 2)
+            add('volume', 'volume_change_abs', 2)
+            for window in cfg.volume_windows:
+                add('volume', f'volume_sma_{window}', window)
+                add('volume', f'volume_ratio_{window}', window)
+            add('volume', 'vpt', 2, recursive=True)
+            add('volume', 'obv_direction', 2)
+            add('volume', 'obv', 2, recursive=True)
+            add('volume', 'vwap', VWAP_WINDOW)
+            add('volume', 'price_vs_vwap', VWAP_WINDOW)
+
+        if cfg.enable_technical_indicators:
+            for name in ('rsi', 'rsi_oversold', 'rsi_overbought'):
+                add('technical', name, RSI_WINDOW + 1)
+            for name in ('macd', 'macd_signal', 'macd_histogram'):
+                add('technical', name, 1, recursive=True)
+            add('technical', 'stoch_k', STOCH_WINDOW)
+            add('technical', 'stoch_d', STOCH_WINDOW + STOCH_SMOOTH - 1)
+            add('technical', 'williams_r', STOCH_WINDOW)
+
+        if cfg.enable_time_features:
+            for name in ('hour', 'day_of_week', 'day_of_month', 'month', 'hour_sin', 'hour_cos',
+                         'day_sin', 'day_cos', 'is_asian_session', 'is_european_session',
+                         'is_american_session'):
+                add('time', name, 1)
+
+        if cfg.enable_lag_features:
+            for lag in range(1, min(cfg.max_lag_periods, MAX_PRICE_LAGS)):
+                add('lag', f'close_lag_{lag}', lag + 1)
+                add('lag', f'volume_lag_{lag}', lag + 1)
+                if cfg.enable_price_features:
+                    add('lag', f'price_change_lag_{lag}', lag + 2)
+            if cfg.enable_technical_indicators:
+                for lag in RSI_LAGS:
+                    add('lag', f'rsi_lag_{lag}', RSI_WINDOW + 1 + lag)
+
+        for window in cfg.volatility_windows:
+            add('statistical', f'volatility_{window}', window)
+            add('statistical', f'volatility_norm_{window}', window)
+        for window in RANGE_WINDOWS:
+            add('statistical', f'highest_{window}', window)
+            add('statistical', f'lowest_{window}', window)
+            add('statistical', f'position_in_range_{window}', window)
+        for period in MOMENTUM_PERIODS:
+            add('statistical', f'momentum_{period}', period + 1)
+            add('statistical', f'roc_{period}', period + 1)
+        for window in ZSCORE_WINDOWS:
+            add('statistical', f'zscore_{window}', window)
+        return specs
+
+    # === Расчет ===
+
+    def _evaluate(self, buffer: Dict[str, np.ndarray], k: int, state: Optional[PipelineState],
+                  times: Optional[pd.DatetimeIndex] = None, commit: int = 2):
+        """
+        Значения признаков для последних k строк буфера.
+
+        buffer содержит эти строки и max(lookback) - 1 строк истории перед ними;
+        рекурсивные признаки продолжаются от state (None - с начала буфера).
+        commit - какая строка с конца попадает в новое состояние: 2 - последняя
+        свеча может быть незакрытой, 1 - все свечи закрыты.
+
+        Returns:
+            ({признак: массив длины k}, состояние после строки k - commit)
+        """
+        cfg = self.config
+        h, l, c, v = (buffer[name] for name in ('high', 'low', 'close', 'volume'))
+        n = len(c)
+        rolling = _Rolling(buffer)
+        out: Dict[str, np.ndarray] = {}
+        ewm_state = dict(state.ewm) if state else {}
+        sums = dict(state.sums) if state else {}
+        commit_ewm: Dict[str, Tuple[float, float]] = {}
+
+        def ema(key: str, x: np.ndarray, span: int) -> np.ndarray:
+            values, num, den = _ewm(x, span, ewm_state.get(key, (0.0, 0.0)))
+            if k >= commit:
+                commit_ewm[key] = (float(num[k - commit]), float(den[k - commit]))
+            elif key in ewm_state:
+                commit_ewm[key] = ewm_state[key]
+            return values
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            h_new, l_new, c_new, v_new = h[n - k:], l[n - k:], c[n - k:], v[n - k:]
+            prev_close = _last(c, k, 1)
+            price_change = c_new / prev_close - 1
+
+            if cfg.enable_price_features:
+                out['typical_price'] = (h_new + l_new + c_new) / 3
+                out['price_change'] = price_change
+                out['price_change_abs'] = c_new - prev_close
+                out['price_range'] = h_new - l_new
+                out['price_range_pct'] = (h_new - l_new) / c_new
+                close_position = (c_new - l_new) / (h_new - l_new)
+                out['close_position'] = np.where(np.isnan(close_position), 0.5, close_position)
+                for window in cfg.price_windows:
+                    sma = rolling('close', window, 'mean', k)
+                    out[f'sma_{window}'] = sma
+                    out[f'price_vs_sma_{window}'] = c_new / sma - 1
+                    ema_values = ema(f'ema_{window}', c_new, window)
+                    out[f'ema_{window}'] = ema_values
+                    out[f'price_vs_ema_{window}'] = c_new / ema_values - 1
+                bb_middle = rolling('close', BB_WINDOW, 'mean', k)
+                bb_std = rolling('close', BB_WINDOW, 'std', k)
+                bb_upper = bb_middle + bb_std * 2
+                bb_lower = bb_middle - bb_std * 2
+                out['bb_middle'] = bb_middle
+                out['bb_upper'] = bb_upper
+                out['bb_lower'] = bb_lower
+                out['bb_position'] = (c_new - bb_lower) / (bb_upper - bb_lower)
+                out['bb_width'] = (bb_upper - bb_lower) / bb_middle
+
+            if cfg.enable_volume_features:
+                prev_volume = _last(v, k, 1)
+                out['volume_change'] = v_new / prev_volume - 1
+                out['volume_change_abs'] = v_new - prev_volume
+                for window in cfg.volume_windows:
+                    volume_sma = rolling('volume', window, 'mean', k)
+                    out[f'volume_sma_{window}'] = volume_sma
+                    out[f'volume_ratio_{window}'] = v_new / volume_sma
+
+                # Накопленные суммы: NaN первой строки истории не входит в сумму (как pandas cumsum)
+                vpt_step = v_new * price_change
+                vpt = sums.get('vpt', 0.0) + np.cumsum(np.where(np.isnan(vpt_step), 0.0, vpt_step))
+                out['vpt'] = np.where(np.isnan(vpt_step), np.nan, vpt)
+                direction = np.where(c_new > prev_close, 1.0, np.where(c_new < prev_close, -1.0, 0.0))
+                obv = sums.get('obv', 0.0) + np.cumsum(v_new * direction)
+                out['obv_direction'] = direction
+                out['obv'] = obv
+                if k >= commit:
+                    sums['vpt'], sums['obv'] = float(vpt[k - commit]), float(obv[k - commit])
+
+                buffer['typical_volume'] = (h + l + c) / 3 * v
+                vwap = (rolling('typical_volume', VWAP_WINDOW, 'sum', k)
+                        / rolling('volume', VWAP_WINDOW, 'sum', k))
+                out['vwap'] = vwap
+                out['price_vs_vwap'] = c_new / vwap - 1
+
+            rsi = None
+            if cfg.enable_technical_indicators:
+                # RSI и стохастик - с запасом строк под лаги RSI и сглаживание %D
+                rsi_rows = k + max(RSI_LAGS)
+                delta = np.empty(n)
+                delta[0] = np.nan
+                delta[1:] = np.diff(c)
+                buffer['gain'] = np.where(delta > 0, delta, 0.0)
+                buffer['loss'] = np.where(delta < 0, -delta, 0.0)
+                rs = rolling('gain', RSI_WINDOW, 'mean', rsi_rows) / rolling('loss', RSI_WINDOW, 'mean', rsi_rows)
+                rsi = 100 - (100 / (1 + rs))
+                rsi_new = rsi[max(RSI_LAGS):]
+                out['rsi'] = rsi_new
+                out['rsi_oversold'] = (rsi_new < 30).astype(np.float64)
+                out['rsi_overbought'] = (rsi_new > 70).astype(np.float64)
+
+                macd = ema(f'ema_{MACD_FAST}', c_new, MACD_FAST) - ema(f'ema_{MACD_SLOW}', c_new, MACD_SLOW)
+                macd_signal = ema('macd_signal', macd, MACD_SIGNAL)
+                out['macd'] = macd
+                out['macd_signal'] = macd_signal
+                out['macd_histogram'] = macd - macd_signal
+
+                stoch_rows = k + STOCH_SMOOTH - 1
+                close_ext = _last(c, stoch_rows)
+                low_14 = rolling('low', STOCH_WINDOW, 'min', stoch_rows)
+                high_14 = rolling('high', STOCH_WINDOW, 'max', stoch_rows)
+                stoch_k = 100 * (close_ext - low_14) / (high_14 - low_14)
+                out['stoch_k'] = stoch_k[STOCH_SMOOTH - 1:]
+                out['stoch_d'] = _rolling(stoch_k, STOCH_SMOOTH, 'mean', k)
+                out['williams_r'] = (-100 * (high_14 - close_ext) / (high_14 - low_14))[STOCH_SMOOTH - 1:]
+
+            if cfg.enable_time_features and times is not None:
+                hour = times.hour.to_numpy(dtype=np.float64)
+                day_of_week = times.dayofweek.to_numpy(dtype=np.float64)
+                out['hour'] = hour
+                out['day_of_week'] = day_of_week
+                out['day_of_month'] = times.day.to_numpy(dtype=np.float64)
+                out['month'] = times.month.to_numpy(dtype=np.float64)
+                out['hour_sin'] = np.sin(2 * np.pi * hour / 24)
+                out['hour_cos'] = np.cos(2 * np.pi * hour / 24)
+                out['day_sin'] = np.sin(2 * np.pi * day_of_week / 7)
+                out['day_cos'] = np.cos(2 * np.pi * day_of_week / 7)
+                out['is_asian_session'] = ((hour >= 1) & (hour <= 9)).astype(np.float64)
+                out['is_european_session'] = ((hour >= 8) & (hour <= 16)).astype(np.float64)
+                out['is_american_session'] = ((hour >= 14) & (hour <= 22)).astype(np.float64)
+
+            if cfg.enable_lag_features:
+                for lag in range(1, min(cfg.max_lag_periods, MAX_PRICE_LAGS)):
+                    lagged_close = _last(c, k, lag)
+                    out[f'close_lag_{lag}'] = lagged_close
+                    out[f'volume_lag_{lag}'] = _last(v, k, lag)
+                    if cfg.enable_price_features:
+                        out[f'price_change_lag_{lag}'] = lagged_close / _last(c, k, lag + 1) - 1
+                if rsi is not None:
+                    for lag in RSI_LAGS:
+                        out[f'rsi_lag_{lag}'] = _last(rsi, k, lag)
+
+            for window in cfg.volatility_windows:
+                volatility = rolling('close', window, 'std', k)
+                out[f'volatility_{window}'] = volatility
+                out[f'volatility_norm_{window}'] = volatility / c_new
+            for window in RANGE_WINDOWS:
+                highest = rolling('high', window, 'max', k)
+                lowest = rolling('low', window, 'min', k)
+                out[f'highest_{window}'] = highest
+                out[f'lowest_{window}'] = lowest
+                out[f'position_in_range_{window}'] = (c_new - lowest) / (highest - lowest)
+            for period in MOMENTUM_PERIODS:
+                momentum = c_new / _last(c, k, period) - 1
+                out[f'momentum_{period}'] = momentum
+                out[f'roc_{period}'] = momentum
+            for window in ZSCORE_WINDOWS:
+                out[f'zscore_{window}'] = ((c_new - rolling('close', window, 'mean', k))
+                                           / rolling('close', window, 'std', k))
+
+        if k >= commit:
+            committed = PipelineState(label=None, close=float(c[n - commit]), ewm=commit_ewm, sums=sums)
+        else:
+            committed = state
+        return out, committed
+
+    def _matrix(self, values: Dict[str, np.ndarray], k: int) -> Tuple[np.ndarray, List[str]]:
+        names = [name for name in self.feature_names if name in values]
+        matrix = np.empty((k, len(names)), dtype=np.float64)
+        for i, name in enumerate(names):
+            matrix[:, i] = values[name]
+        return matrix, names
+
+    def fingerprint(self) -> str:
+        """Хэш конфигурации и версии формул - ключ сохраненных матриц признаков"""
+        config = asdict(self.config) if is_dataclass(self.config) else dict(vars(self.config))
+        payload = json.dumps({'config': config, 'version': FEATURE_SET_VERSION}, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+    def extend(self, arrays: Dict[str, np.ndarray], k: int,
+               state: Optional[PipelineState] = None) -> Tuple[np.ndarray, List[str], Optional[PipelineState]]:
+        """
+        Признаки k последних строк закрытых свечей.
+
+        Args:
+            arrays: OHLCV этих строк и до max(lookback) - 1 строк истории перед ними
+            state: Состояние после строки, предшествующей новым (None - начало ряда)
+
+        Returns:
+            (матрица k x признаки, имена признаков, состояние после последней строки)
+        """
+        buffer = {name: np.asarray(arrays[name], dtype=np.float64) for name in OHLCV_COLUMNS}
+        values, committed = self._evaluate(buffer, k, state, commit=1)
+        matrix, names = self._matrix(values, k)
+        self.stats['rows'] += k
+        return matrix, names, committed
+
+    # === Обучение: полный проход ===
+
+    @staticmethod
+    def standardize(df: pd.DataFrame) -> pd.DataFrame:
+        """Названия колонок OHLCV в нижнем регистре, проверка обязательных"""
+        if not COLUMN_ALIASES.keys().isdisjoint(df.columns):
+            df = df.rename(columns=COLUMN_ALIASES)
+        missing = [col for col in OHLCV_COLUMNS if col not in df.columns]
+        if missing:
+            logger.error(f"❌ Отсутствуют обязательные колонки: {missing}")
+            raise ValueError(f"Отсутствуют колонки: {missing}")
+        return df
+
+    @staticmethod
+    def _arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        return {name: df[name].to_numpy(dtype=np.float64) for name in OHLCV_COLUMNS}
+
+    @staticmethod
+    def _times(df: pd.DataFrame, rows: int) -> Optional[pd.DatetimeIndex]:
+        """Время последних rows строк из колонки timestamp (временные признаки только по ней)"""
+        if 'timestamp' not in df.columns:
+            return None
+        return pd.DatetimeIndex(pd.to_datetime(df['timestamp'].iloc[len(df) - rows:]))
+
+    def compute(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Исходные колонки и все признаки одним проходом (строки warm-up - с NaN).
+        """
+        df = self.standardize(df)
+        if 'timestamp' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+            df = df.assign(timestamp=pd.to_datetime(df['timestamp']))
+        n = len(df)
+        values, _ = self._evaluate(self._arrays(df), n, None, self._times(df, n))
+        matrix, names = self._matrix(values, n)
+        self.stats['full_passes'] += 1
+        self.stats['rows'] += n
+
+        base = df.drop(columns=[name for name in names if name in df.columns])
+        return pd.concat([base, pd.DataFrame(matrix, index=df.index, columns=names)], axis=1)
+
+    # === Live: инкрементальное обновление ===
+
+    def _resume_position(self, state: Optional[PipelineState], labels: np.ndarray,
+                         closes: np.ndarray) -> Optional[int]:
+        """Позиция свечи состояния в новых данных (не последняя строка) или None"""
+        if state is None or state.label is None:
+            return None
+        n = len(labels)
+        for pos in range(n - 2, max(n - 2 - MAX_CATCHUP, -1), -1):
+            if labels[pos] == state.label:
+                return pos if closes[pos] == state.close else None
+        return None
+
+    def _advance(self, key: Any, arrays: Dict[str, np.ndarray], labels: np.ndarray, rows: int,
+                 times_for=None) -> Tuple[np.ndarray, List[str]]:
+        """Признаки последних rows строк с продолжением состояния ключа"""
+        n = len(labels)
+        state = self._states.get(key)
+        pos = self._resume_position(state, labels, arrays['close'])
+        k = n - 1 - pos if pos is not None else 0
+        if pos is None or k < rows or n - k < self.history - 1:
+            state, k, start = None, n, 0
+            self.stats['full_passes'] += 1
+        else:
+            start = n - k - (self.history - 1)
+            self.stats['incremental'] += 1
+
+        buffer = {name: column[start:] for name, column in arrays.items()}
+        times = times_for(k) if times_for is not None else None
+        values, committed = self._evaluate(buffer, k, state, times)
+        if committed is not None and committed is not state:
+            committed.label = labels[n - 2]
+        self._states[key] = committed
+        self.stats['rows'] += k
+
+        matrix, names = self._matrix(values, k)
+        return matrix[k - rows:], names
+
+    def update(self, key: Any, df: pd.DataFrame, rows: int = 1) -> pd.DataFrame:
+        """
+        Последние rows строк признаков для свечей df (live).
+
+        Args:
+            key: Ключ состояния, обычно (символ, таймфрейм)
+            df: Свечи по возрастанию времени, последняя может быть незакрытой
+            rows: Сколько последних строк вернуть
+        """
+        if df is None or df.empty:
+            return pd.DataFrame()
+        df = self.standardize(df)
+        rows = min(rows, len(df))
+        if 'timestamp' in df.columns:
+            labels = df['timestamp'].to_numpy()
+            times_for = lambda count: self._times(df, count)
+        else:
+            labels = df.index.to_numpy()
+            times_for = None
+        matrix, names = self._advance(key, self._arrays(df), labels, rows, times_for)
+
+        tail = df.iloc[len(df) - rows:]
+        base_columns = [col for col in df.columns if col not in names]
+        if set(base_columns) == set(OHLCV_COLUMNS):
+            base = tail[base_columns].to_numpy(dtype=np.float64)
+            return pd.DataFrame(np.hstack((base, matrix)), index=tail.index, columns=base_columns + names)
+        if 'timestamp' in tail.columns and not pd.api.types.is_datetime64_any_dtype(tail['timestamp']):
+            tail = tail.assign(timestamp=pd.to_datetime(tail['timestamp']))
+        return pd.concat([tail[base_columns], pd.DataFrame(matrix, index=tail.index, columns=names)], axis=1)
+
+    def update_arrays(self, key: Any, arrays: Dict[str, np.ndarray], rows: int = 1) -> pd.DataFrame:
+        """
+        То же для массивов candle_store.view(): timestamp (мс) и OHLCV.
+        Результат такой же, как для DataFrame с DatetimeIndex.
+        """
+        timestamps = arrays.get('timestamp')
+        if timestamps is None or len(timestamps) == 0:
+            return pd.DataFrame()
+        rows = min(rows, len(timestamps))
+        ohlcv = {name: np.asarray(arrays[name], dtype=np.float64) for name in OHLCV_COLUMNS}
+        matrix, names = self._advance(key, ohlcv, timestamps, rows)
+
+        index = pd.DatetimeIndex(np.asarray(timestamps[len(timestamps) - rows:]).astype('datetime64[ms]'),
+                                 name='timestamp')
+        base = np.column_stack([ohlcv[name][len(timestamps) - rows:] for name in OHLCV_COLUMNS])
+        return pd.DataFrame(np.hstack((base, matrix)), index=index, columns=list(OHLCV_COLUMNS) + names)
+
+    def reset(self, key: Any = None):
+        """Сброс состояния ключа (или всех)"""
+        if key is None:
+            self._states.clear()
+        else:
+            self._states.pop(key, None)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'keys': len(self._states),
+            'features': len(self.feature_names),
+            'history': self.history,
+        }
@@ -0,0 +1,370 @@
+"""
+Локальное хранилище матриц признаков для обучения
+Файл: src/ml/features/store.py
+
+MLTrainer, HyperparameterOptimizer, DataPipeline и бэктесты берут признаки
+отсюда, а не строят их заново на каждый запуск:
+- ключ - (символ, таймфрейм, источник свечей, FeaturePipeline.fingerprint()),
+  отпечаток - хэш FeatureConfig и версии формул; диапазон данных
+  (первая/последняя свеча, число строк) хранится в meta.json
+- раскладка: <root>/<symbol>/<timeframe>/<source>-<fingerprint>/<column>.bin,
+  по файлу на столбец (timestamp int64 мс, OHLCV и признаки float64),
+  чтение через np.memmap с отбором по времени бинарным поиском
+- новые закрытые свечи (из ohlcv_archive или переданного DataFrame) дописываются:
+  признаки считаются только для них по хвосту из max(lookback) свечей
+  и сохраненному в meta.json состоянию EMA/VPT/OBV
+- свечи раньше начала матрицы (догружена история) или смена версии
+  формул - полный пересчет
+
+Запись как в ohlcv_archive - только дописыванием, meta.json заменяется
+последним: прерванная запись не дает читателю неполных строк, а лишние
+байты обрезаются при следующем дописывании.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ...data.candle_store import _to_ms, frame_timestamps, interval_delta
+from ...data.ohlcv_archive import ohlcv_archive
+from .feature_engineering import FeatureConfig
+from .pipeline import FEATURE_SET_VERSION, OHLCV_COLUMNS, FeaturePipeline, PipelineState
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEATURE_STORE_DIR = os.getenv('FEATURE_STORE_DIR', 'data/features')
+
+ARCHIVE_SOURCE = 'archive'  # свечи из ohlcv_archive
+META_FILE = 'meta.json'
+
+
+class FeatureStore:
+    """
+    Матрицы признаков по (символ, таймфрейм, источник, набор признаков).
+
+    engineer во всех методах - FeatureEngineer, FeatureConfig или
+    FeaturePipeline (по умолчанию - FeatureConfig()).
+    """
+
+    def __init__(self, root: str = DEFAULT_FEATURE_STORE_DIR, archive=None):
+        self.root = Path(root)
+        self.archive = archive or ohlcv_archive
+        self._lock = threading.RLock()
+        self.stats = {'builds': 0, 'appends': 0, 'rows_computed': 0, 'reads': 0}
+
+    # === Ключ и метаданные ===
+
+    @staticmethod
+    def _pipeline(engineer=None) -> FeaturePipeline:
+        if isinstance(engineer, FeaturePipeline):
+            return engineer
+        pipeline = getattr(engineer, 'pipeline', None)
+        if isinstance(pipeline, FeaturePipeline):
+            return pipeline
+        return FeaturePipeline(engineer if isinstance(engineer, FeatureConfig) else FeatureConfig())
+
+    @staticmethod
+    def _feature_names(pipeline: FeaturePipeline) -> List[str]:
+        """Признаки матрицы: временные признаки строятся только из колонки timestamp и не хранятся"""
+        return [spec.name for spec in pipeline.specs if spec.group != 'time']
+
+    def _series_dir(self, symbol: str, timeframe: str, pipeline: FeaturePipeline, source: str) -> Path:
+        return self.root / symbol.replace('/', '') / str(timeframe) / f"{source}-{pipeline.fingerprint()}"
+
+    @staticmethod
+    def _read_meta(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path / META_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_meta(path: Path, meta: Dict[str, Any]):
+        tmp = path / f'{META_FILE}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, path / META_FILE)
+
+    @staticmethod
+    def _dtype(column: str):
+        return np.int64 if column == 'timestamp' else np.float64
+
+    def _memmap(self, path: Path, column: str, rows: int) -> np.ndarray:
+        return np.memmap(path / f'{column}.bin', dtype=self._dtype(column), mode='r', shape=(rows,))
+
+    # === Источник свечей ===
+
+    def _source_first_ts(self, symbol: str, timeframe: str, candles: Optional[pd.DataFrame]) -> Optional[int]:
+        if candles is not None:
+            return int(frame_timestamps(candles).min()) if not candles.empty else None
+        return self.archive.first_timestamp(symbol, timeframe)
+
+    def _source_arrays(self, symbol: str, timeframe: str, candles: Optional[pd.DataFrame],
+                       after_ms: Optional[int]) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Закрытые свечи источника новее after_ms по возрастанию времени, без дубликатов.
+        Незакрытая свеча (open_time + интервал > сейчас) не сохраняется: строки матрицы
+        и состояние EMA/VPT/OBV не меняются после записи.
+        """
+        if candles is None:
+            start = after_ms + 1 if after_ms is not None else None
+            arrays = self.archive.read(symbol, timeframe, start=start)
+            if arrays is None or len(arrays['timestamp']) == 0:
+                return None
+            return {name: np.asarray(values) for name, values in arrays.items()}
+
+        if candles.empty:
+            return None
+        timestamps = frame_timestamps(candles)
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+        keep = np.ones(len(timestamps), dtype=bool)
+        keep[:-1] = timestamps[1:] != timestamps[:-1]
+        if after_ms is not None:
+            keep &= timestamps > after_ms
+        interval_ms = int(interval_delta(timeframe).total_seconds() * 1000)
+        keep &= timestamps + interval_ms <= int(time.time() * 1000)
+        if not keep.any():
+            return None
+        arrays = {'timestamp': timestamps[keep]}
+        for name in OHLCV_COLUMNS:
+            arrays[name] = candles[name].to_numpy(dtype=np.float64)[order][keep]
+        return arrays
+
+    # === Запись ===
+
+    def materialize(self, symbol: str, timeframe: str, engineer=None,
+                    candles: Optional[pd.DataFrame] = None,
+                    source: str = ARCHIVE_SOURCE) -> Optional[Dict[str, Any]]:
+        """
+        Актуализация матрицы признаков: построение или дописывание новых свечей.
+
+        Args:
+            candles: Свечи OHLCV (DatetimeIndex или колонка timestamp);
+                     None - свечи из ohlcv_archive
+            source: Имя источника в ключе (свечи разных источников не смешиваются)
+
+        Returns:
+            meta.json матрицы или None, если свечей нет
+        """
+        pipeline = self._pipeline(engineer)
+        path = self._series_dir(symbol, timeframe, pipeline, source)
+        with self._lock:
+            meta = self._read_meta(path)
+            if meta is not None and (meta.get('version') != FEATURE_SET_VERSION
+                                     or meta.get('features') != self._feature_names(pipeline)):
+                meta = None
+
+            first_ts = self._source_first_ts(symbol, timeframe, candles)
+            if first_ts is None:
+                return meta
+            if meta is not None and first_ts < meta['first_ts']:
+                logger.info(f"🧮 {symbol} {timeframe}: в источнике появилась более ранняя история, "
+                            f"матрица признаков строится заново")
+                meta = None
+
+            arrays = self._source_arrays(symbol, timeframe, candles, meta['last_ts'] if meta else None)
+            if arrays is None:
+                return meta
+            if meta is None:
+                return self._build(path, pipeline, arrays, symbol, timeframe, source)
+            return self._append(path, pipeline, arrays, meta)
+
+    def _build(self, path: Path, pipeline: FeaturePipeline, arrays: Dict[str, np.ndarray],
+               symbol: str, timeframe: str, source: str) -> Dict[str, Any]:
+        rows = len(arrays['timestamp'])
+        matrix, names, state = pipeline.extend(arrays, rows)
+
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(parents=True, exist_ok=True)
+        self._write_columns(path, 0, arrays, matrix, names)
+        meta = {
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'source': source,
+            'version': FEATURE_SET_VERSION,
+            'fingerprint': pipeline.fingerprint(),
+            'config': json.loads(json.dumps(asdict(pipeline.config), default=str)),
+            'features': names,
+            'warmup': pipeline.warmup,
+            'rows': rows,
+            'first_ts': int(arrays['timestamp'][0]),
+            'last_ts': int(arrays['timestamp'][-1]),
+            'state': state.to_dict() if state else None,
+            'updated_at': datetime.utcnow().isoformat(),
+        }
+        self._write_meta(path, meta)
+        self.stats['builds'] += 1
+        self.stats['rows_computed'] += rows
+        logger.info(f"🧮 Матрица признаков {symbol} {timeframe}: {rows} строк x {len(names)} признаков")
+        return meta
+
+    def _append(self, path: Path, pipeline: FeaturePipeline, arrays: Dict[str, np.ndarray],
+                meta: Dict[str, Any]) -> Dict[str, Any]:
+        rows = meta['rows']
+        new_rows = len(arrays['timestamp'])
+
+        # Хвост истории для скользящих окон - из самой матрицы
+        history = min(rows, pipeline.history - 1)
+        buffer = {
+            name: np.concatenate((self._memmap(path, name, rows)[rows - history:], arrays[name]))
+            for name in OHLCV_COLUMNS
+        }
+        state = PipelineState.from_dict(meta['state']) if meta.get('state') else None
+        matrix, names, state = pipeline.extend(buffer, new_rows, state)
+
+        self._write_columns(path, rows, arrays, matrix, names)
+        meta.update({
+            'rows': rows + new_rows,
+            'last_ts': int(arrays['timestamp'][-1]),
+            'state': state.to_dict() if state else None,
+            'updated_at': datetime.utcnow().isoformat(),
+        })
+        self._write_meta(path, meta)
+        self.stats['appends'] += 1
+        self.stats['rows_computed'] += new_rows
+        logger.debug(f"🧮 Признаки {meta['symbol']} {meta['timeframe']}: дописано {new_rows} строк")
+        return meta
+
+    def _write_columns(self, path: Path, rows: int, arrays: Dict[str, np.ndarray],
+                       matrix: np.ndarray, names: List[str]):
+        """Дописывание строк во все столбцы; timestamp - последним"""
+        columns = [(name, arrays[name]) for name in OHLCV_COLUMNS]
+        columns += [(name, matrix[:, i]) for i, name in enumerate(names)]
+        columns.append(('timestamp', arrays['timestamp']))
+        for name, values in columns:
+            dtype = self._dtype(name)
+            with open(path / f'{name}.bin', 'ab') as f:
+                # Байты прерванной записи за пределами meta['rows'] отбрасываются
+                f.truncate(rows * np.dtype(dtype).itemsize)
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+    # === Чтение ===
+
+    def read(self, symbol: str, timeframe: str, engineer=None, start: Any = None, end: Any = None,
+             lookback: Optional[int] = None, columns: Optional[Sequence[str]] = None,
+             source: str = ARCHIVE_SOURCE, drop_warmup: bool = True) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Строки матрицы за период [start, end] срезами np.memmap (только чтение).
+
+        Args:
+            lookback: Не больше стольких последних строк периода
+            columns: Столбцы (по умолчанию OHLCV и все признаки)
+            drop_warmup: Без первых строк ряда, где истории не хватает для всех окон
+
+        Returns:
+            Dict: {'timestamp': int64 мс, <columns>: float64} или None
+        """
+        pipeline = self._pipeline(engineer)
+        path = self._series_dir(symbol, timeframe, pipeline, source)
+        with self._lock:
+            meta = self._read_meta(path)
+            if meta is None or meta['rows'] == 0:
+                return None
+            rows = meta['rows']
+            timestamps = self._memmap(path, 'timestamp', rows)
+            columns = list(columns) if columns is not None else list(OHLCV_COLUMNS) + meta['features']
+            memmaps = {name: self._memmap(path, name, rows) for name in columns}
+
+        start_ms, end_ms = _to_ms(start), _to_ms(end)
+        lo = int(np.searchsorted(timestamps, start_ms, side='left')) if start_ms is not None else 0
+        hi = int(np.searchsorted(timestamps, end_ms, side='right')) if end_ms is not None else rows
+        if drop_warmup:
+            lo = max(lo, meta['warmup'])
+        if lookback:
+            lo = max(lo, hi - int(lookback))
+        if hi <= lo:
+            return None
+
+        self.stats['reads'] += 1
+        result = {'timestamp': timestamps[lo:hi]}
+        result.update({name: values[lo:hi] for name, values in memmaps.items()})
+        return result
+
+    def read_frame(self, symbol: str, timeframe: str, engineer=None, start: Any = None, end: Any = None,
+                   lookback: Optional[int] = None, columns: Optional[Sequence[str]] = None,
+                   source: str = ARCHIVE_SOURCE, drop_warmup: bool = True) -> pd.DataFrame:
+        """То же в DataFrame с DatetimeIndex 'timestamp'"""
+        arrays = self.read(symbol, timeframe, engineer, start, end, lookback, columns, source, drop_warmup)
+        if arrays is None:
+            return pd.DataFrame()
+        timestamps = np.asarray(arrays.pop('timestamp'))
+        index = pd.DatetimeIndex(timestamps.astype('datetime64[ms]'), name='timestamp')
+        return pd.DataFrame({name: np.asarray(values) for name, values in arrays.items()}, index=index)
+
+    def load(self, symbol: str, timeframe: str, engineer=None, start: Any = None, end: Any = None,
+             lookback: Optional[int] = None, candles: Optional[pd.DataFrame] = None,
+             source: str = ARCHIVE_SOURCE, drop_warmup: bool = True) -> pd.DataFrame:
+        """
+        Актуализация матрицы (materialize) и чтение периода.
+
+        Returns:
+            DataFrame: OHLCV и признаки с DatetimeIndex (пустой, если свечей нет)
+        """
+        self.materialize(symbol, timeframe, engineer, candles, source)
+        return self.read_frame(symbol, timeframe, engineer, start, end, lookback,
+                               source=source, drop_warmup=drop_warmup)
+
+    def frame_features(self, candles: pd.DataFrame, engineer=None, symbol: Optional[str] = None,
+                       timeframe: Optional[str] = None, source: str = 'frame') -> pd.DataFrame:
+        """
+        Признаки для строк candles.
+
+        С symbol и timeframe - через хранилище (повторные запуски по тем же
+        свечам читают готовую матрицу), иначе - одним проходом в памяти.
+        Строки warm-up остаются с NaN.
+        """
+        if candles is None or candles.empty:
+            return pd.DataFrame()
+        if not (symbol and timeframe):
+            return self._pipeline(engineer).compute(candles)
+        self.materialize(symbol, timeframe, engineer, candles, source)
+        timestamps = frame_timestamps(candles)
+        frame = self.read_frame(symbol, timeframe, engineer, start=int(timestamps.min()),
+                                end=int(timestamps.max()), source=source, drop_warmup=False)
+        if not frame.empty and not isinstance(candles.index, pd.DatetimeIndex):
+            frame = frame.reset_index(drop=True).set_axis(candles.index[:len(frame)])
+        return frame
+
+    # === Обслуживание ===
+
+    def invalidate(self, symbol: Optional[str] = None, timeframe: Optional[str] = None):
+        """Удаление матриц символа (и таймфрейма) или всего хранилища"""
+        with self._lock:
+            if symbol is None:
+                target = self.root
+            else:
+                target = self.root / symbol.replace('/', '')
+                if timeframe is not None:
+                    target = target / str(timeframe)
+            shutil.rmtree(target, ignore_errors=True)
+
+    def series(self) -> List[Dict[str, Any]]:
+        """Метаданные всех матриц хранилища"""
+        if not self.root.is_dir():
+            return []
+        return [meta for meta in map(self._read_meta, sorted(self.root.glob('*/*/*'))) if meta]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        series = self.series()
+        return {
+            **self.stats,
+            'root': str(self.root),
+            'series': len(series),
+            'rows': sum(meta['rows'] for meta in series),
+            'size_bytes': sum(f.stat().st_size for f in self.root.glob('*/*/*/*.bin')) if series else 0,
+        }
+
+
+# Глобальное хранилище признаков
+feature_store = FeatureStore()
@@ -0,0 +1,439 @@
+"""
+Пакетный ML-инференс для всех пар цикла анализа
+Файл: src/ml/inference.py
+
+Вместо загрузки модели и построения признаков на каждую пару:
+- загруженные модели лежат в LRU-кэше с ключом (символ, таймфрейм, версия);
+  версия - вид модели и mtime файла, поэтому переобученная модель
+  подхватывается без перезапуска, а старая версия вытесняется
+- признаки (FeatureEngineer.latest_features) кэшируются по паре и последней
+  свече: повторный запрос в том же цикле или до прихода новой свечи
+  возвращает готовый DataFrame, а новая свеча пересчитывается
+  инкрементально (ml/features/pipeline.py)
+- последние строки признаков всех пар, обслуживаемых одной моделью,
+  собираются в одну матрицу и оцениваются одним вызовом predict_proba.
+  Общая модель (ml_system.direction_classifier) оценивает все пары
+  без собственной модели за один вызов
+
+Файлы моделей в models/trained:
+- {symbol}_{timeframe}_model.pkl - ансамбль MLTrainer
+- {symbol}_{timeframe}_direction.pkl - DirectionClassifier.save_model()
+- {symbol}_{timeframe}_levels/ - PriceLevelRegressor.save_models()
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..core.unified_config import unified_config as config
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = Path("models/trained")
+DEFAULT_CACHE_SIZE = 256
+SHARED_SYMBOL = '*'  # символ в ключе общей модели
+
+# Метка класса -> направление
+TRAINER_DIRECTIONS = {-1: 'SELL', 0: 'HOLD', 1: 'BUY'}
+CLASSIFIER_DIRECTIONS = {0: 'SELL', 1: 'HOLD', 2: 'BUY'}  # DOWN / SIDEWAYS / UP
+DIRECTION_VALUES = {'SELL': -1, 'HOLD': 0, 'BUY': 1}
+
+ModelKey = Tuple[str, str, str]
+
+
+def _class_labels(model, mapping: Dict[int, str], default: Iterable[int]) -> List[str]:
+    """Направления по столбцам predict_proba"""
+    classes = getattr(model, 'classes_', None)
+    if classes is None and hasattr(model, 'models'):
+        # EnsembleModel: классы совпадают с классами входящих моделей
+        classes = next(
+            (m.classes_ for m in model.models.values() if getattr(m, 'classes_', None) is not None),
+            None
+        )
+    if classes is None:
+        classes = default
+    return [mapping.get(int(c), 'HOLD') for c in classes]
+
+
+class LoadedModel:
+    """Модель направления, готовая к пакетной оценке"""
+
+    def __init__(self, key: ModelKey, model, feature_columns: List[str], labels: List[str],
+                 kind: str, scaler=None, trained_at: Optional[datetime] = None):
+        self.key = key
+        self.model = model
+        self.feature_columns = list(feature_columns)
+        self.labels = np.asarray(labels)
+        self.kind = kind
+        self.scaler = scaler
+        self.trained_at = trained_at
+
+    @property
+    def version(self) -> str:
+        return self.key[2]
+
+    def predict_proba(self, X) -> np.ndarray:
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+        proba = np.asarray(self.model.predict_proba(X), dtype=np.float64)
+        if proba.shape[1] != len(self.labels):
+            raise ValueError(f"predict_proba вернул {proba.shape[1]} классов, ожидалось {len(self.labels)}")
+        return proba
+
+    def score(self, rows: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Направление и вероятности для каждой строки признаков одним вызовом модели"""
+        proba = self.predict_proba(rows[self.feature_columns])
+        by_label = {
+            label: proba[:, self.labels == label].sum(axis=1)
+            for label in DIRECTION_VALUES
+        }
+        best = proba.argmax(axis=1)
+        results = []
+        for i, column in enumerate(best):
+            direction = str(self.labels[column])
+            results.append({
+                'direction': direction,
+                'confidence': float(proba[i, column]),
+                'prediction_value': DIRECTION_VALUES[direction],
+                'probabilities': {
+                    'bearish': float(by_label['SELL'][i]),
+                    'neutral': float(by_label['HOLD'][i]),
+                    'bullish': float(by_label['BUY'][i]),
+                },
+                'model_type': self.kind,
+                'model_version': self.version,
+            })
+        return results
+
+
+class ModelCache:
+    """LRU загруженных моделей с ключом (символ, таймфрейм, версия)"""
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.max_size = max(int(max_size), 1)
+        self._entries: 'OrderedDict[ModelKey, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key: ModelKey, loader: Callable[[], Any]) -> Any:
+        """Модель из кэша или loader(); None от loader не кэшируется"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key]
+            self.stats['misses'] += 1
+
+        # Загрузка с диска - вне блокировки
+        value = loader()
+        if value is None:
+            return None
+
+        with self._lock:
+            # Предыдущие версии той же модели больше не нужны
+            kind = key[2].split('@')[0]
+            for stale in [k for k in self._entries if k[:2] == key[:2] and k[2].split('@')[0] == kind]:
+                del self._entries[stale]
+            self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class InferenceService:
+    """
+    Оценка ML-моделями набора пар за один проход.
+
+    predict_batch() принимает DataFrame свечей по парам и возвращает
+    предсказания направления (и ценовых уровней, если есть регрессор).
+    """
+
+    def __init__(self, models_dir: Path = MODELS_DIR, cache_size: Optional[int] = None):
+        self.models_dir = Path(models_dir)
+        if cache_size is None:
+            cache_size = getattr(config, 'ML_MODEL_CACHE_SIZE', DEFAULT_CACHE_SIZE) or DEFAULT_CACHE_SIZE
+        self.models = ModelCache(cache_size)
+        self.feature_engineer = None
+
+        self._features: Dict[Tuple[str, str], Tuple[tuple, pd.DataFrame]] = {}
+        self._features_lock = threading.Lock()
+        self.stats = {
+            'batches': 0, 'rows': 0, 'model_calls': 0,
+            'features_built': 0, 'features_reused': 0, 'errors': 0,
+            'last_batch_ms': 0.0,
+        }
+
+    # === Признаки ===
+
+    @staticmethod
+    def _frame_stamp(df: pd.DataFrame) -> tuple:
+        """Версия свечей: число строк, последняя свеча и ее текущие close/volume"""
+        if df is None or df.empty:
+            return (0,)
+        last = df.iloc[-1]
+        return (len(df), df.index[-1], float(last.get('close', np.nan)), float(last.get('volume', np.nan)))
+
+    def _get_feature_engineer(self):
+        if self.feature_engineer is None:
+            from .features.feature_engineering import FeatureEngineer
+            self.feature_engineer = FeatureEngineer()
+        return self.feature_engineer
+
+    def features(self, symbol: str, timeframe: str, df: pd.DataFrame,
+                 feature_engineer=None) -> pd.DataFrame:
+        """
+        Признаки пары с переиспользованием между вызовами.
+
+        Пересчет - только если у df изменилась последняя свеча.
+        """
+        stamp = self._frame_stamp(df)
+        cache_key = (symbol, timeframe)
+        with self._features_lock:
+            cached = self._features.get(cache_key)
+        if cached is not None and cached[0] == stamp:
+            self.stats['features_reused'] += 1
+            return cached[1]
+
+        engineer = feature_engineer or self._get_feature_engineer()
+        if hasattr(engineer, 'latest_features'):
+            # Для предсказания нужна только последняя строка: считаются лишь новые свечи
+            frame = engineer.latest_features(df, cache_key)
+        else:
+            frame = engineer.create_features(df, symbol)
+        self.stats['features_built'] += 1
+        with self._features_lock:
+            self._features[cache_key] = (stamp, frame)
+        return frame
+
+    # === Модели ===
+
+    def _artifact(self, symbol: str, timeframe: str, suffix: str) -> Path:
+        return self.models_dir / f"{symbol}_{timeframe}_{suffix}"
+
+    @staticmethod
+    def _mtime(path: Path) -> Optional[int]:
+        try:
+            return path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def direction_model(self, symbol: str, timeframe: str, use_ensemble: bool = True) -> Optional[LoadedModel]:
+        """Собственная модель направления пары: ансамбль MLTrainer, затем DirectionClassifier"""
+        path = self._artifact(symbol, timeframe, 'model.pkl')
+        mtime = self._mtime(path)
+        if mtime is not None:
+            kind = 'ensemble' if use_ensemble else 'single'
+            key = (symbol, timeframe, f"{kind}@{mtime}")
+            return self.models.get(key, lambda: self._load_trainer_model(key, path, use_ensemble))
+
+        path = self._artifact(symbol, timeframe, 'direction.pkl')
+        mtime = self._mtime(path)
+        if mtime is not None:
+            key = (symbol, timeframe, f"direction_classifier@{mtime}")
+            return self.models.get(key, lambda: self._load_classifier(key, path))
+        return None
+
+    def shared_direction_model(self, classifier, timeframe: str) -> Optional[LoadedModel]:
+        """Общий обученный DirectionClassifier (например, ml_system.direction_classifier)"""
+        if classifier is None or not getattr(classifier, 'is_fitted', False) or getattr(classifier, 'model', None) is None:
+            return None
+        # Версия меняется после каждого train()
+        version = f"direction_classifier@{id(classifier)}.{len(getattr(classifier, 'training_history', []))}"
+        key = (SHARED_SYMBOL, timeframe, version)
+        return self.models.get(key, lambda: LoadedModel(
+            key, classifier.model, classifier.feature_names,
+            _class_labels(classifier.model, CLASSIFIER_DIRECTIONS, (0, 1, 2)),
+            kind='direction_classifier', scaler=classifier.scaler
+        ))
+
+    def levels_model(self, symbol: str, timeframe: str):
+        """PriceLevelRegressor пары из {symbol}_{timeframe}_levels/"""
+        directory = self._artifact(symbol, timeframe, 'levels')
+        mtime = self._mtime(directory / 'metadata.json')
+        if mtime is None:
+            return None
+        key = (symbol, timeframe, f"price_levels@{mtime}")
+        return self.models.get(key, lambda: self._load_regressor(directory))
+
+    def _load_trainer_model(self, key: ModelKey, path: Path, use_ensemble: bool) -> Optional[LoadedModel]:
+        try:
+            with open(path, 'rb') as f:
+                model_data = pickle.load(f)
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки модели {path}: {e}")
+            return None
+
+        model = model_data['ensemble'] if use_ensemble else model_data['best_single']
+        trained_at = model_data.get('training_date')
+        logger.info(f"🧠 Модель {key[0]} {key[1]} загружена в кэш ({key[2]})")
+        return LoadedModel(
+            key, model, model_data['feature_columns'],
+            _class_labels(model, TRAINER_DIRECTIONS, (-1, 0, 1)),
+            kind=key[2].split('@')[0],
+            trained_at=datetime.fromisoformat(trained_at) if trained_at else None
+        )
+
+    def _load_classifier(self, key: ModelKey, path: Path) -> Optional[LoadedModel]:
+        from .models.direction_classifier import DirectionClassifier
+
+        classifier = DirectionClassifier()
+        classifier.load_model(str(path))
+        if classifier.model is None or not classifier.feature_names:
+            return None
+        logger.info(f"🧠 DirectionClassifier {key[0]} {key[1]} загружен в кэш")
+        return LoadedModel(
+            key, classifier.model, classifier.feature_names,
+            _class_labels(classifier.model, CLASSIFIER_DIRECTIONS, (0, 1, 2)),
+            kind='direction_classifier', scaler=classifier.scaler
+        )
+
+    @staticmethod
+    def _load_regressor(directory: Path):
+        from .models.price_regressor import PriceLevelRegressor
+
+        regressor = PriceLevelRegressor()
+        regressor.load_models(str(directory))
+        return regressor if regressor.is_fitted and regressor.models else None
+
+    # === Пакетная оценка ===
+
+    @staticmethod
+    def _last_rows(frames: Dict[str, pd.DataFrame], symbols: List[str], columns: List[str]) -> pd.DataFrame:
+        """Последние строки признаков пар одной матрицей (пары без нужных столбцов пропускаются)"""
+        usable = [s for s in symbols if not frames[s].empty and set(columns).issubset(frames[s].columns)]
+        if not usable:
+            return pd.DataFrame(columns=columns)
+        matrix = np.vstack([frames[s][columns].to_numpy(dtype=np.float64)[-1] for s in usable])
+        rows = pd.DataFrame(matrix, columns=columns, index=usable)
+        return rows[np.isfinite(matrix).all(axis=1)]
+
+    def predict_batch(self, frames: Dict[str, pd.DataFrame], timeframe: str,
+                      feature_engineer=None, shared_classifier=None,
+                      shared_regressor=None) -> Dict[str, Dict[str, Any]]:
+        """
+        Предсказания для всех пар одним проходом.
+
+        Args:
+            frames: DataFrame свечей по парам
+            timeframe: Таймфрейм свечей
+            feature_engineer: FeatureEngineer (по умолчанию - собственный)
+            shared_classifier: Общий DirectionClassifier для пар без своей модели
+            shared_regressor: Общий PriceLevelRegressor для пар без своей модели
+
+        Returns:
+            {symbol: {'direction', 'confidence', 'probabilities', ..., 'levels'}}
+        """
+        started = time.perf_counter()
+        features = {}
+        for symbol, df in frames.items():
+            try:
+                features[symbol] = self.features(symbol, timeframe, df, feature_engineer)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ Ошибка признаков ML для {symbol}: {e}")
+
+        # Группировка пар по модели: одна матрица и один вызов на модель
+        shared = self.shared_direction_model(shared_classifier, timeframe)
+        groups: Dict[ModelKey, Tuple[LoadedModel, List[str]]] = {}
+        for symbol in features:
+            model = self.direction_model(symbol, timeframe) or shared
+            if model is not None:
+                groups.setdefault(model.key, (model, []))[1].append(symbol)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for model, symbols in groups.values():
+            try:
+                rows = self._last_rows(features, symbols, model.feature_columns)
+                if rows.empty:
+                    continue
+                scores = model.score(rows)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ Ошибка ML модели {model.key[0]} {model.key[2]}: {e}")
+                continue
+            self.stats['model_calls'] += 1
+            self.stats['rows'] += len(rows)
+            results.update(zip(rows.index, scores))
+
+        if results:
+            for symbol, levels in self._predict_levels(features, list(results), timeframe, shared_regressor).items():
+                results[symbol]['levels'] = levels
+
+        self.stats['batches'] += 1
+        self.stats['last_batch_ms'] = (time.perf_counter() - started) * 1000
+        logger.debug(
+            f"🤖 ML инференс: {len(results)}/{len(frames)} пар, {len(groups)} моделей, "
+            f"{self.stats['last_batch_ms']:.0f} мс"
+        )
+        return results
+
+    def _predict_levels(self, features: Dict[str, pd.DataFrame], symbols: List[str],
+                        timeframe: str, shared_regressor=None) -> Dict[str, Dict[str, float]]:
+        """Ценовые уровни: один predict на регрессор"""
+        if shared_regressor is not None and not getattr(shared_regressor, 'is_fitted', False):
+            shared_regressor = None
+
+        groups: Dict[int, Tuple[Any, List[str]]] = {}
+        for symbol in symbols:
+            regressor = self.levels_model(symbol, timeframe) or shared_regressor
+            if regressor is not None:
+                groups.setdefault(id(regressor), (regressor, []))[1].append(symbol)
+
+        levels: Dict[str, Dict[str, float]] = {}
+        for regressor, group in groups.values():
+            columns = list(dict.fromkeys(list(regressor.feature_names) + ['close']))
+            try:
+                rows = self._last_rows(features, group, columns)
+            except (TypeError, ValueError) as e:
+                logger.error(f"❌ Ошибка признаков для регрессора уровней: {e}")
+                continue
+            if rows.empty:
+                continue
+            prediction = regressor.predict(rows)
+            if 'error' in prediction:
+                self.stats['errors'] += 1
+                continue
+            self.stats['model_calls'] += 1
+            valid = rows.index[np.asarray(prediction['valid_indices'], dtype=bool)]
+            for target, values in prediction['predictions'].items():
+                if not isinstance(values, list):
+                    continue
+                for symbol, value in zip(valid, values):
+                    levels.setdefault(symbol, {})[target] = float(value)
+        return levels
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Сброс кэша признаков (всех или одной пары)"""
+        with self._features_lock:
+            if symbol is None:
+                self._features.clear()
+            else:
+                for key in [k for k in self._features if k[0] == symbol]:
+                    del self._features[key]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'models_cached': len(self.models),
+            'model_cache': dict(self.models.stats),
+            'feature_frames': len(self._features),
+        }
+
+
+# Глобальный экземпляр
+inference_service = InferenceService()
@@ -19,8 +19,6 @@ from pathlib import Path
 import logging
 from dataclasses import dataclass
 from enum import Enum
-import random
-from collections import deque
 
 
 # Безопасные импорты
@@ -81,6 +79,214 @@ class TradingReward:
     risk_penalty: float
     transaction_cost: float
 
+# Границы бинов признаков состояния для Q-table
+# [price, volume, rsi, macd, bb_pos, balance, position, time_step]
+STATE_BINS = (
+    np.linspace(0, 2, 10),      # price (normalized)
+    np.linspace(0, 5, 10),      # volume (normalized)
+    np.linspace(0, 1, 10),      # rsi
+    np.linspace(0, 1, 10),      # macd (normalized)
+    np.linspace(0, 1, 10),      # bb_position
+    np.linspace(0.5, 1.5, 10),  # balance (normalized)
+    np.linspace(0, 1, 5),       # position_size
+    np.linspace(0, 1, 10),      # time_step
+)
+EXTRA_STATE_BINS = np.linspace(0, 1, 10)  # признаки сверх восьми стандартных
+
+# Рыночная часть состояния: (колонка, значение при ее отсутствии, масштаб, сдвиг)
+MARKET_STATE_COLUMNS = (
+    ('close', 0.0, 100.0, 0.0),
+    ('volume', 0.0, 1000000.0, 0.0),
+    ('rsi', 50.0, 100.0, 0.0),
+    ('macd', 0.0, 200.0, 100.0),
+    ('bb_position', 0.5, 1.0, 0.0),
+)
+
+TRADE_SIZE = 0.1  # шаг изменения позиции за одно действие
+
+
+def _market_states(data: pd.DataFrame) -> np.ndarray:
+    """Нормализованная рыночная часть состояния для всех строк data: (len(data), 5)"""
+    columns = []
+    for name, default, scale, shift in MARKET_STATE_COLUMNS:
+        if name in data.columns:
+            values = data[name].to_numpy(dtype=np.float64)
+        else:
+            values = np.full(len(data), default)
+        columns.append((values + shift) / scale if shift else values / scale)
+    return np.column_stack(columns) if len(data) else np.zeros((0, len(MARKET_STATE_COLUMNS)))
+
+
+def _execute_actions(actions: np.ndarray, balance: np.ndarray, position: np.ndarray,
+                     current_price: float, next_price: float, transaction_cost: float,
+                     max_position_size: float, initial_balance: float):
+    """
+    Торговые действия сразу для массива окружений.
+
+    Returns:
+        Tuple: (balance, position, reward, traded, won) - массивы по окружениям
+    """
+    price_change = (next_price - current_price) / current_price
+
+    # Покупка: есть место в позиции и хватает баланса
+    buy_allowed = (actions == TradingAction.BUY) & (position < max_position_size)
+    buy_size = np.minimum(TRADE_SIZE, max_position_size - position)
+    cost = buy_size * current_price * (1 + transaction_cost)
+    buy = buy_allowed & (balance >= cost)
+
+    # Продажа: есть открытая позиция
+    sell = (actions == TradingAction.SELL) & (position > 0)
+    sell_size = np.minimum(TRADE_SIZE, position)
+    revenue = sell_size * current_price * (1 - transaction_cost)
+
+    balance = np.where(buy, balance - cost, np.where(sell, balance + revenue, balance))
+    position = np.where(buy, position + buy_size, np.where(sell, position - sell_size, position))
+
+    # Награда за прибыльную покупку/продажу; покупка без баланса - 0,
+    # HOLD или невозможное действие - штраф за бездействие
+    reward = np.where(buy, buy_size * price_change * 100,
+                      np.where(sell, sell_size * (-price_change) * 100,
+                               np.where(buy_allowed, 0.0, -0.01)))
+
+    # Штраф за убытки и награда за рост портфеля
+    portfolio_value = balance + position * next_price
+    reward = reward - 1.0 * (portfolio_value < initial_balance * 0.9) + 0.5 * (portfolio_value > initial_balance * 1.1)
+
+    traded = buy | sell
+    won = (buy & (price_change > 0)) | (sell & (price_change < 0))
+    return balance, position, reward, traded, won
+
+
+class QTable:
+    """
+    Q-значения в плотном массиве: строка на каждое встреченное состояние.
+
+    Состояния - целочисленные коды (TradingRLAgent.encode_states); код -> строка
+    ищется бинарным поиском по отсортированному массиву кодов, новые коды
+    добавляются пачкой. Номера строк не меняются при росте таблицы.
+    """
+
+    def __init__(self, action_size: int, capacity: int = 1024):
+        self.action_size = action_size
+        self.values = np.zeros((capacity, action_size))
+        self.size = 0
+        self._codes = np.empty(0, dtype=np.int64)  # отсортированные коды
+        self._rows = np.empty(0, dtype=np.int64)   # строка values для _codes[i]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, code) -> bool:
+        return bool(self.rows(np.array([code], dtype=np.int64), insert=False)[0] >= 0)
+
+    def __getitem__(self, code) -> np.ndarray:
+        row = self.rows(np.array([code], dtype=np.int64), insert=False)[0]
+        if row < 0:
+            raise KeyError(code)
+        return self.values[row]
+
+    def rows(self, codes: np.ndarray, insert: bool = True) -> np.ndarray:
+        """Строки values для кодов; неизвестные коды добавляются нулевыми строками (insert) или дают -1"""
+        codes = np.asarray(codes, dtype=np.int64)
+        rows = np.full(codes.shape, -1, dtype=np.int64)
+        if self.size:
+            pos = np.minimum(np.searchsorted(self._codes, codes), self.size - 1)
+            found = self._codes[pos] == codes
+            rows[found] = self._rows[pos[found]]
+        else:
+            found = np.zeros(codes.shape, dtype=bool)
+        if not insert or found.all():
+            return rows
+
+        new = np.unique(codes[~found])
+        self._reserve(self.size + len(new))
+        new_rows = np.arange(self.size, self.size + len(new), dtype=np.int64)
+        self.size += len(new)
+        at = np.searchsorted(self._codes, new)
+        self._codes = np.insert(self._codes, at, new)
+        self._rows = np.insert(self._rows, at, new_rows)
+        rows[~found] = new_rows[np.searchsorted(new, codes[~found])]
+        return rows
+
+    def lookup(self, codes: np.ndarray, insert: bool = True) -> np.ndarray:
+        """Q-значения (len(codes), action_size); для неизвестных состояний без insert - нули"""
+        rows = self.rows(codes, insert)
+        if insert or (rows >= 0).all():
+            return self.values[rows]
+        q_values = np.zeros((len(rows), self.action_size))
+        known = rows >= 0
+        q_values[known] = self.values[rows[known]]
+        return q_values
+
+    def _reserve(self, size: int):
+        if size > len(self.values):
+            values = np.zeros((max(size, 2 * len(self.values)), self.action_size))
+            values[:self.size] = self.values[:self.size]
+            self.values = values
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        return {'codes': self._codes.copy(), 'values': self.values[self._rows].copy()}
+
+    @classmethod
+    def from_arrays(cls, codes: np.ndarray, values: np.ndarray, action_size: int) -> 'QTable':
+        table = cls(action_size, capacity=max(len(codes), 1024))
+        rows = table.rows(np.asarray(codes, dtype=np.int64))
+        table.values[rows] = values
+        return table
+
+
+class ReplayBuffer:
+    """Кольцевой буфер опыта в предвыделенных массивах (состояния - коды Q-table)"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.position = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add_batch(self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray,
+                  next_states: np.ndarray, dones: np.ndarray):
+        """Запись переходов; при переполнении затираются самые старые"""
+        n = len(states)
+        if n == 0:
+            return
+        start = max(0, n - self.capacity)
+        idx = (self.position + np.arange(start, n)) % self.capacity
+        self.states[idx] = states[start:]
+        self.actions[idx] = actions[start:]
+        self.rewards[idx] = rewards[start:]
+        self.next_states[idx] = next_states[start:]
+        self.dones[idx] = dones[start:]
+        self.position = (self.position + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def sample(self, batch_size: int, rng: np.random.Generator):
+        """Случайный батч без повторов: (states, actions, rewards, next_states, dones)"""
+        idx = rng.choice(self.size, size=min(batch_size, self.size), replace=False)
+        return self.states[idx], self.actions[idx], self.rewards[idx], self.next_states[idx], self.dones[idx]
+
+    def clear(self):
+        self.position = 0
+        self.size = 0
+
+    def resize(self, capacity: int):
+        """Смена емкости с сохранением самых свежих переходов"""
+        if capacity == self.capacity:
+            return
+        order = (self.position - self.size + np.arange(self.size)) % self.capacity
+        keep = order[-capacity:]
+        arrays = [getattr(self, name)[keep] for name in ('states', 'actions', 'rewards', 'next_states', 'dones')]
+        self.__init__(capacity)
+        self.add_batch(*arrays)
+
+
 class TradingEnvironment:
     """
     Торговое окружение для RL агента
@@ -105,6 +311,10 @@ class TradingEnvironment:
         self.transaction_cost = transaction_cost
         self.max_position_size = max_position_size
         
+        # Рыночная часть состояний и цены - один раз, без data.iloc на каждом шаге
+        self._market = _market_states(self.data)
+        self._close = self.data['close'].to_numpy(dtype=np.float64)
+        
         # Состояние окружения
         self.current_step = 0
         self.balance = initial_balance
@@ -138,21 +348,15 @@ class TradingEnvironment:
         if self.current_step >= len(self.data):
             return np.zeros(8)  # Пустое состояние
         
-        row = self.data.iloc[self.current_step]
-        
         # Нормализуем состояние
-        state = np.array([
-            row.get('close', 0) / 100.0,  # Нормализованная цена
-            row.get('volume', 0) / 1000000.0,  # Нормализованный объем
-            row.get('rsi', 50) / 100.0,  # RSI [0,1]
-            (row.get('macd', 0) + 100) / 200.0,  # MACD нормализованный
-            row.get('bb_position', 0.5),  # BB позиция [0,1]
-            self.balance / self.initial_balance,  # Нормализованный баланс
-            self.position / self.max_position_size,  # Нормализованная позиция
-            self.current_step / len(self.data)  # Временная позиция
-        ])
-        
-        return state
+        return np.concatenate((
+            self._market[self.current_step],  # Цена, объем, RSI, MACD, BB позиция
+            [
+                self.balance / self.initial_balance,  # Нормализованный баланс
+                self.position / self.max_position_size,  # Нормализованная позиция
+                self.current_step / len(self.data)  # Временная позиция
+            ]
+        ))
     
     def step(self, action: int) -> Tuple[np.ndarray, float, bool, Dict]:
         """
@@ -167,8 +371,8 @@ class TradingEnvironment:
         if self.current_step >= len(self.data) - 1:
             return self._get_state(), 0.0, True, {}
         
-        current_price = self.data.iloc[self.current_step]['close']
-        next_price = self.data.iloc[self.current_step + 1]['close']
+        current_price = self._close[self.current_step]
+        next_price = self._close[self.current_step + 1]
         
         # Выполняем действие
         reward = self._execute_action(action, current_price, next_price)
@@ -197,66 +401,113 @@ class TradingEnvironment:
     
     def _execute_action(self, action: int, current_price: float, next_price: float) -> float:
         """Выполнение торгового действия"""
-        action_enum = TradingAction(action)
-        reward = 0.0
-        
-        price_change = (next_price - current_price) / current_price
-        
-        if action_enum == TradingAction.BUY and self.position < self.max_position_size:
-            # Покупка
-            trade_size = min(0.1, self.max_position_size - self.position)
-            cost = trade_size * current_price * (1 + self.transaction_cost)
-            
-            if self.balance >= cost:
-                self.balance -= cost
-                self.position += trade_size
-                self.total_trades += 1
-                
-                # Награда за прибыльную покупку
-                reward = trade_size * price_change * 100
-                if price_change > 0:
-                    self.winning_trades += 1
-        
-        elif action_enum == TradingAction.SELL and self.position > 0:
-            # Продажа
-            trade_size = min(0.1, self.position)
-            revenue = trade_size * current_price * (1 - self.transaction_cost)
-            
-            self.balance += revenue
-            self.position -= trade_size
-            self.total_trades += 1
-            
-            # Награда за прибыльную продажу (обратная к движению цены)
-            reward = trade_size * (-price_change) * 100
-            if price_change < 0:
-                self.winning_trades += 1
-        
-        else:
-            # HOLD или невозможное действие
-            # Небольшая награда за удержание при неопределенности
-            reward = -0.01  # Штраф за бездействие
-        
-        # Дополнительные штрафы/награды
-        portfolio_value = self.balance + self.position * next_price
-        
-        # Штраф за убытки
-        if portfolio_value < self.initial_balance * 0.9:
-            reward -= 1.0
-        
-        # Награда за рост портфеля
-        if portfolio_value > self.initial_balance * 1.1:
-            reward += 0.5
-        
-        return reward
+        balance, position, reward, traded, won = _execute_actions(
+            np.array([TradingAction(action)]), np.array([self.balance]), np.array([self.position]),
+            current_price, next_price, self.transaction_cost, self.max_position_size, self.initial_balance
+        )
+        self.balance = float(balance[0])
+        self.position = float(position[0])
+        self.total_trades += int(traded[0])
+        self.winning_trades += int(won[0])
+        return float(reward[0])
+
+class VectorTradingEnvironment:
+    """
+    n_envs независимых эпизодов TradingEnvironment на одних данных за один step().
+
+    Все эпизоды идут по свечам синхронно; эпизод, завершившийся раньше
+    (портфель <= 0), замораживается и дальше не меняется.
+    """
+
+    def __init__(self,
+                 data: pd.DataFrame,
+                 n_envs: int = 32,
+                 initial_balance: float = 10000.0,
+                 transaction_cost: float = 0.001,
+                 max_position_size: float = 1.0):
+        self.n_envs = n_envs
+        self.length = len(data)
+        self.initial_balance = initial_balance
+        self.transaction_cost = transaction_cost
+        self.max_position_size = max_position_size
+
+        self._market = _market_states(data)
+        self._close = data['close'].to_numpy(dtype=np.float64)
+        self.reset()
+
+    def reset(self) -> np.ndarray:
+        """Сброс всех эпизодов; состояния (n_envs, 8)"""
+        self.current_step = 0
+        self.balance = np.full(self.n_envs, float(self.initial_balance))
+        self.position = np.zeros(self.n_envs)
+        self.portfolio_value = self.balance.copy()
+        self.total_trades = np.zeros(self.n_envs, dtype=np.int64)
+        self.winning_trades = np.zeros(self.n_envs, dtype=np.int64)
+        self.done = np.zeros(self.n_envs, dtype=bool)
+        return self._get_states()
+
+    def _get_states(self) -> np.ndarray:
+        states = np.zeros((self.n_envs, 8))
+        if self.current_step >= self.length:
+            return states
+        states[:, :5] = self._market[self.current_step]
+        states[:, 5] = self.balance / self.initial_balance
+        states[:, 6] = self.position / self.max_position_size
+        states[:, 7] = self.current_step / self.length
+        return states
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]:
+        """
+        Действия всех эпизодов на текущей свече
+
+        Returns:
+            Tuple: (states (n_envs, 8), rewards, dones, info) - награды завершенных эпизодов равны 0
+        """
+        if self.current_step >= self.length - 1:
+            self.done[:] = True
+            return self._get_states(), np.zeros(self.n_envs), self.done.copy(), self._info()
+
+        current_price = self._close[self.current_step]
+        next_price = self._close[self.current_step + 1]
+        balance, position, rewards, traded, won = _execute_actions(
+            np.asarray(actions), self.balance, self.position, current_price, next_price,
+            self.transaction_cost, self.max_position_size, self.initial_balance
+        )
+
+        active = ~self.done
+        self.balance = np.where(active, balance, self.balance)
+        self.position = np.where(active, position, self.position)
+        self.total_trades += traded & active
+        self.winning_trades += won & active
+        self.portfolio_value = np.where(active, self.balance + self.position * next_price, self.portfolio_value)
+        rewards = np.where(active, rewards, 0.0)
+
+        self.current_step += 1
+        self.done |= (self.current_step >= self.length - 1) | (self.portfolio_value <= 0)
+        return self._get_states(), rewards, self.done.copy(), self._info()
+
+    def _info(self) -> Dict[str, np.ndarray]:
+        return {
+            'portfolio_value': self.portfolio_value,
+            'balance': self.balance,
+            'position': self.position,
+            'total_trades': self.total_trades,
+            'win_rate': self.winning_trades / np.maximum(self.total_trades, 1)
+        }
+
 
 class TradingRLAgent:
     """
     ✅ ИСПРАВЛЕННЫЙ: RL агент для торговли с использованием Q-Learning
-    
+
     Базовая реализация агента обучения с подкреплением для торговли.
     Использует Q-Learning для изучения оптимальной торговой стратегии.
+
+    Состояния кодируются целыми числами (номера бинов признаков в смешанной
+    системе счисления), Q-значения - в плотной QTable, опыт - в кольцевом
+    ReplayBuffer; обучение идет пачками параллельных эпизодов.
     """
-    
+
     def __init__(self,
                  state_size: int = 8,
                  action_size: int = 3,
@@ -265,10 +516,11 @@ class TradingRLAgent:
                  epsilon_decay: float = 0.995,
                  epsilon_min: float = 0.01,
                  gamma: float = 0.95,
-                 memory_size: int = 10000):
+                 memory_size: int = 10000,
+                 parallel_episodes: int = 8):
         """
         Инициализация RL агента
-        
+
         Args:
             state_size: Размер вектора состояния
             action_size: Количество возможных действий
@@ -277,7 +529,8 @@ class TradingRLAgent:
             epsilon_decay: Коэффициент уменьшения epsilon
             epsilon_min: Минимальное значение epsilon
             gamma: Коэффициент дисконтирования
-            memory_size: Размер буфера опыта
+            memory_size: Размер буфера опыта (на один эпизод пачки)
+            parallel_episodes: Эпизодов, проходимых одновременно при обучении
         """
         self.state_size = state_size
         self.action_size = action_size
@@ -286,187 +539,218 @@ class TradingRLAgent:
         self.epsilon_decay = epsilon_decay
         self.epsilon_min = epsilon_min
         self.gamma = gamma
-        
+        self.memory_size = memory_size
+        self.parallel_episodes = parallel_episodes
+
+        self._init_encoder()
+
         # Q-table для простого Q-Learning
-        self.q_table = {}
-        
+        self.q_table = QTable(action_size)
+
         # Буфер опыта
-        self.memory = deque(maxlen=memory_size)
-        
+        self.memory = ReplayBuffer(memory_size)
+        self._rng = np.random.default_rng()
+
         # Метрики
         self.training_history = []
         self.is_trained = False
-        
+
         logger.info("✅ TradingRLAgent инициализирован")
-    
-    def _discretize_state(self, state: np.ndarray) -> str:
+
+    def _init_encoder(self):
+        """Бины признаков и веса разрядов кода состояния для текущего state_size"""
+        self._bins = [STATE_BINS[i] if i < len(STATE_BINS) else EXTRA_STATE_BINS for i in range(self.state_size)]
+        self._levels = [len(edges) + 1 for edges in self._bins]
+        if int(np.prod(self._levels, dtype=object)) >= 2 ** 63:
+            raise ValueError(f"Слишком большое пространство состояний для state_size={self.state_size}")
+        self._radix = np.cumprod([1] + self._levels[:-1]).astype(np.int64)
+
+    def encode_states(self, states: np.ndarray) -> np.ndarray:
+        """Коды состояний (m, state_size) -> (m,): номер бина каждого признака как разряд числа"""
+        states = np.atleast_2d(np.asarray(states, dtype=np.float64))
+        if states.shape[1] < self.state_size:
+            states = np.pad(states, ((0, 0), (0, self.state_size - states.shape[1])))
+        codes = np.zeros(len(states), dtype=np.int64)
+        for i, edges in enumerate(self._bins):
+            # searchsorted(side='right') по возрастающим границам - то же, что np.digitize
+            codes += np.searchsorted(edges, states[:, i], side='right') * self._radix[i]
+        return codes
+
+    def _discretize_state(self, state: np.ndarray) -> int:
         """Дискретизация состояния для Q-table с использованием бинов."""
-        try:
-            # Определяем границы и количество бинов для каждого признака в состоянии
-            # [price, volume, rsi, macd, bb_pos, balance, position, time_step]
-            bins = [
-                np.linspace(0, 2, 10),      # price (normalized)
-                np.linspace(0, 5, 10),      # volume (normalized)
-                np.linspace(0, 1, 10),      # rsi
-                np.linspace(0, 1, 10),      # macd (normalized)
-                np.linspace(0, 1, 10),      # bb_position
-                np.linspace(0.5, 1.5, 10),  # balance (normalized)
-                np.linspace(0, 1, 5),       # position_size
-                np.linspace(0, 1, 10)       # time_step
-            ]
-            
-            # Убедимся, что количество бинов соответствует размеру состояния
-            if len(bins) != len(state):
-                # Fallback на старый метод, если размеры не совпадают
-                return str(np.round(state, 1).tolist())
-    
-            # Преобразуем каждое значение в номер его бина
-            discretized_state = []
-            for i, value in enumerate(state):
-                # np.digitize находит, в какой интервал попадает значение
-                digitized_value = np.digitize(value, bins[i])
-                discretized_state.append(str(digitized_value))
-                
-            # Возвращаем уникальный ключ состояния в виде строки
-            return "_".join(discretized_state)
-        except Exception as e:
-            logger.error(f"Ошибка дискретизации состояния: {e}")
-            # Безопасный fallback в случае ошибки
-            return str(np.round(state, 1).tolist())
-    
+        state = np.asarray(state, dtype=np.float64).ravel()
+        if len(state) != self.state_size:
+            state = np.pad(state, (0, max(0, self.state_size - len(state))))[:self.state_size]
+        return int(self.encode_states(state)[0])
+
+    def _act(self, codes: np.ndarray, training: bool,
+             epsilon: Union[float, np.ndarray, None] = None) -> np.ndarray:
+        """Epsilon-greedy действия для массива закодированных состояний (epsilon - число или по состоянию)"""
+        actions = self.q_table.lookup(codes, insert=training).argmax(axis=1)
+        if training:
+            explore = self._rng.random(len(codes)) < (self.epsilon if epsilon is None else epsilon)
+            actions[explore] = self._rng.integers(0, self.action_size, int(explore.sum()))
+        return actions
+
     def get_action(self, state: np.ndarray, training: bool = True) -> int:
         """
         Выбор действия на основе epsilon-greedy стратегии
-        
+
         Args:
             state: Текущее состояние
             training: Режим обучения
-            
+
         Returns:
             Выбранное действие (0, 1, 2)
         """
-        state_key = self._discretize_state(state)
-        
-        # Инициализируем Q-значения для нового состояния
-        if state_key not in self.q_table:
-            self.q_table[state_key] = np.zeros(self.action_size)
-        
-        # Epsilon-greedy выбор действия
-        if training and random.random() < self.epsilon:
-            return random.randint(0, self.action_size - 1)
-        else:
-            return np.argmax(self.q_table[state_key])
-    
-    def remember(self, state: np.ndarray, action: int, reward: float, 
+        return int(self._act(np.array([self._discretize_state(state)]), training)[0])
+
+    def remember(self, state: np.ndarray, action: int, reward: float,
                  next_state: np.ndarray, done: bool):
         """Запоминание опыта"""
-        self.memory.append((state, action, reward, next_state, done))
-    
+        self.memory.add_batch(
+            np.array([self._discretize_state(state)]), np.array([action]), np.array([reward]),
+            np.array([self._discretize_state(next_state)]), np.array([done])
+        )
+
     def replay(self, batch_size: int = 32):
         """Обучение на батче из буфера опыта"""
         if len(self.memory) < batch_size:
             return
-        
-        # Выбираем случайный батч
-        batch = random.sample(self.memory, min(batch_size, len(self.memory)))
-        
-        for state, action, reward, next_state, done in batch:
-            state_key = self._discretize_state(state)
-            next_state_key = self._discretize_state(next_state)
-            
-            # Инициализируем Q-значения если нужно
-            if state_key not in self.q_table:
-                self.q_table[state_key] = np.zeros(self.action_size)
-            if next_state_key not in self.q_table:
-                self.q_table[next_state_key] = np.zeros(self.action_size)
-            
-            # Q-Learning обновление
-            target = reward
-            if not done:
-                target += self.gamma * np.max(self.q_table[next_state_key])
-            
-            # Обновляем Q-значение
-            current_q = self.q_table[state_key][action]
-            self.q_table[state_key][action] = current_q + self.learning_rate * (target - current_q)
-        
+        self._learn(batch_size)
+
         # Уменьшаем epsilon
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
-    
-    def train(self, 
+
+    def _learn(self, batch_size: int = 32):
+        """Q-Learning обновление по случайному батчу из буфера (без изменения epsilon)"""
+        if len(self.memory) < batch_size:
+            return
+
+        # Выбираем случайный батч и обновляем Q-значения одним векторным шагом
+        states, actions, rewards, next_states, dones = self.memory.sample(batch_size, self._rng)
+        rows = self.q_table.rows(states)
+        next_rows = self.q_table.rows(next_states)
+        q_values = self.q_table.values
+
+        # Q-Learning обновление
+        target = rewards + np.where(dones, 0.0, self.gamma * q_values[next_rows].max(axis=1))
+        current_q = q_values[rows, actions]
+        np.add.at(q_values, (rows, actions), self.learning_rate * (target - current_q))
+
+    def _epsilon_schedule(self, n: int) -> Tuple[np.ndarray, float]:
+        """
+        Epsilon для n эпизодов подряд так, как их дали бы n вызовов replay()
+
+        Returns:
+            Tuple: (epsilon каждого эпизода, epsilon после них)
+        """
+        schedule = self.epsilon * self.epsilon_decay ** np.arange(n + 1)
+        if self.epsilon <= self.epsilon_min:
+            schedule[:] = self.epsilon
+        else:
+            # Как в replay(): уменьшение прекращается на первом значении <= epsilon_min
+            reached = np.flatnonzero(schedule <= self.epsilon_min)
+            if len(reached):
+                schedule[reached[0]:] = schedule[reached[0]]
+        return schedule[:n], float(schedule[n])
+
+    def train(self,
               data: pd.DataFrame,
               episodes: int = 100,
               max_steps_per_episode: int = None,
               validation_split: float = 0.2) -> Dict[str, Any]:
         """
         Обучение RL агента
-        
+
         Args:
             data: Исторические данные для обучения
             episodes: Количество эпизодов обучения
             max_steps_per_episode: Максимальное количество шагов за эпизод
             validation_split: Доля данных для валидации
-            
+
         Returns:
             Результаты обучения
         """
         try:
             logger.info(f"🎯 Начало обучения RL агента на {episodes} эпизодах...")
-            
+
             # Разделяем данные
             split_idx = int(len(data) * (1 - validation_split))
             train_data = data.iloc[:split_idx].copy()
             val_data = data.iloc[split_idx:].copy()
-            
-            # Создаем окружение
-            env = TradingEnvironment(train_data)
-            
+
             # Метрики обучения
             episode_rewards = []
             episode_portfolio_values = []
-            
+
             max_steps = max_steps_per_episode or len(train_data) - 1
-            
-            for episode in range(episodes):
-                state = env.reset()
-                episode_reward = 0
-                
+            env = None
+
+            while len(episode_rewards) < episodes:
+                # Пачка параллельных эпизодов в одном векторном окружении
+                n_envs = min(self.parallel_episodes, episodes - len(episode_rewards))
+                if env is None or env.n_envs != n_envs:
+                    env = VectorTradingEnvironment(train_data, n_envs=n_envs)
+                codes = self.encode_states(env.reset())
+                totals = np.zeros(n_envs)
+
+                # Каждый эпизод пачки хранит в буфере столько же свечей, сколько
+                # один эпизод последовательного обучения
+                if self.memory.capacity < self.memory_size * n_envs:
+                    self.memory.resize(self.memory_size * n_envs)
+
+                # Epsilon эпизода - как при последовательном обучении с уменьшением после каждого
+                env_epsilon, next_epsilon = self._epsilon_schedule(n_envs)
+
+                # Одно обновление на эпизод, равномерно по ходу пачки
+                replays_done = 0
+
                 for step in range(max_steps):
-                    # Выбираем действие
-                    action = self.get_action(state, training=True)
-                    
-                    # Выполняем действие
-                    next_state, reward, done, info = env.step(action)
-                    
-                    # Запоминаем опыт
-                    self.remember(state, action, reward, next_state, done)
-                    
-                    episode_reward += reward
-                    state = next_state
-                    
-                    if done:
+                    active = ~env.done
+
+                    # Выбираем действия и выполняем их
+                    actions = self._act(codes, training=True, epsilon=env_epsilon)
+                    next_states, rewards, dones, info = env.step(actions)
+                    next_codes = self.encode_states(next_states)
+
+                    # Запоминаем опыт эпизодов, еще не завершенных до этого шага
+                    self.memory.add_batch(codes[active], actions[active], rewards[active],
+                                          next_codes[active], dones[active])
+
+                    totals += rewards
+                    codes = next_codes
+
+                    for _ in range((step + 1) * n_envs // max_steps - replays_done):
+                        self._learn()
+                    replays_done = (step + 1) * n_envs // max_steps
+
+                    if env.done.all():
                         break
-                
-                # Обучаем агента
-                self.replay()
-                
+
+                # Обновления, не выполненные из-за раннего завершения эпизодов
+                for _ in range(n_envs - replays_done):
+                    self._learn()
+                self.epsilon = next_epsilon
+
                 # Записываем метрики
-                episode_rewards.append(episode_reward)
-                final_portfolio = info.get('portfolio_value', env.initial_balance)
-                episode_portfolio_values.append(final_portfolio)
-                
+                logged = len(episode_rewards)
+                episode_rewards.extend(totals.tolist())
+                episode_portfolio_values.extend(env.portfolio_value.tolist())
+
                 # Логируем прогресс
-                if episode % 10 == 0:
+                if len(episode_rewards) // 10 > logged // 10 or logged == 0:
                     avg_reward = np.mean(episode_rewards[-10:])
                     avg_portfolio = np.mean(episode_portfolio_values[-10:])
-                    logger.info(f"Эпизод {episode}/{episodes}: "
+                    logger.info(f"Эпизод {len(episode_rewards)}/{episodes}: "
                                f"Reward={avg_reward:.2f}, "
                                f"Portfolio=${avg_portfolio:.2f}, "
                                f"Epsilon={self.epsilon:.3f}")
-            
+
             # Валидация
             val_results = self._validate(val_data)
-            
+
             # Результаты обучения
             training_results = {
                 'episodes_completed': episodes,
@@ -479,61 +763,63 @@ class TradingRLAgent:
                 'episode_rewards': episode_rewards,
                 'episode_portfolio_values': episode_portfolio_values
             }
-            
+
             self.training_history.append({
                 'timestamp': datetime.now(),
                 'results': training_results,
                 'episodes': episodes
             })
-            
+
             self.is_trained = True
-            
+
             logger.info(f"✅ Обучение завершено!")
             logger.info(f"📊 Финальная доходность: {training_results['total_return']:.2f}%")
             logger.info(f"📊 Размер Q-table: {training_results['q_table_size']}")
-            
+
             return training_results
-            
+
         except Exception as e:
             logger.error(f"❌ Ошибка обучения RL агента: {e}")
             return {'success': False, 'error': str(e)}
-    
+
     def _validate(self, val_data: pd.DataFrame) -> Dict[str, Any]:
         """Валидация агента на отложенных данных"""
         try:
-            env = TradingEnvironment(val_data)
-            state = env.reset()
-            
-            total_reward = 0
+            env = VectorTradingEnvironment(val_data, n_envs=1)
+            codes = self.encode_states(env.reset())
+
+            total_reward = 0.0
             actions_taken = []
-            
+            info = {}
+
             for step in range(len(val_data) - 1):
-                action = self.get_action(state, training=False)
-                next_state, reward, done, info = env.step(action)
-                
-                actions_taken.append(action)
-                total_reward += reward
-                state = next_state
-                
-                if done:
+                actions = self._act(codes, training=False)
+                next_states, rewards, dones, info = env.step(actions)
+
+                actions_taken.append(int(actions[0]))
+                total_reward += float(rewards[0])
+                codes = self.encode_states(next_states)
+
+                if dones[0]:
                     break
-            
-            final_value = info.get('portfolio_value', env.initial_balance)
+
+            final_value = float(env.portfolio_value[0])
             total_return = (final_value / env.initial_balance - 1) * 100
-            
+            counts = np.bincount(actions_taken, minlength=self.action_size)
+
             return {
                 'total_reward': total_reward,
                 'final_portfolio_value': final_value,
                 'total_return': total_return,
-                'total_trades': info.get('total_trades', 0),
-                'win_rate': info.get('win_rate', 0),
+                'total_trades': int(env.total_trades[0]),
+                'win_rate': float(info['win_rate'][0]) if info else 0,
                 'actions_distribution': {
-                    'SELL': actions_taken.count(0),
-                    'HOLD': actions_taken.count(1),
-                    'BUY': actions_taken.count(2)
+                    'SELL': int(counts[0]),
+                    'HOLD': int(counts[1]),
+                    'BUY': int(counts[2])
                 }
             }
-            
+
         except Exception as e:
             logger.error(f"❌ Ошибка валидации: {e}")
             return {'error': str(e)}
@@ -611,7 +897,7 @@ class TradingRLAgent:
         """Сохранение модели"""
         try:
             model_data = {
-                'q_table': self.q_table,
+                'q_table': self.q_table.to_dict(),
                 'state_size': self.state_size,
                 'action_size': self.action_size,
                 'learning_rate': self.learning_rate,
@@ -638,9 +924,10 @@ class TradingRLAgent:
             with open(filepath, 'rb') as f:
                 model_data = pickle.load(f)
             
-            self.q_table = model_data['q_table']
             self.state_size = model_data['state_size']
             self.action_size = model_data['action_size']
+            self._init_encoder()
+            self.q_table = self._load_q_table(model_data['q_table'])
             self.learning_rate = model_data['learning_rate']
             self.epsilon = model_data['epsilon']
             self.epsilon_decay = model_data['epsilon_decay']
@@ -654,6 +941,26 @@ class TradingRLAgent:
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки модели: {e}")
     
+    def _load_q_table(self, data: Dict) -> QTable:
+        """QTable из сохраненной модели, включая старый формат {"<бин>_<бин>_...": Q-значения}"""
+        if 'codes' in data and 'values' in data:
+            return QTable.from_arrays(data['codes'], data['values'], self.action_size)
+
+        codes, values = [], []
+        for key, q_values in data.items():
+            try:
+                digits = [int(part) for part in str(key).split('_')]
+            except ValueError:
+                continue  # ключи резервного формата (округленный вектор) не переносятся
+            if len(digits) != self.state_size or any(not 0 <= d < n for d, n in zip(digits, self._levels)):
+                continue
+            codes.append(int(np.dot(digits, self._radix)))
+            values.append(q_values)
+        if len(codes) < len(data):
+            logger.warning(f"⚠️ Из Q-table старого формата перенесено {len(codes)} из {len(data)} состояний")
+        return QTable.from_arrays(np.array(codes, dtype=np.int64),
+                                  np.array(values).reshape(len(values), self.action_size), self.action_size)
+
     def get_model_info(self) -> Dict[str, Any]:
         """Получение информации о модели"""
         return {
@@ -672,6 +979,9 @@ class TradingRLAgent:
 __all__ = [
     'TradingRLAgent',
     'TradingEnvironment',
+    'VectorTradingEnvironment',
+    'QTable',
+    'ReplayBuffer',
     'TradingAction',
     'TradingState',
     'TradingReward'
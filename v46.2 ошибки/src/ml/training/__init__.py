@@ -60,6 +60,13 @@ except ImportError:
     _backtester_available = False
     MLBacktester = None
 
+try:
+    from .sweep_runner import SweepRunner
+    _sweep_runner_available = True
+except ImportError:
+    _sweep_runner_available = False
+    SweepRunner = None
+
 # Экспорт
 __all__ = ['MLTrainer', 'EnsembleModel']
 
@@ -67,4 +74,7 @@ if _optimizer_available:
     __all__.append('HyperparameterOptimizer')
     
 if _backtester_available:
-    __all__.append('MLBacktester')
\ No newline at end of file
+    __all__.append('MLBacktester')
+
+if _sweep_runner_available:
+    __all__.append('SweepRunner')
\ No newline at end of file
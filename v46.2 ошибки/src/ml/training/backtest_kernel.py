@@ -0,0 +1,284 @@
+"""
+Векторизованное ядро бэктестинга на массивах NumPy
+Файл: src/ml/training/backtest_kernel.py
+
+Повторяет семантику построчного цикла Backtester.run_backtest
+(SL/TP, трейлинг-стоп, шорты, развороты по сигналу), но работает
+с заранее извлеченными массивами вместо market_data.iloc[i] и
+пропускает участки без позиций и сигналов одной операцией.
+
+Модуль зависит только от NumPy/pandas, чтобы его можно было
+импортировать в дочерних процессах без тяжелых ML зависимостей.
+"""
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+SIGNAL_HOLD = 0
+SIGNAL_BUY = 1
+SIGNAL_SELL = -1
+
+SIDE_LONG = 1
+SIDE_SHORT = -1
+
+EXIT_STOP_LOSS = 0
+EXIT_TAKE_PROFIT = 1
+EXIT_END_OF_BACKTEST = 2
+EXIT_REASONS = ('stop_loss', 'take_profit', 'end_of_backtest')
+
+# Поля массива сделок, возвращаемого ядром
+TRADE_FIELDS = (
+    'entry_index', 'exit_index', 'side', 'entry_price', 'exit_price',
+    'position_size', 'stop_loss', 'take_profit', 'commission_paid',
+    'profit', 'profit_percent', 'max_profit', 'max_loss', 'exit_reason',
+    'ml_confidence', 'strategy_code'
+)
+
+# Индексы полей открытой позиции
+_SIDE, _ENTRY, _SIZE, _SL, _TP, _COMM, _MAXP, _MAXL, _ENTRY_IDX, _CONF, _STRAT = range(11)
+
+
+def encode_predictions(predictions: pd.DataFrame, n_bars: int) -> Dict[str, Any]:
+    """
+    Преобразование DataFrame предсказаний в массивы для ядра.
+
+    Значения по умолчанию совпадают с prediction.get(...) в построчном цикле.
+    Бары за пределами predictions получают сигнал HOLD.
+    """
+    n_pred = min(len(predictions), n_bars)
+
+    def column(name: str, default: Any) -> np.ndarray:
+        if name in predictions.columns:
+            return predictions[name].to_numpy()[:n_pred]
+        return np.full(n_pred, default, dtype=object)
+
+    raw_signal = column('signal', 'hold')
+    signal = np.zeros(n_bars, dtype=np.int8)
+    signal[:n_pred][raw_signal == 'buy'] = SIGNAL_BUY
+    signal[:n_pred][raw_signal == 'sell'] = SIGNAL_SELL
+
+    def numeric(name: str, default: float) -> np.ndarray:
+        values = np.full(n_bars, default, dtype=np.float64)
+        values[:n_pred] = column(name, default).astype(np.float64)
+        return values
+
+    strategy_codes, strategy_labels = pd.factorize(
+        pd.Series(column('strategy', 'unknown'), dtype=object), use_na_sentinel=False
+    )
+    strategy = np.zeros(n_bars, dtype=np.int64)
+    strategy[:n_pred] = strategy_codes
+
+    return {
+        'signal': signal,
+        'confidence': numeric('confidence', 0.0),
+        'take_profit_percent': numeric('take_profit_percent', 2.0),
+        'stop_loss_percent': numeric('stop_loss_percent', 1.0),
+        'strategy_code': strategy,
+        'strategy_labels': list(strategy_labels),
+        'n_predictions': n_pred,
+    }
+
+
+def run_backtest_kernel(close: np.ndarray, high: np.ndarray, low: np.ndarray,
+                        signal: np.ndarray, confidence: np.ndarray,
+                        take_profit_percent: np.ndarray, stop_loss_percent: np.ndarray,
+                        strategy_code: np.ndarray, config: Any,
+                        n_predictions: int = None) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    Прогон бэктеста по массивам.
+
+    Args:
+        close, high, low: Цены баров
+        signal: SIGNAL_BUY / SIGNAL_SELL / SIGNAL_HOLD по барам
+        confidence, take_profit_percent, stop_loss_percent: Параметры предсказаний
+        strategy_code: Код стратегии (индекс в списке меток)
+        config: BacktestConfig
+        n_predictions: Число баров, для которых есть предсказания
+
+    Returns:
+        (сделки в колоночном виде по TRADE_FIELDS, кривая капитала)
+    """
+    n = len(close)
+    if n == 0:
+        return _trade_columns([]), np.empty(0, dtype=np.float64)
+    if n_predictions is None:
+        n_predictions = n
+
+    # Python-списки дают самый быстрый скалярный доступ в цикле
+    close_l = np.asarray(close, dtype=np.float64).tolist()
+    high_l = np.asarray(high, dtype=np.float64).tolist()
+    low_l = np.asarray(low, dtype=np.float64).tolist()
+    signal_l = np.asarray(signal).tolist()
+    conf_l = np.asarray(confidence, dtype=np.float64).tolist()
+    tp_l = np.asarray(take_profit_percent, dtype=np.float64).tolist()
+    sl_l = np.asarray(stop_loss_percent, dtype=np.float64).tolist()
+    strat_l = np.asarray(strategy_code).tolist()
+
+    commission_rate = config.commission
+    slippage = config.slippage
+    use_stop_loss = config.use_stop_loss
+    use_take_profit = config.use_take_profit
+    trailing_stop = config.trailing_stop
+    trailing_distance = config.trailing_stop_distance
+    enable_shorting = config.enable_shorting
+    max_open_positions = config.max_open_positions
+    risk_per_trade = config.risk_per_trade
+    max_position_size = config.max_position_size
+    use_leverage = config.use_leverage
+    leverage = config.leverage
+
+    # Бары, на которых в принципе может открыться позиция
+    actionable = np.asarray(signal) == SIGNAL_BUY
+    if enable_shorting:
+        actionable |= np.asarray(signal) == SIGNAL_SELL
+    actionable[min(n_predictions, n):] = False
+    actionable[:1] = False
+    candidates = np.flatnonzero(actionable)
+
+    balance = config.initial_balance
+    equity = np.empty(n, dtype=np.float64)
+    equity[0] = balance
+
+    trades: List[list] = []
+    open_positions: List[list] = []
+
+    def close_position(position: list, exit_price: float, exit_index: int, reason: int):
+        if position[_SIDE] == SIDE_LONG:
+            exit_price *= (1 - slippage)
+            profit = position[_SIZE] * (exit_price / position[_ENTRY] - 1)
+        else:
+            exit_price *= (1 + slippage)
+            profit = position[_SIZE] * (1 - exit_price / position[_ENTRY])
+        position[_COMM] += position[_SIZE] * commission_rate
+        profit -= position[_COMM]
+        trades.append([
+            position[_ENTRY_IDX], exit_index, position[_SIDE], position[_ENTRY], exit_price,
+            position[_SIZE], position[_SL], position[_TP], position[_COMM],
+            profit, (profit / position[_SIZE]) * 100, position[_MAXP], position[_MAXL],
+            reason, position[_CONF], position[_STRAT]
+        ])
+        return profit
+
+    i = 1
+    while i < n:
+        if not open_positions and max_open_positions > 0:
+            # Нет позиций: капитал равен балансу до следующего сигнала
+            pos = int(np.searchsorted(candidates, i))
+            next_i = int(candidates[pos]) if pos < len(candidates) else n
+            if next_i > i:
+                equity[i:next_i] = balance
+                i = next_i
+                if i >= n:
+                    break
+        elif not open_positions:
+            equity[i:] = balance
+            break
+
+        price = close_l[i]
+        bar_high = high_l[i]
+        bar_low = low_l[i]
+
+        if open_positions:
+            closed = []
+            for pos_idx, position in enumerate(open_positions):
+                side = position[_SIDE]
+                stop_loss = position[_SL]
+                if use_stop_loss and stop_loss:
+                    if (side == SIDE_LONG and bar_low <= stop_loss) or \
+                       (side == SIDE_SHORT and bar_high >= stop_loss):
+                        closed.append((pos_idx, stop_loss, EXIT_STOP_LOSS))
+                        continue
+
+                take_profit = position[_TP]
+                if use_take_profit and take_profit:
+                    if (side == SIDE_LONG and bar_high >= take_profit) or \
+                       (side == SIDE_SHORT and bar_low <= take_profit):
+                        closed.append((pos_idx, take_profit, EXIT_TAKE_PROFIT))
+                        continue
+
+                entry = position[_ENTRY]
+                if side == SIDE_LONG:
+                    current_profit = (price - entry) / entry
+                else:
+                    current_profit = (entry - price) / entry
+                position[_MAXP] = max(position[_MAXP], current_profit)
+                position[_MAXL] = min(position[_MAXL], current_profit)
+
+                if trailing_stop and current_profit > trailing_distance:
+                    if side == SIDE_LONG:
+                        new_stop = price * (1 - trailing_distance)
+                        position[_SL] = max(stop_loss, new_stop) if stop_loss else new_stop
+                    else:
+                        new_stop = price * (1 + trailing_distance)
+                        position[_SL] = min(stop_loss, new_stop) if stop_loss else new_stop
+
+            # Закрытые позиции фиксируются в обратном порядке, как pop() в цикле
+            for pos_idx, exit_price, reason in reversed(closed):
+                balance += close_position(open_positions.pop(pos_idx), exit_price, i, reason)
+
+        if len(open_positions) < max_open_positions and i < n_predictions:
+            bar_signal = signal_l[i]
+            if bar_signal == SIGNAL_BUY or (bar_signal == SIGNAL_SELL and enable_shorting):
+                conf = conf_l[i]
+                sl_percent = sl_l[i]
+                position_size = balance * risk_per_trade / (sl_percent / 100)
+                position_size *= 0.5 + conf * 0.5
+                position_size = min(position_size, balance * max_position_size)
+                if use_leverage:
+                    position_size *= leverage
+
+                if position_size > 0:
+                    side = SIDE_LONG if bar_signal == SIGNAL_BUY else SIDE_SHORT
+                    if enable_shorting:
+                        # Разворот: как и в построчном цикле, противоположным позициям
+                        # начисляется комиссия закрытия, но они остаются открытыми
+                        for position in open_positions:
+                            if position[_SIDE] == -side:
+                                position[_COMM] += position[_SIZE] * commission_rate
+
+                    tp_percent = tp_l[i]
+                    if side == SIDE_LONG:
+                        entry = price * (1 + slippage)
+                        stop_loss = entry * (1 - sl_percent / 100) if use_stop_loss else None
+                        take_profit = entry * (1 + tp_percent / 100) if use_take_profit else None
+                    else:
+                        entry = price * (1 - slippage)
+                        stop_loss = entry * (1 + sl_percent / 100) if use_stop_loss else None
+                        take_profit = entry * (1 - tp_percent / 100) if use_take_profit else None
+                    commission = position_size * commission_rate
+                    open_positions.append([
+                        side, entry, position_size, stop_loss, take_profit, commission,
+                        0.0, 0.0, i, conf, strat_l[i]
+                    ])
+                    balance -= position_size + commission
+
+        current_equity = balance
+        for position in open_positions:
+            if position[_SIDE] == SIDE_LONG:
+                current_equity += position[_SIZE] * (price / position[_ENTRY])
+            else:
+                current_equity += position[_SIZE] * (2 - price / position[_ENTRY])
+        equity[i] = current_equity
+        i += 1
+
+    final_index = n - 1
+    final_price = close_l[final_index]
+    for position in open_positions:
+        balance += close_position(position, final_price, final_index, EXIT_END_OF_BACKTEST)
+
+    return _trade_columns(trades), equity
+
+
+def _trade_columns(trades: list) -> Dict[str, np.ndarray]:
+    """Сделки (кортежи по TRADE_FIELDS) в колоночный вид"""
+    columns = list(zip(*trades)) if trades else [[] for _ in TRADE_FIELDS]
+    result = {}
+    for field, values in zip(TRADE_FIELDS, columns):
+        if field in ('stop_loss', 'take_profit'):
+            result[field] = np.array(values, dtype=object)
+        elif field in ('entry_index', 'exit_index', 'side', 'exit_reason', 'strategy_code'):
+            result[field] = np.array(values, dtype=np.int64)
+        else:
+            result[field] = np.array(values, dtype=np.float64)
+    return result
@@ -8,6 +8,7 @@ from typing import Dict, List, Tuple, Optional, Any, Callable
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 import json
+import time
 from collections import defaultdict
 
 import matplotlib.pyplot as plt
@@ -16,9 +17,13 @@ from scipy import stats
 
 from ...logging.smart_logger import SmartLogger
 from ...core.database import SessionLocal
-from ..models.classifier import DirectionClassifier
+from ...data.ohlcv_archive import ohlcv_archive
+from ..features.store import feature_store
 from ..models.regressor import PriceLevelRegressor
 from ..strategy_selector import MLStrategySelector
+from .backtest_kernel import (
+    EXIT_REASONS, SIDE_LONG, TRADE_FIELDS, encode_predictions, run_backtest_kernel
+)
 
 
 @dataclass
@@ -37,6 +42,7 @@ class BacktestConfig:
     use_take_profit: bool = True
     trailing_stop: bool = False
     trailing_stop_distance: float = 0.02  # 2%
+    vectorized: bool = True  # Ядро на массивах NumPy вместо построчного цикла
 
 
 @dataclass
@@ -114,6 +120,31 @@ class Backtester:
         self.config = config
         self.logger = SmartLogger(__name__)
         
+    @staticmethod
+    def load_market_data(symbol: str, timeframe: str,
+                         start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        OHLCV данные из локального архива свечей (memory-map, без запросов к БД)
+        
+        Returns:
+            DataFrame с DatetimeIndex или пустой DataFrame, если в архиве нет данных
+        """
+        return ohlcv_archive.read_frame(symbol, timeframe, start_date, end_date)
+
+    @staticmethod
+    def load_features(symbol: str, timeframe: str,
+                      start_date: Optional[datetime] = None,
+                      end_date: Optional[datetime] = None,
+                      feature_engineer=None) -> pd.DataFrame:
+        """
+        OHLCV и признаки из хранилища признаков (те же матрицы, что и при обучении)
+        
+        Returns:
+            DataFrame с DatetimeIndex или пустой DataFrame, если в архиве нет данных
+        """
+        return feature_store.load(symbol, timeframe, feature_engineer, start_date, end_date)
+        
     def run_backtest(self, 
                     market_data: pd.DataFrame,
                     features: pd.DataFrame,
@@ -154,6 +185,70 @@ class Backtester:
             features = features[mask]
             predictions = predictions[mask]
         
+        if self.config.vectorized:
+            trades, equity = self._run_kernel(market_data, predictions)
+        else:
+            trades, equity = self._run_loop(market_data, predictions)
+        
+        # Рассчитываем результаты
+        result = self._calculate_results(trades, equity, market_data)
+        
+        self.logger.info(
+            f"Бэктест завершен: Return={result.total_return_percent:.2f}%, "
+            f"Trades={result.total_trades}, WinRate={result.win_rate:.2f}%",
+            category='backtest'
+        )
+        
+        return result
+    
+    def _run_kernel(self, market_data: pd.DataFrame,
+                    predictions: pd.DataFrame) -> Tuple[List[Trade], np.ndarray]:
+        """Прогон через векторизованное ядро (см. backtest_kernel.py)"""
+        encoded = encode_predictions(predictions, len(market_data))
+        strategy_labels = encoded.pop('strategy_labels')
+        
+        columns, equity = run_backtest_kernel(
+            market_data['close'].to_numpy(dtype=np.float64),
+            market_data['high'].to_numpy(dtype=np.float64),
+            market_data['low'].to_numpy(dtype=np.float64),
+            config=self.config,
+            **encoded
+        )
+        
+        index = market_data.index
+        trades = []
+        for row in zip(*(columns[name] for name in TRADE_FIELDS)):
+            record = dict(zip(TRADE_FIELDS, row))
+            entry_time = index[record['entry_index']]
+            exit_time = index[record['exit_index']]
+            trades.append(Trade(
+                entry_time=entry_time,
+                entry_price=float(record['entry_price']),
+                position_size=float(record['position_size']),
+                side='long' if record['side'] == SIDE_LONG else 'short',
+                stop_loss=record['stop_loss'],
+                take_profit=record['take_profit'],
+                exit_time=exit_time,
+                exit_price=float(record['exit_price']),
+                profit=float(record['profit']),
+                profit_percent=float(record['profit_percent']),
+                commission_paid=float(record['commission_paid']),
+                exit_reason=EXIT_REASONS[record['exit_reason']],
+                ml_confidence=float(record['ml_confidence']),
+                strategy=strategy_labels[record['strategy_code']],
+                max_profit=float(record['max_profit']),
+                max_loss=float(record['max_loss']),
+                duration=exit_time - entry_time
+            ))
+        
+        return trades, equity
+    
+    def _run_loop(self, market_data: pd.DataFrame,
+                  predictions: pd.DataFrame) -> Tuple[List[Trade], List[float]]:
+        """Построчный прогон бэктеста (эталонная реализация)"""
+        if market_data.empty:
+            return [], []
+        
         # Инициализация
         balance = self.config.initial_balance
         equity = [balance]
@@ -287,16 +382,58 @@ class Backtester:
             trades.append(position)
             balance += position.profit
         
-        # Рассчитываем результаты
-        result = self._calculate_results(trades, equity, market_data)
-        
-        self.logger.info(
-            f"Бэктест завершен: Return={result.total_return_percent:.2f}%, "
-            f"Trades={result.total_trades}, WinRate={result.win_rate:.2f}%",
-            category='backtest'
-        )
+        return trades, equity
+    
+    def compare_engines(self,
+                        market_data: pd.DataFrame,
+                        predictions: pd.DataFrame,
+                        rtol: float = 1e-9) -> Dict[str, Any]:
+        """
+        Сверка векторизованного ядра с построчным циклом сделка за сделкой
         
-        return result
+        Args:
+            market_data: OHLCV данные
+            predictions: Предсказания ML моделей
+            rtol: Допустимая относительная погрешность
+            
+        Returns:
+            Словарь с признаком совпадения, расхождениями и ускорением
+        """
+        started = time.perf_counter()
+        loop_trades, loop_equity = self._run_loop(market_data, predictions)
+        loop_time = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        kernel_trades, kernel_equity = self._run_kernel(market_data, predictions)
+        kernel_time = time.perf_counter() - started
+        
+        mismatches = []
+        if len(loop_trades) != len(kernel_trades):
+            mismatches.append({'field': 'total_trades',
+                               'loop': len(loop_trades), 'kernel': len(kernel_trades)})
+        
+        for n, (expected, actual) in enumerate(zip(loop_trades, kernel_trades)):
+            for name in Trade.__dataclass_fields__:
+                a, b = getattr(expected, name), getattr(actual, name)
+                if isinstance(a, float) and b is not None:
+                    same = np.isclose(a, b, rtol=rtol, atol=0.0, equal_nan=True)
+                else:
+                    same = a == b
+                if not same:
+                    mismatches.append({'trade': n, 'field': name, 'loop': a, 'kernel': b})
+        
+        equity_match = len(loop_equity) == len(kernel_equity) and \
+            np.allclose(loop_equity, kernel_equity, rtol=rtol, atol=0.0)
+        
+        return {
+            'match': not mismatches and equity_match,
+            'equity_match': equity_match,
+            'mismatches': mismatches,
+            'total_trades': len(loop_trades),
+            'loop_seconds': loop_time,
+            'kernel_seconds': kernel_time,
+            'speedup': loop_time / kernel_time if kernel_time > 0 else float('inf')
+        }
     
     def _open_position(self, side: str, entry_time: datetime, entry_price: float,
                       position_size: float, sl_percent: float, tp_percent: float,
@@ -472,7 +609,7 @@ class Backtester:
             }
         
         # Месячные доходности
-        monthly_returns = equity_series.resample('M').last().pct_change().dropna()
+        monthly_returns = equity_series.resample('ME').last().pct_change().dropna()
         result.monthly_returns = monthly_returns
         
         return result
@@ -561,6 +698,52 @@ class Backtester:
         
         return analysis
     
+    def run_walk_forward_parallel(self,
+                                  market_data: pd.DataFrame,
+                                  predictions: pd.DataFrame,
+                                  window_size: int = 252,
+                                  step_size: int = 21,
+                                  max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Walk-forward анализ с параллельным прогоном тестовых окон
+        
+        Окна раздаются по пулу процессов (по умолчанию - все ядра),
+        OHLCV и предсказания передаются через shared memory.
+        
+        Args:
+            market_data: Рыночные данные
+            predictions: Предсказания на весь период
+            window_size: Размер окна обучения
+            step_size: Шаг сдвига окна
+            max_workers: Число процессов
+            
+        Returns:
+            Результаты walk-forward анализа
+        """
+        from .sweep_runner import SweepRunner
+        
+        runner = SweepRunner(self.config, max_workers=max_workers)
+        report = runner.run_walk_forward(market_data, predictions, window_size, step_size)
+        
+        results = []
+        periods = []
+        for row in report.to_dict('records'):
+            if isinstance(row.get('error'), str):
+                continue
+            results.append(BacktestResult(
+                total_return=row['total_return'],
+                total_return_percent=row['total_return_percent'],
+                total_trades=row['total_trades'],
+                win_rate=row['win_rate'],
+                profit_factor=row['profit_factor'],
+                max_drawdown_percent=row['max_drawdown_percent'],
+                sharpe_ratio=row['sharpe_ratio'],
+                sortino_ratio=row['sortino_ratio']
+            ))
+            periods.append({key: row[key] for key in ('train_start', 'train_end', 'test_start', 'test_end')})
+        
+        return self._analyze_walk_forward_results(results, periods)
+    
     def _analyze_walk_forward_results(self, results: List[BacktestResult],
                                     periods: List[Dict]) -> Dict[str, Any]:
         """Анализирует результаты walk-forward тестирования"""
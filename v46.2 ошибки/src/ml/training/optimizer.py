@@ -2,6 +2,7 @@
 Оптимизатор гиперпараметров для ML моделей
 Файл: src/ml/training/optimizer.py
 """
+import dataclasses
 import optuna
 import numpy as np
 import pandas as pd
@@ -20,6 +21,8 @@ from tensorflow.keras import backend as K
 from ..models.classifier import DirectionClassifier
 from ..models.regressor import PriceLevelRegressor
 from ..features.feature_engineering import FeatureEngineer
+from ..features.pipeline import OHLCV_COLUMNS
+from ..features.store import feature_store
 from .trainer import MLTrainer
 from .backtester import MLBacktester
 from ...core.database import SessionLocal
@@ -28,6 +31,9 @@ from ...logging.smart_logger import SmartLogger
 
 logger = SmartLogger(__name__)
 
+# Параметры поиска, которые меняют набор признаков: имя в trial -> поле FeatureConfig
+FEATURE_SEARCH_PARAMS = {'use_volume_features': 'enable_volume_features'}
+
 
 class HyperparameterOptimizer:
     """
@@ -39,6 +45,7 @@ class HyperparameterOptimizer:
         self.study = None
         self.best_params = None
         self.optimization_history = []
+        self._feature_frames: Dict[Tuple, pd.DataFrame] = {}
         
         # Настройки оптимизации
         self.n_trials = 100
@@ -77,13 +84,6 @@ class HyperparameterOptimizer:
             'min_samples_leaf': trial.suggest_int('min_samples_leaf', 1, 10),
             'max_features': trial.suggest_categorical('max_features', ['sqrt', 'log2', None]),
             
-            # Feature engineering параметры
-            'rsi_period': trial.suggest_int('rsi_period', 7, 21),
-            'macd_fast': trial.suggest_int('macd_fast', 8, 15),
-            'macd_slow': trial.suggest_int('macd_slow', 20, 30),
-            'bb_period': trial.suggest_int('bb_period', 15, 25),
-            'atr_period': trial.suggest_int('atr_period', 10, 20),
-            
             # Параметры обучения
             'lookback_period': trial.suggest_int('lookback_period', 50, 200),
             'prediction_horizon': trial.suggest_int('prediction_horizon', 1, 10),
@@ -109,7 +109,6 @@ class HyperparameterOptimizer:
             
             # Feature параметры
             'use_volume_features': trial.suggest_categorical('use_volume_features', [True, False]),
-            'use_market_features': trial.suggest_categorical('use_market_features', [True, False]),
             'feature_selection_k': trial.suggest_int('feature_selection_k', 10, 50),
             
             # Регуляризация
@@ -166,13 +165,18 @@ class HyperparameterOptimizer:
         }
     
     def objective(self, trial: optuna.Trial, data: pd.DataFrame, 
-                  feature_engineer: FeatureEngineer) -> float:
+                  feature_engineer: FeatureEngineer,
+                  symbol: Optional[str] = None, timeframe: Optional[str] = None) -> float:
         """
         Целевая функция для оптимизации
+
+        Признаки считаются один раз на набор параметров признаков trial
+        (см. _trial_features) и делятся между фолдами
         """
         try:
             # Получаем гиперпараметры
             params = self.get_search_space(trial)
+            feature_frame = self._trial_features(data, feature_engineer, params, symbol, timeframe)
             
             # Логируем попытку
             logger.info(
@@ -189,18 +193,9 @@ class HyperparameterOptimizer:
                 train_data = data.iloc[train_idx]
                 val_data = data.iloc[val_idx]
                 
-                # Извлекаем признаки с оптимизированными параметрами
-                feature_params = {k: v for k, v in params.items() 
-                                if k in ['rsi_period', 'macd_fast', 'macd_slow', 
-                                        'bb_period', 'atr_period']}
-                
-                # Обновляем параметры feature engineer
-                for param, value in feature_params.items():
-                    setattr(feature_engineer, param, value)
-                
                 # Подготавливаем данные
-                X_train, y_train = self._prepare_data(train_data, feature_engineer, params)
-                X_val, y_val = self._prepare_data(val_data, feature_engineer, params)
+                X_train, y_train = self._prepare_data(train_data, feature_engineer, params, feature_frame)
+                X_val, y_val = self._prepare_data(val_data, feature_engineer, params, feature_frame)
                 
                 # Обучаем модель
                 model = self._create_model(params)
@@ -243,15 +238,34 @@ class HyperparameterOptimizer:
             )
             return 0.0
     
+    def _trial_features(self, data: pd.DataFrame, feature_engineer: FeatureEngineer, params: Dict,
+                        symbol: Optional[str] = None, timeframe: Optional[str] = None) -> pd.DataFrame:
+        """
+        Признаки для строк data с параметрами признаков trial (FEATURE_SEARCH_PARAMS).
+        Кэш по набору этих параметров: каждая конфигурация считается один раз
+        за исследование, с symbol и timeframe - через хранилище признаков.
+        """
+        overrides = {field: params[name] for name, field in FEATURE_SEARCH_PARAMS.items() if name in params}
+        key = tuple(sorted(overrides.items()))
+        if key not in self._feature_frames:
+            config = dataclasses.replace(feature_engineer.config, **overrides)
+            self._feature_frames[key] = feature_store.frame_features(data, config, symbol, timeframe)
+        return self._feature_frames[key]
+    
     def _prepare_data(self, data: pd.DataFrame, feature_engineer: FeatureEngineer,
-                     params: Dict) -> Tuple[np.ndarray, np.ndarray]:
+                     params: Dict, feature_frame: Optional[pd.DataFrame] = None) -> Tuple[np.ndarray, np.ndarray]:
         """Подготовка данных для обучения"""
-        # Извлекаем признаки
-        features = feature_engineer.extract_features(
-            data,
-            include_volume=params.get('use_volume_features', True),
-            include_market=params.get('use_market_features', True)
-        )
+        if feature_frame is not None:
+            # Строки фолда из матрицы, посчитанной один раз на исследование
+            columns = [c for c in feature_frame.columns if c not in OHLCV_COLUMNS]
+            features = feature_frame.reindex(data.index)[columns].to_numpy(dtype=np.float64)
+        else:
+            # Извлекаем признаки
+            features = feature_engineer.extract_features(
+                data,
+                include_volume=params.get('use_volume_features', True),
+                include_market=params.get('use_market_features', True)
+            )
         
         # Создаем целевую переменную
         if self.model_type in ['classifier', 'xgboost']:
@@ -445,15 +459,23 @@ class HyperparameterOptimizer:
             return -mean_absolute_error(y_val, y_pred)
     
     async def optimize(self, data: pd.DataFrame, feature_engineer: FeatureEngineer,
-                      n_trials: Optional[int] = None) -> Dict[str, Any]:
+                      n_trials: Optional[int] = None, symbol: Optional[str] = None,
+                      timeframe: Optional[str] = None) -> Dict[str, Any]:
         """
         Запускает процесс оптимизации
+
+        Признаки считаются один раз на конфигурацию признаков, а не в каждом
+        фолде каждого trial: с symbol и timeframe - через хранилище признаков
+        (повторные исследования по тем же свечам их не пересчитывают), иначе -
+        одним проходом в памяти.
         """
         logger.info(
             f"Запуск оптимизации гиперпараметров для {self.model_type}",
             category='ml',
             n_trials=n_trials or self.n_trials
         )
+
+        self._feature_frames = {}
         
         # Создаем исследование Optuna
         self.study = optuna.create_study(
@@ -467,7 +489,7 @@ class HyperparameterOptimizer:
         
         # Оптимизация
         self.study.optimize(
-            lambda trial: self.objective(trial, data, feature_engineer),
+            lambda trial: self.objective(trial, data, feature_engineer, symbol, timeframe),
             n_trials=n_trials or self.n_trials,
             timeout=self.timeout,
             n_jobs=1  # Параллелизм внутри objective
@@ -673,7 +695,9 @@ class AutoOptimizer:
     
     async def optimize_all(self, data: pd.DataFrame,
                           feature_engineer: FeatureEngineer,
-                          n_trials_per_model: int = 50):
+                          n_trials_per_model: int = 50,
+                          symbol: Optional[str] = None,
+                          timeframe: Optional[str] = None):
         """
         Оптимизирует все модели
         """
@@ -688,7 +712,7 @@ class AutoOptimizer:
             
             try:
                 result = await optimizer.optimize(
-                    data, feature_engineer, n_trials_per_model
+                    data, feature_engineer, n_trials_per_model, symbol, timeframe
                 )
                 self.results[model_type] = result
                 
@@ -0,0 +1,376 @@
+"""
+Параллельные walk-forward прогоны и перебор параметров стратегий
+Файл: src/ml/training/sweep_runner.py
+
+Задачи (окно walk-forward или комбинация стратегия/параметры/символ)
+раздаются по ProcessPoolExecutor. OHLCV и предсказания кладутся в
+shared memory один раз, воркеры получают только короткий дескриптор
+блока, а не pickle массивов на каждую задачу. Результаты сводятся
+в один ранжированный отчет.
+"""
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field, is_dataclass
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .backtest_kernel import (
+    SIGNAL_BUY, SIGNAL_HOLD, SIGNAL_SELL, encode_predictions, run_backtest_kernel
+)
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+# =================================================================
+# SHARED MEMORY
+# =================================================================
+
+class SharedColumns:
+    """
+    Набор одномерных float64 колонок одинаковой длины в одном блоке
+    shared memory. Родитель создает блок, воркеры подключаются по
+    дескриптору (имя блока, колонки, длина).
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        names = tuple(columns)
+        length = len(next(iter(columns.values()))) if columns else 0
+        size = max(1, len(names) * length * np.dtype(np.float64).itemsize)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        matrix = np.ndarray((len(names), length), dtype=np.float64, buffer=self._shm.buf)
+        for row, name in enumerate(names):
+            matrix[row] = np.asarray(columns[name], dtype=np.float64)
+        self.descriptor = (self._shm.name, names, length)
+
+    @classmethod
+    def from_ohlcv(cls, df: pd.DataFrame) -> 'SharedColumns':
+        """Блок OHLCV из DataFrame с DatetimeIndex (время в мс)"""
+        if isinstance(df.index, pd.DatetimeIndex):
+            timestamps = df.index.values.astype('datetime64[ms]').astype(np.int64)
+        else:
+            timestamps = np.arange(len(df), dtype=np.int64)
+        columns = {'timestamp': timestamps}
+        for name in OHLCV_COLUMNS[1:]:
+            columns[name] = df[name].to_numpy(dtype=np.float64) if name in df.columns else np.zeros(len(df))
+        return cls(columns)
+
+    def close(self):
+        """Освобождение блока (вызывается родителем после прогона)"""
+        try:
+            self._shm.close()
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Подключенные в воркере блоки: имя -> (SharedMemory, {колонка: view})
+_attached: Dict[str, Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]] = {}
+
+
+def attach_columns(descriptor: Tuple[str, Tuple[str, ...], int]) -> Dict[str, np.ndarray]:
+    """Подключение к блоку в воркере (кэшируется на процесс)"""
+    name, names, length = descriptor
+    cached = _attached.get(name)
+    if cached is not None:
+        return cached[1]
+
+    # Воркеры пула делят resource_tracker с родителем, блок удаляет только родитель
+    shm = shared_memory.SharedMemory(name=name)
+    matrix = np.ndarray((len(names), length), dtype=np.float64, buffer=shm.buf)
+    views = {col: matrix[row] for row, col in enumerate(names)}
+    _attached[name] = (shm, views)
+    return views
+
+
+# =================================================================
+# ГЕНЕРАТОРЫ СИГНАЛОВ
+# =================================================================
+
+def _cross_signals(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """BUY/SELL на барах пересечения fast и slow"""
+    above = fast > slow
+    signal = np.zeros(len(fast), dtype=np.int8)
+    crossed = np.zeros(len(fast), dtype=bool)
+    crossed[1:] = above[1:] != above[:-1]
+    valid = ~(np.isnan(fast) | np.isnan(slow))
+    signal[crossed & above & valid] = SIGNAL_BUY
+    signal[crossed & ~above & valid] = SIGNAL_SELL
+    return signal
+
+
+def sma_crossover(data: Dict[str, np.ndarray], fast: int = 10, slow: int = 30,
+                  stop_loss_percent: float = 1.0, take_profit_percent: float = 2.0) -> Dict[str, Any]:
+    """Пересечение скользящих средних"""
+    close = pd.Series(data['close'])
+    return {
+        'signal': _cross_signals(close.rolling(fast).mean().to_numpy(),
+                                 close.rolling(slow).mean().to_numpy()),
+        'confidence': 0.7,
+        'stop_loss_percent': stop_loss_percent,
+        'take_profit_percent': take_profit_percent,
+    }
+
+
+def rsi_reversion(data: Dict[str, np.ndarray], period: int = 14, lower: float = 30.0,
+                  upper: float = 70.0, stop_loss_percent: float = 1.0,
+                  take_profit_percent: float = 2.0) -> Dict[str, Any]:
+    """Возврат RSI из зон перекупленности/перепроданности"""
+    delta = pd.Series(data['close']).diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / period, adjust=False).mean()
+    rsi = (100 - 100 / (1 + gain / loss)).to_numpy()
+
+    signal = np.full(len(rsi), SIGNAL_HOLD, dtype=np.int8)
+    signal[1:][(rsi[:-1] < lower) & (rsi[1:] >= lower)] = SIGNAL_BUY
+    signal[1:][(rsi[:-1] > upper) & (rsi[1:] <= upper)] = SIGNAL_SELL
+    confidence = np.clip(np.abs(rsi - 50) / 50 + 0.5, 0.5, 1.0)
+    return {
+        'signal': signal,
+        'confidence': np.nan_to_num(confidence, nan=0.5),
+        'stop_loss_percent': stop_loss_percent,
+        'take_profit_percent': take_profit_percent,
+    }
+
+
+SIGNAL_GENERATORS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    'sma_crossover': sma_crossover,
+    'rsi_reversion': rsi_reversion,
+}
+
+
+# =================================================================
+# ЗАДАЧИ И МЕТРИКИ
+# =================================================================
+
+@dataclass
+class SweepTask:
+    """Одна единица работы для воркера"""
+    data: Tuple[str, Tuple[str, ...], int]
+    start: int
+    end: int
+    config: Dict[str, Any]
+    predictions: Optional[Tuple[str, Tuple[str, ...], int]] = None
+    generator: Optional[str] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+def summarize_run(trades: Dict[str, np.ndarray], equity: np.ndarray,
+                  initial_balance: float) -> Dict[str, float]:
+    """
+    Сводные метрики прогона, совпадающие с Backtester._calculate_results
+    (без объектов Trade и графиков)
+    """
+    summary = {
+        'total_trades': 0, 'win_rate': 0.0, 'total_return': 0.0,
+        'total_return_percent': 0.0, 'profit_factor': 0.0,
+        'max_drawdown_percent': 0.0, 'sharpe_ratio': 0.0, 'sortino_ratio': 0.0,
+    }
+    profits = trades['profit']
+    if len(profits) == 0:
+        return summary
+
+    wins = profits[profits > 0]
+    losses = profits[profits < 0]
+    summary['total_trades'] = int(len(profits))
+    summary['win_rate'] = len(wins) / len(profits) * 100
+    summary['total_return'] = float(profits.sum())
+    summary['total_return_percent'] = summary['total_return'] / initial_balance * 100
+    if len(losses):
+        summary['profit_factor'] = float(abs(wins.sum() / losses.sum()))
+
+    peak = np.maximum.accumulate(equity)
+    drawdown = (equity - peak) / peak
+    summary['max_drawdown_percent'] = float(drawdown.min() * 100)
+
+    returns = equity[1:] / equity[:-1] - 1
+    returns = returns[~np.isnan(returns)]
+    if len(returns) > 1:
+        std = returns.std(ddof=1)
+        summary['sharpe_ratio'] = float(np.sqrt(252) * returns.mean() / std) if std > 0 else 0.0
+        downside = returns[returns < 0]
+        downside_std = downside.std(ddof=1) if len(downside) > 1 else 0.0
+        summary['sortino_ratio'] = float(np.sqrt(252) * returns.mean() / downside_std) if downside_std > 0 else 0.0
+    return summary
+
+
+def _run_task(task: SweepTask) -> Dict[str, Any]:
+    """Выполнение задачи в воркере"""
+    started = time.perf_counter()
+    data = attach_columns(task.data)
+    config = SimpleNamespace(**task.config)
+
+    if task.predictions is not None:
+        pred = attach_columns(task.predictions)
+        encoded = {
+            'signal': pred['signal'][task.start:task.end].astype(np.int8),
+            'confidence': pred['confidence'][task.start:task.end],
+            'take_profit_percent': pred['take_profit_percent'][task.start:task.end],
+            'stop_loss_percent': pred['stop_loss_percent'][task.start:task.end],
+            'strategy_code': pred['strategy_code'][task.start:task.end].astype(np.int64),
+        }
+    else:
+        # Генератору отдаем историю до конца окна, чтобы индикаторы прогрелись
+        history = {name: values[:task.end] for name, values in data.items()}
+        generated = SIGNAL_GENERATORS[task.generator](history, **task.params)
+        n = task.end - task.start
+        encoded = {'strategy_code': np.zeros(n, dtype=np.int64)}
+        for name in ('signal', 'confidence', 'take_profit_percent', 'stop_loss_percent'):
+            values = np.asarray(generated[name])
+            encoded[name] = values[task.start:task.end] if values.ndim else np.full(n, float(values))
+        encoded['signal'] = encoded['signal'].astype(np.int8)
+
+    trades, equity = run_backtest_kernel(
+        data['close'][task.start:task.end],
+        data['high'][task.start:task.end],
+        data['low'][task.start:task.end],
+        config=config,
+        **encoded
+    )
+
+    result = dict(task.meta)
+    result.update(summarize_run(trades, equity, config.initial_balance))
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+# =================================================================
+# РАННЕР
+# =================================================================
+
+def expand_grid(param_grid: Dict[str, Iterable[Any]]) -> List[Dict[str, Any]]:
+    """{'fast': [5, 10], 'slow': [20]} -> [{'fast': 5, 'slow': 20}, {'fast': 10, 'slow': 20}]"""
+    if not param_grid:
+        return [{}]
+    keys = list(param_grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+
+
+class SweepRunner:
+    """
+    Раздача прогонов бэктеста по пулу процессов.
+
+    По умолчанию использует все ядра машины (os.cpu_count()).
+    """
+
+    def __init__(self, config: Any = None, max_workers: Optional[int] = None,
+                 rank_by: str = 'sharpe_ratio'):
+        if config is None:
+            from .backtester import BacktestConfig
+            config = BacktestConfig()
+        self.config = asdict(config) if is_dataclass(config) else dict(vars(config))
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.rank_by = rank_by
+
+    def _execute(self, tasks: List[SweepTask]) -> List[Dict[str, Any]]:
+        results = []
+        if self.max_workers == 1 or len(tasks) <= 1:
+            for task in tasks:
+                results.append(_run_task(task))
+            return results
+
+        workers = min(self.max_workers, len(tasks))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_run_task, task): task for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    meta = futures[future].meta
+                    logger.error(f"❌ Ошибка задачи {meta}: {e}")
+                    results.append({**meta, 'error': str(e)})
+        return results
+
+    def _rank(self, results: List[Dict[str, Any]]) -> pd.DataFrame:
+        report = pd.DataFrame(results)
+        if report.empty or self.rank_by not in report.columns:
+            return report
+        report = report.sort_values(self.rank_by, ascending=False, na_position='last').reset_index(drop=True)
+        report.insert(0, 'rank', np.arange(1, len(report) + 1))
+        return report
+
+    def run_walk_forward(self, market_data: pd.DataFrame, predictions: pd.DataFrame,
+                         window_size: int = 252, step_size: int = 21) -> pd.DataFrame:
+        """
+        Параллельный прогон тестовых окон walk-forward.
+        Окна совпадают с Backtester.run_walk_forward_analysis.
+        """
+        n = len(market_data)
+        encoded = encode_predictions(predictions, n)
+        labels = encoded.pop('strategy_labels')
+        encoded.pop('n_predictions')
+
+        with SharedColumns.from_ohlcv(market_data) as data, SharedColumns(encoded) as pred:
+            tasks = []
+            for period, start_idx in enumerate(range(0, n - window_size - step_size, step_size)):
+                test_start = start_idx + window_size
+                test_end = min(test_start + step_size, n)
+                tasks.append(SweepTask(
+                    data=data.descriptor, predictions=pred.descriptor,
+                    start=test_start, end=test_end, config=self.config,
+                    meta={
+                        'period': period + 1,
+                        'train_start': market_data.index[start_idx],
+                        'train_end': market_data.index[test_start - 1],
+                        'test_start': market_data.index[test_start],
+                        'test_end': market_data.index[test_end - 1],
+                    }
+                ))
+            started = time.perf_counter()
+            results = self._execute(tasks)
+
+        logger.info(f"✅ Walk-forward: {len(tasks)} окон за {time.perf_counter() - started:.2f}с "
+                    f"({self.max_workers} процессов, стратегии: {labels})")
+        return pd.DataFrame(results).sort_values('period').reset_index(drop=True) if results else pd.DataFrame()
+
+    def run_parameter_sweep(self, datasets: Dict[str, pd.DataFrame],
+                            strategies: Dict[str, Dict[str, Iterable[Any]]]) -> pd.DataFrame:
+        """
+        Перебор сетки (стратегия, параметры, символ).
+
+        Args:
+            datasets: {symbol: OHLCV DataFrame}
+            strategies: {имя генератора из SIGNAL_GENERATORS: сетка параметров}
+
+        Returns:
+            Ранжированный отчет по self.rank_by
+        """
+        unknown = [name for name in strategies if name not in SIGNAL_GENERATORS]
+        if unknown:
+            raise ValueError(f"Неизвестные генераторы сигналов: {unknown}")
+
+        blocks = {symbol: SharedColumns.from_ohlcv(df) for symbol, df in datasets.items()}
+        try:
+            tasks = []
+            for strategy, grid in strategies.items():
+                for params in expand_grid(grid):
+                    for symbol, block in blocks.items():
+                        tasks.append(SweepTask(
+                            data=block.descriptor, start=0, end=block.descriptor[2],
+                            config=self.config, generator=strategy, params=params,
+                            meta={'symbol': symbol, 'strategy': strategy, 'params': params}
+                        ))
+            started = time.perf_counter()
+            results = self._execute(tasks)
+        finally:
+            for block in blocks.values():
+                block.close()
+
+        logger.info(f"✅ Перебор параметров: {len(tasks)} прогонов за "
+                    f"{time.perf_counter() - started:.2f}с ({self.max_workers} процессов)")
+        return self._rank(results)
@@ -38,6 +38,8 @@ except ImportError:
 
 # ✅ ИСПРАВЛЕНО: правильный путь к DirectionClassifier        
 from ..models.direction_classifier import DirectionClassifier
+from ..inference import inference_service
+from ..features.store import feature_store
 
 
 class EnsembleModel:
@@ -201,11 +203,12 @@ class MLTrainer:
             self.logger.info(f"🚀 Начинаем обучение модели для {symbol}", category='ml', symbol=symbol)
             
             # === 1. ПОДГОТОВКА ДАННЫХ ===
-            df = await self.feature_engineer.extract_features(
-                symbol=symbol,
-                timeframe=timeframe,
-                lookback_periods=self.training_config['lookback_periods']
+            # Признаки из хранилища: считаются только свечи, появившиеся после прошлого обучения
+            df = await asyncio.to_thread(
+                feature_store.load, symbol, timeframe, self.feature_engineer,
+                lookback=self.training_config['lookback_periods']
             )
+            df = df.dropna()
             
             if df.empty:
                 return {'success': False, 'error': 'Нет данных для обучения'}
@@ -469,74 +472,60 @@ class MLTrainer:
         try:
             model_key = f"{symbol}_{timeframe}"
             
-            # Попытка загрузки из памяти
-            if model_key not in self.models:
-                # Загрузка с диска
-                model_path = self.models_dir / f"{symbol}_{timeframe}_model.pkl"
-                if not model_path.exists():
-                    return {
-                        'success': False,
-                        'error': f'Модель для {symbol} не найдена. Требуется обучение.'
-                    }
-                
-                with open(model_path, 'rb') as f:
-                    model_data = pickle.load(f)
-                
-                model_to_use = model_data['ensemble'] if use_ensemble else model_data['best_single']
-                self.models[model_key] = model_to_use
+            # Модель из кэша сервиса инференса (перечитывается с диска только после переобучения)
+            model = inference_service.direction_model(symbol, timeframe, use_ensemble=use_ensemble)
+            if model is None:
+                return {
+                    'success': False,
+                    'error': f'Модель для {symbol} не найдена. Требуется обучение.'
+                }
+            
+            if self.models.get(model_key) is not model.model:
+                self.models[model_key] = model.model
                 
                 # Проверяем возраст модели
-                training_date = datetime.fromisoformat(model_data['training_date'])
-                model_age_hours = (datetime.utcnow() - training_date).total_seconds() / 3600
-                
-                if model_age_hours > self.training_config['retrain_interval_hours']:
-                    self.logger.warning(
-                        f"Модель для {symbol} устарела",
-                        category='ml',
-                        symbol=symbol,
-                        age_hours=model_age_hours
-                    )
-            
-            model = self.models[model_key]
+                if model.trained_at:
+                    model_age_hours = (datetime.utcnow() - model.trained_at).total_seconds() / 3600
+                    if model_age_hours > self.training_config['retrain_interval_hours']:
+                        self.logger.warning(
+                            f"Модель для {symbol} устарела",
+                            category='ml',
+                            symbol=symbol,
+                            age_hours=model_age_hours
+                        )
             
             # Подготовка данных для предсказания
             if current_data is None:
                 # Извлекаем свежие данные
-                features_df = await self.feature_engineer.extract_features(
-                    symbol=symbol,
-                    timeframe=timeframe,
-                    lookback_periods=100  # Меньше данных для предсказания
+                features_df = await asyncio.to_thread(
+                    feature_store.load, symbol, timeframe, self.feature_engineer,
+                    lookback=100  # Меньше данных для предсказания
                 )
                 
                 if features_df.empty:
                     return {'success': False, 'error': 'Нет данных для предсказания'}
-                
-                # Берем последнюю строку
-                X = features_df.iloc[-1:].values
+            elif set(model.feature_columns).issubset(current_data.columns):
+                features_df = current_data
             else:
-                X = current_data.values
-            
-            # Предсказание
-            prediction = model.predict(X)[0]
-            prediction_proba = model.predict_proba(X)[0]
-            confidence = model.get_confidence(X)[0] if hasattr(model, 'get_confidence') else max(prediction_proba)
+                # Свечи: признаки из кэша, если они уже построены в этом цикле
+                features_df = inference_service.features(symbol, timeframe, current_data, self.feature_engineer)
+                if features_df.empty:
+                    return {'success': False, 'error': 'Нет данных для предсказания'}
             
-            # Интерпретация
-            direction_map = {-1: 'SELL', 0: 'HOLD', 1: 'BUY'}
-            direction = direction_map.get(prediction, 'HOLD')
+            # Предсказание по последней строке - один вызов predict_proba
+            scored = model.score(features_df.iloc[-1:])[0]
+            direction = scored['direction']
+            confidence = scored['confidence']
             
             result = {
                 'success': True,
                 'symbol': symbol,
                 'direction': direction,
-                'confidence': float(confidence),
-                'prediction_value': int(prediction),
-                'probabilities': {
-                    'bearish': float(prediction_proba[0]) if len(prediction_proba) > 0 else 0.0,
-                    'neutral': float(prediction_proba[1]) if len(prediction_proba) > 1 else 0.0,
-                    'bullish': float(prediction_proba[2]) if len(prediction_proba) > 2 else 0.0
-                },
+                'confidence': confidence,
+                'prediction_value': scored['prediction_value'],
+                'probabilities': scored['probabilities'],
                 'model_type': 'ensemble' if use_ensemble else 'single',
+                'model_version': scored['model_version'],
                 'timestamp': datetime.utcnow().isoformat()
             }
             
@@ -12,6 +12,7 @@ ENHANCED RISK MANAGER - Продвинутая система управлени
 """
 
 import asyncio
+import time
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Optional, Tuple, Any, Union
@@ -21,13 +22,17 @@ from enum import Enum
 from collections import defaultdict, deque
 import logging
 
-from ..core.database import SessionLocal
+from ..core.async_database import run_db
 from ..core.models import Trade, TradeStatus, Balance, TradingPair
 from ..core.unified_config import config
 from ..common.types import UnifiedTradingSignal as TradingSignal
+from .portfolio_analytics import VAR_Z_95, portfolio_analytics
 
 logger = logging.getLogger(__name__)
 
+# Активы, стоимость которых берется из Balance.total, если usd_value не заполнен
+STABLE_ASSETS = ('USDT', 'USDC', 'BUSD', 'USD')
+
 class RiskLevel(Enum):
     """Уровни риска"""
     VERY_LOW = "very_low"      # <1% риска
@@ -56,6 +61,7 @@ class PositionRisk:
     correlation_risk: float    # Корреляционный риск
     liquidity_risk: float     # Риск ликвидности
     concentration_risk: float  # Риск концентрации
+    exposure: float = 0.0      # Стоимость позиции со знаком (long > 0, short < 0)
 
 @dataclass
 class PortfolioRisk:
@@ -68,6 +74,8 @@ class PortfolioRisk:
     diversification_ratio: float    # Коэффициент диверсификации
     sharpe_ratio: float        # Коэффициент Шарпа
     risk_status: RiskStatus    # Текущий статус риска
+    var_95: float = 0.0        # VaR 95% портфеля за свечу
+    marginal_var: Dict[str, float] = field(default_factory=dict)  # dVaR/dэкспозиция по символам
 
 @dataclass
 class RiskParameters:
@@ -124,6 +132,19 @@ class EnhancedRiskManager:
         self.returns_history = defaultdict(deque)
         self.drawdown_history = deque(maxlen=1000)
         
+        # Аналитика портфеля и кеш позиций/сделок из БД (обновляется раз в RISK_STATE_TTL)
+        self.analytics = portfolio_analytics
+        self.state_ttl = float(getattr(config, 'RISK_STATE_TTL', 10.0) or 10.0)
+        self.equity_days = int(getattr(config, 'RISK_EQUITY_DAYS', 30) or 30)
+        self._state_refreshed_at = float('-inf')
+        self._state_lock = asyncio.Lock()
+        self._open_positions: List[PositionRisk] = []
+        self._total_value = 0.0      # капитал счета: Balance или последний переданный баланс + позиции
+        self._reported_balance = 0.0  # доступный баланс из последней validate_trade_risk
+        self._closed_trades = {'symbol': np.array([], dtype=object),
+                               'close_time': np.array([], dtype='datetime64[us]'),
+                               'profit_loss': np.array([])}
+        
         # Статистика
         self.risk_events = deque(maxlen=100)
         self.rejected_trades = 0
@@ -167,6 +188,8 @@ class EnhancedRiskManager:
         """
         try:
             self.total_risk_checks += 1
+            if balance and balance > 0:
+                self._reported_balance = float(balance)
             
             # Проверка экстренной остановки
             if self.emergency_stop_active:
@@ -308,7 +331,8 @@ class EnhancedRiskManager:
             var_95 = position_value * volatility * 1.645  # 95% VaR
             
             # Корреляционный риск
-            correlation_risk = await self._calculate_correlation_risk(symbol)
+            exposure = position_value * self._direction(signal.action)
+            correlation_risk = await self._calculate_correlation_risk(symbol, exposure)
             
             # Риск ликвидности (упрощенный)
             liquidity_risk = min(0.1, position_value / 1000000)  # 1M USD как базовая ликвидность
@@ -326,7 +350,8 @@ class EnhancedRiskManager:
                 expected_loss=risk_amount * 0.5,  # Упрощенный расчет
                 correlation_risk=correlation_risk,
                 liquidity_risk=liquidity_risk,
-                concentration_risk=concentration_risk
+                concentration_risk=concentration_risk,
+                exposure=exposure
             )
             
         except Exception as e:
@@ -366,9 +391,12 @@ class EnhancedRiskManager:
             # Коэффициент диверсификации
             diversification_ratio = self._calculate_diversification_ratio(all_positions, correlation_matrix)
             
-            # Коэффициент Шарпа (упрощенный)
+            # Коэффициент Шарпа
             sharpe_ratio = await self._calculate_portfolio_sharpe(all_positions)
             
+            # VaR портфеля и маржинальный VaR позиций
+            var_metrics = self.analytics.portfolio_metrics(self._exposures(all_positions))
+            
             # Определение статуса риска
             risk_status = self._determine_risk_status(
                 total_risk_percent, current_drawdown, diversification_ratio
@@ -382,7 +410,9 @@ class EnhancedRiskManager:
                 correlation_matrix=correlation_matrix,
                 diversification_ratio=diversification_ratio,
                 sharpe_ratio=sharpe_ratio,
-                risk_status=risk_status
+                risk_status=risk_status,
+                var_95=var_metrics['var_95'],
+                marginal_var=var_metrics['marginal_var']
             )
             
         except Exception as e:
@@ -625,35 +655,31 @@ class EnhancedRiskManager:
     
     async def _get_historical_stats(self, symbol: str) -> Tuple[float, float, float]:
         """Получение исторической статистики торговли"""
+        # Закрытые сделки за последние 30 дней из кеша _refresh_portfolio_state
+        cutoff_date = np.datetime64(datetime.utcnow() - timedelta(days=30), 'us')
+        
         try:
-            db = SessionLocal()
+            await self._refresh_portfolio_state()
+            trades = self._closed_trades
+            mask = (trades['symbol'] == symbol) & (trades['close_time'] >= cutoff_date)
+            profits = trades['profit_loss'][mask]
+            profits = profits[profits != 0]
             
-            # Запрос закрытых сделок за последние 30 дней
-            cutoff_date = datetime.utcnow() - timedelta(days=30)
-            trades = db.query(Trade).filter(
-                Trade.symbol == symbol,
-                Trade.status == TradeStatus.CLOSED,
-                Trade.exit_time >= cutoff_date
-            ).all()
-            
-            if not trades:
+            if len(profits) == 0:
                 return 0.5, 0.02, 0.02  # Дефолтные значения
             
-            profits = [t.profit for t in trades if t.profit]
-            wins = [p for p in profits if p > 0]
-            losses = [-p for p in profits if p < 0]
+            wins = profits[profits > 0]
+            losses = -profits[profits < 0]
             
-            win_rate = len(wins) / len(profits) if profits else 0.5
-            avg_win = np.mean(wins) if wins else 0.02
-            avg_loss = np.mean(losses) if losses else 0.02
+            win_rate = len(wins) / len(profits)
+            avg_win = wins.mean() if len(wins) else 0.02
+            avg_loss = losses.mean() if len(losses) else 0.02
             
             return win_rate, avg_win, avg_loss
             
         except Exception as e:
             logger.error(f"❌ Ошибка получения исторической статистики: {e}")
             return 0.5, 0.02, 0.02
-        finally:
-            db.close()
     
     def _calculate_dynamic_stop_loss(self, current_price: float, symbol: str,
                                    action: str) -> float:
@@ -710,38 +736,186 @@ class EnhancedRiskManager:
             return {}
 
 # =================================================================
-# ЗАГЛУШКИ ДЛЯ МЕТОДОВ, ТРЕБУЮЩИХ ПОЛНОЙ РЕАЛИЗАЦИИ
+# ПОРТФЕЛЬ: ПОЗИЦИИ, КОРРЕЛЯЦИИ, ПРОСАДКА
 # =================================================================
 
+    @staticmethod
+    def _direction(action: Any) -> int:
+        """+1 для покупки, -1 для продажи"""
+        return -1 if str(getattr(action, 'value', action)).upper() in ('SELL', 'SHORT') else 1
+    
+    @staticmethod
+    def _exposures(positions: List[PositionRisk]) -> Dict[str, float]:
+        """Суммарная стоимость со знаком по символам"""
+        exposures: Dict[str, float] = defaultdict(float)
+        for pos in positions:
+            exposures[pos.symbol] += pos.exposure
+        return exposures
+    
+    async def _refresh_portfolio_state(self, force: bool = False):
+        """
+        Открытые позиции и закрытые сделки из БД - не чаще раза в RISK_STATE_TTL.
+        Между обновлениями проверки сделок работают только с кешем и analytics.
+        """
+        if not force and time.monotonic() - self._state_refreshed_at < self.state_ttl:
+            return
+        async with self._state_lock:
+            if not force and time.monotonic() - self._state_refreshed_at < self.state_ttl:
+                return
+            
+            cutoff_date = datetime.utcnow() - timedelta(days=max(30, self.equity_days))
+            
+            def query(db):
+                open_trades = db.query(
+                    Trade.symbol, Trade.side, Trade.quantity, Trade.price, Trade.stop_loss
+                ).filter(Trade.status == TradeStatus.OPEN).all()
+                closed_trades = db.query(
+                    Trade.symbol, Trade.close_time, Trade.profit_loss
+                ).filter(
+                    Trade.status == TradeStatus.CLOSED,
+                    Trade.close_time >= cutoff_date,
+                    Trade.profit_loss.isnot(None)
+                ).order_by(Trade.close_time).all()
+                balances = db.query(Balance.asset, Balance.total, Balance.usd_value).all()
+                return ([tuple(row) for row in open_trades], [tuple(row) for row in closed_trades],
+                        [tuple(row) for row in balances])
+            
+            try:
+                open_trades, closed_trades, balances = await run_db(query)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обновления состояния портфеля: {e}")
+                self._state_refreshed_at = time.monotonic()  # не повторяем запрос на каждой проверке
+                return
+            
+            # Позиции: стоимость по последней цене свечей (или по цене входа)
+            self.analytics.sync([row[0] for row in open_trades])
+            priced = []
+            for symbol, side, quantity, entry_price, stop_loss in open_trades:
+                quantity = float(quantity or 0)
+                entry_price = float(entry_price or 0)
+                price = self.analytics.price(symbol) or entry_price
+                priced.append((symbol, self._direction(side), quantity, entry_price, price, stop_loss))
+            
+            # Капитал: сумма балансов из БД, иначе доступный баланс + стоимость позиций
+            total_value = self._balance_equity(balances)
+            if total_value <= 0 and self._reported_balance > 0:
+                total_value = self._reported_balance + sum(q * p for _, _, q, _, p, _ in priced)
+            if total_value <= 0:
+                logger.warning("⚠️ Капитал счета неизвестен (нет Balance и баланса из проверок) - просадка не считается")
+            self._total_value = total_value
+            
+            positions, unrealized = [], 0.0
+            for symbol, direction, quantity, entry_price, price, stop_loss in priced:
+                value = quantity * price
+                if stop_loss:
+                    risk_amount = abs(price - stop_loss) * quantity
+                else:
+                    risk_amount = value * self.risk_params.max_position_risk
+                volatility = float(self.analytics.volatility([symbol])[0])
+                unrealized += direction * quantity * (price - entry_price)
+                positions.append(PositionRisk(
+                    symbol=symbol,
+                    position_size=quantity,
+                    risk_amount=risk_amount,
+                    risk_percent=risk_amount / total_value if total_value > 0 else 0,
+                    var_95=VAR_Z_95 * value * volatility,
+                    expected_loss=risk_amount * 0.5,
+                    correlation_risk=0.0,
+                    liquidity_risk=min(0.1, value / 1000000),
+                    concentration_risk=value / total_value if total_value > 0 else 0,
+                    exposure=direction * value
+                ))
+            self._open_positions = positions
+            self.analytics.set_exposures(self._exposures(positions))
+            
+            # Кривая капитала: текущий капитал минус реализованный результат в обратном порядке
+            symbols = np.array([row[0] for row in closed_trades], dtype=object)
+            close_times = np.array([row[1] for row in closed_trades], dtype='datetime64[us]')
+            pnl = np.array([row[2] for row in closed_trades], dtype=np.float64)
+            self._closed_trades = {'symbol': symbols, 'close_time': close_times, 'profit_loss': pnl}
+            
+            # Капитал total_value уже включает нереализованный результат позиций
+            if total_value > 0:
+                equity_cutoff = np.datetime64(datetime.utcnow() - timedelta(days=self.equity_days), 'us')
+                realized = pnl[close_times >= equity_cutoff]
+                start_equity = total_value - unrealized - realized.sum()
+                equity = np.concatenate(([start_equity], start_equity + np.cumsum(realized), [total_value]))
+            else:
+                equity = []
+            self.analytics.set_equity(equity)
+            
+            self._state_refreshed_at = time.monotonic()
+    
     async def _get_current_positions(self) -> List[PositionRisk]:
-        """Заглушка - получение текущих позиций"""
-        return []
+        """Открытые позиции (кеш, см. _refresh_portfolio_state)"""
+        await self._refresh_portfolio_state()
+        return list(self._open_positions)
+    
+    @staticmethod
+    def _balance_equity(balances: List[Tuple[str, float, float]]) -> float:
+        """Капитал по таблице Balance: usd_value, для стейблкоинов без оценки - total"""
+        equity = 0.0
+        for asset, total, usd_value in balances:
+            if usd_value:
+                equity += float(usd_value)
+            elif total and str(asset).upper() in STABLE_ASSETS:
+                equity += float(total)
+        return equity
     
     async def _get_total_portfolio_value(self) -> float:
-        """Заглушка - получение общей стоимости портфеля"""
-        return 10000.0
+        """Капитал счета (кеш, см. _refresh_portfolio_state); 0 - неизвестен"""
+        await self._refresh_portfolio_state()
+        return self._total_value
     
-    async def _calculate_correlation_risk(self, symbol: str) -> float:
-        """Заглушка - расчет корреляционного риска"""
-        return 0.1
+    async def _calculate_correlation_risk(self, symbol: str, exposure: float = 1.0) -> float:
+        """
+        Корреляция новой позиции с текущим портфелем:
+        > 0 - позиция усиливает риск портфеля (0 при пустом портфеле)
+        """
+        await self._refresh_portfolio_state()
+        self.analytics.sync([symbol])
+        correlation = self.analytics.screen([symbol], [exposure])['correlation'][0]
+        return max(0.0, float(correlation))
     
     async def _calculate_drawdown(self) -> Tuple[float, float]:
-        """Заглушка - расчет просадки"""
-        return 0.05, 0.12
+        """(текущая, максимальная) просадка по кривой капитала за RISK_EQUITY_DAYS"""
+        await self._refresh_portfolio_state()
+        return self.analytics.drawdown()
     
     async def _build_correlation_matrix(self, symbols: List[str]) -> np.ndarray:
-        """Заглушка - построение корреляционной матрицы"""
-        n = len(symbols)
-        return np.eye(n) if n > 0 else np.array([])
+        """Матрица EWMA-корреляций доходностей символов"""
+        self.analytics.sync(symbols)
+        return self.analytics.correlation(symbols)
     
     def _calculate_diversification_ratio(self, positions: List[PositionRisk],
                                        correlation_matrix: np.ndarray) -> float:
-        """Заглушка - расчет коэффициента диверсификации"""
-        return 0.7
+        """Коэффициент диверсификации: 0 - одна позиция или полностью коррелированные, ближе к 1 - лучше"""
+        return self.analytics.diversification_ratio(
+            [pos.exposure for pos in positions], [pos.symbol for pos in positions], correlation_matrix
+        )
     
     async def _calculate_portfolio_sharpe(self, positions: List[PositionRisk]) -> float:
-        """Заглушка - расчет коэффициента Шарпа портфеля"""
-        return 1.2
+        """Годовой коэффициент Шарпа портфеля на окне доходностей свечей"""
+        return self.analytics.sharpe_ratio(self._exposures(positions))
+    
+    async def screen_candidates(self, candidates: Dict[str, float]) -> Dict[str, Dict[str, float]]:
+        """
+        Влияние кандидатов на портфель одним векторным проходом
+        
+        Args:
+            candidates: {symbol: стоимость предполагаемой позиции со знаком}
+            
+        Returns:
+            {symbol: {'correlation', 'marginal_var', 'incremental_var', 'volatility'}}
+        """
+        await self._refresh_portfolio_state()
+        symbols = list(candidates)
+        self.analytics.sync(symbols)
+        metrics = self.analytics.screen(symbols, [candidates[s] for s in symbols])
+        return {
+            symbol: {name: float(values[i]) for name, values in metrics.items()}
+            for i, symbol in enumerate(symbols)
+        }
     
     def _determine_risk_status(self, total_risk: float, drawdown: float,
                              diversification: float) -> RiskStatus:
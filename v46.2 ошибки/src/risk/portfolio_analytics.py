@@ -0,0 +1,376 @@
+"""
+Аналитика портфеля для риск-менеджера
+Файл: src/risk/portfolio_analytics.py
+
+Ковариации доходностей и метрики портфеля по общим свечам candle_store:
+- матрица лог-доходностей закрытых свечей (окно RISK_RETURNS_WINDOW) для
+  всех открытых и проверявшихся символов на общей сетке времени таймфрейма
+- EWMA-ковариация по окну (полураспад RISK_EWMA_HALFLIFE свечей) сдвигается
+  только на новые свечи; столбцы новых символов считаются по окну
+- VaR, маржинальный VaR, корреляция кандидатов с портфелем,
+  коэффициент диверсификации и Шарп - векторно по текущей матрице
+- просадка - по кривой капитала, которую передает риск-менеджер
+
+Пересчет идет раз в свечу (или при появлении нового символа), а проверки
+сделок только читают готовые массивы.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from ..core.unified_config import unified_config as config
+from ..data.candle_store import DEFAULT_CAPACITY, candle_store, interval_delta
+
+logger = logging.getLogger(__name__)
+
+VAR_Z_95 = 1.645  # квантиль нормального распределения для VaR 95%
+
+
+def _setting(name: str, default, cast=int):
+    try:
+        return cast(getattr(config, name, default) or default)
+    except (TypeError, ValueError):
+        return default
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class PortfolioAnalytics:
+    """
+    Матрица доходностей, EWMA-ковариация и метрики портфеля.
+
+    Экспозиции - подписанная стоимость позиций в валюте счета
+    (long > 0, short < 0); волатильность и VaR - на одну свечу таймфрейма.
+    """
+
+    def __init__(self, timeframe: Optional[str] = None, halflife: Optional[float] = None,
+                 window: Optional[int] = None, store=None):
+        self.store = store or candle_store
+        self.timeframe = timeframe or getattr(config, 'RISK_ANALYTICS_TIMEFRAME', '') or '5m'
+        self.halflife = float(halflife or _setting('RISK_EWMA_HALFLIFE', 288.0, float))
+        # Окно + опорная свеча + незакрытая должны помещаться в буфер candle_store
+        self.window = min(int(window or _setting('RISK_RETURNS_WINDOW', 1000)), DEFAULT_CAPACITY - 2)
+        self.decay = 0.5 ** (1.0 / self.halflife)
+        self.interval_ms = int(interval_delta(self.timeframe).total_seconds() * 1000)
+        self.periods_per_year = 365 * 24 * 3600 * 1000 / self.interval_ms
+
+        # Матрица доходностей и ковариации (столбцы - self.symbols)
+        self.symbols: List[str] = []
+        self._columns: Dict[str, int] = {}
+        self.times = np.empty(0, dtype=np.int64)
+        self.returns = np.empty((0, 0))
+        self.last_close = np.empty(0)
+        self.cov = np.empty((0, 0))
+        self._last_ts: Optional[int] = None
+        self._next_sync_ms = 0
+
+        # Текущий портфель
+        self.exposures = np.empty(0)
+        self._cov_w = np.empty(0)
+        self._portfolio_var = 0.0
+        self.equity = np.empty(0)
+
+        self._lock = threading.RLock()
+        self.stats = {'syncs': 0, 'rows_applied': 0, 'columns_added': 0}
+
+    # === Матрица доходностей и ковариации ===
+
+    def track(self, symbols: Iterable[str]):
+        """Добавление символов (например, всех кандидатов сканера) заранее, вне проверки сделки"""
+        self.sync(symbols)
+
+    def sync(self, symbols: Iterable[str] = (), force: bool = False) -> bool:
+        """
+        Досчет по новым закрытым свечам и новым символам.
+
+        Returns:
+            bool: Была ли обновлена матрица
+        """
+        new_symbols = [s for s in dict.fromkeys(symbols or ())
+                       if s not in self._columns and self.store.has(s, self.timeframe)]
+        now_ms = _now_ms()
+        if not new_symbols and not force and now_ms < self._next_sync_ms:
+            return False
+
+        with self._lock:
+            for symbol in new_symbols:
+                if symbol not in self._columns:
+                    self._columns[symbol] = len(self.symbols)
+                    self.symbols.append(symbol)
+            if not self.symbols:
+                return False
+
+            # Сетка открытий закрытых свечей: последняя закрыта, если прошел ее интервал
+            last_closed = (now_ms // self.interval_ms - 1) * self.interval_ms
+            grid = last_closed - np.arange(self.window, -1, -1, dtype=np.int64) * self.interval_ms
+            closes = self._aligned_closes(grid)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns = np.diff(np.log(closes), axis=0)
+            returns[~np.isfinite(returns)] = 0.0
+
+            n_old = self.cov.shape[0]
+            new_rows = self.window if self._last_ts is None else int(np.count_nonzero(grid[1:] > self._last_ts))
+            if n_old and new_rows:
+                self._apply_rows(returns, n_old, new_rows)
+            if len(self.symbols) > n_old:
+                self._add_columns(returns, n_old)
+
+            self.times = grid[1:]
+            self.returns = returns
+            self.last_close = closes[-1]
+            self._last_ts = int(grid[-1])
+            self._next_sync_ms = int(grid[-1]) + 2 * self.interval_ms
+            self._resize_exposures()
+            self._refresh_portfolio()
+            self.stats['syncs'] += 1
+            self.stats['rows_applied'] += new_rows
+            return True
+
+    def _aligned_closes(self, grid: np.ndarray) -> np.ndarray:
+        """Цены закрытия всех символов на сетке grid (последнее известное значение, NaN до начала истории)"""
+        closes = np.full((len(grid), len(self.symbols)), np.nan)
+        for col, symbol in enumerate(self.symbols):
+            view = self.store.view(symbol, self.timeframe, limit=len(grid) + 1)
+            if view is None:
+                continue
+            idx = np.searchsorted(view['timestamp'], grid, side='right') - 1
+            known = idx >= 0
+            closes[known, col] = view['close'][idx[known]]
+        return closes
+
+    def _weights(self, rows: int) -> np.ndarray:
+        """EWMA-веса строк окна (последняя строка - вес 1)"""
+        return self.decay ** np.arange(rows - 1, -1, -1)
+
+    def _apply_rows(self, returns: np.ndarray, n_old: int, new_rows: int):
+        """
+        Сдвиг окна EWMA-ковариации на new_rows строк: старые веса затухают,
+        выпавшие из окна строки вычитаются, новые добавляются
+        """
+        if new_rows >= len(returns) or len(self.returns) != len(returns):
+            self.cov = self._window_cov(returns[:, :n_old], 0, n_old)
+            return
+        total = self._weights(len(returns)).sum()
+        rows = returns[-new_rows:, :n_old]
+        dropped = self.returns[:new_rows, :n_old]
+        added_w = self._weights(new_rows)
+        dropped_w = self.decay ** len(returns) * added_w
+        self.cov = (self.decay ** new_rows * self.cov
+                    + ((rows * added_w[:, None]).T @ rows
+                       - (dropped * dropped_w[:, None]).T @ dropped) / total)
+
+    def _window_cov(self, returns: np.ndarray, start: int, stop: int) -> np.ndarray:
+        """Столбцы start:stop EWMA-ковариации по всему окну"""
+        weights = self._weights(len(returns))
+        return (returns * weights[:, None]).T @ returns[:, start:stop] / weights.sum()
+
+    def _add_columns(self, returns: np.ndarray, n_old: int):
+        """Ковариации новых символов со всеми - по всему окну с теми же весами"""
+        block = self._window_cov(returns, n_old, returns.shape[1])
+        n = len(self.symbols)
+        cov = np.zeros((n, n))
+        cov[:n_old, :n_old] = self.cov
+        cov[:, n_old:] = block
+        cov[n_old:, :] = block.T
+        self.cov = cov
+        self.stats['columns_added'] += n - n_old
+
+    # === Портфель ===
+
+    def _resize_exposures(self):
+        if len(self.exposures) < len(self.symbols):
+            self.exposures = np.concatenate((self.exposures, np.zeros(len(self.symbols) - len(self.exposures))))
+
+    def _refresh_portfolio(self):
+        self._cov_w = self.cov @ self.exposures if len(self.exposures) else np.empty(0)
+        self._portfolio_var = float(self.exposures @ self._cov_w) if len(self.exposures) else 0.0
+
+    def set_exposures(self, exposures: Dict[str, float]):
+        """Текущие позиции: {symbol: подписанная стоимость}"""
+        self.sync(exposures)
+        with self._lock:
+            values = np.zeros(len(self.symbols))
+            for symbol, value in exposures.items():
+                col = self._columns.get(symbol)
+                if col is not None:
+                    values[col] += value
+            self.exposures = values
+            self._refresh_portfolio()
+
+    def set_equity(self, equity: Sequence[float]):
+        """Кривая капитала счета (по возрастанию времени) для расчета просадки"""
+        self.equity = np.asarray(equity, dtype=np.float64)
+
+    def price(self, symbol: str) -> Optional[float]:
+        """Последняя цена закрытия символа из матрицы"""
+        col = self._columns.get(symbol)
+        if col is None or not np.isfinite(self.last_close[col]):
+            return None
+        return float(self.last_close[col])
+
+    def _vector(self, exposures: Dict[str, float]):
+        """Столбцы и экспозиции известных символов"""
+        cols, values = [], []
+        for symbol, value in exposures.items():
+            col = self._columns.get(symbol)
+            if col is not None and value:
+                cols.append(col)
+                values.append(value)
+        return np.array(cols, dtype=np.int64), np.array(values, dtype=np.float64)
+
+    # === Метрики ===
+
+    def volatility(self, symbols: Sequence[str]) -> np.ndarray:
+        """Волатильность доходности за свечу (0 для неизвестных символов)"""
+        cols = np.array([self._columns.get(s, -1) for s in symbols], dtype=np.int64)
+        result = np.zeros(len(cols))
+        known = cols >= 0
+        result[known] = np.sqrt(np.maximum(np.diag(self.cov)[cols[known]], 0.0))
+        return result
+
+    def correlation(self, symbols: Sequence[str]) -> np.ndarray:
+        """Матрица корреляций symbols x symbols (неизвестные символы - некоррелированы)"""
+        n = len(symbols)
+        if n == 0:
+            return np.array([])
+        cols = np.array([self._columns.get(s, -1) for s in symbols], dtype=np.int64)
+        known = cols >= 0
+        corr = np.eye(n)
+        if known.any():
+            sub = self.cov[np.ix_(cols[known], cols[known])]
+            sigma = np.sqrt(np.maximum(np.diag(sub), 0.0))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                block = sub / np.outer(sigma, sigma)
+            block[~np.isfinite(block)] = 0.0
+            np.fill_diagonal(block, 1.0)
+            corr[np.ix_(known, known)] = block
+        return corr
+
+    def screen(self, symbols: Sequence[str], exposures: Sequence[float],
+               z: float = VAR_Z_95) -> Dict[str, np.ndarray]:
+        """
+        Влияние кандидатов на портфель - по каждому отдельно, одним векторным проходом.
+
+        Args:
+            symbols: Символы кандидатов
+            exposures: Подписанная стоимость предполагаемых позиций
+
+        Returns:
+            Dict: correlation - корреляция позиции с портфелем (> 0 - усиливает риск),
+                  marginal_var - dVaR/dэкспозиция, incremental_var - прирост VaR портфеля,
+                  volatility - волатильность символа за свечу
+        """
+        exposures = np.asarray(exposures, dtype=np.float64)
+        cols = np.array([self._columns.get(s, -1) for s in symbols], dtype=np.int64)
+        known = cols >= 0
+        n = len(cols)
+        variance = np.zeros(n)
+        cross = np.zeros(n)
+        if known.any():
+            variance[known] = np.maximum(np.diag(self.cov)[cols[known]], 0.0)
+            if len(self._cov_w):
+                cross[known] = self._cov_w[cols[known]]
+
+        sigma_p = np.sqrt(max(self._portfolio_var, 0.0))
+        sigma = np.sqrt(variance)
+        new_var = np.maximum(self._portfolio_var + 2 * exposures * cross + exposures ** 2 * variance, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = np.where(sigma * sigma_p > 0, np.sign(exposures) * cross / (sigma * sigma_p), 0.0)
+            marginal = np.where(new_var > 0, z * (cross + exposures * variance) / np.sqrt(new_var), 0.0)
+        return {
+            'correlation': correlation,
+            'marginal_var': marginal,
+            'incremental_var': z * (np.sqrt(new_var) - sigma_p),
+            'volatility': sigma,
+        }
+
+    def portfolio_metrics(self, exposures: Dict[str, float], z: float = VAR_Z_95) -> Dict[str, Any]:
+        """
+        Метрики портфеля с заданными экспозициями.
+
+        Returns:
+            Dict: volatility и var_95 (валюта, за свечу), marginal_var {symbol: dVaR/dэкспозиция},
+                  diversification_ratio, sharpe_ratio
+        """
+        cols, values = self._vector(exposures)
+        if len(cols) == 0:
+            return {'volatility': 0.0, 'var_95': 0.0, 'marginal_var': {},
+                    'diversification_ratio': 1.0, 'sharpe_ratio': 0.0}
+        sub = self.cov[np.ix_(cols, cols)]
+        cov_w = sub @ values
+        sigma_p = float(np.sqrt(max(values @ cov_w, 0.0)))
+        marginal = z * cov_w / sigma_p if sigma_p > 0 else np.zeros(len(cols))
+        return {
+            'volatility': sigma_p,
+            'var_95': z * sigma_p,
+            'marginal_var': {self.symbols[c]: float(m) for c, m in zip(cols, marginal)},
+            'diversification_ratio': self._diversification(values, np.sqrt(np.maximum(np.diag(sub), 0.0)), sigma_p),
+            'sharpe_ratio': self._sharpe(self.returns[:, cols] @ values),
+        }
+
+    @staticmethod
+    def _diversification(values: np.ndarray, sigma: np.ndarray, sigma_p: float) -> float:
+        """
+        1 - 1/DR, где DR = sum(|w| * sigma) / sigma_p (Choueifaty):
+        0 - одна позиция или полностью коррелированные, ближе к 1 - лучше диверсифицирован
+        """
+        weighted = float(np.abs(values) @ sigma)
+        if sigma_p <= 0 or weighted <= 0:
+            return 1.0
+        return float(max(0.0, 1.0 - sigma_p / weighted))
+
+    def diversification_ratio(self, exposures: Sequence[float], symbols: Sequence[str],
+                              correlation_matrix: Optional[np.ndarray] = None) -> float:
+        """Коэффициент диверсификации (см. _diversification) по матрице корреляций symbols"""
+        values = np.asarray(exposures, dtype=np.float64)
+        if len(values) == 0:
+            return 1.0
+        corr = correlation_matrix if correlation_matrix is not None and len(correlation_matrix) else self.correlation(symbols)
+        sigma = self.volatility(symbols)
+        scaled = values * sigma
+        sigma_p = float(np.sqrt(max(scaled @ corr @ scaled, 0.0)))
+        return self._diversification(values, sigma, sigma_p)
+
+    def sharpe_ratio(self, exposures: Dict[str, float]) -> float:
+        """Годовой коэффициент Шарпа портфеля с этими экспозициями на окне доходностей"""
+        cols, values = self._vector(exposures)
+        if len(cols) == 0:
+            return 0.0
+        return self._sharpe(self.returns[:, cols] @ values)
+
+    def _sharpe(self, pnl: np.ndarray) -> float:
+        if len(pnl) < 2:
+            return 0.0
+        std = float(pnl.std(ddof=1))
+        if std <= 0:
+            return 0.0
+        return float(pnl.mean() / std * np.sqrt(self.periods_per_year))
+
+    def drawdown(self):
+        """(текущая, максимальная) просадка кривой капитала в долях"""
+        equity = self.equity
+        if len(equity) == 0:
+            return 0.0, 0.0
+        peak = np.maximum.accumulate(equity)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdowns = np.where(peak > 0, 1.0 - equity / peak, 0.0)
+        return float(drawdowns[-1]), float(drawdowns.max())
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'timeframe': self.timeframe,
+            'symbols': len(self.symbols),
+            'window': len(self.times),
+            'last_candle': self._last_ts,
+            'portfolio_volatility': float(np.sqrt(max(self._portfolio_var, 0.0))),
+        }
+
+
+# Глобальный экземпляр, общий для риск-менеджеров
+portfolio_analytics = PortfolioAnalytics()
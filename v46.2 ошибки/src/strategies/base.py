@@ -14,6 +14,7 @@ import asyncio
 logger = logging.getLogger(__name__)
 
 from ..common.types import UnifiedTradingSignal as TradingSignal
+from ..indicators.indicator_cache import indicator_cache
 
 class BaseStrategy(ABC):
     """
@@ -435,6 +436,31 @@ class BaseStrategy(ABC):
         except:
             return 0, 0
 
+    def cached_indicator(self, df: pd.DataFrame, indicator: str, compute, **params):
+        """
+        Индикатор из общего кэша (один расчет на пару и свечу для всех стратегий).
+
+        Одно имя индикатора должно означать одну и ту же формулу
+        во всех стратегиях; параметры входят в ключ кэша.
+        """
+        return indicator_cache.get_or_compute(df, indicator, compute, params)
+
+    def stream_indicator(self, df: pd.DataFrame, name: str) -> Optional[float]:
+        """
+        Последнее значение потокового индикатора пары или None.
+
+        Анализ рынка кладет в df.attrs['indicators'] снимок IndicatorStream
+        (rsi, atr, macd_macd, bb_upper, ...), обновляемый за O(1) на свечу.
+        None - снимка нет или индикатор еще не прогрет: тогда считаем по DataFrame.
+        """
+        values = df.attrs.get('indicators')
+        if not values:
+            return None
+        value = values.get(name)
+        if value is None or np.isnan(value):
+            return None
+        return float(value)
+
     async def calculate_enhanced_indicators(self, df: pd.DataFrame) -> dict:
         """
         Расчет расширенного набора индикаторов
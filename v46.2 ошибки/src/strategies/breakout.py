@@ -151,30 +151,45 @@ class BreakoutStrategy(BaseStrategy):
             
             if TA_AVAILABLE:
                 # RSI для определения моментума
-                rsi = RSIIndicator(df['close'], window=14)
-                indicators['rsi'] = float(rsi.rsi().iloc[-1])
+                rsi = self.cached_indicator(
+                    df, 'ta_rsi', lambda: RSIIndicator(df['close'], window=14).rsi(), window=14
+                )
+                indicators['rsi'] = float(rsi.iloc[-1])
                 
                 # ADX для силы тренда
-                adx = ADXIndicator(df['high'], df['low'], df['close'])
-                indicators['adx'] = float(adx.adx().iloc[-1])
-                indicators['adx_pos'] = float(adx.adx_pos().iloc[-1])
-                indicators['adx_neg'] = float(adx.adx_neg().iloc[-1])
+                adx, adx_pos, adx_neg = self.cached_indicator(
+                    df, 'ta_adx', lambda: self._ta_adx(df), window=14
+                )
+                indicators['adx'] = float(adx.iloc[-1])
+                indicators['adx_pos'] = float(adx_pos.iloc[-1])
+                indicators['adx_neg'] = float(adx_neg.iloc[-1])
                 
                 # EMA для определения общего тренда
-                ema_20 = EMAIndicator(df['close'], window=20)
-                ema_50 = EMAIndicator(df['close'], window=50)
-                indicators['ema_20'] = float(ema_20.ema_indicator().iloc[-1])
-                indicators['ema_50'] = float(ema_50.ema_indicator().iloc[-1])
+                ema_20 = self.cached_indicator(
+                    df, 'ta_ema', lambda: EMAIndicator(df['close'], window=20).ema_indicator(), window=20
+                )
+                ema_50 = self.cached_indicator(
+                    df, 'ta_ema', lambda: EMAIndicator(df['close'], window=50).ema_indicator(), window=50
+                )
+                indicators['ema_20'] = float(ema_20.iloc[-1])
+                indicators['ema_50'] = float(ema_50.iloc[-1])
                 
                 # ATR для волатильности
-                atr = AverageTrueRange(df['high'], df['low'], df['close'])
-                indicators['atr'] = float(atr.average_true_range().iloc[-1])
+                atr = self.cached_indicator(
+                    df, 'ta_atr',
+                    lambda: AverageTrueRange(df['high'], df['low'], df['close'], window=14).average_true_range(),
+                    window=14
+                )
+                indicators['atr'] = float(atr.iloc[-1])
                 
                 # OBV для объемного анализа (если есть объем)
                 if 'volume' in df.columns:
-                    obv = OnBalanceVolumeIndicator(df['close'], df['volume'])
-                    indicators['obv'] = float(obv.on_balance_volume().iloc[-1])
-                    indicators['obv_trend'] = self._calculate_obv_trend(obv.on_balance_volume())
+                    obv = self.cached_indicator(
+                        df, 'ta_obv',
+                        lambda: OnBalanceVolumeIndicator(df['close'], df['volume']).on_balance_volume()
+                    )
+                    indicators['obv'] = float(obv.iloc[-1])
+                    indicators['obv_trend'] = self._calculate_obv_trend(obv)
                 
             else:
                 # Базовые вычисления без TA-Lib
@@ -422,6 +437,12 @@ class BreakoutStrategy(BaseStrategy):
             return TradingSignal('WAIT', 0, 0, reason=f'Ошибка решения: {e}')
     
     # Вспомогательные методы
+    @staticmethod
+    def _ta_adx(df: pd.DataFrame) -> tuple:
+        """ADX, +DI, -DI - тот же расчет 'ta_adx', что в MultiIndicatorStrategy"""
+        adx_indicator = ADXIndicator(df['high'], df['low'], df['close'], window=14)
+        return adx_indicator.adx(), adx_indicator.adx_pos(), adx_indicator.adx_neg()
+    
     def _calculate_obv_trend(self, obv_series):
         """Определение тренда OBV"""
         if len(obv_series) < 10:
@@ -92,24 +92,38 @@ class MeanReversionStrategy(BaseStrategy):
             
             if TA_AVAILABLE:
                 # RSI
-                rsi = RSIIndicator(df['close'], window=self.rsi_period)
-                indicators['rsi'] = float(rsi.rsi().iloc[-1])
+                rsi = self.cached_indicator(
+                    df, 'ta_rsi', lambda: RSIIndicator(df['close'], window=self.rsi_period).rsi(),
+                    window=self.rsi_period
+                )
+                indicators['rsi'] = float(rsi.iloc[-1])
                 
                 # Bollinger Bands
-                bb = BollingerBands(df['close'], window=self.bb_period, window_dev=self.bb_std)
-                indicators['bb_upper'] = float(bb.bollinger_hband().iloc[-1])
-                indicators['bb_lower'] = float(bb.bollinger_lband().iloc[-1])
-                indicators['bb_middle'] = float(bb.bollinger_mavg().iloc[-1])
-                indicators['bb_percent'] = float(bb.bollinger_pband().iloc[-1])
-                indicators['bb_width'] = float(bb.bollinger_wband().iloc[-1])
+                bb_upper, bb_lower, bb_middle, bb_percent = self.cached_indicator(
+                    df, 'ta_bbands', lambda: self._ta_bollinger(df, self.bb_period, self.bb_std),
+                    window=self.bb_period, window_dev=self.bb_std
+                )
+                indicators['bb_upper'] = float(bb_upper.iloc[-1])
+                indicators['bb_lower'] = float(bb_lower.iloc[-1])
+                indicators['bb_middle'] = float(bb_middle.iloc[-1])
+                indicators['bb_percent'] = float(bb_percent.iloc[-1])
+                # Как bollinger_wband() в ta
+                indicators['bb_width'] = (indicators['bb_upper'] - indicators['bb_lower']) / indicators['bb_middle'] * 100
                 
                 # EMA
-                ema = EMAIndicator(df['close'], window=self.ema_period)
-                indicators['ema'] = float(ema.ema_indicator().iloc[-1])
+                ema = self.cached_indicator(
+                    df, 'ta_ema', lambda: EMAIndicator(df['close'], window=self.ema_period).ema_indicator(),
+                    window=self.ema_period
+                )
+                indicators['ema'] = float(ema.iloc[-1])
                 
                 # ATR
-                atr = AverageTrueRange(df['high'], df['low'], df['close'])
-                indicators['atr'] = float(atr.average_true_range().iloc[-1])
+                atr = self.cached_indicator(
+                    df, 'ta_atr',
+                    lambda: AverageTrueRange(df['high'], df['low'], df['close'], window=14).average_true_range(),
+                    window=14
+                )
+                indicators['atr'] = float(atr.iloc[-1])
                 
             else:
                 # Базовые вычисления без TA-Lib
@@ -291,6 +305,13 @@ class MeanReversionStrategy(BaseStrategy):
             logger.error(f"Ошибка принятия решения mean reversion: {e}")
             return TradingSignal('WAIT', 0, 0, reason=f'Ошибка решения: {e}')
     
+    @staticmethod
+    def _ta_bollinger(df: pd.DataFrame, window: int, window_dev: float) -> tuple:
+        """Верхняя, нижняя, средняя полосы и %B - тот же расчет 'ta_bbands', что в MultiIndicatorStrategy"""
+        bb_indicator = BollingerBands(df['close'], window=window, window_dev=window_dev)
+        return (bb_indicator.bollinger_hband(), bb_indicator.bollinger_lband(),
+                bb_indicator.bollinger_mavg(), bb_indicator.bollinger_pband())
+    
     # Вспомогательные методы для расчетов без TA-Lib
     def _calculate_rsi(self, prices, period=14):
         """RSI без TA-Lib"""
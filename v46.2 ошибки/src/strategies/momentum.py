@@ -118,9 +118,15 @@ class MomentumStrategy(BaseStrategy):
                 
             # === MOVING AVERAGES ===
             if TA_AVAILABLE and len(df) > self.ema_slow:
-                ema_fast = EMAIndicator(close=df['close'], window=self.ema_fast).ema_indicator()
+                ema_fast = self.cached_indicator(
+                    df, 'ta_ema', lambda: EMAIndicator(close=df['close'], window=self.ema_fast).ema_indicator(),
+                    window=self.ema_fast
+                )
                 indicators['ema_fast'] = ema_fast.iloc[-1]
-                ema_slow = EMAIndicator(close=df['close'], window=self.ema_slow).ema_indicator()
+                ema_slow = self.cached_indicator(
+                    df, 'ta_ema', lambda: EMAIndicator(close=df['close'], window=self.ema_slow).ema_indicator(),
+                    window=self.ema_slow
+                )
                 indicators['ema_slow'] = ema_slow.iloc[-1]
             else:
                 indicators['ema_fast'] = df['close'].ewm(span=self.ema_fast, adjust=False).mean().iloc[-1]
@@ -130,7 +136,10 @@ class MomentumStrategy(BaseStrategy):
             
             # === RSI ===
             if TA_AVAILABLE and len(df) > self.rsi_period:
-                rsi = RSIIndicator(close=df['close'], window=self.rsi_period).rsi()
+                rsi = self.cached_indicator(
+                    df, 'ta_rsi', lambda: RSIIndicator(close=df['close'], window=self.rsi_period).rsi(),
+                    window=self.rsi_period
+                )
                 indicators['rsi'] = rsi.iloc[-1]
             else:
                 delta = df['close'].diff()
@@ -145,7 +154,10 @@ class MomentumStrategy(BaseStrategy):
 
             # === ROC (Rate of Change) ===
             if TA_AVAILABLE and len(df) > self.roc_period:
-                roc = ROCIndicator(close=df['close'], window=self.roc_period).roc()
+                roc = self.cached_indicator(
+                    df, 'ta_roc', lambda: ROCIndicator(close=df['close'], window=self.roc_period).roc(),
+                    window=self.roc_period
+                )
                 indicators['roc'] = roc.iloc[-1]
             else:
                 if len(df) > self.roc_period:
@@ -157,7 +169,11 @@ class MomentumStrategy(BaseStrategy):
                     
             # === ATR для расчета уровней ===
             if TA_AVAILABLE and len(df) > 14:
-                atr = AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=14).average_true_range()
+                atr = self.cached_indicator(
+                    df, 'ta_atr',
+                    lambda: AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=14).average_true_range(),
+                    window=14
+                )
                 indicators['atr'] = atr.iloc[-1]
             else:
                 high_low = df['high'] - df['low']
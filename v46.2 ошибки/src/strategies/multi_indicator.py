@@ -153,9 +153,13 @@ class MultiIndicatorStrategy(BaseStrategy):
     def _calculate_rsi_safely(self, df: pd.DataFrame, indicators: Dict):
         """✅ НОВЫЙ: Безопасный расчет RSI"""
         try:
-            if len(df) >= 14:
-                rsi_indicator = RSIIndicator(df['close'], window=14)
-                rsi_values = rsi_indicator.rsi()
+            stream_rsi = self.stream_indicator(df, 'rsi')
+            if stream_rsi is not None:
+                indicators['rsi'] = stream_rsi
+            elif len(df) >= 14:
+                rsi_values = self.cached_indicator(
+                    df, 'ta_rsi', lambda: RSIIndicator(df['close'], window=14).rsi(), window=14
+                )
                 indicators['rsi'] = rsi_values.iloc[-1] if not rsi_values.empty else 50.0
             else:
                 indicators['rsi'] = 50.0
@@ -166,11 +170,13 @@ class MultiIndicatorStrategy(BaseStrategy):
     def _calculate_macd_safely(self, df: pd.DataFrame, indicators: Dict):
         """✅ НОВЫЙ: Безопасный расчет MACD"""
         try:
-            if len(df) >= 26:
-                macd_indicator = MACD(df['close'])
-                macd_line = macd_indicator.macd()
-                macd_signal_line = macd_indicator.macd_signal()
-                macd_diff = macd_indicator.macd_diff()
+            stream_macd = [self.stream_indicator(df, name) for name in ('macd_macd', 'macd_signal', 'macd_histogram')]
+            if None not in stream_macd:
+                indicators['macd'], indicators['macd_signal'], indicators['macd_diff'] = stream_macd
+            elif len(df) >= 26:
+                macd_line, macd_signal_line, macd_diff = self.cached_indicator(
+                    df, 'ta_macd', lambda: self._ta_macd(df), fast=12, slow=26, signal=9
+                )
                 
                 indicators['macd'] = macd_line.iloc[-1] if not macd_line.empty else 0.0
                 indicators['macd_signal'] = macd_signal_line.iloc[-1] if not macd_signal_line.empty else 0.0
@@ -188,12 +194,20 @@ class MultiIndicatorStrategy(BaseStrategy):
     def _calculate_bollinger_safely(self, df: pd.DataFrame, indicators: Dict):
         """✅ НОВЫЙ: Безопасный расчет Bollinger Bands"""
         try:
-            if len(df) >= 20:
-                bb_indicator = BollingerBands(df['close'], window=20, window_dev=2)
-                bb_upper = bb_indicator.bollinger_hband()
-                bb_lower = bb_indicator.bollinger_lband()
-                bb_middle = bb_indicator.bollinger_mavg()
-                bb_percent = bb_indicator.bollinger_pband()
+            stream_bb = [self.stream_indicator(df, name) for name in ('bb_upper', 'bb_lower', 'bb_middle')]
+            if None not in stream_bb:
+                upper, lower, middle = stream_bb
+                indicators['bb_upper'] = upper
+                indicators['bb_lower'] = lower
+                indicators['bb_middle'] = middle
+                # Как BollingerBands.bollinger_pband()
+                indicators['bb_percent'] = (
+                    (indicators['current_price'] - lower) / (upper - lower) if upper != lower else 0.5
+                )
+            elif len(df) >= 20:
+                bb_upper, bb_lower, bb_middle, bb_percent = self.cached_indicator(
+                    df, 'ta_bbands', lambda: self._ta_bollinger(df), window=20, window_dev=2
+                )
                 
                 indicators['bb_upper'] = bb_upper.iloc[-1] if not bb_upper.empty else indicators['current_price'] * 1.02
                 indicators['bb_lower'] = bb_lower.iloc[-1] if not bb_lower.empty else indicators['current_price'] * 0.98
@@ -216,9 +230,15 @@ class MultiIndicatorStrategy(BaseStrategy):
     def _calculate_atr_safely(self, df: pd.DataFrame, indicators: Dict):
         """✅ НОВЫЙ: Безопасный расчет ATR"""
         try:
-            if len(df) >= 14:
-                atr_indicator = AverageTrueRange(df['high'], df['low'], df['close'], window=14)
-                atr_values = atr_indicator.average_true_range()
+            stream_atr = self.stream_indicator(df, 'atr')
+            if stream_atr is not None:
+                indicators['atr'] = stream_atr
+            elif len(df) >= 14:
+                atr_values = self.cached_indicator(
+                    df, 'ta_atr',
+                    lambda: AverageTrueRange(df['high'], df['low'], df['close'], window=14).average_true_range(),
+                    window=14
+                )
                 indicators['atr'] = atr_values.iloc[-1] if not atr_values.empty else indicators['current_price'] * 0.02
             else:
                 indicators['atr'] = indicators['current_price'] * 0.02  # 2% от цены
@@ -277,9 +297,15 @@ class MultiIndicatorStrategy(BaseStrategy):
                 periods = [9, min(21, data_length - 1)]
             
             for period in periods:
-                if data_length > period:
-                    ema = EMAIndicator(df['close'], window=period)
-                    indicators[f'ema_{period}'] = float(ema.ema_indicator().iloc[-1])
+                stream_ema = self.stream_indicator(df, f'ema_{period}')
+                if stream_ema is not None:
+                    indicators[f'ema_{period}'] = stream_ema
+                elif data_length > period:
+                    ema = self.cached_indicator(
+                        df, 'ta_ema', lambda: EMAIndicator(df['close'], window=period).ema_indicator(),
+                        window=period
+                    )
+                    indicators[f'ema_{period}'] = float(ema.iloc[-1])
                 else:
                     # Если недостаточно данных, используем простое среднее
                     indicators[f'ema_{period}'] = float(df['close'].tail(min(period, data_length)).mean())
@@ -298,13 +324,14 @@ class MultiIndicatorStrategy(BaseStrategy):
             
             # ADX требует минимум 14 периодов для расчета + еще данные для сглаживания
             # Увеличиваем минимальное требование до 30 периодов для надежности
-            if data_length >= 30:
-                adx_indicator = ADXIndicator(df['high'], df['low'], df['close'], window=14)
-                
+            stream_adx = [self.stream_indicator(df, name) for name in ('adx_adx', 'adx_plus_di', 'adx_minus_di')]
+            if data_length >= 30 and None not in stream_adx:
+                indicators['adx'], indicators['adx_pos'], indicators['adx_neg'] = stream_adx
+            elif data_length >= 30:
                 # Получаем значения индикаторов
-                adx_values = adx_indicator.adx()
-                adx_pos_values = adx_indicator.adx_pos()
-                adx_neg_values = adx_indicator.adx_neg()
+                adx_values, adx_pos_values, adx_neg_values = self.cached_indicator(
+                    df, 'ta_adx', lambda: self._ta_adx(df), window=14
+                )
                 
                 # КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: Проверяем что результаты не пустые и имеют достаточно данных
                 if (not adx_values.empty and len(adx_values) > 0 and 
@@ -364,10 +391,13 @@ class MultiIndicatorStrategy(BaseStrategy):
     def _calculate_stochastic_safely(self, df: pd.DataFrame, indicators: Dict):
         """✅ НОВОЕ: Безопасный расчет Stochastic"""
         try:
-            if len(df) >= 14:  # Stochastic требует минимум 14 периодов
-                stoch = StochasticOscillator(df['high'], df['low'], df['close'])
-                stoch_k_values = stoch.stoch()
-                stoch_d_values = stoch.stoch_signal()
+            stream_stoch = [self.stream_indicator(df, name) for name in ('stoch_k', 'stoch_d')]
+            if None not in stream_stoch:
+                indicators['stoch_k'], indicators['stoch_d'] = stream_stoch
+            elif len(df) >= 14:  # Stochastic требует минимум 14 периодов
+                stoch_k_values, stoch_d_values = self.cached_indicator(
+                    df, 'ta_stoch', lambda: self._ta_stochastic(df), window=14, smooth_window=3
+                )
                 
                 indicators['stoch_k'] = stoch_k_values.iloc[-1] if not stoch_k_values.empty else 50.0
                 indicators['stoch_d'] = stoch_d_values.iloc[-1] if not stoch_d_values.empty else 50.0
@@ -379,6 +409,29 @@ class MultiIndicatorStrategy(BaseStrategy):
             indicators['stoch_k'] = 50.0
             indicators['stoch_d'] = 50.0
     
+    # Расчеты библиотекой ta, результаты которых кэшируются целиком
+
+    @staticmethod
+    def _ta_macd(df: pd.DataFrame) -> tuple:
+        macd_indicator = MACD(df['close'])
+        return macd_indicator.macd(), macd_indicator.macd_signal(), macd_indicator.macd_diff()
+
+    @staticmethod
+    def _ta_bollinger(df: pd.DataFrame) -> tuple:
+        bb_indicator = BollingerBands(df['close'], window=20, window_dev=2)
+        return (bb_indicator.bollinger_hband(), bb_indicator.bollinger_lband(),
+                bb_indicator.bollinger_mavg(), bb_indicator.bollinger_pband())
+
+    @staticmethod
+    def _ta_adx(df: pd.DataFrame) -> tuple:
+        adx_indicator = ADXIndicator(df['high'], df['low'], df['close'], window=14)
+        return adx_indicator.adx(), adx_indicator.adx_pos(), adx_indicator.adx_neg()
+
+    @staticmethod
+    def _ta_stochastic(df: pd.DataFrame) -> tuple:
+        stoch = StochasticOscillator(df['high'], df['low'], df['close'])
+        return stoch.stoch(), stoch.stoch_signal()
+
     def _analyze_signals(self, indicators: Dict, df: pd.DataFrame) -> Dict:
         """Анализ сигналов от каждого индикатора"""
         signals = {
@@ -2,12 +2,14 @@
 # ОПИСАНИЕ: Стратегия анализа биржевого стакана для детекции манипуляций и генерации торговых сигналов.
 # ИСПРАВЛЕНО: Унифицирована логика для работы как в автономном режиме, так и под управлением BotManager.
 # Добавлено получение exchange_client из глобального bot_manager для автономного режима.
+# Паттерны ищутся в живом L2-стакане (order_book_engine) после каждого обновления из потока,
+# снимки из БД - запасной вариант, когда потока нет.
 
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import asyncio
-import json
+import time
 from decimal import Decimal
 import numpy as np
 from sqlalchemy import and_, desc
@@ -20,12 +22,15 @@ except (ImportError, ModuleNotFoundError):
     # устанавливаем его в None, чтобы избежать падения.
     bot_manager = None
 
-from ..core.database import SessionLocal
+from ..core.async_database import run_db
 from ..core.models import (
     OrderBookSnapshot,
     Signal,
     SignalTypeEnum
 )
+from ..data.order_book import L2Book, disappeared_levels, order_book_engine
+from ..data.orderbook_codec import snapshot_arrays
+from .signal_bus import signal_bus
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +51,16 @@ class OrderBookAnalysisStrategy:
         self.imbalance_threshold = self.config.get('imbalance_threshold', 2.0)
         self.lookback_minutes = self.config.get('lookback_minutes', 30)
         self.min_signal_strength = self.config.get('min_signal_strength', 0.5)
+        self.absorption_window = self.config.get('absorption_window', 60)  # секунд истории живого стакана
+        self.live_max_age = self.config.get('live_max_age', 10)  # секунд, после которых стакан устарел
+        self.signal_cooldown = self.config.get('signal_cooldown', 60)  # секунд между одинаковыми сигналами
+
+        self._last_published: Dict[tuple, float] = {}
+        self.live_updates = 0
+        self.live_signals = 0
+
+        # Анализ после каждого обновления стакана (одна подписка на имя стратегии)
+        order_book_engine.add_listener(self.name, self._on_book_update)
 
         logger.info(f"Стратегия {self.name} инициализирована")
 
@@ -78,7 +93,6 @@ class OrderBookAnalysisStrategy:
     async def run(self):
         """Основной цикл анализа для автономного режима"""
         logger.debug(f"{self.name}: запуск автономного цикла анализа...")
-        db_session = SessionLocal()
         try:
             # ИСПРАВЛЕНИЕ: Получаем exchange_client из bot_manager
             if not bot_manager or not bot_manager.exchange_client:
@@ -86,7 +100,7 @@ class OrderBookAnalysisStrategy:
                 return
 
             exchange_client = bot_manager.exchange_client
-            symbols = await self._get_active_symbols(db_session)
+            symbols = await self._get_active_symbols()
 
             if not symbols:
                 logger.debug(f"В автономном цикле {self.name} не найдено активных символов для анализа.")
@@ -98,9 +112,6 @@ class OrderBookAnalysisStrategy:
 
         except Exception as e:
             logger.error(f"Ошибка в цикле run стратегии {self.name}: {e}")
-            db_session.rollback()
-        finally:
-            db_session.close()
 
     # --- Основной метод анализа, вызываемый из BotManager или автономного режима ---
     async def analyze(self, symbol: str, exchange_client=None) -> Optional[Dict]:
@@ -121,26 +132,17 @@ class OrderBookAnalysisStrategy:
             logger.warning(f"⚠️ В {self.name} не был передан exchange_client для анализа {symbol}")
             return None
 
-        db_session = SessionLocal()
         try:
-            # 1. Получаем снимки стакана из БД для анализа паттернов
-            snapshots = await self._get_order_book_snapshots(db_session, symbol)
-
-            # 2. Анализируем паттерны (стены, спуфинг и т.д.)
-            signal_data = None
-            if len(snapshots) > 1:
-                signal_data = await self._detect_walls(snapshots[-1])
-                if not signal_data:
-                    signal_data = await self._detect_spoofing(snapshots)
-                if not signal_data:
-                    signal_data = await self._detect_absorption(snapshots)
-                if not signal_data:
-                    signal_data = await self._detect_imbalance(snapshots[-1])
-
-            # 3. Если паттерн найден, сохраняем и возвращаем сигнал
+            book = order_book_engine.book(symbol)
+            if book is not None and book.age() < self.live_max_age:
+                signal_data = self._detect_live(book)
+            else:
+                signal_data = await self._detect_from_snapshots(symbol)
+
+            # Если паттерн найден, публикуем и возвращаем сигнал
             if signal_data and signal_data.get('strength', 0) > self.min_signal_strength:
-                await self._save_signal(db_session, signal_data)
-                db_session.commit()
+                if self._should_publish(signal_data):
+                    await self._save_signal(signal_data)
                 
                 logger.info(f"✅ {self.name}: найден сигнал {signal_data['signal_type'].name} для {symbol} (уверенность: {signal_data['strength']:.2f})")
                 
@@ -157,12 +159,68 @@ class OrderBookAnalysisStrategy:
 
         except Exception as e:
             logger.error(f"❌ Ошибка анализа {symbol} в стратегии {self.name}: {e}")
-            db_session.rollback()
-        finally:
-            db_session.close()
 
         return None
 
+    # --- Анализ живого стакана ---
+
+    def _on_book_update(self, book: L2Book):
+        """Вызывается order_book_engine после каждого обновления стакана"""
+        self.live_updates += 1
+        signal_data = self._detect_live(book)
+        if signal_data and signal_data['strength'] > self.min_signal_strength and self._should_publish(signal_data):
+            self.live_signals += 1
+            self._publish_signal(signal_data)
+
+    def _should_publish(self, signal_data: Dict) -> bool:
+        """Паттерн держится много обновлений подряд - одинаковый сигнал не чаще signal_cooldown"""
+        key = (signal_data['symbol'], signal_data['strategy'], signal_data['signal_type'])
+        now = time.monotonic()
+        if now - self._last_published.get(key, float('-inf')) < self.signal_cooldown:
+            return False
+        self._last_published[key] = now
+        return True
+
+    def _detect_live(self, book: L2Book) -> Optional[Dict]:
+        """Стены, спуфинг, абсорбция и дисбаланс по массивам живого стакана"""
+        bid_volume, ask_volume = book.volumes()
+        return (
+            self._detect_walls(book)
+            or self._detect_spoofing(
+                book.symbol,
+                book.recent_disappeared(self.spoofing_time_window),
+                bid_volume + ask_volume,
+                self.spoofing_time_window
+            )
+            or self._detect_absorption(book.symbol, book.history(self.absorption_window)[:, 1:3])
+            or self._detect_imbalance(book.symbol, bid_volume, ask_volume)
+        )
+
+    async def _detect_from_snapshots(self, symbol: str) -> Optional[Dict]:
+        """Запасной вариант без потока: паттерны по снимкам стакана из БД"""
+        snapshots = await self._get_order_book_snapshots(symbol)
+        if len(snapshots) < 2:
+            return None
+
+        prev, curr = snapshots[-2], snapshots[-1]
+        prev_book, curr_book = (
+            L2Book.from_arrays(s.symbol, *snapshot_arrays(s)) for s in (prev, curr)
+        )
+        volumes = np.array([[float(s.bid_volume or 0), float(s.ask_volume or 0)] for s in snapshots])
+
+        signal_data = self._detect_walls(curr_book)
+        if not signal_data:
+            time_diff = (curr.timestamp - prev.timestamp).total_seconds()
+            if time_diff <= self.spoofing_time_window:
+                signal_data = self._detect_spoofing(
+                    symbol, disappeared_levels(prev_book, curr_book), float(volumes[-2].sum()), time_diff
+                )
+        if not signal_data:
+            signal_data = self._detect_absorption(symbol, volumes)
+        if not signal_data:
+            signal_data = self._detect_imbalance(symbol, float(volumes[-1, 0]), float(volumes[-1, 1]))
+        return signal_data
+
     # --- Вспомогательные методы ---
 
     async def _get_orderbook_safely(self, symbol: str, exchange_client) -> Optional[Dict]:
@@ -181,106 +239,62 @@ class OrderBookAnalysisStrategy:
             logger.debug(f"Не удалось получить стакан для {symbol}: {e}")
             return None
 
-    async def _detect_walls(self, snapshot: OrderBookSnapshot) -> Optional[Dict]:
+    def _detect_walls(self, book: L2Book) -> Optional[Dict]:
         """Детекция стен в стакане"""
         try:
-            bids = json.loads(snapshot.bids) if snapshot.bids else []
-            asks = json.loads(snapshot.asks) if snapshot.asks else []
-            total_bid_volume = sum(float(bid[1]) for bid in bids)
-            total_ask_volume = sum(float(ask[1]) for ask in asks)
-            total_volume = total_bid_volume + total_ask_volume
-            if total_volume == 0: return None
-
-            for i, bid in enumerate(bids[:10]):
-                bid_size = float(bid[1])
-                if (bid_size / total_volume) * 100 > self.wall_threshold:
-                    return { 'symbol': snapshot.symbol, 'signal_type': SignalTypeEnum.SELL, 'strength': min(1.0, bid_size / total_volume), 'strategy': 'order_book_walls', 'metadata': { 'wall_type': 'bid', 'wall_price': float(bid[0]), 'wall_size': bid_size, 'wall_percentage': (bid_size / total_volume) * 100, 'level': i + 1 } }
-
-            for i, ask in enumerate(asks[:10]):
-                ask_size = float(ask[1])
-                if (ask_size / total_volume) * 100 > self.wall_threshold:
-                    return { 'symbol': snapshot.symbol, 'signal_type': SignalTypeEnum.BUY, 'strength': min(1.0, ask_size / total_volume), 'strategy': 'order_book_walls', 'metadata': { 'wall_type': 'ask', 'wall_price': float(ask[0]), 'wall_size': ask_size, 'wall_percentage': (ask_size / total_volume) * 100, 'level': i + 1 } }
+            walls = book.walls(self.wall_threshold)
+            if not walls:
+                return None
+            wall = walls[0]
+            # Стена на покупку сдерживает рост (SELL), на продажу - падение (BUY)
+            signal_type = SignalTypeEnum.SELL if wall['side'] == 'bid' else SignalTypeEnum.BUY
+            return { 'symbol': book.symbol, 'signal_type': signal_type, 'strength': min(1.0, wall['percentage'] / 100), 'strategy': 'order_book_walls', 'metadata': { 'wall_type': wall['side'], 'wall_price': wall['price'], 'wall_size': wall['size'], 'wall_percentage': wall['percentage'], 'level': wall['level'] } }
         except Exception as e:
             logger.error(f"Ошибка при детекции стен: {e}")
         return None
 
-    async def _detect_spoofing(self, snapshots: List[OrderBookSnapshot]) -> Optional[Dict]:
+    def _detect_spoofing(self, symbol: str, disappeared_orders: List[Dict], reference_volume: float,
+                         time_diff: float) -> Optional[Dict]:
         """Детекция спуфинга - появление и исчезновение крупных ордеров"""
         try:
-            if len(snapshots) < 2: return None
-            prev_snapshot, curr_snapshot = snapshots[-2], snapshots[-1]
-            time_diff = (curr_snapshot.timestamp - prev_snapshot.timestamp).total_seconds()
-            if time_diff > self.spoofing_time_window: return None
-
-            prev_orders = {'bids': json.loads(prev_snapshot.bids), 'asks': json.loads(prev_snapshot.asks)}
-            curr_orders = {'bids': json.loads(curr_snapshot.bids), 'asks': json.loads(curr_snapshot.asks)}
-            disappeared_orders = self._find_disappeared_orders(prev_orders, curr_orders)
-
-            if disappeared_orders:
-                total_disappeared_volume = sum(order['volume'] for order in disappeared_orders)
-                bid_disappeared = sum(order['volume'] for order in disappeared_orders if order['side'] == 'bid')
-                ask_disappeared = sum(order['volume'] for order in disappeared_orders if order['side'] == 'ask')
-                signal_type = SignalTypeEnum.SELL if bid_disappeared > ask_disappeared else SignalTypeEnum.BUY
-                strength = min(1.0, total_disappeared_volume / (float(prev_snapshot.bid_volume) + float(prev_snapshot.ask_volume)))
-                return { 'symbol': curr_snapshot.symbol, 'signal_type': signal_type, 'strength': strength, 'strategy': 'order_book_spoofing', 'metadata': { 'disappeared_orders': len(disappeared_orders), 'disappeared_volume': total_disappeared_volume, 'bid_disappeared': bid_disappeared, 'ask_disappeared': ask_disappeared, 'time_diff_seconds': time_diff } }
+            if not disappeared_orders or reference_volume <= 0: return None
+            total_disappeared_volume = sum(order['volume'] for order in disappeared_orders)
+            bid_disappeared = sum(order['volume'] for order in disappeared_orders if order['side'] == 'bid')
+            ask_disappeared = sum(order['volume'] for order in disappeared_orders if order['side'] == 'ask')
+            signal_type = SignalTypeEnum.SELL if bid_disappeared > ask_disappeared else SignalTypeEnum.BUY
+            strength = min(1.0, total_disappeared_volume / reference_volume)
+            return { 'symbol': symbol, 'signal_type': signal_type, 'strength': strength, 'strategy': 'order_book_spoofing', 'metadata': { 'disappeared_orders': len(disappeared_orders), 'disappeared_volume': total_disappeared_volume, 'bid_disappeared': bid_disappeared, 'ask_disappeared': ask_disappeared, 'time_diff_seconds': time_diff } }
         except Exception as e:
             logger.error(f"Ошибка при детекции спуфинга: {e}")
         return None
 
-    def _find_disappeared_orders(self, prev: Dict, curr: Dict) -> List[Dict]:
-        """Поиск исчезнувших крупных ордеров, работая со списками."""
-        disappeared = []
-        prev_bids, prev_asks = prev.get('bids', []), prev.get('asks', [])
-        curr_bids_prices = {float(b[0]) for b in curr.get('bids', [])}
-        curr_asks_prices = {float(a[0]) for a in curr.get('asks', [])}
-        prev_total_volume = sum(float(b[1]) for b in prev_bids) + sum(float(a[1]) for a in prev_asks)
-        if prev_total_volume == 0: return []
-        volume_threshold = prev_total_volume * 0.01
-
-        for prev_bid in prev_bids[:10]:
-            price, volume = float(prev_bid[0]), float(prev_bid[1])
-            if volume > volume_threshold and price not in curr_bids_prices:
-                disappeared.append({'side': 'bid', 'price': price, 'volume': volume})
-        for prev_ask in prev_asks[:10]:
-            price, volume = float(prev_ask[0]), float(prev_ask[1])
-            if volume > volume_threshold and price not in curr_asks_prices:
-                disappeared.append({'side': 'ask', 'price': price, 'volume': volume})
-        return disappeared
-
-    async def _detect_absorption(self, snapshots: List[OrderBookSnapshot]) -> Optional[Dict]:
-        """Детекция абсорбции - поглощение крупных ордеров"""
+    def _detect_absorption(self, symbol: str, volumes: np.ndarray) -> Optional[Dict]:
+        """Детекция абсорбции - поглощение крупных ордеров (volumes: строки объемов bids, asks по времени)"""
         try:
-            if len(snapshots) < 3: return None
-            volume_changes = []
-            for i in range(1, len(snapshots)):
-                prev, curr = snapshots[i-1], snapshots[i]
-                bid_change = float(curr.bid_volume) - float(prev.bid_volume)
-                ask_change = float(curr.ask_volume) - float(prev.ask_volume)
-                volume_changes.append({'bid_change': bid_change, 'ask_change': ask_change, 'total_change': abs(bid_change) + abs(ask_change)})
-
-            avg_change = np.mean([v['total_change'] for v in volume_changes])
-            last_change = volume_changes[-1]
-            if avg_change > 0 and last_change['total_change'] > avg_change * self.absorption_volume_ratio:
-                if last_change['bid_change'] < 0 and abs(last_change['bid_change']) > abs(last_change['ask_change']):
+            if len(volumes) < 3: return None
+            changes = np.diff(volumes, axis=0)
+            total_changes = np.abs(changes).sum(axis=1)
+            avg_change = float(total_changes.mean())
+            bid_change, ask_change = float(changes[-1, 0]), float(changes[-1, 1])
+            last_change = float(total_changes[-1])
+            if avg_change > 0 and last_change > avg_change * self.absorption_volume_ratio:
+                if bid_change < 0 and abs(bid_change) > abs(ask_change):
                     signal_type = SignalTypeEnum.SELL
-                elif last_change['ask_change'] < 0 and abs(last_change['ask_change']) > abs(last_change['bid_change']):
+                elif ask_change < 0 and abs(ask_change) > abs(bid_change):
                     signal_type = SignalTypeEnum.BUY
                 else:
                     return None
-                strength = min(1.0, last_change['total_change'] / (avg_change * self.absorption_volume_ratio))
-                return { 'symbol': snapshots[-1].symbol, 'signal_type': signal_type, 'strength': strength, 'strategy': 'order_book_absorption', 'metadata': { 'bid_volume_change': last_change['bid_change'], 'ask_volume_change': last_change['ask_change'], 'avg_volume_change': avg_change, 'absorption_ratio': last_change['total_change'] / avg_change } }
+                strength = min(1.0, last_change / (avg_change * self.absorption_volume_ratio))
+                return { 'symbol': symbol, 'signal_type': signal_type, 'strength': strength, 'strategy': 'order_book_absorption', 'metadata': { 'bid_volume_change': bid_change, 'ask_volume_change': ask_change, 'avg_volume_change': avg_change, 'absorption_ratio': last_change / avg_change } }
         except Exception as e:
             logger.error(f"Ошибка при детекции абсорбции: {e}")
         return None
 
-    async def _detect_imbalance(self, snapshot: OrderBookSnapshot) -> Optional[Dict]:
+    def _detect_imbalance(self, symbol: str, bid_volume: float, ask_volume: float) -> Optional[Dict]:
         """Детекция дисбаланса bid/ask"""
         try:
-            if snapshot.bid_volume is None or snapshot.ask_volume is None: return None
-            bid_volume_float = float(snapshot.bid_volume)
-            ask_volume_float = float(snapshot.ask_volume)
-            if ask_volume_float == 0: return None
-            bid_ask_ratio = bid_volume_float / ask_volume_float
+            if ask_volume == 0: return None
+            bid_ask_ratio = bid_volume / ask_volume
 
             if bid_ask_ratio > self.imbalance_threshold:
                 signal_type = SignalTypeEnum.BUY
@@ -290,33 +304,44 @@ class OrderBookAnalysisStrategy:
                 strength = min(1.0, (1 - bid_ask_ratio) / (1 - 1/self.imbalance_threshold))
             else:
                 return None
-            return { 'symbol': snapshot.symbol, 'signal_type': signal_type, 'strength': strength, 'strategy': 'order_book_imbalance', 'metadata': { 'bid_volume': float(snapshot.bid_volume), 'ask_volume': float(snapshot.ask_volume), 'bid_ask_ratio': bid_ask_ratio, 'imbalance_threshold': self.imbalance_threshold } }
+            return { 'symbol': symbol, 'signal_type': signal_type, 'strength': strength, 'strategy': 'order_book_imbalance', 'metadata': { 'bid_volume': bid_volume, 'ask_volume': ask_volume, 'bid_ask_ratio': bid_ask_ratio, 'imbalance_threshold': self.imbalance_threshold } }
         except Exception as e:
             logger.error(f"Ошибка при детекции дисбаланса: {e}")
         return None
 
-    async def _get_active_symbols(self, db_session) -> List[str]:
+    async def _get_active_symbols(self) -> List[str]:
         """Получение списка активных символов"""
-        try:
-            cutoff_time = datetime.utcnow() - timedelta(hours=1)
+        cutoff_time = datetime.utcnow() - timedelta(hours=1)
+
+        def query(db_session):
             symbols = db_session.query(OrderBookSnapshot.symbol).filter(OrderBookSnapshot.timestamp > cutoff_time).distinct().all()
             return [symbol[0] for symbol in symbols]
+
+        try:
+            return await run_db(query)
         except Exception as e:
             logger.error(f"Ошибка при получении активных символов: {e}")
             return []
 
-    async def _get_order_book_snapshots(self, db_session, symbol: str) -> List[OrderBookSnapshot]:
-        """Получение снимков стакана"""
+    async def _get_order_book_snapshots(self, symbol: str) -> List[OrderBookSnapshot]:
+        """Последние снимки стакана за lookback_minutes (по возрастанию времени)"""
+        cutoff_time = datetime.utcnow() - timedelta(minutes=self.lookback_minutes)
+
+        def query(db_session):
+            snapshots = db_session.query(OrderBookSnapshot).filter(and_(OrderBookSnapshot.symbol == symbol, OrderBookSnapshot.timestamp > cutoff_time)).order_by(OrderBookSnapshot.timestamp.desc()).limit(20).all()
+            return snapshots[::-1]
+
         try:
-            cutoff_time = datetime.utcnow() - timedelta(minutes=self.lookback_minutes)
-            snapshots = db_session.query(OrderBookSnapshot).filter(and_(OrderBookSnapshot.symbol == symbol, OrderBookSnapshot.timestamp > cutoff_time)).order_by(OrderBookSnapshot.timestamp.asc()).limit(20).all()
-            return list(snapshots)
+            return await run_db(query)
         except Exception as e:
             logger.error(f"Ошибка при получении снимков стакана: {e}")
             return []
 
-    async def _save_signal(self, db_session, signal: Dict):
-        """Сохранение сигнала в БД"""
+    async def _save_signal(self, signal: Dict):
+        """Публикация сигнала в шину сигналов (в БД пишет шина)"""
+        self._publish_signal(signal)
+
+    def _publish_signal(self, signal: Dict):
         try:
             action_map = { SignalTypeEnum.BUY: 'BUY', SignalTypeEnum.SELL: 'SELL', SignalTypeEnum.NEUTRAL: 'HOLD' }
             def convert_decimals(obj):
@@ -334,9 +359,14 @@ class OrderBookAnalysisStrategy:
                 reason=f"OrderBook: {signal['strategy']}",
                 indicators=convert_decimals(signal.get('metadata', {}))
             )
-            db_session.add(new_signal)
-            logger.debug(f"Подготовлен к сохранению сигнал {new_signal.action} для {new_signal.symbol} от стратегии {new_signal.strategy}")
+            signal_bus.publish(new_signal)
+            logger.debug(f"Опубликован сигнал {new_signal.action} для {new_signal.symbol} от стратегии {new_signal.strategy}")
         except Exception as e:
-            logger.error(f"Ошибка при подготовке сигнала к сохранению: {e}")
-            db_session.rollback()
+            logger.error(f"Ошибка при публикации сигнала: {e}")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'live_updates': self.live_updates,
+            'live_signals': self.live_signals,
+        }
 
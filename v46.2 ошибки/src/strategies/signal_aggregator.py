@@ -4,8 +4,10 @@
 Файл: src/strategies/signal_aggregator.py
 
 Функции:
-- Мониторинг новых сигналов от всех стратегий
-- Группировка сигналов по валютам
+- Получение сигналов стратегий из шины сигналов (signal_bus.py) в момент публикации
+- Группировка сигналов по валютам в скользящем окне
+- Одна запись aggregated_signals на символ за окно: пересчеты внутри окна
+  обновляют ее, а не добавляют почти одинаковые строки
 - Вычисление итогового сигнала и уверенности
 - Учет весов и приоритетов стратегий
 """
@@ -13,15 +15,16 @@
 import asyncio
 import logging
 from typing import Dict, List, Optional, Tuple, Any
-from datetime import datetime, timedelta
+from datetime import datetime
 from dataclasses import dataclass, field
 from enum import Enum
 import json
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, deque
+import time
 
 # ИСПРАВЛЕНО: Правильные импорты из core.models
-from ..core.database import SessionLocal
+from ..core.async_database import run_db
 from ..core.models import (
     Signal as SignalExtended,  # Используем алиас из models.py
     SignalTypeEnum as SignalType,  # Правильное имя enum
@@ -29,9 +32,20 @@ from ..core.models import (
     FinalSignalTypeEnum as FinalSignalType  # Правильное имя enum
 )
 from ..core.unified_config import unified_config as config
+from .signal_bus import signal_bus
 
 logger = logging.getLogger(__name__)
 
+# Как часто агрегированные сигналы пишутся в БД (секунд)
+FLUSH_INTERVAL = 1.0
+
+# Поля aggregated_signals, обновляемые при пересчете внутри окна
+_UPSERT_COLUMNS = (
+    'final_signal', 'confidence_score', 'contributing_signals',
+    'buy_signals_count', 'sell_signals_count', 'neutral_signals_count',
+    'details', 'updated_at',
+)
+
 @dataclass
 class StrategyWeight:
     """Вес и параметры стратегии"""
@@ -90,102 +104,139 @@ class SignalAggregator:
         )
     }
     
-    def __init__(self, aggregation_window: int = 60):
+    def __init__(self, aggregation_window: int = 60, bus=None):
         """
         Инициализация агрегатора
         
         Args:
             aggregation_window: Окно агрегации в секундах
+            bus: Шина сигналов (по умолчанию общая signal_bus)
         """
         self.aggregation_window = aggregation_window
+        self.bus = bus or signal_bus
         self.is_running = False
-        self.db = None
-        self.processed_signals = set()  # Кэш обработанных сигналов
-        self.last_cleanup = datetime.utcnow()
+        self._queue: Optional[asyncio.Queue] = None
+        
+        # Скользящее окно сигналов по символам: (время получения, сигнал)
+        self.windows: Dict[str, deque] = defaultdict(deque)
+        # Последний агрегированный сигнал по символу
+        self.latest: Dict[str, Dict[str, Any]] = {}
+        # Последний пересчет по символу, еще не записанный в БД
+        self._pending_aggregated: Dict[str, AggregatedSignal] = {}
+        # Строка БД текущего окна символа: (id, time.monotonic() вставки)
+        self._window_rows: Dict[str, Tuple[int, float]] = {}
+        self._last_flush = 0.0
+        
+        self.aggregated_count = 0
+        self.last_latency_ms = 0.0
         
         logger.info(f"SignalAggregator инициализирован (окно={aggregation_window}с)")
     
+    def _ensure_subscribed(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = self.bus.subscribe()
+        return self._queue
+    
     async def start(self):
-        """Запуск агрегатора"""
+        """Запуск агрегатора: обработка сигналов сразу после публикации"""
         logger.info("🚀 Запуск SignalAggregator")
         self.is_running = True
+        queue = self._ensure_subscribed()
         
         try:
             while self.is_running:
-                await self.run()
-                await asyncio.sleep(10)  # Проверка каждые 10 секунд
+                # Ждем первый сигнал, затем забираем все, что уже накопилось
+                try:
+                    envelope = await asyncio.wait_for(queue.get(), timeout=FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    await self._flush_aggregated()
+                    continue
+                envelopes = [envelope]
+                while not queue.empty():
+                    envelopes.append(queue.get_nowait())
+                # None - сигнал остановки от stop()
+                stopping = None in envelopes
+                envelopes = [item for item in envelopes if item is not None]
+                if envelopes:
+                    await self._consume(envelopes)
+                if stopping:
+                    break
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"Ошибка в основном цикле агрегатора: {e}")
         finally:
             self.is_running = False
+            await self._flush_aggregated(force=True)
     
     async def stop(self):
         """Остановка агрегатора"""
         logger.info("🛑 Остановка SignalAggregator")
         self.is_running = False
+        if self._queue is not None:
+            self.bus.unsubscribe(self._queue)
+            # Будим start(), ожидающий queue.get()
+            try:
+                self._queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+            self._queue = None
+        await self._flush_aggregated(force=True)
     
     async def run(self):
-        """Основной цикл агрегации"""
+        """Однократная обработка сигналов, накопившихся в шине"""
+        queue = self._ensure_subscribed()
+        envelopes = []
+        while not queue.empty():
+            envelope = queue.get_nowait()
+            if envelope is not None:
+                envelopes.append(envelope)
+        if envelopes:
+            await self._consume(envelopes)
+        await self._flush_aggregated(force=True)
+    
+    async def _consume(self, envelopes: List[Tuple[float, SignalExtended]]):
+        """Добавление сигналов в окна и пересчет затронутых символов"""
         try:
-            self.db = SessionLocal()
-            
-            # Получаем новые сигналы
-            new_signals = await self._get_new_signals()
-            
-            if not new_signals:
-                return
+            now = time.monotonic()
+            touched = set()
+            for received_at, signal in envelopes:
+                self.windows[signal.symbol].append((received_at, signal))
+                touched.add(signal.symbol)
             
-            logger.info(f"📊 Найдено {len(new_signals)} новых сигналов для агрегации")
+            oldest = min(received_at for received_at, _ in envelopes)
             
-            # Группируем по символам
-            signal_groups = self._group_signals_by_symbol(new_signals)
-            
-            # Обрабатываем каждую группу
-            for symbol, group in signal_groups.items():
-                aggregated = await self._process_signal_group(group)
+            for symbol in touched:
+                group = self._window_group(symbol, now)
+                if group is None:
+                    continue
                 
+                aggregated = await self._process_signal_group(group)
                 if aggregated:
                     self._save_aggregated_signal(aggregated, group)
+                    self.latest[symbol] = aggregated
+                    self.aggregated_count += 1
                     logger.info(
                         f"✅ Агрегирован сигнал для {symbol}: "
                         f"{aggregated['final_signal_type']} "
                         f"(confidence={aggregated['confidence']:.2%})"
                     )
             
-            # Добавляем обработанные сигналы в кэш
-            for signal in new_signals:
-                self.processed_signals.add(signal.id)
-            
-            # Очищаем старые записи из кэша
-            self._cleanup_cache()
-            
-            self.db.commit()
+            self.last_latency_ms = (time.monotonic() - oldest) * 1000
+            await self._flush_aggregated()
             
         except Exception as e:
             logger.error(f"❌ Ошибка агрегации: {e}")
-            if self.db:
-                self.db.rollback()
-        finally:
-            if self.db:
-                self.db.close()
-                self.db = None
     
-    async def _get_new_signals(self) -> List[SignalExtended]:
-        """Получение новых сигналов для агрегации"""
-        try:
-            cutoff_time = datetime.utcnow() - timedelta(seconds=self.aggregation_window)
-            
-            # Получаем сигналы за последний период
-            signals = self.db.query(SignalExtended).filter(
-                SignalExtended.created_at > cutoff_time,
-                ~SignalExtended.id.in_(self.processed_signals) if self.processed_signals else True
-            ).all()
-            
-            return signals
-            
-        except Exception as e:
-            logger.error(f"Ошибка получения новых сигналов: {e}")
-            return []
+    def _window_group(self, symbol: str, now: float) -> Optional[SignalGroup]:
+        """Группа сигналов символа за последние aggregation_window секунд"""
+        window = self.windows[symbol]
+        while window and now - window[0][0] > self.aggregation_window:
+            window.popleft()
+        if not window:
+            del self.windows[symbol]
+            return None
+        return self._group_signals_by_symbol([signal for _, signal in window]).get(symbol)
     
     def _group_signals_by_symbol(self, signals: List[SignalExtended]) -> Dict[str, SignalGroup]:
         """Группировка сигналов по символам"""
@@ -427,34 +478,63 @@ class SignalAggregator:
                 updated_at=datetime.utcnow()
             )
             
-            self.db.add(aggregated_signal)
+            # В пачку попадает только последний пересчет символа
+            self._pending_aggregated[aggregated_data['symbol']] = aggregated_signal
             
         except Exception as e:
             logger.error(f"Ошибка сохранения агрегированного сигнала: {e}")
     
-    def _cleanup_cache(self):
-        """Очистка кэша обработанных сигналов"""
-        try:
-            # Очищаем кэш раз в час
-            if (datetime.utcnow() - self.last_cleanup).total_seconds() > 3600:
-                # Оставляем только сигналы за последние 2 часа
-                cutoff_time = datetime.utcnow() - timedelta(hours=2)
-                
-                # Получаем ID старых сигналов
-                old_signal_ids = set(
-                    self.db.query(SignalExtended.id).filter(
-                        SignalExtended.timestamp < cutoff_time
-                    ).all()
+    async def _flush_aggregated(self, force: bool = False):
+        """
+        Запись агрегированных сигналов в БД без блокировки event loop.
+
+        Не чаще раза в FLUSH_INTERVAL (кроме force). Если для символа уже есть
+        строка, вставленная в пределах aggregation_window, она обновляется.
+        """
+        if not self._pending_aggregated:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        batch, self._pending_aggregated = self._pending_aggregated, {}
+        
+        updates = {}
+        inserts = {}
+        for symbol, aggregated_signal in batch.items():
+            row = self._window_rows.get(symbol)
+            if row is not None and now - row[1] < self.aggregation_window:
+                updates[row[0]] = {
+                    column: getattr(aggregated_signal, column) for column in _UPSERT_COLUMNS
+                }
+            else:
+                inserts[symbol] = aggregated_signal
+        
+        def write(db):
+            for row_id, values in updates.items():
+                db.query(AggregatedSignal).filter(AggregatedSignal.id == row_id).update(
+                    values, synchronize_session=False
                 )
-                
-                # Удаляем из кэша
-                self.processed_signals -= old_signal_ids
-                
-                self.last_cleanup = datetime.utcnow()
-                logger.info(f"🧹 Очищен кэш сигналов, удалено {len(old_signal_ids)} записей")
-                
+            db.add_all(inserts.values())
+            db.flush()
+            return {symbol: signal.id for symbol, signal in inserts.items()}
+        
+        try:
+            row_ids = await run_db(write, commit=True)
+            for symbol, row_id in row_ids.items():
+                self._window_rows[symbol] = (row_id, now)
         except Exception as e:
-            logger.error(f"Ошибка очистки кэша: {e}")
+            logger.error(f"Ошибка сохранения агрегированных сигналов: {e}")
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'is_running': self.is_running,
+            'symbols_in_window': len(self.windows),
+            'signals_in_window': sum(len(w) for w in self.windows.values()),
+            'aggregated': self.aggregated_count,
+            'last_latency_ms': self.last_latency_ms,
+            'bus': self.bus.get_statistics(),
+        }
     
     def aggregate_signals_sync(self, symbol: str, strategies_data: List[Dict]) -> Dict:
         """Синхронная агрегация сигналов для матрицы"""
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Шина торговых сигналов (publish/subscribe в памяти)
+Файл: src/strategies/signal_bus.py
+
+Стратегии публикуют сигналы в шину, подписчики (SignalAggregator)
+получают их сразу через asyncio.Queue. Запись в таблицу signals -
+побочный эффект: фоновая задача пишет накопленные сигналы пачкой
+одним INSERT в отдельном потоке, не задерживая стратегии и агрегатор.
+Если пачка не записалась, строки пишутся по одной: некорректный сигнал
+отбрасывается (учитывается в rejected), остальные сохраняются.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.database import SessionLocal
+from ..core.models import Signal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_FLUSH_INTERVAL = 1.0  # секунд
+DEFAULT_BATCH_SIZE = 500
+
+# Поля таблицы signals, которые заполняют стратегии
+SIGNAL_COLUMNS = ('symbol', 'strategy', 'action', 'price', 'confidence', 'reason', 'indicators', 'created_at')
+
+
+def _signal_row(signal: Signal) -> Dict[str, Any]:
+    """Строка для пакетного INSERT (сам объект в сессию не попадает)"""
+    return {column: getattr(signal, column, None) for column in SIGNAL_COLUMNS}
+
+
+class SignalBus:
+    """
+    Шина сигналов.
+
+    Подписчик получает кортежи (время публикации time.monotonic(), Signal).
+    Объекты Signal не привязываются к сессии БД, поэтому их можно читать
+    в подписчиках после записи в БД.
+    """
+
+    def __init__(self, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._subscribers: List[asyncio.Queue] = []
+        self._pending: List[Signal] = []
+        self._writer: Optional[asyncio.Task] = None
+
+        self.published = 0
+        self.dropped = 0
+        self.persisted = 0
+        self.persist_errors = 0
+        self.rejected = 0
+
+    # === Публикация и подписка ===
+
+    def subscribe(self, maxsize: int = DEFAULT_QUEUE_SIZE) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def publish(self, signal: Signal):
+        """
+        Публикация сигнала без ожидания.
+        Вызывается из event loop бота; при переполнении очереди подписчика
+        сигнал для него теряется (учитывается в статистике), запись в БД - нет.
+        """
+        if signal.created_at is None:
+            signal.created_at = datetime.utcnow()
+        if signal.confidence is None:
+            signal.confidence = 0.0
+        envelope: Tuple[float, Signal] = (time.monotonic(), signal)
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(envelope)
+            except asyncio.QueueFull:
+                self.dropped += 1
+        self.published += 1
+        self._pending.append(signal)
+        self._ensure_writer()
+
+    # === Фоновая запись в БД ===
+
+    def _ensure_writer(self):
+        if self._writer is not None and not self._writer.done():
+            return
+        try:
+            self._writer = asyncio.get_running_loop().create_task(self._writer_loop())
+        except RuntimeError:
+            # Нет работающего event loop - пишем сразу
+            self._write_batch(self._take_pending())
+
+    async def _writer_loop(self):
+        try:
+            while self._pending:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        except asyncio.CancelledError:
+            await self.flush()
+            raise
+
+    def _take_pending(self) -> List[Signal]:
+        batch, self._pending = self._pending, []
+        return batch
+
+    async def flush(self):
+        """Запись накопленных сигналов в БД в отдельном потоке"""
+        batch = self._take_pending()
+        if batch:
+            await asyncio.to_thread(self._write_batch, batch)
+
+    def _write_batch(self, batch: List[Signal]):
+        if not batch:
+            return
+        rows = [_signal_row(signal) for signal in batch]
+        db = SessionLocal()
+        try:
+            for start in range(0, len(rows), self.batch_size):
+                db.execute(Signal.__table__.insert(), rows[start:start + self.batch_size])
+            db.commit()
+            self.persisted += len(rows)
+            logger.debug(f"💾 Записано {len(rows)} сигналов")
+        except Exception as e:
+            db.rollback()
+            self.persist_errors += 1
+            logger.warning(f"⚠️ Ошибка пакетной записи сигналов, запись по одному: {e}")
+            self._write_rows(db, rows)
+        finally:
+            db.close()
+
+    def _write_rows(self, db, rows: List[Dict[str, Any]]):
+        """Построчная запись после ошибки пачки: отбрасываются только плохие строки"""
+        written = 0
+        rejected = 0
+        for row in rows:
+            try:
+                db.execute(Signal.__table__.insert(), [row])
+                db.commit()
+                written += 1
+            except Exception as e:
+                db.rollback()
+                rejected += 1
+                logger.error(f"❌ Сигнал {row.get('strategy')}/{row.get('symbol')} отброшен: {e}")
+        self.persisted += written
+        self.rejected += rejected
+        if rejected:
+            logger.error(f"❌ Отброшено {rejected} из {len(rows)} сигналов пачки")
+
+    async def close(self):
+        """Остановка фоновой записи с дозаписью оставшихся сигналов"""
+        if self._writer is not None and not self._writer.done():
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'subscribers': len(self._subscribers),
+            'published': self.published,
+            'dropped': self.dropped,
+            'pending_writes': len(self._pending),
+            'persisted': self.persisted,
+            'persist_errors': self.persist_errors,
+            'rejected': self.rejected,
+            'queue_depth': [queue.qsize() for queue in self._subscribers],
+        }
+
+
+# Глобальная шина сигналов
+signal_bus = SignalBus()
@@ -5,6 +5,9 @@
 Логика: Обнаружение активов с низкой волатильностью, в которые 
 начинают "вливаться" аномальные объемы.
 
+Признаки (волатильность, Хёрст, VWAP, OFI) считаются для всех символов
+цикла одним проходом в RegimeFeatureEngine (src/data/regime_features.py).
+
 Файл: src/strategies/sleeping_giants.py
 """
 
@@ -15,7 +18,6 @@ from datetime import datetime, timedelta
 import logging
 from dataclasses import dataclass
 import asyncio
-from sqlalchemy import desc, and_
 import json
 
 # ИСПРАВЛЕНО: Правильные импорты из core.models
@@ -24,10 +26,10 @@ from ..core.database import SessionLocal
 from ..core.models import (
     Signal, 
     VolumeAnomaly, 
-    OrderBookSnapshot,
-    SignalTypeEnum,  # Правильное имя enum
-    MarketData  # Вместо Price используем MarketData
+    SignalTypeEnum  # Правильное имя enum
 )
+from ..data.regime_features import RegimeFeatureEngine, hurst_exponents
+from .signal_bus import signal_bus
 
 # Импорт базовой стратегии - проверим существование
 try:
@@ -76,30 +78,7 @@ class HurstCalculator:
         Returns:
             float: Показатель Хёрста
         """
-        if len(time_series) < max_lag * 2:
-            max_lag = len(time_series) // 2
-            
-        if max_lag <= min_lag:
-            return 0.5
-            
-        lags = range(min_lag, max_lag)
-        tau = []
-        
-        for lag in lags:
-            try:
-                tau.append(np.sqrt(np.std(np.subtract(time_series[lag:], time_series[:-lag]))))
-            except:
-                continue
-                
-        if not tau:
-            return 0.5
-            
-        # Линейная регрессия log(tau) от log(lag)
-        try:
-            poly = np.polyfit(np.log(list(lags)[:len(tau)]), np.log(tau), 1)
-            return poly[0] * 2.0
-        except:
-            return 0.5
+        return float(hurst_exponents(time_series, min_lag, max_lag)[0])
 
 
 class SleepingGiantsStrategy(BaseStrategy):
@@ -142,6 +121,15 @@ class SleepingGiantsStrategy(BaseStrategy):
         self.lookback_hours = 24
         self.volume_window = 6  # часов
         self.price_window = 100  # свечей
+        self.min_candles = 50
+        self.anomaly_max_age = timedelta(hours=1)
+        
+        self.features = RegimeFeatureEngine(
+            timeframe=getattr(config, 'SLEEPING_GIANTS_TIMEFRAME', '5m'),
+            lookback_hours=self.lookback_hours,
+            vwap_hours=self.volume_window,
+            max_lag=self.price_window
+        )
         
         logger.info(f"✅ {self.name} инициализирована (volatility_threshold={volatility_threshold})")
     
@@ -155,171 +143,71 @@ class SleepingGiantsStrategy(BaseStrategy):
         Returns:
             SleepingGiantSignal если найден сигнал, иначе None
         """
+        signals = await self.analyze_batch([symbol])
+        return signals[0] if signals else None
+    
+    async def analyze_batch(self, symbols: List[str]) -> List[SleepingGiantSignal]:
+        """
+        Анализ всех символов цикла: по одному запросу на аномалии, свечи и OFI
+        и один векторный расчет признаков
+        
+        Returns:
+            List[SleepingGiantSignal]: Опубликованные сигналы
+        """
+        signals = []
         try:
             with SessionLocal() as db:
-                # 1. Проверка волатильности
-                volatility = await self._calculate_volatility(db, symbol)
-                if volatility > self.volatility_threshold:
-                    return None
-                
-                # 2. Проверка аномалии объема
-                volume_anomaly = await self._check_volume_anomaly(db, symbol)
-                if not volume_anomaly or volume_anomaly.score < self.volume_anomaly_threshold:
-                    return None
-                
-                # 3. Расчет показателя Хёрста
-                prices = await self._get_price_series(db, symbol)
-                if len(prices) < 50:
-                    return None
-                    
-                hurst = HurstCalculator.calculate_hurst(prices)
+                # 1. Аномалии объема
+                anomaly_scores = self._get_volume_anomaly_scores(db, symbols)
+                candidates = [s for s, score in anomaly_scores.items() if score >= self.volume_anomaly_threshold]
+                if not candidates:
+                    return signals
                 
-                # 4. Расчет OFI (Order Flow Imbalance)
-                ofi_score = await self._calculate_ofi(db, symbol)
-                
-                # 5. Расчет отклонения от VWAP
-                vwap_deviation = await self._calculate_vwap_deviation(db, symbol)
-                
-                # 6. Генерация сигнала
+                # 2. Волатильность, Хёрст, OFI, отклонение от VWAP
+                features = self.features.compute(candidates, db)
+            
+            # 3. Низкая волатильность и достаточная история
+            quiet = features[
+                (features['volatility'] <= self.volatility_threshold)
+                & (features['candles'] >= self.min_candles)
+            ]
+            
+            # 4. Генерация и публикация сигналов
+            for symbol, row in quiet.iterrows():
                 signal = self._generate_signal(
                     symbol=symbol,
-                    volatility=volatility,
-                    volume_anomaly_score=volume_anomaly.score,
-                    hurst=hurst,
-                    ofi_score=ofi_score,
-                    vwap_deviation=vwap_deviation
+                    price=float(row['price']),
+                    volatility=float(row['volatility']),
+                    volume_anomaly_score=anomaly_scores[symbol],
+                    hurst=float(row['hurst']),
+                    ofi_score=float(row['ofi']),
+                    vwap_deviation=float(row['vwap_deviation'])
                 )
-                
-                # 7. Сохранение сигнала если он достаточно уверенный
                 if signal and signal.confidence >= self.min_confidence:
-                    await self._save_signal(db, signal)
-                    return signal
+                    await self._save_signal(signal)
+                    signals.append(signal)
                     
         except Exception as e:
-            logger.error(f"Ошибка при анализе {symbol}: {e}", exc_info=True)
-            
-        return None
-    
-    async def _calculate_volatility(self, db, symbol: str) -> float:
-        """Расчет волатильности за последние 24 часа"""
-        try:
-            cutoff_time = datetime.utcnow() - timedelta(hours=self.lookback_hours)
-            
-            # ✅ ИСПРАВЛЕНО: Запрос возвращает кортежи (tuples), а не объекты.
-            # Также, в модели MarketData поле называется last_price.
-            prices_tuples = db.query(MarketData.last_price).filter(
-                and_(MarketData.symbol == symbol, MarketData.updated_at > cutoff_time)
-            ).all()
-            
-            if len(prices_tuples) < 10:
-                return float('inf')
-            
-            # ✅ ИСПРАВЛЕНО: Извлекаем значения из кортежей и преобразуем в float
-            price_values = [float(p[0]) for p in prices_tuples if p and p[0] is not None]
-            
-            if len(price_values) < 2:
-                 return float('inf')
-    
-            returns = np.diff(np.log(price_values))
-            volatility = np.std(returns) * np.sqrt(365 * 24)
-            return volatility
-            
-        except Exception as e:
-            logger.error(f"Ошибка расчета волатильности для {symbol}: {e}")
-            return float('inf')
-
-
-    
-    async def _check_volume_anomaly(self, db, symbol: str) -> Optional[VolumeAnomaly]:
-        """Проверка наличия аномалий объема"""
-        try:
-            # Получаем последнюю аномалию
-            anomaly = db.query(VolumeAnomaly).filter(
-                VolumeAnomaly.symbol == symbol
-            ).order_by(VolumeAnomaly.detected_at.desc()).first()
-            
-            if anomaly and (datetime.utcnow() - anomaly.detected_at).total_seconds() < 3600:
-                return anomaly
-                
-        except Exception as e:
-            logger.error(f"Ошибка проверки аномалии объема: {e}")
+            logger.error(f"Ошибка при анализе {len(symbols)} символов: {e}", exc_info=True)
             
-        return None
-    
-    async def _get_price_series(self, db, symbol: str) -> np.ndarray:
-        """Получение временного ряда цен"""
-        try:
-            cutoff_time = datetime.utcnow() - timedelta(hours=self.lookback_hours)
-            
-            prices = db.query(MarketData.last_price).filter(
-                and_(
-                    MarketData.symbol == symbol,
-                    MarketData.updated_at > cutoff_time
-                )
-            ).order_by(MarketData.updated_at.asc()).all()
-            
-            return np.array([float(p[0]) for p in prices])
-            
-        except Exception as e:
-            logger.error(f"Ошибка получения ценового ряда: {e}")
-            return np.array([])
+        return signals
     
-    async def _calculate_ofi(self, db, symbol: str) -> float:
-        """Расчет Order Flow Imbalance"""
+    def _get_volume_anomaly_scores(self, db, symbols: List[str]) -> Dict[str, float]:
+        """Последняя аномалия объема за час по каждому символу (volume_ratio)"""
         try:
-            # Получаем последние снимки стакана
-            snapshots = db.query(OrderBookSnapshot).filter(
-                OrderBookSnapshot.symbol == symbol
-            ).order_by(OrderBookSnapshot.timestamp.desc()).limit(10).all()
-            
-            if not snapshots:
-                return 0.0
-            
-            total_ofi = 0.0
-            for snapshot in snapshots:
-                ofi = (snapshot.bid_volume - snapshot.ask_volume) / (snapshot.bid_volume + snapshot.ask_volume)
-                total_ofi += ofi
-            
-            return total_ofi / len(snapshots)
-            
-        except Exception as e:
-            logger.error(f"Ошибка расчета OFI: {e}")
-            return 0.0
-    
-    async def _calculate_vwap_deviation(self, db, symbol: str) -> float:
-        """Расчет отклонения от VWAP"""
-        try:
-            cutoff_time = datetime.utcnow() - timedelta(hours=6)
-            
-            # Получаем данные о ценах и объемах
-            data = db.query(
-                MarketData.last_price,
-                MarketData.volume_24h
+            anomalies = db.query(
+                VolumeAnomaly.symbol,
+                VolumeAnomaly.volume_ratio
             ).filter(
-                and_(
-                    MarketData.symbol == symbol,
-                    MarketData.updated_at > cutoff_time
-                )
-            ).all()
-            
-            if not data:
-                return 0.0
-            
-            prices = np.array([float(d[0]) for d in data])
-            volumes = np.array([float(d[1]) for d in data])
-            
-            # Расчет VWAP
-            vwap = np.sum(prices * volumes) / np.sum(volumes)
-            current_price = prices[-1]
+                VolumeAnomaly.symbol.in_(symbols),
+                VolumeAnomaly.timestamp > datetime.utcnow() - self.anomaly_max_age
+            ).order_by(VolumeAnomaly.timestamp.asc()).all()
             
-            # Процентное отклонение
-            deviation = (current_price - vwap) / vwap
-            
-            return deviation
+            return {symbol: float(ratio) for symbol, ratio in anomalies}
             
         except Exception as e:
-            logger.error(f"Ошибка расчета VWAP deviation: {e}")
-            return 0.0
+            logger.error(f"Ошибка проверки аномалий объема: {e}")
+            return {}
     
     def _generate_signal(self, **kwargs) -> Optional[SleepingGiantSignal]:
         """Генерация торгового сигнала на основе анализа"""
@@ -376,7 +264,7 @@ class SleepingGiantsStrategy(BaseStrategy):
                     symbol=symbol,
                     signal_type=signal_type,
                     confidence=min(confidence, 1.0),
-                    price=0.0,  # Будет установлена при сохранении
+                    price=kwargs.get('price', 0.0),
                     volume_anomaly_score=volume_anomaly_score,
                     hurst_exponent=hurst,
                     vwap_deviation=vwap_deviation,
@@ -398,17 +286,9 @@ class SleepingGiantsStrategy(BaseStrategy):
             
         return None
     
-    async def _save_signal(self, db, signal: SleepingGiantSignal):
-        """Сохранение сигнала в БД"""
+    async def _save_signal(self, signal: SleepingGiantSignal):
+        """Публикация сигнала в шину сигналов (в БД пишет шина)"""
         try:
-            # Получаем текущую цену
-            latest_price = db.query(MarketData.last_price).filter(
-                MarketData.symbol == signal.symbol
-            ).order_by(MarketData.updated_at.desc()).first()
-            
-            if latest_price:
-                signal.price = float(latest_price[0])
-            
             # Преобразуем signal_type в action для модели Signal
             action_map = {
                 'buy': 'BUY',
@@ -416,7 +296,6 @@ class SleepingGiantsStrategy(BaseStrategy):
                 'neutral': 'HOLD'
             }
             
-            # Создаем сигнал в БД
             db_signal = Signal(
                 symbol=signal.symbol,
                 strategy=self.name,
@@ -427,17 +306,15 @@ class SleepingGiantsStrategy(BaseStrategy):
                 indicators=signal.details,
             )
             
-            db.add(db_signal)
-            db.commit()
+            signal_bus.publish(db_signal)
             
             logger.info(
-                f"💎 Сигнал сохранен: {signal.symbol} {signal.signal_type.upper()} "
+                f"💎 Сигнал опубликован: {signal.symbol} {signal.signal_type.upper()} "
                 f"(confidence: {signal.confidence:.2%})"
             )
             
         except Exception as e:
-            logger.error(f"Ошибка сохранения сигнала: {e}")
-            db.rollback()
+            logger.error(f"Ошибка публикации сигнала: {e}")
     
     async def run(self):
         """Основной цикл стратегии"""
@@ -449,15 +326,10 @@ class SleepingGiantsStrategy(BaseStrategy):
                     # Получаем список активных символов
                     symbols = await self._get_active_symbols(db)
                     
-                    # Анализируем каждый символ
-                    signals_generated = 0
-                    for symbol in symbols:
-                        signal = await self.analyze(symbol)
-                        if signal:
-                            signals_generated += 1
-                    
-                    if signals_generated > 0:
-                        logger.info(f"💎 Сгенерировано {signals_generated} сигналов")
+                # Анализируем все символы одним проходом
+                signals = await self.analyze_batch(symbols)
+                if signals:
+                    logger.info(f"💎 Сгенерировано {len(signals)} сигналов")
                 
                 # Ждем перед следующей итерацией
                 await asyncio.sleep(config.SLEEPING_GIANTS_INTERVAL)
@@ -473,7 +345,7 @@ class SleepingGiantsStrategy(BaseStrategy):
             cutoff_time = datetime.utcnow() - timedelta(hours=24)
             
             symbols = db.query(VolumeAnomaly.symbol).filter(
-                VolumeAnomaly.detected_at > cutoff_time
+                VolumeAnomaly.timestamp > cutoff_time
             ).distinct().all()
             
             return [s[0] for s in symbols]
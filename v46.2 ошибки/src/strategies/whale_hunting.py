@@ -33,6 +33,7 @@ from ..core.models import (
     SignalTypeEnum
 )
 from .base import BaseStrategy # <-- ИЗМЕНЕНО: Исправлен путь импорта
+from .signal_bus import signal_bus
 from ..exchange import get_exchange_client
 from ..api_clients.onchain_data_producer import OnchainDataProducer
 
@@ -301,8 +302,7 @@ class WhaleHuntingStrategy(BaseStrategy):
         }
         
     async def _save_signal(self, signal_data: Dict[str, Any]):
-        """Сохраняет сигнал в БД с получением актуальной цены."""
-        db = self.db_session_factory()
+        """Публикует сигнал в шину сигналов с актуальной ценой (в БД пишет шина)."""
         try:
             symbol_for_ticker = signal_data['symbol'].replace('/', '')
             ticker = await self.exchange_client.get_ticker(symbol_for_ticker)
@@ -321,14 +321,10 @@ class WhaleHuntingStrategy(BaseStrategy):
                 reason=signal_data['reason'],
                 indicators=signal_data.get('details', {})
             )
-            db.add(signal)
-            db.commit()
-            logger.info(f"Сигнал сохранен: {signal.symbol} {signal.action} @ ${signal.price}")
+            signal_bus.publish(signal)
+            logger.info(f"Сигнал опубликован: {signal.symbol} {signal.action} @ ${signal.price}")
         except Exception as e:
-            logger.error(f"Ошибка сохранения сигнала: {e}", exc_info=True)
-            db.rollback()
-        finally:
-            db.close()
+            logger.error(f"Ошибка публикации сигнала: {e}", exc_info=True)
             
     async def stop(self):
         """
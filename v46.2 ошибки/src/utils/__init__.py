@@ -4,7 +4,6 @@
 """
 from .threading_compat import (
     CompatibleThreadPoolExecutor,
-    AsyncRouteHandler,
     SystemdCompatibleService,
     safe_executor_shutdown,
     handle_threadpool_errors
@@ -12,7 +11,6 @@ from .threading_compat import (
 
 __all__ = [
     'CompatibleThreadPoolExecutor',
-    'AsyncRouteHandler', 
     'SystemdCompatibleService',
     'safe_executor_shutdown',
     'handle_threadpool_errors'
@@ -3,15 +3,13 @@
 Обеспечивает совместимость с различными версиями Python
 Путь: src/utils/threading_compat.py
 """
-import asyncio
 import sys
 import threading
 import logging
 import subprocess
 import os
 from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Any, Callable
-from contextlib import asynccontextmanager
+from typing import Optional, Callable
 
 logger = logging.getLogger(__name__)
 
@@ -135,96 +133,6 @@ class CompatibleThreadPoolExecutor:
         """Context manager exit"""
         self.shutdown(wait=True, timeout=30)
 
-class AsyncRouteHandler:
-    """
-    Улучшенный асинхронный обработчик маршрутов
-    Исправляет проблемы с ThreadPoolExecutor
-    """
-    
-    def __init__(self, max_workers: int = 4, request_timeout: float = 30.0):
-        """
-        Инициализация обработчика
-        
-        Args:
-            max_workers: Количество рабочих потоков
-            request_timeout: Таймаут обработки запросов
-        """
-        self.max_workers = max_workers
-        self.request_timeout = request_timeout
-        self.executor = CompatibleThreadPoolExecutor(
-            max_workers=max_workers,
-            thread_name_prefix='AsyncRoute'
-        )
-        self._running = False
-        
-        logger.info(f"✅ AsyncRouteHandler инициализирован "
-                   f"(workers: {max_workers}, timeout: {request_timeout}s)")
-    
-    async def start(self):
-        """Запуск обработчика"""
-        if not self._running:
-            self.executor.start()
-            self._running = True
-            logger.info("🚀 AsyncRouteHandler запущен")
-    
-    async def stop(self):
-        """Остановка обработчика"""
-        if self._running:
-            logger.info("🛑 Остановка AsyncRouteHandler...")
-            
-            try:
-                # Безопасная остановка с учетом версии Python
-                self.executor.shutdown(wait=True, timeout=self.request_timeout)
-                logger.info("✅ AsyncRouteHandler остановлен успешно")
-                
-            except Exception as e:
-                logger.error(f"❌ Ошибка при остановке AsyncRouteHandler: {e}")
-                
-            finally:
-                self._running = False
-    
-    async def execute_in_thread(self, func: Callable, *args, **kwargs) -> Any:
-        """
-        Выполнение функции в отдельном потоке
-        
-        Args:
-            func: Функция для выполнения
-            *args: Позиционные аргументы
-            **kwargs: Именованные аргументы
-            
-        Returns:
-            Результат выполнения функции
-        """
-        if not self._running:
-            await self.start()
-        
-        loop = asyncio.get_event_loop()
-        
-        try:
-            # Выполняем в пуле потоков с таймаутом
-            future = self.executor.submit(func, *args, **kwargs)
-            result = await asyncio.wait_for(
-                loop.run_in_executor(None, future.result),
-                timeout=self.request_timeout
-            )
-            return result
-            
-        except asyncio.TimeoutError:
-            logger.error(f"⏰ Таймаут выполнения функции {func.__name__}")
-            raise
-        except Exception as e:
-            logger.error(f"❌ Ошибка выполнения {func.__name__}: {e}")
-            raise
-    
-    @asynccontextmanager
-    async def managed_execution(self):
-        """Context manager для безопасного выполнения"""
-        await self.start()
-        try:
-            yield self
-        finally:
-            await self.stop()
-
 class SystemdCompatibleService:
     """
     Сервис совместимый с systemd для автоматического восстановления
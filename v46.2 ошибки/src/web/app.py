@@ -5,12 +5,11 @@ import os
 import logging
 import atexit
 import time
-import asyncio
 import threading
 from datetime import datetime, timedelta
 from flask import Flask, render_template, jsonify, request, redirect, url_for, session
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
 
 # --- Импорты из нашего проекта ---
@@ -39,6 +38,9 @@ except ImportError as e:
     logger.error(f"⚠️ Не удалось импортировать ExchangeClient: {e}. API, связанные с биржей, могут не работать.")
     exchange_client = None
 
+# Топики push-канала дашборда
+PUSH_TOPICS = ('bot_status', 'balance', 'positions')
+
 # --- Глобальные переменные ---
 app: Flask = None
 socketio: SocketIO = None
@@ -217,40 +219,50 @@ def register_page_routes(app_instance: Flask):
 def register_websocket_handlers(socketio):
     """Регистрация обработчиков WebSocket"""
     
-    # Создаем WebSocket менеджер
-    from .enhanced_websocket import EnhancedWebSocketManager, WebSocketBotIntegration
-    ws_manager = EnhancedWebSocketManager()
+    from .push_channel import SocketIOPushChannel
+    push_channel = SocketIOPushChannel(socketio)
+    socketio.push_channel = push_channel
+    
+    # Подписки на push-канал (работают и без бота: снимков просто не будет)
+    @socketio.on('subscribe')
+    def handle_subscribe(data):
+        data = data or {}
+        topics = data.get('topics') or PUSH_TOPICS
+        rooms, encoding = push_channel.subscribe(request.sid, topics, data.get('encoding', 'json'))
+        for room in rooms:
+            join_room(room)
+        for payload in push_channel.snapshot_payloads(topics, encoding):
+            emit(SocketIOPushChannel.EVENT, payload)
+    
+    @socketio.on('unsubscribe')
+    def handle_unsubscribe(data):
+        for room in push_channel.unsubscribe(request.sid, (data or {}).get('topics')):
+            leave_room(room)
+    
+    @socketio.on('resync')
+    def handle_resync(data):
+        """Полный снимок топика для клиента, пропустившего seq"""
+        data = data or {}
+        for payload in push_channel.snapshot_payloads([data.get('topic')], data.get('encoding', 'json')):
+            emit(SocketIOPushChannel.EVENT, payload)
+    
+    # ✅ ИСПРАВЛЕНО: handle_connect теперь принимает параметр auth
+    @socketio.on('connect')
+    def handle_connect(auth):
+        logger.info("✅ WebSocket клиент подключен")
     
-    # Если есть bot_manager, создаем интеграцию
+    # Подписки снимаются при любом отключении, иначе в push-канале копятся мертвые sid
+    @socketio.on('disconnect')
+    def handle_disconnect():
+        push_channel.unsubscribe(request.sid)
+        logger.info("❌ WebSocket клиент отключен")
+    
+    # Если есть bot_manager, подключаем его данные к push-каналу
     if bot_manager:
-        ws_integration = WebSocketBotIntegration(ws_manager, bot_manager)
-        
-        # ✅ ИСПРАВЛЕНО: handle_connect теперь принимает параметр auth
-        @socketio.on('connect')
-        def handle_connect(auth):
-            logger.info("✅ WebSocket клиент подключен")
-            # Запускаем интеграцию если еще не запущена
-            if not ws_integration.running:
-                # ✅ ИСПРАВЛЕНО: создаем task в отдельном потоке
-                import threading
-                def run_async():
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(ws_integration.start())
-                
-                thread = threading.Thread(target=run_async, daemon=True)
-                thread.start()
-        
-        @socketio.on('disconnect')
-        def handle_disconnect():
-            logger.info("❌ WebSocket клиент отключен")
-        
-        # Обработчик запроса статуса
+        # Обработчик запроса статуса: статус уходит подписчикам с ближайшей рассылкой
         @socketio.on('get_status')
         def handle_get_status():
-            if bot_manager:
-                status = bot_manager.get_status()
-                emit('bot_status_update', status)
+            push_channel.publish('bot_status', bot_manager.get_status())
         
         # Обработчик команд управления
         @socketio.on('bot_command')
@@ -272,28 +284,19 @@ def register_websocket_handlers(socketio):
                     'message': message
                 })
         
-        # Периодическая отправка обновлений всем подключенным клиентам
+        # Снимки состояния бота публикуются в push-канал, клиентам уходят только изменения
         def broadcast_updates():
             while True:
-                time.sleep(2)  # Каждые 2 секунды
-                if bot_manager:
-                    try:
-                        # Отправляем статус
-                        status = bot_manager.get_status()
-                        socketio.emit('bot_status_update', status)
-                        
-                        # Отправляем баланс
-                        balance = bot_manager.get_balance_info()
-                        socketio.emit('balance_update', balance)
-                        
-                        # Отправляем позиции
-                        positions = bot_manager.get_positions_info()
-                        socketio.emit('positions_update', {
-                            'positions': positions,
-                            'count': len(positions)
-                        })
-                    except Exception as e:
-                        logger.error(f"Ошибка при отправке обновлений: {e}")
+                time.sleep(push_channel.flush_interval)
+                try:
+                    push_channel.publish('bot_status', bot_manager.get_status())
+                    push_channel.publish('balance', bot_manager.get_balance_info())
+                    # Позиции по id, чтобы изменение одной позиции не пересылало весь список
+                    positions = bot_manager.get_positions_info()
+                    push_channel.publish('positions', {str(p.get('id', p.get('symbol'))): p for p in positions})
+                    push_channel.flush()
+                except Exception as e:
+                    logger.error(f"Ошибка при отправке обновлений: {e}")
         
         # Запускаем фоновый поток для broadcast
         broadcast_thread = threading.Thread(target=broadcast_updates, daemon=True)
@@ -0,0 +1,361 @@
+"""
+ASGI-приложение API и WebSocket дашборда
+Файл: src/web/asgi_app.py
+
+Работает в том же event loop, что и BotManager (режим `python main.py asgi`).
+Все страницы, статика, авторизация и эндпоинты unified_api - это Flask-приложение
+из app.py, смонтированное через WSGI-мост: второго набора API нет.
+Нативно в event loop обслуживаются только маршруты, которым это дает выигрыш:
+- состояние бота читается напрямую, запуск и остановка - задачи этого же
+  цикла (lifecycle.start_in_loop) вместо отдельного цикла в потоке
+- ответы read-моделей unified_api.py отдаются из кэша прямо в цикле,
+  в asyncio.to_thread уходит только построение устаревшего представления
+  (синхронные запросы к БД), чтобы не задерживать торговые задачи
+- /ws - EnhancedWebSocketManager с delta-рассылкой push-канала
+- /socket.io/ - Socket.IO дашборда на socketio.AsyncServer (long-polling и
+  WebSocket) с теми же событиями, что и Flask-SocketIO в app.py
+Каждый нативный маршрут обязан существовать во Flask-приложении с теми же
+методами (проверяется при создании), поэтому ответы двух путей не расходятся.
+
+WSGI-мост (a2wsgi) выполняет Flask-запросы в собственном пуле из
+WSGI_BRIDGE_WORKERS потоков: медленные Flask-запросы не занимают пул
+asyncio.to_thread, в котором строятся read-модели.
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Hashable
+
+import socketio
+from a2wsgi import WSGIMiddleware
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+
+from . import unified_api
+from .enhanced_websocket import EnhancedWebSocketManager, WebSocketBotIntegration, enhanced_websocket_endpoint
+from .push_channel import AsyncSocketIOPushChannel
+from .read_models import read_models
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 8000
+WSGI_BRIDGE_WORKERS = int(os.getenv('WSGI_BRIDGE_WORKERS', 8))
+
+
+def _int_param(request: Request, name: str, default: int) -> int:
+    try:
+        return int(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _page_size(request: Request, default: int) -> int:
+    return max(1, min(_int_param(request, 'limit', default), unified_api.MAX_PAGE_SIZE))
+
+
+async def cached_response(request: Request, name: str, *params: Hashable) -> Response:
+    """
+    HTTP-ответ read-модели с ETag и Cache-Control.
+    Попадание в кэш обслуживается в event loop, промах строится в пуле потоков.
+    """
+    view = read_models.peek(name, *params)
+    if view is None:
+        view = await asyncio.to_thread(read_models.get, name, *params)
+
+    headers = {
+        'ETag': f'"{view.etag}"',
+        'Cache-Control': f'private, max-age={int(view.ttl)}',
+        **view.headers,
+    }
+    if read_models.is_not_modified(view, request.headers.get('if-none-match')):
+        return Response(status_code=304, headers=headers)
+    return Response(view.body, media_type='application/json', headers=headers)
+
+
+def _check_native_routes(app: FastAPI, flask_app) -> None:
+    """Нативные маршруты - только ускоренные копии маршрутов Flask-приложения"""
+    flask_rules = {}
+    for rule in flask_app.url_map.iter_rules():
+        flask_rules.setdefault(rule.rule, set()).update(rule.methods)
+    missing = [
+        f"{','.join(sorted(route.methods))} {route.path}"
+        for route in app.routes
+        if isinstance(route, APIRoute) and not route.methods <= flask_rules.get(route.path, set())
+    ]
+    if missing:
+        raise RuntimeError(f"ASGI-маршруты без аналога во Flask-приложении: {', '.join(missing)}")
+
+
+def create_socketio_server(bot_manager=None):
+    """
+    Socket.IO дашборда в event loop бота: события register_websocket_handlers
+    (app.py) и рассылка снимков состояния бота через push-канал.
+
+    Returns:
+        Tuple: (socketio.AsyncServer, AsyncSocketIOPushChannel)
+    """
+    from .app import PUSH_TOPICS
+
+    sio = socketio.AsyncServer(
+        async_mode='asgi',
+        cors_allowed_origins='*',
+        ping_timeout=60,
+        ping_interval=25,
+        max_http_buffer_size=1000000,
+        logger=False,
+        engineio_logger=False
+    )
+    push_channel = AsyncSocketIOPushChannel(sio)
+
+    @sio.on('subscribe')
+    async def handle_subscribe(sid, data=None):
+        data = data or {}
+        topics = data.get('topics') or PUSH_TOPICS
+        rooms, encoding = push_channel.subscribe(sid, topics, data.get('encoding', 'json'))
+        for room in rooms:
+            await sio.enter_room(sid, room)
+        for payload in push_channel.snapshot_payloads(topics, encoding):
+            await sio.emit(AsyncSocketIOPushChannel.EVENT, payload, to=sid)
+
+    @sio.on('unsubscribe')
+    async def handle_unsubscribe(sid, data=None):
+        for room in push_channel.unsubscribe(sid, (data or {}).get('topics')):
+            await sio.leave_room(sid, room)
+
+    @sio.on('resync')
+    async def handle_resync(sid, data=None):
+        """Полный снимок топика для клиента, пропустившего seq"""
+        data = data or {}
+        for payload in push_channel.snapshot_payloads([data.get('topic')], data.get('encoding', 'json')):
+            await sio.emit(AsyncSocketIOPushChannel.EVENT, payload, to=sid)
+
+    @sio.on('connect')
+    async def handle_connect(sid, environ, auth=None):
+        logger.info("✅ WebSocket клиент подключен")
+
+    # Подписки снимаются при любом отключении, иначе в push-канале копятся мертвые sid
+    @sio.on('disconnect')
+    async def handle_disconnect(sid, *args):
+        push_channel.unsubscribe(sid)
+        logger.info("❌ WebSocket клиент отключен")
+
+    if bot_manager:
+        @sio.on('get_status')
+        async def handle_get_status(sid, *args):
+            push_channel.publish('bot_status', bot_manager.get_status())
+
+        @sio.on('bot_command')
+        async def handle_bot_command(sid, data=None):
+            command = (data or {}).get('command')
+            if command == 'start':
+                success, message = await bot_manager.start_in_loop()
+            elif command == 'stop':
+                success, message = await bot_manager.stop_in_loop()
+            else:
+                return
+            await sio.emit('command_response', {
+                'command': command,
+                'success': success,
+                'message': message
+            }, to=sid)
+
+    return sio, push_channel
+
+
+async def _broadcast_updates(bot_manager, push_channel: AsyncSocketIOPushChannel):
+    """Снимки состояния бота в push-канал Socket.IO, клиентам уходят только изменения"""
+    while True:
+        await asyncio.sleep(push_channel.flush_interval)
+        try:
+            push_channel.publish('bot_status', bot_manager.get_status())
+            push_channel.publish('balance', bot_manager.get_balance_info())
+            # Позиции по id, чтобы изменение одной позиции не пересылало весь список
+            positions = bot_manager.get_positions_info()
+            push_channel.publish('positions', {str(p.get('id', p.get('symbol'))): p for p in positions})
+            await push_channel.flush()
+        except Exception as e:
+            logger.error(f"Ошибка при отправке обновлений: {e}")
+
+
+def create_asgi_app(bot_manager=None, flask_app=None) -> FastAPI:
+    """
+    Создание ASGI-приложения.
+
+    Args:
+        bot_manager: Экземпляр BotManager (по умолчанию - глобальный get_bot_manager())
+        flask_app: Flask-приложение для остальных маршрутов (по умолчанию - app.create_app())
+    """
+    bot_manager = bot_manager or unified_api.get_bot_manager()
+    if flask_app is None:
+        from .app import create_app
+        flask_app, _ = create_app()
+    ws_manager = EnhancedWebSocketManager()
+    ws_integration = WebSocketBotIntegration(ws_manager, bot_manager)
+    sio, push_channel = create_socketio_server(bot_manager)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await ws_integration.start()
+        broadcast_task = asyncio.create_task(_broadcast_updates(bot_manager, push_channel)) if bot_manager else None
+        logger.info("✅ ASGI-приложение запущено в event loop бота")
+        try:
+            yield
+        finally:
+            if broadcast_task:
+                broadcast_task.cancel()
+            await ws_integration.stop()
+            await ws_manager.cleanup()
+            logger.info("⏹️ ASGI-приложение остановлено")
+
+    app = FastAPI(title='Trading Bot API', version='3.0', lifespan=lifespan)
+    app.state.bot_manager = bot_manager
+    app.state.ws_manager = ws_manager
+    app.state.socketio = sio
+
+    # --- Общие эндпоинты ---
+
+    @app.get('/api/')
+    async def root():
+        return {"version": "3.0", "status": "running", "message": "Welcome to the Professional Trading Bot API"}
+
+    @app.get('/api/health')
+    async def health_check():
+        return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+
+    # --- Состояние бота (читается напрямую из BotManager) ---
+
+    @app.get('/api/bot/status')
+    async def get_bot_status():
+        return unified_api.bot_status_payload(bot_manager)
+
+    @app.post('/api/bot/start')
+    async def start_bot():
+        if not bot_manager:
+            return JSONResponse({"success": False, "message": "Bot manager not available"}, status_code=503)
+        success, message = await bot_manager.start_in_loop()
+        return {"success": success, "message": message}
+
+    @app.post('/api/bot/stop')
+    async def stop_bot():
+        if not bot_manager:
+            return JSONResponse({"success": False, "message": "Bot manager not available"}, status_code=503)
+        success, message = await bot_manager.stop_in_loop()
+        return {"success": success, "message": message}
+
+    @app.get('/api/dashboard/balance')
+    async def get_dashboard_balance():
+        empty = {"total_usdt": 0, "available_usdt": 0, "in_positions": 0}
+        if not bot_manager:
+            return JSONResponse({**empty, "error": "Bot manager not initialized"}, status_code=503)
+        try:
+            return JSONResponse(bot_manager.get_balance_info())
+        except Exception as e:
+            logger.error(f"Ошибка при получении баланса: {e}", exc_info=True)
+            return JSONResponse({**empty, "error": str(e)}, status_code=500)
+
+    @app.get('/api/dashboard/positions')
+    async def get_dashboard_positions():
+        if not bot_manager:
+            return []
+        try:
+            return JSONResponse(bot_manager.get_positions_info())
+        except Exception as e:
+            logger.error(f"Ошибка при получении позиций: {e}", exc_info=True)
+            return []
+
+    # --- Read-модели unified_api.py ---
+
+    @app.get('/api/dashboard/recent-trades')
+    async def get_dashboard_recent_trades(request: Request):
+        try:
+            return await cached_response(request, 'recent_trades', _page_size(request, 20))
+        except Exception as e:
+            logger.error(f"Ошибка при получении недавних сделок: {e}", exc_info=True)
+            return JSONResponse({"error": "Failed to fetch recent trades"}, status_code=500)
+
+    @app.get('/api/analytics/performance')
+    async def get_performance_analytics(request: Request):
+        try:
+            days = max(1, min(_int_param(request, 'days', 30), 3650))
+            return await cached_response(request, 'performance', days)
+        except Exception as e:
+            logger.error(f"Ошибка при получении аналитики производительности: {e}", exc_info=True)
+            return JSONResponse({"error": "Failed to fetch performance analytics"}, status_code=500)
+
+    app.add_api_route('/api/dashboard/statistics', get_performance_analytics, methods=['GET'])
+
+    @app.get('/api/signals/matrix')
+    async def get_signals_matrix(request: Request):
+        if not bot_manager:
+            return JSONResponse({'error': 'Bot manager not available'}, status_code=503)
+        try:
+            version = getattr(bot_manager, 'last_matrix_update', None)
+            return await cached_response(request, 'signals_matrix', version)
+        except Exception as e:
+            logger.error(f"Error in signals matrix endpoint: {e}", exc_info=True)
+            return JSONResponse({'error': str(e)}, status_code=500)
+
+    @app.get('/api/signals/latest')
+    async def get_latest_signals(request: Request):
+        try:
+            return await cached_response(request, 'latest_signals', _page_size(request, 100))
+        except Exception as e:
+            logger.error(f"Ошибка при получении последних сигналов: {e}", exc_info=True)
+            return JSONResponse({"error": "Failed to fetch latest signals"}, status_code=500)
+
+    @app.get('/api/trades/active')
+    async def get_active_trades(request: Request):
+        if not bot_manager:
+            return []
+        try:
+            return await cached_response(request, 'active_trades')
+        except Exception as e:
+            logger.error(f"Ошибка получения активных сделок: {e}")
+            return []
+
+    @app.get('/api/trades/history')
+    async def get_trades_history(request: Request):
+        """Следующая страница: ?cursor=<значение заголовка X-Next-Cursor>"""
+        if not bot_manager:
+            return []
+        try:
+            return await cached_response(
+                request,
+                'trades_history',
+                request.query_params.get('cursor'),
+                _int_param(request, 'offset', 0),
+                _page_size(request, 50)
+            )
+        except Exception as e:
+            logger.error(f"Ошибка получения истории сделок: {e}")
+            return []
+
+    # --- WebSocket ---
+
+    @app.websocket('/ws')
+    async def websocket_endpoint(websocket: WebSocket):
+        await enhanced_websocket_endpoint(websocket, ws_manager)
+
+    # Socket.IO обслуживается в цикле, а не через WSGI-мост: long-polling
+    # не держит поток моста на время опроса
+    app.mount('/socket.io', socketio.ASGIApp(sio, socketio_path=None))
+
+    # --- Все остальное (страницы, статика, авторизация, API) - Flask-приложение ---
+
+    _check_native_routes(app, flask_app)
+    app.mount('/', WSGIMiddleware(flask_app, workers=WSGI_BRIDGE_WORKERS))
+
+    return app
+
+
+async def serve(app: FastAPI, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """Запуск uvicorn в текущем event loop (до остановки сервера)"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level='info'))
+    logger.info(f"🌐 ASGI-сервер: http://localhost:{port}")
+    await server.serve()
@@ -404,6 +404,7 @@ def get_dashboard_html():
             socket: null,
             charts: {},
             updateIntervals: {},
+            pushState: {},
             currentData: {
                 balance: 0,
                 positions: [],
@@ -434,6 +435,9 @@ def get_dashboard_html():
                 state.isConnected = true;
                 updateConnectionStatus(true);
                 showNotification('Connected to server', 'success');
+                // Push channel: full snapshot first, then only changes
+                state.pushState = {};
+                state.socket.emit('subscribe', { topics: ['bot_status', 'balance', 'positions'] });
             });
 
             state.socket.on('disconnect', () => {
@@ -444,9 +448,9 @@ def get_dashboard_html():
             });
 
             // Listen for updates
-            state.socket.on('bot_status', handleBotStatus);
-            state.socket.on('balance_update', handleBalanceUpdate);
-            state.socket.on('position_update', handlePositionUpdate);
+            state.socket.on('push', (payload) => {
+                handlePush(typeof payload === 'string' ? JSON.parse(payload) : payload);
+            });
             state.socket.on('trade_update', handleTradeUpdate);
             state.socket.on('strategy_update', handleStrategyUpdate);
             state.socket.on('ticker_update', handleTickerUpdate);
@@ -533,6 +537,53 @@ def get_dashboard_html():
             }
         }
 
+        // Push channel: snapshot replaces topic state, delta (JSON Merge Patch) is applied on top;
+        // a gap in seq requests a resync
+        function handlePush(message) {
+            const topic = message.topic;
+            const current = state.pushState[topic];
+
+            if (message.kind === 'snapshot') {
+                if (current && current.seq >= message.seq) return;
+                state.pushState[topic] = { seq: message.seq, data: message.data };
+            } else {
+                const expected = current ? current.seq + 1 : 1;
+                if (message.seq < expected) return;
+                if (message.seq > expected) {
+                    state.socket.emit('resync', { topic: topic });
+                    return;
+                }
+                state.pushState[topic] = {
+                    seq: message.seq,
+                    data: mergePatch(current ? current.data : {}, message.data)
+                };
+            }
+
+            const data = state.pushState[topic].data;
+            if (topic === 'bot_status') {
+                handleBotStatus(data);
+            } else if (topic === 'balance') {
+                handleBalanceUpdate(data);
+            } else if (topic === 'positions') {
+                handlePositionUpdate({ positions: Object.values(data) });
+            }
+        }
+
+        function mergePatch(target, patch) {
+            if (patch === null || typeof patch !== 'object' || Array.isArray(patch)) {
+                return patch;
+            }
+            const result = (target && typeof target === 'object' && !Array.isArray(target)) ? { ...target } : {};
+            for (const [key, value] of Object.entries(patch)) {
+                if (value === null) {
+                    delete result[key];
+                } else {
+                    result[key] = mergePatch(result[key], value);
+                }
+            }
+            return result;
+        }
+
         // Update handlers
         function handleBotStatus(data) {
             const statusEl = document.getElementById('bot-status');
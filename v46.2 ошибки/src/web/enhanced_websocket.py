@@ -3,7 +3,8 @@
 ============================
 Файл: src/web/enhanced_websocket.py
 
-Обеспечивает real-time обновления для дашборда
+Обеспечивает real-time обновления для дашборда.
+Состояние бота рассылается как delta-сообщения push-канала (push_channel.py).
 """
 
 import asyncio
@@ -15,6 +16,8 @@ from fastapi import WebSocket, WebSocketDisconnect
 from collections import defaultdict
 import traceback
 
+from .push_channel import ENCODINGS, TopicStream, encode_message
+
 logger = logging.getLogger(__name__)
 
 class EnhancedWebSocketManager:
@@ -32,6 +35,12 @@ class EnhancedWebSocketManager:
         # Очереди сообщений для каждого соединения
         self.message_queues: Dict[WebSocket, asyncio.Queue] = {}
         
+        # Кодировка сообщений соединения ('json' или 'msgpack')
+        self.encodings: Dict[WebSocket, str] = {}
+        
+        # Снимки топиков и их delta-сообщения
+        self.topic_stream = TopicStream()
+        
         # Статистика
         self.stats = {
             'total_connections': 0,
@@ -85,6 +94,7 @@ class EnhancedWebSocketManager:
         # Удаляем очередь сообщений
         if websocket in self.message_queues:
             del self.message_queues[websocket]
+        self.encodings.pop(websocket, None)
         
         logger.info(f"🔌 WebSocket отключен. Активных: {len(self.active_connections)}")
     
@@ -101,7 +111,12 @@ class EnhancedWebSocketManager:
                     'tickers': self.data_cache['tickers'],
                     'recent_trades': self.data_cache['trades'][-10:],
                     'strategies': self.data_cache['strategies']
-                }
+                },
+                # Снимки топиков с seq, от которых считаются следующие delta
+                'push': [
+                    message for message in map(self.topic_stream.snapshot, self.topic_stream.topics())
+                    if message is not None
+                ]
             }
             
             await websocket.send_json(initial_data)
@@ -152,8 +167,16 @@ class EnhancedWebSocketManager:
                 topics = message.get('topics', [])
                 for topic in topics:
                     self.subscriptions[topic].add(websocket)
+                if message.get('encoding') in ENCODINGS:
+                    self.encodings[websocket] = message['encoding']
                 logger.info(f"📊 Клиент подписан на: {topics}")
                 
+            elif msg_type == 'resync':
+                # Полный снимок топика для клиента, пропустившего seq
+                snapshot = self.topic_stream.snapshot(message.get('topic'))
+                if snapshot is not None:
+                    await self._send_to_client(websocket, self._encode({'type': 'push', **snapshot}, websocket))
+                
             elif msg_type == 'unsubscribe':
                 # Отписка от типов данных
                 topics = message.get('topics', [])
@@ -255,14 +278,18 @@ class EnhancedWebSocketManager:
         if not subscribers:
             return
         
-        # Сериализуем сообщение один раз
-        message_json = json.dumps(message, default=str, ensure_ascii=False)
-        message_bytes = len(message_json.encode('utf-8'))
-        
-        # Отправляем асинхронно всем подписчикам
+        # Сериализуем сообщение один раз на каждую кодировку
+        payloads = {}
         tasks = []
+        sizes = []
         for websocket in list(subscribers):
-            tasks.append(self._send_to_client(websocket, message_json))
+            encoding = self.encodings.get(websocket, 'json')
+            if encoding not in payloads:
+                payload = encode_message(message, encoding)
+                payloads[encoding] = (payload, len(payload.encode('utf-8') if isinstance(payload, str) else payload))
+            payload, size = payloads[encoding]
+            tasks.append(self._send_to_client(websocket, payload))
+            sizes.append(size)
         
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
@@ -270,12 +297,18 @@ class EnhancedWebSocketManager:
         successful = sum(1 for r in results if r is True)
         self.stats['messages_sent'] += successful
         self.stats['messages_failed'] += len(results) - successful
-        self.stats['bytes_sent'] += message_bytes * successful
+        self.stats['bytes_sent'] += sum(size for r, size in zip(results, sizes) if r is True)
+    
+    def _encode(self, message: Dict[str, Any], websocket: WebSocket):
+        return encode_message(message, self.encodings.get(websocket, 'json'))
     
-    async def _send_to_client(self, websocket: WebSocket, message: str) -> bool:
-        """Отправка сообщения конкретному клиенту"""
+    async def _send_to_client(self, websocket: WebSocket, message) -> bool:
+        """Отправка сообщения конкретному клиенту (str - текстом, bytes - бинарно)"""
         try:
-            await websocket.send_text(message)
+            if isinstance(message, bytes):
+                await websocket.send_bytes(message)
+            else:
+                await websocket.send_text(message)
             return True
         except Exception as e:
             logger.error(f"❌ Ошибка отправки клиенту: {e}")
@@ -286,29 +319,42 @@ class EnhancedWebSocketManager:
     # ОБНОВЛЕНИЕ ДАННЫХ
     # =================================================================
     
+    def publish_topic(self, topic: str, data: Any) -> None:
+        """Снимок топика для следующей рассылки (повторные вызовы до flush схлопываются)"""
+        self.topic_stream.publish(topic, data)
+    
+    async def flush_topics(self) -> None:
+        """Рассылка изменившихся топиков delta-сообщениями"""
+        for topic, message in self.topic_stream.flush():
+            await self._broadcast_to_subscribers('all', {'type': 'push', **message})
+    
     async def update_bot_status(self, status: Dict[str, Any]) -> None:
         """Обновление статуса бота"""
         self.data_cache['bot_status'] = status
-        await self.broadcast('bot_status', status)
+        self.publish_topic('bot_status', status)
+        await self.flush_topics()
     
     async def update_balance(self, balance: Dict[str, Any]) -> None:
         """Обновление баланса"""
         self.data_cache['balance'] = balance
-        await self.broadcast('balance_update', balance)
+        self.publish_topic('balance', balance)
+        await self.flush_topics()
     
-    async def update_positions(self, positions: List[Dict[str, Any]]) -> None:
-        """Обновление позиций"""
+    def _publish_positions(self, positions: List[Dict[str, Any]]) -> None:
         self.data_cache['positions'] = positions
         
-        # Рассчитываем общую статистику
-        total_pnl = sum(p.get('pnl', 0) for p in positions)
-        
-        await self.broadcast('position_update', {
-            'positions': positions,
-            'total_pnl': total_pnl,
+        # Позиции по id: изменение одной позиции не пересылает весь список
+        self.publish_topic('positions', {
+            'positions': {str(p.get('id', p.get('symbol'))): p for p in positions},
+            'total_pnl': sum(p.get('pnl', 0) for p in positions),
             'count': len(positions)
         })
     
+    async def update_positions(self, positions: List[Dict[str, Any]]) -> None:
+        """Обновление позиций"""
+        self._publish_positions(positions)
+        await self.flush_topics()
+    
     async def update_ticker(self, symbol: str, ticker_data: Dict[str, Any]) -> None:
         """Обновление тикера"""
         self.data_cache['tickers'][symbol] = ticker_data
@@ -331,7 +377,8 @@ class EnhancedWebSocketManager:
     async def update_strategies(self, strategies: Dict[str, Any]) -> None:
         """Обновление информации о стратегиях"""
         self.data_cache['strategies'] = strategies
-        await self.broadcast('strategy_update', {'strategies': strategies})
+        self.publish_topic('strategies', strategies)
+        await self.flush_topics()
     
     async def add_log(self, level: str, message: str, source: str = 'system') -> None:
         """Добавление лога"""
@@ -365,6 +412,7 @@ class EnhancedWebSocketManager:
             'messages_failed': self.stats['messages_failed'],
             'bytes_sent': self.stats['bytes_sent'],
             'uptime_seconds': int(uptime),
+            'push': self.topic_stream.get_statistics(),
             'subscriptions': {
                 topic: len(subscribers) 
                 for topic, subscribers in self.subscriptions.items()
@@ -455,22 +503,27 @@ class WebSocketBotIntegration:
             try:
                 # Получаем данные от бота
                 if self.bot_manager:
+                    ws = self.ws_manager
+                    
                     # Статус бота
-                    bot_status = self.bot_manager.get_status()
-                    await self.ws_manager.update_bot_status(bot_status)
+                    ws.data_cache['bot_status'] = self.bot_manager.get_status()
+                    ws.publish_topic('bot_status', ws.data_cache['bot_status'])
                     
                     # Баланс - используем реальный метод
                     balance = self.bot_manager.get_balance_info()
                     if balance:
-                        await self.ws_manager.update_balance(balance)
+                        ws.data_cache['balance'] = balance
+                        ws.publish_topic('balance', balance)
                     
                     # Позиции - используем реальный метод
-                    positions = self.bot_manager.get_positions_info()
-                    await self.ws_manager.update_positions(positions)
+                    ws._publish_positions(self.bot_manager.get_positions_info())
                     
                     # Стратегии
-                    strategies = self._get_strategies_from_bot()
-                    await self.ws_manager.update_strategies(strategies)
+                    ws.data_cache['strategies'] = self._get_strategies_from_bot()
+                    ws.publish_topic('strategies', ws.data_cache['strategies'])
+                    
+                    # Клиентам уходят только изменения, одной рассылкой
+                    await ws.flush_topics()
                 
                 await asyncio.sleep(self.update_interval)
                 
@@ -509,9 +562,8 @@ async def enhanced_websocket_endpoint(websocket: WebSocket, ws_manager: Enhanced
     await ws_manager.connect(websocket)
     
     try:
-        while True:
-            # Просто держим соединение открытым
-            # Вся логика обработки в _handle_client_messages
+        # Держим соединение открытым, пока его не закроет _handle_client_messages
+        while websocket in ws_manager.active_connections:
             await asyncio.sleep(1)
             
     except WebSocketDisconnect:
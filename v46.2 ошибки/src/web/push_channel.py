@@ -0,0 +1,256 @@
+"""
+Push-канал дашборда: подписки на топики и рассылка изменений
+Файл: src/web/push_channel.py
+
+Вместо периодической рассылки полных снимков каждому клиенту:
+- источник публикует текущий снимок топика (bot_status, balance, positions, ...)
+- при рассылке снимок сравнивается с последним отправленным, клиентам уходит
+  только разница (JSON Merge Patch, RFC 7386) с порядковым номером seq топика
+- несколько публикаций между рассылками схлопываются в одну
+- сообщение кодируется один раз на каждую кодировку (JSON или MessagePack),
+  а не на каждого клиента
+
+Клиент, пропустивший seq, запрашивает полный снимок (resync).
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ('json', 'msgpack') if MSGPACK_AVAILABLE else ('json',)
+
+# Пределы интервала рассылки: под нагрузкой интервал растет, изменения копятся
+MIN_FLUSH_INTERVAL = 0.5  # секунд
+MAX_FLUSH_INTERVAL = 5.0
+
+_UNCHANGED = object()
+
+
+def normalize(data: Any) -> Any:
+    """Приведение снимка к JSON-совместимым типам (datetime, Decimal -> str)"""
+    return json.loads(json.dumps(data, default=str))
+
+
+def merge_patch(old: Any, new: Any) -> Any:
+    """
+    Разница между снимками в формате JSON Merge Patch.
+
+    Вложенные словари сравниваются по ключам, удаленный ключ передается как None,
+    прочие значения (в том числе списки) заменяются целиком.
+    Возвращает _UNCHANGED, если снимки равны.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        patch = {}
+        for key, value in new.items():
+            if key not in old:
+                patch[key] = value
+                continue
+            sub = merge_patch(old[key], value)
+            if sub is not _UNCHANGED:
+                patch[key] = sub
+        for key in old.keys() - new.keys():
+            patch[key] = None
+        return patch if patch else _UNCHANGED
+    return _UNCHANGED if old == new else new
+
+
+def encode_message(message: Dict[str, Any], encoding: str = 'json'):
+    """Сериализация сообщения: str для JSON, bytes для MessagePack"""
+    if encoding == 'msgpack' and MSGPACK_AVAILABLE:
+        return msgpack.packb(message, use_bin_type=True, default=str)
+    return json.dumps(message, default=str, ensure_ascii=False, separators=(',', ':'))
+
+
+class TopicStream:
+    """
+    Последние снимки топиков и формирование delta-сообщений.
+
+    publish() только запоминает снимок (потокобезопасно), сравнение
+    и нумерация выполняются в flush() один раз на все соединения.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sent: Dict[str, Any] = {}
+        self._pending: Dict[str, Any] = {}
+        self._seq: Dict[str, int] = defaultdict(int)
+
+        self.published = 0
+        self.coalesced = 0
+        self.unchanged = 0
+        self.deltas = 0
+
+    def publish(self, topic: str, snapshot: Any):
+        snapshot = normalize(snapshot)
+        with self._lock:
+            if topic in self._pending:
+                self.coalesced += 1
+            self._pending[topic] = snapshot
+            self.published += 1
+
+    def flush(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Delta-сообщения по топикам, изменившимся с прошлой рассылки"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            messages = []
+            for topic, snapshot in pending.items():
+                if topic not in self._sent:
+                    patch = snapshot
+                else:
+                    patch = merge_patch(self._sent[topic], snapshot)
+                    if patch is _UNCHANGED:
+                        self.unchanged += 1
+                        continue
+                self._sent[topic] = snapshot
+                self._seq[topic] += 1
+                self.deltas += 1
+                messages.append((topic, {'topic': topic, 'seq': self._seq[topic], 'kind': 'delta', 'data': patch}))
+            return messages
+
+    def snapshot(self, topic: str) -> Optional[Dict[str, Any]]:
+        """Полный снимок топика (последний отправленный) для новых клиентов и resync"""
+        with self._lock:
+            if topic not in self._sent:
+                return None
+            return {'topic': topic, 'seq': self._seq[topic], 'kind': 'snapshot', 'data': self._sent[topic]}
+
+    def topics(self) -> List[str]:
+        with self._lock:
+            return list(self._sent)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'topics': dict(self._seq),
+            'published': self.published,
+            'coalesced': self.coalesced,
+            'unchanged': self.unchanged,
+            'deltas': self.deltas,
+        }
+
+
+class SocketIOPushChannel:
+    """
+    Рассылка TopicStream через Flask-SocketIO.
+
+    Клиент подписывается событием 'subscribe' {topics, encoding} и попадает
+    в комнату '<topic>:<encoding>'; сообщения приходят событием 'push'.
+    """
+
+    EVENT = 'push'
+
+    def __init__(self, socketio, stream: Optional[TopicStream] = None):
+        self.socketio = socketio
+        self.stream = stream or TopicStream()
+        self.flush_interval = MIN_FLUSH_INTERVAL
+        self._members: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+        self.bytes_sent: Dict[str, int] = defaultdict(int)
+        self.messages_sent = 0
+        self.last_flush_ms = 0.0
+
+    @staticmethod
+    def room(topic: str, encoding: str) -> str:
+        return f"{topic}:{encoding}"
+
+    def subscribe(self, sid: str, topics: Iterable[str], encoding: str = 'json') -> Tuple[List[str], str]:
+        """
+        Регистрация подписки клиента.
+
+        Returns:
+            Tuple: (комнаты для join_room, выбранная кодировка)
+        """
+        encoding = encoding if encoding in ENCODINGS else 'json'
+        rooms = []
+        with self._lock:
+            for topic in topics:
+                self._members[(topic, encoding)].add(sid)
+                rooms.append(self.room(topic, encoding))
+        return rooms, encoding
+
+    def unsubscribe(self, sid: str, topics: Optional[Iterable[str]] = None) -> List[str]:
+        """Отписка клиента от топиков (все топики - при отключении). Возвращает комнаты для leave_room"""
+        topics = set(topics) if topics is not None else None
+        rooms = []
+        with self._lock:
+            for (topic, encoding), members in list(self._members.items()):
+                if (topics is None or topic in topics) and sid in members:
+                    members.discard(sid)
+                    rooms.append(self.room(topic, encoding))
+                    if not members:
+                        del self._members[(topic, encoding)]
+        return rooms
+
+    def snapshot_payloads(self, topics: Iterable[str], encoding: str = 'json') -> List[Any]:
+        """Закодированные полные снимки для отправки одному клиенту"""
+        payloads = []
+        for topic in topics:
+            message = self.stream.snapshot(topic)
+            if message is not None:
+                payloads.append(encode_message(message, encoding))
+        return payloads
+
+    def publish(self, topic: str, snapshot: Any):
+        self.stream.publish(topic, snapshot)
+
+    def _outgoing(self) -> List[Tuple[str, Any]]:
+        """(комната, payload) для изменений с прошлой рассылки, по одному на кодировку"""
+        messages = self.stream.flush()
+        with self._lock:
+            encodings_by_topic = defaultdict(list)
+            for topic, encoding in self._members:
+                encodings_by_topic[topic].append(encoding)
+
+        outgoing = []
+        for topic, message in messages:
+            for encoding in encodings_by_topic.get(topic, ()):
+                payload = encode_message(message, encoding)
+                outgoing.append((self.room(topic, encoding), payload))
+                self.bytes_sent[encoding] += len(payload)
+                self.messages_sent += 1
+        return outgoing
+
+    def _record_flush(self, started: float):
+        elapsed = time.perf_counter() - started
+        self.last_flush_ms = elapsed * 1000
+        self.flush_interval = min(MAX_FLUSH_INTERVAL, max(MIN_FLUSH_INTERVAL, elapsed * 10))
+
+    def flush(self):
+        """Рассылка изменений подписчикам; интервал следующей рассылки растет с ее стоимостью"""
+        started = time.perf_counter()
+        for room, payload in self._outgoing():
+            self.socketio.emit(self.EVENT, payload, to=room)
+        self._record_flush(started)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            subscribers = {self.room(*key): len(members) for key, members in self._members.items()}
+        return {
+            **self.stream.get_statistics(),
+            'subscribers': subscribers,
+            'messages_sent': self.messages_sent,
+            'bytes_sent': dict(self.bytes_sent),
+            'flush_interval': self.flush_interval,
+            'last_flush_ms': self.last_flush_ms,
+        }
+
+
+class AsyncSocketIOPushChannel(SocketIOPushChannel):
+    """Тот же push-канал для socketio.AsyncServer (ASGI): рассылка - корутина"""
+
+    async def flush(self):
+        started = time.perf_counter()
+        for room, payload in self._outgoing():
+            await self.socketio.emit(self.EVENT, payload, to=room)
+        self._record_flush(started)
@@ -0,0 +1,250 @@
+"""
+Read-модели REST API дашборда
+Файл: src/web/read_models.py
+
+Ответы опрашиваемых эндпоинтов строятся один раз и отдаются из памяти:
+- представление (view) сериализуется в JSON один раз на версию данных
+- версия сбрасывается по событиям бота: коммит сессии SQLAlchemy, изменивший
+  таблицы представления (ORM-объекты и Core INSERT/UPDATE/DELETE через сессию)
+- TTL ограничивает устаревание данных, которые меняются вне сессий процесса
+- ETag позволяет клиенту получить 304 без тела ответа
+
+Одновременные запросы к устаревшему представлению строят его один раз.
+"""
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import chain
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from flask import Response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 10.0  # секунд
+MAX_ENTRIES = 512
+
+_TOUCHED_TABLES_KEY = 'read_model_tables'
+
+
+@dataclass
+class CachedView:
+    """Сериализованный ответ представления"""
+    body: bytes
+    etag: str
+    built_at: float
+    generation: int
+    ttl: float
+    headers: Dict[str, str]
+
+
+@dataclass
+class ReadModel:
+    name: str
+    builder: Callable[..., Any]
+    ttl: float
+    tables: Tuple[str, ...]
+
+
+class ReadModelCache:
+    """Реестр представлений и кэш их сериализованных ответов (LRU)"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._models: Dict[str, ReadModel] = {}
+        self._by_table: Dict[str, Set[str]] = defaultdict(set)
+        self._generation: Dict[str, int] = defaultdict(int)
+        self._entries: 'OrderedDict[Tuple[str, Hashable], CachedView]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks: Dict[Tuple[str, Hashable], threading.Lock] = defaultdict(threading.Lock)
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def register(self, name: str, builder: Callable[..., Any], ttl: float = DEFAULT_TTL,
+                 tables: Iterable[str] = ()):
+        """
+        Регистрация представления.
+
+        Args:
+            builder: Функция (*params) -> данные или (данные, заголовки)
+            ttl: Максимальный возраст ответа в секундах
+            tables: Таблицы, изменение которых сбрасывает представление
+        """
+        model = ReadModel(name, builder, ttl, tuple(tables))
+        self._models[name] = model
+        for table in model.tables:
+            self._by_table[table].add(name)
+
+    def get(self, name: str, *params: Hashable) -> CachedView:
+        """Ответ представления с параметрами params (из кэша или построенный заново)"""
+        model = self._models[name]
+        key = (name, params)
+
+        view = self._fresh(key, model)
+        if view is not None:
+            self.hits += 1
+            return view
+
+        with self._build_locks[key]:
+            # Пока ждали блокировку, представление мог построить другой запрос
+            view = self._fresh(key, model)
+            if view is not None:
+                self.hits += 1
+                return view
+
+            self.misses += 1
+            generation = self._generation[name]
+            result = model.builder(*params)
+            data, headers = result if isinstance(result, tuple) else (result, {})
+            body = json.dumps(data, default=str, ensure_ascii=False).encode('utf-8')
+            view = CachedView(
+                body=body,
+                etag=hashlib.blake2b(body, digest_size=16).hexdigest(),
+                built_at=time.monotonic(),
+                generation=generation,
+                ttl=model.ttl,
+                headers=headers,
+            )
+            with self._lock:
+                self._entries[key] = view
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._build_locks.pop(evicted, None)
+            return view
+
+    def peek(self, name: str, *params: Hashable) -> Optional[CachedView]:
+        """Актуальный ответ из кэша без построения (None - нужно вызвать get())"""
+        view = self._fresh((name, params), self._models[name])
+        if view is not None:
+            self.hits += 1
+        return view
+
+    def is_not_modified(self, view: CachedView, if_none_match: Optional[str]) -> bool:
+        """Совпадает ли значение заголовка If-None-Match с ETag ответа"""
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')}
+        if view.etag in tags or '*' in tags:
+            self.not_modified += 1
+            return True
+        return False
+
+    def _fresh(self, key, model: ReadModel) -> Optional[CachedView]:
+        with self._lock:
+            view = self._entries.get(key)
+            if view is None:
+                return None
+            if view.generation != self._generation[model.name] or \
+                    time.monotonic() - view.built_at > model.ttl:
+                return None
+            self._entries.move_to_end(key)
+            return view
+
+    def invalidate(self, *names: str):
+        """Сброс представлений (ответы перестраиваются при следующем запросе)"""
+        with self._lock:
+            for name in names:
+                self._generation[name] += 1
+            self.invalidations += len(names)
+
+    def invalidate_tables(self, tables: Iterable[str]):
+        names = set(chain.from_iterable(self._by_table.get(table, ()) for table in tables))
+        if names:
+            self.invalidate(*names)
+
+    def response(self, name: str, *params: Hashable) -> Response:
+        """
+        HTTP-ответ представления с ETag и Cache-Control.
+        Если If-None-Match совпадает с ETag, возвращается 304 без тела.
+        """
+        view = self.get(name, *params)
+        if view.etag in request.if_none_match:
+            self.not_modified += 1
+            response = Response(status=304)
+        else:
+            response = Response(view.body, mimetype='application/json')
+        response.set_etag(view.etag)
+        response.cache_control.private = True
+        response.cache_control.max_age = int(view.ttl)
+        for header, value in view.headers.items():
+            response.headers[header] = value
+        return response
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'views': len(self._models),
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'invalidations': self.invalidations,
+        }
+
+
+# === Курсорная пагинация ===
+
+def encode_cursor(timestamp: Optional[datetime], row_id: int) -> str:
+    raw = f"{timestamp.isoformat() if timestamp else ''}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[Optional[datetime], int]]:
+    """
+    (время, id) последней строки предыдущей страницы или None для некорректного курсора.
+    Время None - строка без метки времени (такие строки идут после остальных)
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit('|', 1)
+        return (datetime.fromisoformat(timestamp) if timestamp else None), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+# Глобальный кэш read-моделей
+read_models = ReadModelCache()
+
+
+# === Сброс представлений по коммитам сессий ===
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    tables = session.info.setdefault(_TOUCHED_TABLES_KEY, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            tables.add(table)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_executed_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            orm_execute_state.session.info.setdefault(_TOUCHED_TABLES_KEY, set()).add(table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_tables(session):
+    tables = session.info.pop(_TOUCHED_TABLES_KEY, None)
+    if tables:
+        read_models.invalidate_tables(tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_tables(session):
+    session.info.pop(_TOUCHED_TABLES_KEY, None)
@@ -36,6 +36,9 @@ class DashboardManager {
                 this.socket.on('connect', () => {
                     console.log('✅ WebSocket подключен');
                     this.showNotification('Подключено к серверу', 'success');
+                    // Подписка на push-канал: сначала полный снимок, затем только изменения
+                    this.pushState = {};
+                    this.socket.emit('subscribe', { topics: ['bot_status', 'balance', 'positions'] });
                 });
 
                 this.socket.on('disconnect', () => {
@@ -43,28 +46,70 @@ class DashboardManager {
                     this.showNotification('Соединение потеряно', 'warning');
                 });
 
-                this.socket.on('bot_status', (data) => {
-                    this.updateBotStatus(data);
-                });
-
-                this.socket.on('balance_update', (data) => {
-                    this.updateBalance(data);
+                this.socket.on('push', (payload) => {
+                    this.applyPush(typeof payload === 'string' ? JSON.parse(payload) : payload);
                 });
 
                 this.socket.on('new_trade', (data) => {
                     this.addNewTrade(data);
                     this.showNotification(`Новая сделка: ${data.symbol} ${data.side}`, 'info');
                 });
-
-                this.socket.on('position_update', (data) => {
-                    this.updatePositions(data);
-                });
             } catch (error) {
                 console.error('Ошибка инициализации WebSocket:', error);
             }
         }
     }
 
+    /**
+     * Применение сообщения push-канала: snapshot заменяет состояние топика,
+     * delta (JSON Merge Patch) накладывается на него; при пропуске seq - resync
+     */
+    applyPush(message) {
+        this.pushState = this.pushState || {};
+        const topic = message.topic;
+        const state = this.pushState[topic];
+
+        if (message.kind === 'snapshot') {
+            if (state && state.seq >= message.seq) return;
+            this.pushState[topic] = { seq: message.seq, data: message.data };
+        } else {
+            const expected = state ? state.seq + 1 : 1;
+            if (message.seq < expected) return;
+            if (message.seq > expected) {
+                this.socket.emit('resync', { topic: topic });
+                return;
+            }
+            this.pushState[topic] = {
+                seq: message.seq,
+                data: DashboardManager.mergePatch(state ? state.data : {}, message.data)
+            };
+        }
+
+        const data = this.pushState[topic].data;
+        if (topic === 'bot_status') {
+            this.updateBotStatus(data);
+        } else if (topic === 'balance') {
+            this.updateBalance(data);
+        } else if (topic === 'positions') {
+            this.updatePositions(Object.values(data));
+        }
+    }
+
+    static mergePatch(target, patch) {
+        if (patch === null || typeof patch !== 'object' || Array.isArray(patch)) {
+            return patch;
+        }
+        const result = (target && typeof target === 'object' && !Array.isArray(target)) ? { ...target } : {};
+        for (const [key, value] of Object.entries(patch)) {
+            if (value === null) {
+                delete result[key];
+            } else {
+                result[key] = DashboardManager.mergePatch(result[key], value);
+            }
+        }
+        return result;
+    }
+
     setupEventHandlers() {
         // Кнопка запуска бота
         const btnStart = document.getElementById('btn-start');
@@ -244,32 +289,23 @@ class DashboardManager {
     initWebSocket() {
         const socket = io();
         
+        this.socket = socket;
+
         socket.on('connect', () => {
             console.log('WebSocket подключен');
             this.showNotification('Подключено к серверу', 'success');
+            this.pushState = {};
+            socket.emit('subscribe', { topics: ['bot_status', 'balance', 'positions'] });
         });
-        
+
         socket.on('disconnect', () => {
             console.log('WebSocket отключен');
             this.showNotification('Отключено от сервера', 'warning');
         });
-        
-        // Обработка обновлений статуса
-        socket.on('bot_status_update', (data) => {
-            console.log('Получено обновление статуса:', data);
-            this.updateBotStatus(data);
-        });
-        
-        // Обработка обновлений баланса
-        socket.on('balance_update', (data) => {
-            console.log('Получено обновление баланса:', data);
-            this.updateBalance(data);
-        });
-        
-        // Обработка обновлений позиций
-        socket.on('positions_update', (data) => {
-            console.log('Получено обновление позиций:', data);
-            this.updatePositions(data);
+
+        // Статус, баланс и позиции приходят через push-канал
+        socket.on('push', (payload) => {
+            this.applyPush(typeof payload === 'string' ? JSON.parse(payload) : payload);
         });
     }
 
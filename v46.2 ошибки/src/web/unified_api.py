@@ -1,7 +1,7 @@
 # src/web/unified_api.py
 # -*- coding: utf-8 -*-
 from flask import Blueprint, jsonify, request, current_app
-from sqlalchemy import func, case
+from sqlalchemy import func, case, and_, or_
 from datetime import datetime, timedelta
 
 # ✅ ИСПРАВЛЕНО: Правильный импорт для создания сессий
@@ -13,6 +13,7 @@ from src.bot import get_bot_manager
 from src.exchange import get_enhanced_exchange_client
 from src.analysis import MarketAnalyzer, NewsAnalyzer, SocialAnalyzer
 from src.core.unified_config import config
+from src.web.read_models import read_models, encode_cursor, decode_cursor
 
 # Создаем Blueprint для унифицированного API
 signals_api_bp = Blueprint('signals_api', __name__, url_prefix='/api')
@@ -22,8 +23,15 @@ market_analyzer = MarketAnalyzer()
 news_analyzer = NewsAnalyzer()
 social_analyzer = SocialAnalyzer()
 
+# Максимальный размер страницы (ограничивает и число вариантов ответа в кэше)
+MAX_PAGE_SIZE = 500
+
 # --- Хелперы ---
 
+def _page_size(default: int) -> int:
+    return max(1, min(request.args.get('limit', default, type=int), MAX_PAGE_SIZE))
+
+
 def get_bot_status_data():
     """Возвращает статус бота."""
     bot_manager = get_bot_manager()
@@ -91,38 +99,46 @@ def get_dashboard_positions():
         logger.error(f"Ошибка при получении позиций: {e}", exc_info=True)
         return jsonify([]), 200  # Возвращаем пустой массив при ошибке
 
-@signals_api_bp.route('/dashboard/recent-trades', methods=['GET'])
-def get_dashboard_recent_trades():
+def _build_recent_trades(limit: int):
     db = SessionLocal()
     try:
-        limit = request.args.get('limit', 20, type=int)
         # ✅ ИСПРАВЛЕНО: Используем правильное имя поля 'close_time'
         trades = db.query(Trade).order_by(Trade.close_time.desc()).limit(limit).all()
-        return jsonify([trade.to_dict() for trade in trades])
+        return [trade.to_dict() for trade in trades]
+    finally:
+        db.close()
+
+read_models.register('recent_trades', _build_recent_trades, ttl=10, tables=('trades',))
+
+@signals_api_bp.route('/dashboard/recent-trades', methods=['GET'])
+def get_dashboard_recent_trades():
+    try:
+        return read_models.response('recent_trades', _page_size(20))
     except Exception as e:
         logger.error(f"Ошибка при получении недавних сделок: {e}", exc_info=True)
         return jsonify({"error": "Failed to fetch recent trades"}), 500
-    finally:
-        db.close()
 
 # --- Эндпоинты для управления ботом ---
 
-@signals_api_bp.route('/bot/status', methods=['GET'])
-def get_bot_status():
-    bot_manager = get_bot_manager()
+def bot_status_payload(bot_manager):
+    """Статус бота для /api/bot/status (общий для Flask и ASGI-приложения)"""
     if bot_manager:
         status_data = bot_manager.get_status()
         # Добавляем дополнительные поля для совместимости с frontend
-        return jsonify({
+        return {
             **status_data,
             'running': status_data.get('is_running', False),
             'status_message': status_data.get('status', 'unknown')
-        })
-    return jsonify({
+        }
+    return {
         'running': False,
         'status_message': 'Bot manager not initialized',
         'error': True
-    })
+    }
+
+@signals_api_bp.route('/bot/status', methods=['GET'])
+def get_bot_status():
+    return jsonify(bot_status_payload(get_bot_manager()))
 
 @signals_api_bp.route('/bot/start', methods=['POST'])
 def start_bot():
@@ -156,6 +172,20 @@ def stop_bot():
 
 # --- Эндпоинты для конфигурации ---
 
+def _build_signals_matrix(version):
+    # Получаем кэшированные результаты анализа
+    matrix_data = get_bot_manager().get_signals_matrix_data()
+    
+    # ✅ ИЗМЕНЕНО: Возвращаем успешный ответ даже с пустыми данными
+    return {
+        'success': True,
+        'data': matrix_data if matrix_data else [],
+        'timestamp': datetime.utcnow().isoformat(),
+        'message': 'No data available yet' if not matrix_data else None
+    }
+
+read_models.register('signals_matrix', _build_signals_matrix, ttl=30)
+
 @signals_api_bp.route('/signals/matrix', methods=['GET'])
 def get_signals_matrix():
     """
@@ -166,16 +196,9 @@ def get_signals_matrix():
         if not bot_manager:
             return jsonify({'error': 'Bot manager not available'}), 503
             
-        # Получаем кэшированные результаты анализа
-        matrix_data = bot_manager.get_signals_matrix_data()
-        
-        # ✅ ИЗМЕНЕНО: Возвращаем успешный ответ даже с пустыми данными
-        return jsonify({
-            'success': True,
-            'data': matrix_data if matrix_data else [],
-            'timestamp': datetime.utcnow().isoformat(),
-            'message': 'No data available yet' if not matrix_data else None
-        })
+        # Ответ перестраивается только после нового обновления матрицы ботом
+        version = getattr(bot_manager, 'last_matrix_update', None)
+        return read_models.response('signals_matrix', version)
     except Exception as e:
         logger.error(f"Error in signals matrix endpoint: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
@@ -209,19 +232,24 @@ def get_config_pairs():
 
 # --- Эндпоинты для сигналов ---
 
-@signals_api_bp.route('/signals/latest', methods=['GET'])
-def get_latest_signals():
+def _build_latest_signals(limit: int):
     db = SessionLocal()
     try:
-        limit = request.args.get('limit', 100, type=int)
         # ✅ ИСПРАВЛЕНО: Используем правильное имя поля 'created_at'
         signals = db.query(Signal).order_by(Signal.created_at.desc()).limit(limit).all()
-        return jsonify([signal.to_dict() for signal in signals])
+        return [signal.to_dict() for signal in signals]
+    finally:
+        db.close()
+
+read_models.register('latest_signals', _build_latest_signals, ttl=10, tables=('signals',))
+
+@signals_api_bp.route('/signals/latest', methods=['GET'])
+def get_latest_signals():
+    try:
+        return read_models.response('latest_signals', _page_size(100))
     except Exception as e:
         logger.error(f"Ошибка при получении последних сигналов: {e}", exc_info=True)
         return jsonify({"error": "Failed to fetch latest signals"}), 500
-    finally:
-        db.close()
 
 
 # --- Эндпоинты для графиков и аналитики ---
@@ -236,43 +264,52 @@ def get_chart_indicators(symbol):
         logger.error(f"Ошибка при получении индикаторов для {symbol}: {e}", exc_info=True)
         return jsonify({"error": "Failed to fetch indicators"}), 500
 
-@signals_api_bp.route('/analytics/performance', methods=['GET'])
-def get_performance_analytics():
+def _build_performance(days: int):
     db = SessionLocal()
     try:
-        days = request.args.get('days', 30, type=int)
         time_since = datetime.utcnow() - timedelta(days=days)
 
-        # ✅ ИСПРАВЛЕНО: Используем правильные имена полей
-        signals_query = db.query(Signal).filter(Signal.created_at >= time_since)
-        all_signals = signals_query.all()
-        total_signals = len(all_signals)
-        buy_signals = sum(1 for signal in all_signals if signal.action == 'BUY')
-        sell_signals = sum(1 for signal in all_signals if signal.action == 'SELL')
-
-        trades_query = db.query(Trade).filter(Trade.close_time >= time_since)
-        successful_trades = trades_query.filter(Trade.profit_loss > 0).count()
-        failed_trades = trades_query.filter(Trade.profit_loss <= 0).count()
-
-        total_pnl = db.query(func.sum(Trade.profit_loss)).filter(Trade.close_time >= time_since).scalar() or 0
+        # Агрегаты считает БД, строки в память не загружаются
+        signal_counts = dict(
+            db.query(Signal.action, func.count(Signal.id))
+            .filter(Signal.created_at >= time_since)
+            .group_by(Signal.action)
+            .all()
+        )
+        successful_trades, failed_trades, total_pnl = db.query(
+            func.sum(case((Trade.profit_loss > 0, 1), else_=0)),
+            func.sum(case((Trade.profit_loss <= 0, 1), else_=0)),
+            func.sum(Trade.profit_loss),
+        ).filter(Trade.close_time >= time_since).one()
+        successful_trades = int(successful_trades or 0)
+        failed_trades = int(failed_trades or 0)
+        total_pnl = total_pnl or 0
         
         win_rate = (successful_trades / (successful_trades + failed_trades) * 100) if (successful_trades + failed_trades) > 0 else 0
 
-        return jsonify({
+        return {
             'period_days': days,
-            'total_signals': total_signals,
-            'buy_signals': buy_signals,
-            'sell_signals': sell_signals,
+            'total_signals': sum(signal_counts.values()),
+            'buy_signals': signal_counts.get('BUY', 0),
+            'sell_signals': signal_counts.get('SELL', 0),
             'successful_trades': successful_trades,
             'failed_trades': failed_trades,
             'total_pnl': round(total_pnl, 2),
             'win_rate': round(win_rate, 2)
-        })
+        }
+    finally:
+        db.close()
+
+read_models.register('performance', _build_performance, ttl=30, tables=('signals', 'trades'))
+
+@signals_api_bp.route('/analytics/performance', methods=['GET'])
+def get_performance_analytics():
+    try:
+        days = max(1, min(request.args.get('days', 30, type=int), 3650))
+        return read_models.response('performance', days)
     except Exception as e:
         logger.error(f"Ошибка при получении аналитики производительности: {e}", exc_info=True)
         return jsonify({"error": "Failed to fetch performance analytics"}), 500
-    finally:
-        db.close()
 
 @signals_api_bp.route('/analytics/detailed', methods=['GET'])
 def get_detailed_analytics():
@@ -309,6 +346,30 @@ def get_virtual_trades():
         logger.error(f"Ошибка получения виртуальных сделок: {e}")
         return jsonify([]), 200
 
+def _build_active_trades():
+    db = SessionLocal()
+    try:
+        # Активные сделки - это позиции
+        positions = db.query(Position).filter(
+            Position.status == 'OPEN'
+        ).all()
+        
+        return [{
+            'id': pos.id,
+            'symbol': pos.symbol,
+            'side': pos.side,
+            'entry_price': pos.entry_price,
+            'current_price': pos.current_price,
+            'quantity': pos.quantity,
+            'pnl': pos.unrealized_pnl,
+            'pnl_percent': pos.pnl_percent,
+            'created_at': pos.created_at.isoformat() if pos.created_at else None
+        } for pos in positions]
+    finally:
+        db.close()
+
+read_models.register('active_trades', _build_active_trades, ttl=5, tables=('positions',))
+
 @signals_api_bp.route('/trades/active', methods=['GET'])
 def get_active_trades():
     """Получение активных сделок"""
@@ -317,54 +378,73 @@ def get_active_trades():
         return jsonify([]), 200
     
     try:
-        db = SessionLocal()
-        try:
-            # Активные сделки - это позиции
-            positions = db.query(Position).filter(
-                Position.status == 'OPEN'
-            ).all()
-            
-            trades_data = []
-            for pos in positions:
-                trades_data.append({
-                    'id': pos.id,
-                    'symbol': pos.symbol,
-                    'side': pos.side,
-                    'entry_price': pos.entry_price,
-                    'current_price': pos.current_price,
-                    'quantity': pos.quantity,
-                    'pnl': pos.unrealized_pnl,
-                    'pnl_percent': pos.pnl_percent,
-                    'created_at': pos.created_at.isoformat() if pos.created_at else None
-                })
-            
-            return jsonify(trades_data)
-        finally:
-            db.close()
+        return read_models.response('active_trades')
     except Exception as e:
         logger.error(f"Ошибка получения активных сделок: {e}")
         return jsonify([]), 200
 
+def _build_trades_history(cursor, offset: int, limit: int):
+    db = SessionLocal()
+    try:
+        # Ключ страницы - (close_time, id): его обслуживает индекс
+        # idx_trade_status_close. Закрытые сделки без close_time идут
+        # после остальных отдельным запросом по id.
+        closed = db.query(Trade).filter(Trade.status == 'CLOSED')
+        timed = closed.filter(Trade.close_time.isnot(None))
+        untimed = closed.filter(Trade.close_time.is_(None))
+        
+        after = decode_cursor(cursor)
+        skip_timed = skip_untimed = 0
+        if after:
+            # Keyset-пагинация: строки после последней строки предыдущей страницы
+            close_time, trade_id = after
+            if close_time is None:
+                timed = None
+                untimed = untimed.filter(Trade.id < trade_id)
+            else:
+                timed = timed.filter(or_(
+                    Trade.close_time < close_time,
+                    and_(Trade.close_time == close_time, Trade.id < trade_id)
+                ))
+        elif offset:
+            skip_timed = offset
+            skip_untimed = max(0, offset - timed.count())
+        
+        trades = []
+        if timed is not None:
+            trades = timed.order_by(Trade.close_time.desc(), Trade.id.desc()).offset(skip_timed).limit(limit + 1).all()
+        if len(trades) <= limit:
+            trades += untimed.order_by(Trade.id.desc()).offset(skip_untimed).limit(limit + 1 - len(trades)).all()
+        
+        headers = {}
+        if len(trades) > limit:
+            trades = trades[:limit]
+            last = trades[-1]
+            headers['X-Next-Cursor'] = encode_cursor(last.close_time, last.id)
+        return [trade.to_dict() for trade in trades], headers
+    finally:
+        db.close()
+
+read_models.register('trades_history', _build_trades_history, ttl=60, tables=('trades',))
+
 @signals_api_bp.route('/trades/history', methods=['GET'])
 def get_trades_history():
-    """Получение истории сделок"""
+    """
+    Получение истории сделок.
+    Следующая страница: ?cursor=<значение заголовка X-Next-Cursor>
+    (offset поддерживается для совместимости, но медленнее на глубоких страницах).
+    """
     bot_manager = get_bot_manager()
     if not bot_manager:
         return jsonify([]), 200
     
     try:
-        db = SessionLocal()
-        try:
-            limit = request.args.get('limit', 50, type=int)
-            offset = request.args.get('offset', 0, type=int)
-            
-            trades = db.query(Trade).filter(
-                Trade.status == 'CLOSED'
-            ).order_by(Trade.close_time.desc()).offset(offset).limit(limit).all()
-            
-            return jsonify([trade.to_dict() for trade in trades])
-        finally:
-            db.close()
+        return read_models.response(
+            'trades_history',
+            request.args.get('cursor'),
+            request.args.get('offset', 0, type=int),
+            _page_size(50)
+        )
     except Exception as e:
         logger.error(f"Ошибка получения истории сделок: {e}")
         return jsonify([]), 200
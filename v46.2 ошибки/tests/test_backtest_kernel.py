@@ -0,0 +1,89 @@
+"""
+Сверка векторизованного ядра бэктеста с построчным циклом
+Файл: tests/test_backtest_kernel.py
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('matplotlib')
+pytest.importorskip('seaborn')
+pytest.importorskip('scipy')
+pytest.importorskip('xgboost')
+
+from src.ml.training.backtest_kernel import encode_predictions, run_backtest_kernel  # noqa: E402
+from src.ml.training.backtester import BacktestConfig, Backtester  # noqa: E402
+
+
+def make_data(n: int = 5000, seed: int = 0):
+    """Случайное блуждание цены и случайные сигналы buy/sell/hold"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-01', periods=n, freq='1min')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    market_data = pd.DataFrame({
+        'open': close,
+        'high': close * (1 + np.abs(rng.normal(0, 0.002, n))),
+        'low': close * (1 - np.abs(rng.normal(0, 0.002, n))),
+        'close': close,
+        'volume': 1.0,
+    }, index=index)
+
+    predictions = pd.DataFrame(index=index)
+    predictions['signal'] = rng.choice(['buy', 'sell', 'hold'], p=[0.03, 0.03, 0.94], size=n)
+    predictions['confidence'] = rng.uniform(0.5, 1.0, n)
+    predictions['take_profit_percent'] = rng.uniform(1.0, 3.0, n)
+    predictions['stop_loss_percent'] = rng.uniform(0.5, 1.5, n)
+    predictions['strategy'] = rng.choice(['trend', 'reversal'], size=n)
+    return market_data, predictions
+
+
+CONFIGS = {
+    'long_short': BacktestConfig(enable_shorting=True),
+    'long_only': BacktestConfig(enable_shorting=False, max_open_positions=1),
+    'trailing_stop': BacktestConfig(trailing_stop=True, trailing_stop_distance=0.002),
+    'no_sl_tp': BacktestConfig(use_stop_loss=False, use_take_profit=False, max_open_positions=5),
+    'leverage': BacktestConfig(use_leverage=True, leverage=3.0),
+    'leverage_trailing_no_sl': BacktestConfig(use_stop_loss=False, trailing_stop=True,
+                                              trailing_stop_distance=0.001,
+                                              use_leverage=True, leverage=3.0),
+}
+
+
+@pytest.mark.parametrize('name', list(CONFIGS))
+def test_kernel_matches_loop(name):
+    market_data, predictions = make_data(seed=len(name))
+    result = Backtester(CONFIGS[name]).compare_engines(market_data, predictions)
+
+    assert result['total_trades'] > 0
+    assert result['equity_match']
+    assert result['match'], result['mismatches'][:5]
+
+
+def test_run_backtest_same_result_for_both_engines():
+    market_data, predictions = make_data(n=3000, seed=1)
+    backtester = Backtester(BacktestConfig())
+    kernel = backtester.run_backtest(market_data, None, predictions)
+    backtester.config.vectorized = False
+    loop = backtester.run_backtest(market_data, None, predictions)
+
+    assert kernel.total_trades == loop.total_trades
+    assert np.isclose(kernel.total_return, loop.total_return, rtol=1e-9)
+    assert np.allclose(kernel.equity_curve, loop.equity_curve, rtol=1e-9)
+
+
+def test_empty_data_gives_empty_result():
+    market_data, predictions = make_data(n=10)
+    market_data, predictions = market_data.iloc[:0], predictions.iloc[:0]
+
+    columns, equity = run_backtest_kernel(
+        np.empty(0), np.empty(0), np.empty(0), config=BacktestConfig(),
+        **{k: v for k, v in encode_predictions(predictions, 0).items() if k != 'strategy_labels'}
+    )
+    assert len(equity) == 0
+    assert all(len(values) == 0 for values in columns.values())
+
+    backtester = Backtester(BacktestConfig())
+    assert backtester.compare_engines(market_data, predictions)['match']
+    for vectorized in (True, False):
+        backtester.config.vectorized = vectorized
+        assert backtester.run_backtest(market_data, None, predictions).total_trades == 0
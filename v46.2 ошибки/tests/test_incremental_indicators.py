@@ -0,0 +1,156 @@
+"""
+Сверка потоковых индикаторов с пакетными функциями
+Файл: tests/test_incremental_indicators.py
+"""
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Пакет src.indicators экспортирует экземпляр unified_indicators под именем модуля
+ui = importlib.import_module('src.indicators.unified_indicators')
+
+
+def make_candles(n: int = 1500, seed: int = 3):
+    """Случайное блуждание с плоским участком (нулевые диапазоны и потоки)"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    high = close * (1 + np.abs(rng.normal(0, 0.005, n)))
+    low = close * (1 - np.abs(rng.normal(0, 0.005, n)))
+    close[300:330] = high[300:330] = low[300:330] = close[300]
+    volume = rng.uniform(1, 100, n)
+    return pd.DataFrame({'open': close, 'high': high, 'low': low, 'close': close, 'volume': volume})
+
+
+def run(indicator, df, outputs):
+    """Значения индикатора после каждой свечи"""
+    result = {name: [] for name in outputs}
+    for candle in df.to_dict('records'):
+        indicator.update(candle)
+        values = indicator.values
+        for name in outputs:
+            result[name].append(values[name])
+    return {name: np.array(values) for name, values in result.items()}
+
+
+def assert_same(actual, expected):
+    expected = np.asarray(expected, dtype=np.float64)
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.fixture(params=['manual', 'talib'])
+def mode(request, monkeypatch):
+    """Пакетные функции и потоковые индикаторы в одном режиме формул"""
+    if request.param == 'talib':
+        monkeypatch.setattr(ui, 'talib', pytest.importorskip('talib'), raising=False)
+    monkeypatch.setattr(ui, 'USE_TALIB', request.param == 'talib')
+    return request.param
+
+
+CASES = {
+    'ema': (lambda: ui.IncrementalEMA(20), ['ema'],
+            lambda d: [ui.EMA(d['close'].values, 20)]),
+    'rsi': (lambda: ui.IncrementalRSI(14), ['rsi'],
+            lambda d: [ui.RSI(d['close'].values, 14)]),
+    'macd': (lambda: ui.IncrementalMACD(12, 26, 9), ['macd', 'signal', 'histogram'],
+             lambda d: ui.MACD(d['close'].values, 12, 26, 9)),
+    'bollinger': (lambda: ui.IncrementalBollingerBands(20), ['upper', 'middle', 'lower'],
+                  lambda d: ui.BBANDS(d['close'].values, 20, 2, 2)),
+    'atr': (lambda: ui.IncrementalATR(14), ['atr'],
+            lambda d: [ui.ATR(d['high'].values, d['low'].values, d['close'].values, 14)]),
+    'adx': (lambda: ui.IncrementalADX(14), ['adx'],
+            lambda d: [ui.ADX(d['high'].values, d['low'].values, d['close'].values, 14)]),
+    'obv': (lambda: ui.IncrementalOBV(), ['obv'],
+            lambda d: [ui.OBV(d['close'].values, d['volume'].values)]),
+    'stochastic': (lambda: ui.IncrementalStochastic(14, 3, smooth_k=3), ['k', 'd'],
+                   lambda d: ui.STOCH(d['high'].values, d['low'].values, d['close'].values, 14, 3, 3)),
+    'mfi': (lambda: ui.IncrementalMFI(14), ['mfi'],
+            lambda d: [ui.MFI(d['high'].values, d['low'].values, d['close'].values, d['volume'].values, 14)]),
+}
+
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_incremental_matches_batch(name, mode):
+    make, outputs, batch = CASES[name]
+    df = make_candles()
+    actual = run(make(), df, outputs)
+    for output, expected in zip(outputs, batch(df)):
+        assert_same(actual[output], expected)
+
+
+def test_directional_indicators_match_talib(mode):
+    if mode != 'talib':
+        pytest.skip("PLUS_DI/MINUS_DI без TA-Lib - заглушки")
+    df = make_candles()
+    actual = run(ui.IncrementalADX(14), df, ['plus_di', 'minus_di'])
+    high, low, close = df['high'].values, df['low'].values, df['close'].values
+    assert_same(actual['plus_di'], ui.PLUS_DI(high, low, close, 14))
+    assert_same(actual['minus_di'], ui.MINUS_DI(high, low, close, 14))
+
+
+def test_seed_and_sync_match_update(mode):
+    df = make_candles(600)
+    timestamps = np.arange(len(df), dtype=np.int64) * 300_000
+    view = {'timestamp': timestamps, **{column: df[column].values for column in df.columns}}
+
+    by_update = ui.IndicatorStream.default()
+    for i, candle in enumerate(df.iloc[:-1].to_dict('records')):
+        by_update.update(candle, timestamp=int(timestamps[i]))
+
+    by_sync = ui.IndicatorStream.default()
+    half = {column: values[:300] for column, values in view.items()}
+    assert by_sync.sync(half) == 299
+    assert by_sync.sync(view) == 300
+
+    assert by_sync.last_timestamp == by_update.last_timestamp
+    np.testing.assert_allclose(list(by_sync.snapshot().values()), list(by_update.snapshot().values()),
+                               rtol=1e-12, equal_nan=True)
+
+
+def test_preview_does_not_change_state(mode):
+    df = make_candles(400)
+    view = {'timestamp': np.arange(len(df), dtype=np.int64), **{c: df[c].values for c in df.columns}}
+    stream = ui.IndicatorStream.default()
+    stream.sync(view)
+    before = stream.snapshot()
+
+    preview = stream.preview(df.iloc[-1].to_dict())
+
+    full = ui.IndicatorStream.default()
+    full.sync(view, closed_only=False)
+    np.testing.assert_allclose(list(preview.values()), list(full.snapshot().values()), rtol=1e-12, equal_nan=True)
+    np.testing.assert_array_equal(list(stream.snapshot().values()), list(before.values()))
+
+
+def test_talib_mode_matches_ta_library():
+    """Режим TA-Lib в сканере заменяет расчеты библиотекой ta в MultiIndicatorStrategy"""
+    ta_momentum = pytest.importorskip('ta.momentum')
+    ta_trend = pytest.importorskip('ta.trend')
+    ta_volatility = pytest.importorskip('ta.volatility')
+    df = make_candles(1000)
+    high, low, close = df['high'], df['low'], df['close']
+
+    rsi = run(ui.IncrementalRSI(14, talib=True), df, ['rsi'])['rsi']
+    atr = run(ui.IncrementalATR(14, talib=True), df, ['atr'])['atr']
+    adx = run(ui.IncrementalADX(14, talib=True), df, ['adx', 'plus_di', 'minus_di'])
+    bb = run(ui.IncrementalBollingerBands(20, talib=True), df, ['upper', 'lower'])
+    stoch = run(ui.IncrementalStochastic(14, 3, talib=True), df, ['k', 'd'])
+
+    adx_ta = ta_trend.ADXIndicator(high, low, close, window=14)
+    bb_ta = ta_volatility.BollingerBands(close, window=20, window_dev=2)
+    stoch_ta = ta_momentum.StochasticOscillator(high, low, close)
+    expected = {
+        'rsi': (rsi, ta_momentum.RSIIndicator(close, window=14).rsi()),
+        'atr': (atr, ta_volatility.AverageTrueRange(high, low, close, window=14).average_true_range()),
+        'adx': (adx['adx'], adx_ta.adx()),
+        'plus_di': (adx['plus_di'], adx_ta.adx_pos()),
+        'minus_di': (adx['minus_di'], adx_ta.adx_neg()),
+        'bb_upper': (bb['upper'], bb_ta.bollinger_hband()),
+        'bb_lower': (bb['lower'], bb_ta.bollinger_lband()),
+        'stoch_k': (stoch['k'], stoch_ta.stoch()),
+        'stoch_d': (stoch['d'], stoch_ta.stoch_signal()),
+    }
+    for name, (actual, reference) in expected.items():
+        assert actual[-1] == pytest.approx(reference.iloc[-1], rel=1e-9), name
@@ -0,0 +1,57 @@
+"""
+Догрузка свечей в признаки режима на хосте с локальным временем не UTC
+Файл: tests/test_regime_features.py
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.core.models import Candle, OrderBookSnapshot
+from src.data.candle_store import CandleStore
+from src.data.regime_features import RegimeFeatureEngine
+
+
+@pytest.fixture(params=['Asia/Tokyo', 'Pacific/Honolulu'])
+def local_tz(request, monkeypatch):
+    """Часовой пояс процесса (UTC+9 и UTC-10)"""
+    monkeypatch.setenv('TZ', request.param)
+    time.tzset()
+    yield request.param
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    Candle.__table__.create(engine)
+    OrderBookSnapshot.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def test_backfill_stores_utc_timestamps(local_tz, db):
+    """open_time в БД - локальное время хоста (как пишет candle_writer), в буфере - UTC мс"""
+    step = timedelta(minutes=5)
+    now_ms = int(time.time() // 300 * 300 * 1000)
+    expected = [now_ms - i * 300_000 for i in range(12 * 23, -1, -1)]  # последние 23 часа
+    for ts in expected:
+        open_time = datetime.fromtimestamp(ts / 1000)
+        db.add(Candle(symbol='BTCUSDT', interval='5m', open_time=open_time, close_time=open_time + step,
+                      open=1.0, high=1.0, low=1.0, close=1.0, volume=1.0))
+    db.commit()
+
+    store = CandleStore()
+    engine = RegimeFeatureEngine(store=store)
+    engine.compute(['BTCUSDT'], db=db)
+
+    view = store.view('BTCUSDT', '5m')
+    assert view['timestamp'].tolist() == expected
+
+    # Следующая живая свеча не отбрасывается как "старая"
+    assert store.append('BTCUSDT', '5m', [now_ms + 300_000, 1.0, 1.0, 1.0, 1.0, 1.0])
+    assert store.last_timestamp('BTCUSDT', '5m') == now_ms + 300_000
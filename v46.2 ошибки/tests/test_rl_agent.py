@@ -0,0 +1,73 @@
+"""
+Обучение TradingRLAgent пачками параллельных эпизодов
+Файл: tests/test_rl_agent.py
+"""
+import numpy as np
+import pandas as pd
+
+from src.ml.models.rl_agent import ReplayBuffer, TradingRLAgent
+
+TIME_STEP = 7  # индекс признака time_step в векторе состояния
+
+
+def make_data(n: int = 2000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    return pd.DataFrame({
+        'close': close,
+        'volume': rng.uniform(1e5, 1e6, n),
+        'rsi': rng.uniform(20, 80, n),
+        'macd': rng.normal(0, 1, n),
+        'bb_position': rng.uniform(0, 1, n),
+    })
+
+
+def test_replay_samples_cover_whole_training_history(monkeypatch):
+    """Обновления пачки берут опыт со всей истории, а не только с последних свечей"""
+    sampled = []
+    original_sample = ReplayBuffer.sample
+
+    def recording_sample(self, batch_size, rng):
+        batch = original_sample(self, batch_size, rng)
+        sampled.append(batch[0].copy())
+        return batch
+
+    monkeypatch.setattr(ReplayBuffer, 'sample', recording_sample)
+
+    agent = TradingRLAgent(memory_size=200, parallel_episodes=16)
+    agent.train(make_data(), episodes=16, validation_split=0.1)
+
+    assert len(sampled) == 16
+    assert agent.memory.capacity == 200 * 16
+
+    # Дециль истории, из которой взят переход, - разряд time_step в коде состояния
+    codes = np.concatenate(sampled)
+    deciles = codes // agent._radix[TIME_STEP] % agent._levels[TIME_STEP]
+    assert set(range(1, 10)) <= set(deciles.tolist())
+
+
+def test_parallel_epsilon_matches_sequential_decay():
+    agent = TradingRLAgent(parallel_episodes=8)
+    agent.train(make_data(300), episodes=20, validation_split=0.1)
+
+    expected = 1.0
+    for _ in range(20):
+        if expected > agent.epsilon_min:
+            expected *= agent.epsilon_decay
+    assert np.isclose(agent.epsilon, expected)
+
+
+def test_epsilon_schedule_stops_at_minimum():
+    agent = TradingRLAgent(epsilon=0.02, epsilon_decay=0.5, epsilon_min=0.01)
+    schedule, after = agent._epsilon_schedule(4)
+    np.testing.assert_allclose(schedule, [0.02, 0.01, 0.01, 0.01])
+    assert after == 0.01
+
+
+def test_replay_buffer_resize_keeps_latest():
+    buffer = ReplayBuffer(4)
+    values = np.arange(6)
+    buffer.add_batch(values, values, values.astype(float), values, np.zeros(6, dtype=bool))
+    buffer.resize(3)
+    assert len(buffer) == 3
+    assert sorted(buffer.states[:3].tolist()) == [3, 4, 5]